@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
 from app.models import QCM, Question, User
+from app.repositories.question_repository import QuestionRepository
 
 
 def add_questions_to_qcm(qcm_titre: str, questions_data: list):
@@ -18,36 +19,22 @@ def add_questions_to_qcm(qcm_titre: str, questions_data: list):
         print(f"❌ QCM '{qcm_titre}' non trouvé")
         return False
 
-    # Vérifier quelles questions existent déjà
-    questions_existantes = {q.enonce for q in qcm.questions}
-    nouvelles_questions = 0
+    # Vérifier quelles questions existent déjà (énoncés seuls, sans charger les questions)
+    questions_existantes = {enonce for (enonce,) in db.session.query(Question.enonce).filter_by(qcm_id=qcm.id)}
+    nouvelles = []
 
     for q_data in questions_data:
         # Vérifier si la question existe déjà
         if q_data['enonce'] in questions_existantes:
             print(f"⏭️  Question déjà existante: {q_data['enonce'][:50]}...")
             continue
-
-        question = Question(
-            enonce=q_data['enonce'],
-            type_question=q_data['type'],
-            points=q_data['points'],
-            qcm_id=qcm.id,
-            explication=q_data.get('explication')
-        )
-
-        if q_data['type'] == 'qcm':
-            # Options pour QCM
-            question.set_options(q_data['options'])
-        elif q_data['type'] == 'vrai_faux':
-            question.reponse_correcte = q_data['reponse_correcte']
-
-        db.session.add(question)
-        nouvelles_questions += 1
+        nouvelles.append(q_data)
         print(f"✅ Question ajoutée: {q_data['enonce'][:50]}...")
 
+    # Insertion en masse (une seule instruction)
+    QuestionRepository().insert_many(qcm.id, nouvelles)
     db.session.commit()
-    print(f"✅ {nouvelles_questions} nouvelle(s) question(s) ajoutée(s) au QCM '{qcm_titre}'")
+    print(f"✅ {len(nouvelles)} nouvelle(s) question(s) ajoutée(s) au QCM '{qcm_titre}'")
     return True
 
 
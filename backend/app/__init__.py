@@ -146,6 +146,20 @@ def create_app(config=None):
     app.config['JWT_CSRF_CHECK_FORM'] = False
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
 
+    # Commentaires IA des résultats générés en arrière-plan (voir commentaire_ia_pipeline)
+    app.config['COMMENTAIRES_IA_ACTIFS'] = os.getenv(
+        'COMMENTAIRES_IA_ACTIFS', 'true').lower() in ('1', 'true', 'yes')
+
+    # Socket.IO à plusieurs workers (voir app.events.diffusion)
+    # SOCKETIO_MESSAGE_QUEUE: redis://..., amqp://... ou memory:// (un seul processus); vide: pas de file
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    app.config['SOCKETIO_CHANNEL'] = os.getenv('SOCKETIO_CHANNEL', 'flask-socketio')
+    # Processus qui émettent sans servir de clients WebSocket (workers Celery)
+    app.config['SOCKETIO_WRITE_ONLY'] = os.getenv(
+        'SOCKETIO_WRITE_ONLY', 'false').lower() in ('1', 'true', 'yes')
+    # Présence des utilisateurs connectés (par défaut la file si c'est Redis, sinon en mémoire)
+    app.config['SOCKETIO_PRESENCE_URL'] = os.getenv('SOCKETIO_PRESENCE_URL', '')
+
     # Configuration CSRF
     # Désactiver Flask-WTF CSRF pour les routes API (on utilise JWT CSRF protection)
     # Flask-WTF CSRF est principalement pour les formulaires HTML
@@ -177,23 +191,23 @@ def create_app(config=None):
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
-    socketio.init_app(app)
+    from app.events.diffusion import configurer_presence, options_socketio
+    socketio.init_app(app, **options_socketio(app.config))
+    configurer_presence(app.config)
     # Ne pas initialiser CSRF globalement car on utilise JWT CSRF protection pour les API
     # csrf.init_app(app)  # Désactivé - on utilise JWT CSRF protection à la place
     
     # Ajouter des claims additionnels au JWT (incluant le rôle)
     @jwt.additional_claims_loader
     def add_claims_to_access_token(identity):
-        """Ajoute le rôle de l'utilisateur au token JWT"""
-        from app.models.user import User
-        user = User.query.get(identity)
-        if user:
-            return {
-                'role': user.role.value if hasattr(user.role, 'value') else str(user.role),
-                'email': user.email,
-                'name': user.name
-            }
-        return {}
+        """Ajoute le rôle de l'utilisateur au token JWT (identité partagée, voir app.utils.identity)"""
+        from app.utils.identity import charger_identite
+        identite = charger_identite(identity)
+        return identite.claims() if identite else {}
+
+    # Identités chargées pendant la requête (le contexte d'application peut lui survivre)
+    from app.utils.identity import liberer_memoire_requete
+    app.teardown_request(liberer_memoire_requete)
 
     # Prometheus metrics
     PrometheusMetrics(app)
@@ -217,6 +231,10 @@ def create_app(config=None):
     app.register_blueprint(users_api_bp)  # Enseignants, Étudiants, Classes
 
     # Importer les événements WebSocket (nécessaire pour enregistrer les handlers)
-    from app.events import notifications
+    from app.events import notifications, exam_timer
+
+    # Application réutilisée par les tâches hors requête (voir app.utils.app_context)
+    from app.utils.app_context import register_app
+    register_app(app)
 
     return app
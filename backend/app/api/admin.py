@@ -5,6 +5,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity
 from app import db
 from app.utils.decorators import require_role
+from app.utils.identity import invalider_identite
+from app.utils.pagination import lire_pagination_curseur
 from app.services.user_service import UserService
 from app.services.qcm_service import QCMService
 from app.services.question_service import QuestionService
@@ -104,6 +106,21 @@ def get_users(current_user):
         if sort_order not in ['asc', 'desc']:
             sort_order = 'desc'
         
+        # Pagination par curseur (paramètre cursor présent): tri fixe sur la date de création
+        pagination_curseur = lire_pagination_curseur()
+        if pagination_curseur:
+            curseur, avec_total = pagination_curseur
+            users, curseur_suivant, total = user_service.get_users_curseur(
+                filters=filters, limit=per_page, curseur=curseur, avec_total=avec_total)
+            return jsonify({
+                'users': users,
+                'pagination': {
+                    'per_page': per_page,
+                    'next_cursor': curseur_suivant,
+                    'total': total
+                }
+            }), 200
+
         # Récupérer les utilisateurs (déjà sous forme de dictionnaires)
         users, total = user_service.get_users(filters=filters, skip=skip, limit=per_page, sort_by=sort_by, sort_order=sort_order)
         
@@ -117,6 +134,8 @@ def get_users(current_user):
             }
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erreur lors de la récupération des utilisateurs: {str(e)}'}), 500
 
@@ -339,6 +358,21 @@ def get_qcms(current_user):
         if search:
             filters['search'] = search
 
+        # Pagination par curseur (paramètre cursor présent)
+        pagination_curseur = lire_pagination_curseur()
+        if pagination_curseur:
+            curseur, avec_total = pagination_curseur
+            qcms, curseur_suivant, total = qcm_service.get_qcms_curseur(
+                filters=filters, limit=per_page, curseur=curseur, avec_total=avec_total)
+            return jsonify({
+                'qcms': [qcm_response_schema.dump(qcm) for qcm in qcms],
+                'pagination': {
+                    'per_page': per_page,
+                    'next_cursor': curseur_suivant,
+                    'total': total
+                }
+            }), 200
+
         # Récupérer les QCM
         qcms, total = qcm_service.get_qcms(filters=filters, skip=skip, limit=per_page)
 
@@ -352,6 +386,8 @@ def get_qcms(current_user):
             }
         }), 200
 
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erreur lors de la récupération des QCM: {str(e)}'}), 500
 
@@ -463,6 +499,21 @@ def get_questions(current_user):
         if search:
             filters['search'] = search
 
+        # Pagination par curseur (paramètre cursor présent)
+        pagination_curseur = lire_pagination_curseur()
+        if pagination_curseur:
+            curseur, avec_total = pagination_curseur
+            questions, curseur_suivant, total = question_service.get_questions_curseur(
+                filters=filters, limit=per_page, curseur=curseur, avec_total=avec_total)
+            return jsonify({
+                'questions': [question_response_schema.dump(question) for question in questions],
+                'pagination': {
+                    'per_page': per_page,
+                    'next_cursor': curseur_suivant,
+                    'total': total
+                }
+            }), 200
+
         # Récupérer les questions
         questions, total = question_service.get_questions(filters=filters, skip=skip, limit=per_page)
 
@@ -476,6 +527,8 @@ def get_questions(current_user):
             }
         }), 200
 
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erreur lors de la récupération des questions: {str(e)}'}), 500
 
@@ -1071,6 +1124,21 @@ def get_sessions_admin(current_user):
         if qcm_id:
             filters['qcm_id'] = qcm_id
 
+        # Pagination par curseur (paramètre cursor présent)
+        pagination_curseur = lire_pagination_curseur()
+        if pagination_curseur:
+            curseur, avec_total = pagination_curseur
+            sessions, curseur_suivant, total = admin_service.get_sessions_admin_curseur(
+                filters=filters, limit=per_page, curseur=curseur, avec_total=avec_total)
+            return jsonify({
+                'sessions': sessions,
+                'pagination': {
+                    'per_page': per_page,
+                    'next_cursor': curseur_suivant,
+                    'total': total
+                }
+            }), 200
+
         sessions, total = admin_service.get_all_sessions_admin(
             filters=filters, skip=skip, limit=per_page
         )
@@ -1085,6 +1153,8 @@ def get_sessions_admin(current_user):
             }
         }), 200
 
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erreur: {str(e)}'}), 500
 
@@ -1140,6 +1210,21 @@ def get_resultats_admin(current_user):
         if status:
             filters['status'] = status
 
+        # Pagination par curseur (paramètre cursor présent)
+        pagination_curseur = lire_pagination_curseur()
+        if pagination_curseur:
+            curseur, avec_total = pagination_curseur
+            resultats, curseur_suivant, total = admin_service.get_resultats_admin_curseur(
+                filters=filters, limit=per_page, curseur=curseur, avec_total=avec_total)
+            return jsonify({
+                'resultats': resultats,
+                'pagination': {
+                    'per_page': per_page,
+                    'next_cursor': curseur_suivant,
+                    'total': total
+                }
+            }), 200
+
         resultats, total = admin_service.get_all_resultats_admin(
             filters=filters, skip=skip, limit=per_page
         )
@@ -1154,6 +1239,8 @@ def get_resultats_admin(current_user):
             }
         }), 200
 
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erreur: {str(e)}'}), 500
 
@@ -1291,6 +1378,7 @@ def activate_user(current_user, user_id):
         notify_user_activated(user_id)
 
         db.session.commit()
+        invalider_identite(user_id)
 
         return jsonify({
             'message': 'Utilisateur activé avec succès',
@@ -1329,6 +1417,7 @@ def reject_user(current_user, user_id):
         # notify_user_rejected(user_id, reason)
 
         db.session.commit()
+        invalider_identite(user_id)
 
         return jsonify({
             'message': 'Utilisateur rejeté et supprimé avec succès'
@@ -6,6 +6,7 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from app import db
 from app.models.user import User, UserRole
 from app.schemas.user_schema import UserRegisterSchema, UserLoginSchema, UserResponseSchema
+from app.utils.identity import charger_utilisateur, invalider_identite
 import os
 import requests
 from datetime import timedelta
@@ -144,7 +145,8 @@ def refresh_token():
         if not user_id:
             return jsonify({'message': 'Token invalide'}), 401
         
-        user = User.query.get(user_id)
+        # Utilisateur et profils chargés une fois (partagés avec les claims du token)
+        user = charger_utilisateur(user_id)
         
         if not user:
             return jsonify({'message': 'Utilisateur non trouvé'}), 404
@@ -265,6 +267,7 @@ def update_me():
                 user.date_naissance = None
         
         db.session.commit()
+        invalider_identite(user_id)
         
         return jsonify(user_response_schema.dump(user.to_dict())), 200
         
@@ -410,6 +413,7 @@ def complete_profile():
         
         # Commit avant de créer le nouveau token pour s'assurer que le rôle est bien enregistré
         db.session.commit()
+        invalider_identite(user_id)
 
         # Créer une notification admin pour la validation
         try:
@@ -0,0 +1,38 @@
+"""
+Route API du catalogue des référentiels (toutes les listes déroulantes en une requête)
+"""
+from flask import request
+from flask_restx import Namespace, Resource, fields
+from app.services.referentiel_service import catalogue_referentiels
+from app.utils.http_cache import reponse_etag
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Namespace pour l'API
+api = Namespace('referentiels', description='Catalogue des référentiels')
+
+# Modèle pour la documentation Swagger (listes au format des routes de chaque référentiel)
+catalogue_model = api.model('CatalogueReferentiels', {
+    'niveaux': fields.List(fields.Raw, description='Niveaux (voir /api/niveaux)'),
+    'mentions': fields.List(fields.Raw, description='Mentions (voir /api/mentions)'),
+    'parcours': fields.List(fields.Raw, description='Parcours (voir /api/parcours)'),
+    'matieres': fields.List(fields.Raw, description='Matières (voir /api/matieres)'),
+    'etablissements': fields.List(fields.Raw, description='Établissements (voir /api/etablissements)')
+})
+
+
+@api.route('')
+class Catalogue(Resource):
+    @api.doc('get_catalogue_referentiels', responses={304: 'Catalogue inchangé (If-None-Match)'})
+    @api.param('actifs_seulement', 'Ne retourner que les éléments actifs', type='boolean', default=False)
+    @api.response(200, 'Succès', catalogue_model)
+    def get(self):
+        """Niveaux, mentions, parcours, matières et établissements en une seule réponse (ETag)"""
+        try:
+            actifs_seulement = request.args.get('actifs_seulement', 'false').lower() == 'true'
+            catalogue, etag = catalogue_referentiels.catalogue(actifs_seulement)
+            return reponse_etag(catalogue, etag)
+        except Exception as e:
+            logger.error(f"Erreur récupération catalogue des référentiels: {e}", exc_info=True)
+            api.abort(500, f"Erreur interne: {str(e)}")
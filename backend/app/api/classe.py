@@ -7,6 +7,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.classe_service import ClasseService
 from app.models.user import UserRole
 from app.repositories.user_repository import UserRepository
+from app.utils.identity import charger_identite
 import logging
 
 logger = logging.getLogger(__name__)
@@ -56,7 +57,7 @@ user_repo = UserRepository()
 def require_admin_or_teacher():
     """Vérifie que l'utilisateur est admin ou enseignant"""
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
+    user = charger_identite(user_id)
     if not user or user.role not in [UserRole.ADMIN, UserRole.ENSEIGNANT]:
         api.abort(403, "Accès réservé aux administrateurs et enseignants")
 
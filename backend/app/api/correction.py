@@ -5,14 +5,18 @@ from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from celery.result import AsyncResult
+from werkzeug.exceptions import HTTPException
 from celery_app import celery
+from app.models.user import UserRole
+from app.repositories.session_examen_repository import SessionExamenRepository
+from app.repositories.user_repository import UserRepository
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Imports optionnels pour les tâches de correction (peuvent ne pas être disponibles)
 try:
-    from app.tasks.correction import correct_student_answer, batch_correct_answers
+    from app.tasks.correction import correct_student_answer, batch_correct_answers, batch_correct_copies
     CORRECTION_AVAILABLE = True
 except ImportError as e:
     CORRECTION_AVAILABLE = False
@@ -22,10 +26,15 @@ except ImportError as e:
         raise ImportError("La correction automatique nécessite certaines dépendances. Installez-les avec: pip install transformers torch numpy")
     def batch_correct_answers(*args, **kwargs):
         raise ImportError("La correction automatique nécessite certaines dépendances. Installez-les avec: pip install transformers torch numpy")
+    def batch_correct_copies(*args, **kwargs):
+        raise ImportError("La correction automatique nécessite certaines dépendances. Installez-les avec: pip install transformers torch numpy")
 
 # Namespace pour l'API
 api = Namespace('correction', description='Correction automatique des réponses')
 
+session_repo = SessionExamenRepository()
+user_repo = UserRepository()
+
 # Modèles pour la documentation Swagger
 answer_submit_model = api.model('AnswerSubmit', {
     'question_id': fields.String(required=True, description='ID de la question'),
@@ -37,6 +46,10 @@ batch_submit_model = api.model('BatchSubmit', {
     'answers': fields.Raw(required=True, description='Dictionnaire {question_id: answer}')
 })
 
+copies_submit_model = api.model('CopiesSubmit', {
+    'session_id': fields.String(required=True, description='ID de la session d\'examen (copies lues en base)')
+})
+
 correction_result_model = api.model('CorrectionResult', {
     'question_id': fields.String(description='ID de la question'),
     'is_correct': fields.Boolean(description='Réponse correcte ou non'),
@@ -145,6 +158,55 @@ class BatchSubmit(Resource):
             api.abort(500, f"Erreur interne: {str(e)}")
 
 
+@api.route('/batch/copies')
+class CopiesSubmit(Resource):
+    @api.doc('copies_submit', security='Bearer')
+    @api.expect(copies_submit_model)
+    @api.marshal_with(task_status_model, code=202)
+    @jwt_required()
+    def post(self):
+        """
+        Soumet les copies de toute une session pour correction par lot (asynchrone)
+        Réservé à l'enseignant créateur de la session et aux administrateurs; les copies
+        (réponses des résultats terminés) sont lues en base par la tâche.
+        """
+        try:
+            if not CORRECTION_AVAILABLE:
+                api.abort(503, "La correction automatique nécessite certaines dépendances. Installez-les avec: pip install transformers torch numpy")
+
+            data = request.get_json() or {}
+            session_id = data.get('session_id')
+            if not session_id:
+                api.abort(400, "session_id est requis")
+
+            session = session_repo.get_by_id(session_id)
+            if not session:
+                api.abort(404, "Session non trouvée")
+
+            user_id = get_jwt_identity()
+            user = user_repo.get_by_id(user_id)
+            if not user or (user.role != UserRole.ADMIN and session.createur_id != user_id):
+                api.abort(403, "Seul l'enseignant de la session ou un administrateur peut lancer la correction")
+
+            # Lancer la tâche Celery de correction des copies
+            task = batch_correct_copies.apply_async(
+                args=[session_id]
+            )
+
+            return {
+                'task_id': task.id,
+                'status': 'PENDING',
+                'qcm_id': session.qcm_id,
+                'message': 'Correction en cours...'
+            }, 202
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur soumission des copies: {e}", exc_info=True)
+            api.abort(500, f"Erreur interne: {str(e)}")
+
+
 @api.route('/tasks/<string:task_id>')
 @api.param('task_id', 'ID de la tâche Celery')
 class CorrectionTaskStatus(Resource):
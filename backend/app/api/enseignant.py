@@ -7,6 +7,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.enseignant_service import EnseignantService
 from app.models.user import UserRole
 from app.repositories.user_repository import UserRepository
+from app.utils.identity import charger_identite
 import logging
 
 logger = logging.getLogger(__name__)
@@ -47,19 +48,18 @@ user_repo = UserRepository()
 
 def require_admin():
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
+    user = charger_identite(user_id)
     if not user or user.role != UserRole.ADMIN:
         api.abort(403, "Accès réservé aux administrateurs")
 
 
 def require_admin_or_self(enseignant_id):
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
-    if user.role == UserRole.ADMIN:
+    user = charger_identite(user_id)
+    if user and user.role == UserRole.ADMIN:
         return
-    # Vérifier si c'est l'enseignant lui-même
-    enseignant = enseignant_service.get_enseignant_by_user_id(user_id)
-    if not enseignant or enseignant['id'] != enseignant_id:
+    # Vérifier si c'est l'enseignant lui-même (profil lu avec l'identité)
+    if not user or user.enseignant_id is None or user.enseignant_id != enseignant_id:
         api.abort(403, "Accès non autorisé")
 
 
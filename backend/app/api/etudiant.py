@@ -6,6 +6,7 @@ from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.repositories.etudiant_repository import EtudiantRepository
 from app.repositories.user_repository import UserRepository
+from app.utils.identity import charger_identite, invalider_identite
 from app.models.user import UserRole
 import logging
 
@@ -45,7 +46,7 @@ user_repo = UserRepository()
 def require_admin():
     """Vérifie que l'utilisateur est admin"""
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
+    user = charger_identite(user_id)
     if not user or user.role != UserRole.ADMIN:
         api.abort(403, "Accès réservé aux administrateurs")
 
@@ -53,12 +54,11 @@ def require_admin():
 def require_admin_or_self(etudiant_id):
     """Vérifie que l'utilisateur est admin ou l'étudiant lui-même"""
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
-    if user.role == UserRole.ADMIN:
+    user = charger_identite(user_id)
+    if user and user.role == UserRole.ADMIN:
         return
-    # Vérifier si c'est l'étudiant lui-même
-    etudiant = etudiant_repo.get_by_user_id(user_id)
-    if not etudiant or etudiant.id != etudiant_id:
+    # Vérifier si c'est l'étudiant lui-même (profil lu avec l'identité)
+    if not user or user.etudiant_id is None or user.etudiant_id != etudiant_id:
         api.abort(403, "Accès non autorisé")
 
 
@@ -120,6 +120,7 @@ class EtudiantList(Resource):
             
             db.session.add(etudiant)
             db.session.commit()
+            invalider_identite(etudiant.user_id)
             
             return etudiant.to_dict(), 201
         except Exception as e:
@@ -5,8 +5,11 @@ from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.matiere_service import MatiereService
+from app.services.referentiel_service import catalogue_referentiels
 from app.models.user import UserRole
 from app.repositories.user_repository import UserRepository
+from app.utils.identity import charger_identite
+from app.utils.http_cache import reponse_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,7 +49,7 @@ user_repo = UserRepository()
 def require_admin():
     """Vérifie que l'utilisateur est admin"""
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
+    user = charger_identite(user_id)
     if not user or user.role != UserRole.ADMIN:
         api.abort(403, "Accès réservé aux administrateurs")
 
@@ -54,7 +57,7 @@ def require_admin():
 def require_admin_or_enseignant():
     """Vérifie que l'utilisateur est admin ou enseignant"""
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
+    user = charger_identite(user_id)
     if not user or (user.role != UserRole.ADMIN and user.role != UserRole.ENSEIGNANT):
         api.abort(403, "Accès réservé aux administrateurs et enseignants")
 
@@ -83,8 +86,8 @@ class MatiereList(Resource):
         """Liste toutes les matières"""
         try:
             actives_seulement = request.args.get('actives_seulement', 'false').lower() == 'true'
-            matieres = matiere_service.get_all_matieres(actives_seulement=actives_seulement)
-            return matieres, 200
+            matieres, etag = catalogue_referentiels.lister('matieres', actives_seulement)
+            return reponse_etag(matieres, etag)
         except Exception as e:
             logger.error(f"Erreur récupération matières: {e}", exc_info=True)
             api.abort(500, f"Erreur interne: {str(e)}")
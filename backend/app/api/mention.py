@@ -5,8 +5,11 @@ from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.mention_service import MentionService
+from app.services.referentiel_service import catalogue_referentiels
 from app.models.user import UserRole
 from app.repositories.user_repository import UserRepository
+from app.utils.identity import charger_identite
+from app.utils.http_cache import reponse_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,7 +49,7 @@ user_repo = UserRepository()
 def require_admin():
     """Vérifie que l'utilisateur est admin"""
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
+    user = charger_identite(user_id)
     if not user or user.role != UserRole.ADMIN:
         api.abort(403, "Accès réservé aux administrateurs")
 
@@ -60,8 +63,8 @@ class MentionList(Resource):
         """Liste toutes les mentions"""
         try:
             actives_seulement = request.args.get('actives_seulement', 'false').lower() == 'true'
-            mentions = mention_service.get_all_mentions(actives_seulement=actives_seulement)
-            return mentions, 200
+            mentions, etag = catalogue_referentiels.lister('mentions', actives_seulement)
+            return reponse_etag(mentions, etag)
         except Exception as e:
             logger.error(f"Erreur récupération mentions: {e}", exc_info=True)
             api.abort(500, f"Erreur interne: {str(e)}")
@@ -5,8 +5,11 @@ from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.parcours_service import ParcoursService
+from app.services.referentiel_service import catalogue_referentiels
 from app.models.user import UserRole
 from app.repositories.user_repository import UserRepository
+from app.utils.identity import charger_identite
+from app.utils.http_cache import reponse_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -44,7 +47,7 @@ user_repo = UserRepository()
 def require_admin():
     """Vérifie que l'utilisateur est admin"""
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
+    user = charger_identite(user_id)
     if not user or user.role != UserRole.ADMIN:
         api.abort(403, "Accès réservé aux administrateurs")
 
@@ -58,8 +61,8 @@ class ParcoursList(Resource):
         """Liste tous les parcours"""
         try:
             actifs_seulement = request.args.get('actifs_seulement', 'false').lower() == 'true'
-            parcours_list = parcours_service.get_all_parcours(actifs_seulement=actifs_seulement)
-            return parcours_list, 200
+            parcours_list, etag = catalogue_referentiels.lister('parcours', actifs_seulement)
+            return reponse_etag(parcours_list, etag)
         except Exception as e:
             logger.error(f"Erreur récupération parcours: {e}", exc_info=True)
             api.abort(500, f"Erreur interne: {str(e)}")
@@ -4,16 +4,19 @@ Routes API pour la gestion des QCM
 from flask import Blueprint, request, jsonify, abort
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.exceptions import HTTPException
 from app.services.qcm_service import QCMService
 from app.services.question_service import QuestionService
+from app.services.audience_service import AudienceService
+from app.services.document_parser import DocumentParser
+from app.utils.pagination import lire_pagination_curseur
 import logging
-import base64
 
 logger = logging.getLogger(__name__)
 
 # Imports pour la génération asynchrone
 try:
-    from app.services.async_task_manager import task_manager
+    from app.services.async_task_manager import task_manager, TaskQueueFullError
     from app.services.quiz_generation_service import (
         generate_quiz_from_text_async,
         generate_quiz_from_document_async,
@@ -72,7 +75,8 @@ generate_from_text_model = api.model('GenerateFromText', {
 
 generate_from_document_model = api.model('GenerateFromDocument', {
     'titre': fields.String(required=True, description='Titre du QCM'),
-    'file_content': fields.String(required=True, description='Contenu du fichier en base64'),
+    'file_content': fields.String(description='Contenu du fichier en base64 (anciens clients; '
+                                              'de préférence: multipart/form-data, champ file)'),
     'file_type': fields.String(required=True, description='Type de fichier', enum=['pdf', 'docx']),
     'num_questions': fields.Integer(description='Nombre de questions à générer', default=5, min=1, max=20),
     'matiere': fields.String(description='Matière'),
@@ -84,14 +88,16 @@ generate_from_document_model = api.model('GenerateFromDocument', {
 
 task_status_model = api.model('TaskStatus', {
     'task_id': fields.String(description='ID de la tâche'),
-    'status': fields.String(description='Statut de la tâche', enum=['PENDING', 'PROGRESS', 'SUCCESS', 'FAILURE']),
+    'status': fields.String(description='Statut de la tâche', enum=['PENDING', 'PROGRESS', 'SUCCESS', 'FAILURE', 'REVOKED']),
     'result': fields.Raw(description='Résultat de la tâche'),
-    'error': fields.String(description='Message d\'erreur si échec')
+    'error': fields.String(description='Message d\'erreur si échec'),
+    'queue_position': fields.Integer(description='Position dans la file d\'attente (tâche en attente)')
 })
 
 # Service
 qcm_service = QCMService()
 question_service = QuestionService()
+audience_service = AudienceService()
 from app.services.resultat_service import ResultatService
 resultat_service = ResultatService()
 
@@ -103,6 +109,8 @@ class QCMList(Resource):
     @api.param('limit', 'Nombre d\'éléments à retourner', type='integer', default=100)
     @api.param('status', 'Filtrer par statut', type='string', enum=['draft', 'published', 'archived'])
     @api.param('matiere', 'Filtrer par matière', type='string')
+    @api.param('cursor', 'Curseur de pagination (vide pour la première page)', type='string')
+    @api.param('include_total', 'Calculer le total (pagination par curseur)', type='boolean', default=False)
     @jwt_required()
     def get(self):
         """Liste tous les QCM avec pagination et filtres"""
@@ -130,6 +138,19 @@ class QCMList(Resource):
             if user and user.role != UserRole.ADMIN:
                 filters['createur_id'] = user_id
 
+            # Pagination par curseur (paramètre cursor présent)
+            pagination_curseur = lire_pagination_curseur()
+            if pagination_curseur:
+                curseur, avec_total = pagination_curseur
+                qcms, curseur_suivant, total = qcm_service.get_qcms_curseur(
+                    filters=filters, limit=limit, curseur=curseur, avec_total=avec_total)
+                return {
+                    'data': qcms,
+                    'total': total,
+                    'limit': limit,
+                    'next_cursor': curseur_suivant
+                }, 200
+
             qcms, total = qcm_service.get_qcms(filters=filters, skip=skip, limit=limit)
 
             # Retourner directement le dictionnaire (Flask-RESTX gère la sérialisation JSON)
@@ -140,6 +161,8 @@ class QCMList(Resource):
                 'limit': limit
             }, 200
 
+        except ValueError as e:
+            api.abort(400, str(e))
         except Exception as e:
             logger.error(f"Erreur récupération QCMs: {e}", exc_info=True)
             api.abort(500, f"Erreur interne: {str(e)}")
@@ -249,29 +272,14 @@ class GenerateFromText(Resource):
             matiere_id = None
             matiere_text = data.get('matiere')
             if matiere_text:
-                from app.repositories.matiere_repository import MatiereRepository
-                from app.models.matiere import Matiere
-                matiere_repo = MatiereRepository()
-                
-                # Chercher d'abord par code exact
-                matiere_obj = matiere_repo.get_by_code(matiere_text.strip())
+                from app.services.recherche_service import index_matieres
                 
-                # Si pas trouvé, chercher par nom exact
-                if not matiere_obj:
-                    matiere_obj = matiere_repo.session.query(Matiere).filter(
-                        Matiere.nom.ilike(matiere_text.strip())
-                    ).filter(Matiere.actif == True).first()
+                # Code, nom exact puis nom partiel (index en mémoire, sans accents ni casse)
+                matiere_trouvee = index_matieres.resoudre(matiere_text)
                 
-                # Si toujours pas trouvé, faire une recherche partielle
-                if not matiere_obj:
-                    results = matiere_repo.search(matiere_text.strip())
-                    results = [m for m in results if m.actif]
-                    if results:
-                        matiere_obj = results[0]
-                
-                if matiere_obj and matiere_obj.actif:
-                    matiere_id = matiere_obj.id
-                    matiere_text = matiere_obj.nom  # Utiliser le nom officiel
+                if matiere_trouvee and matiere_trouvee['actif']:
+                    matiere_id = matiere_trouvee['id']
+                    matiere_text = matiere_trouvee['nom']  # Utiliser le nom officiel
 
             # Récupérer niveau, mention, parcours depuis les IDs ou codes
             niveau_id = data.get('niveau_id') or data.get('niveauId')
@@ -320,6 +328,9 @@ class GenerateFromText(Resource):
                 'status': 'draft'
             }
 
+            # Refuser avant de créer le QCM si la file de génération est pleine
+            task_manager.verifier_admission()
+
             qcm = qcm_service.create_qcm(qcm_data, user_id)
 
             # Estimer le temps de génération
@@ -336,11 +347,12 @@ class GenerateFromText(Resource):
                     data.get('matiere'),
                     niveau_nom,  # Passer le nom du niveau
                     mention_nom,  # Passer le nom de la mention
-                    parcours_nom  # Passer le nom du parcours
+                    parcours_nom,  # Passer le nom du parcours
+                    user_id=user_id  # Questions transmises en direct à l'enseignant
                 )
             
             # Lancer la tâche asynchrone (task_id sera passé automatiquement)
-            task_id = task_manager.create_task_with_id(run_generation)
+            task_id = task_manager.create_task_with_id(run_generation, owner_id=user_id)
             
             # Définir l'estimation de temps
             task_manager.set_estimated_duration(task_id, estimated_time)
@@ -350,9 +362,12 @@ class GenerateFromText(Resource):
                 'status': 'PENDING',
                 'qcm_id': qcm['id'],
                 'message': 'Génération en cours...',
-                'estimated_duration_seconds': estimated_time
+                'estimated_duration_seconds': estimated_time,
+                'queue_position': task_manager.get_queue_position(task_id)
             }, 202
 
+        except TaskQueueFullError as e:
+            api.abort(503, str(e))
         except ValueError as e:
             api.abort(400, str(e))
         except Exception as e:
@@ -367,17 +382,38 @@ class GenerateFromDocument(Resource):
     @api.marshal_with(task_status_model, code=202)
     @jwt_required()
     def post(self):
-        """Génère un QCM à partir d'un document PDF/DOCX (asynchrone)"""
+        """
+        Génère un QCM à partir d'un document PDF/DOCX (asynchrone)
+
+        Le document est envoyé en multipart/form-data (champ file, autres paramètres en champs
+        de formulaire) ou, pour les anciens clients, en base64 dans le JSON (file_content).
+        Il est écrit par blocs dans un fichier temporaire dont seul le chemin est transmis
+        à la tâche; le fichier est supprimé quand la tâche quitte la file.
+        """
+        chemin = None
+        confie = False
         try:
             if not QUIZ_GENERATION_AVAILABLE:
                 api.abort(503, "La génération de quiz nécessite 'transformers' et 'torch'. Installez-les avec: pip install transformers torch")
             
-            data = request.get_json()
+            fichier = request.files.get('file')
+            if fichier is not None:
+                # Champs du formulaire multipart (valeurs texte)
+                data = request.form.to_dict()
+                for champ in ('num_questions', 'duree'):
+                    if data.get(champ):
+                        data[champ] = int(data[champ])
+            else:
+                data = request.get_json() or {}
             user_id = get_jwt_identity()
+            suffixe = f".{data.get('file_type', '')}"
 
-            # Décoder le fichier base64
+            # Écrire le fichier sur disque par blocs (jamais entièrement en mémoire)
             try:
-                file_bytes = base64.b64decode(data['file_content'])
+                if fichier is not None:
+                    chemin = DocumentParser.enregistrer(fichier.stream, suffixe)
+                else:
+                    chemin = DocumentParser.enregistrer_base64(data.pop('file_content'), suffixe)
             except Exception as e:
                 api.abort(400, f"Erreur décodage fichier: {str(e)}")
 
@@ -385,29 +421,14 @@ class GenerateFromDocument(Resource):
             matiere_id = None
             matiere_text = data.get('matiere')
             if matiere_text:
-                from app.repositories.matiere_repository import MatiereRepository
-                from app.models.matiere import Matiere
-                matiere_repo = MatiereRepository()
-                
-                # Chercher d'abord par code exact
-                matiere_obj = matiere_repo.get_by_code(matiere_text.strip())
+                from app.services.recherche_service import index_matieres
                 
-                # Si pas trouvé, chercher par nom exact
-                if not matiere_obj:
-                    matiere_obj = matiere_repo.session.query(Matiere).filter(
-                        Matiere.nom.ilike(matiere_text.strip())
-                    ).filter(Matiere.actif == True).first()
+                # Code, nom exact puis nom partiel (index en mémoire, sans accents ni casse)
+                matiere_trouvee = index_matieres.resoudre(matiere_text)
                 
-                # Si toujours pas trouvé, faire une recherche partielle
-                if not matiere_obj:
-                    results = matiere_repo.search(matiere_text.strip())
-                    results = [m for m in results if m.actif]
-                    if results:
-                        matiere_obj = results[0]
-                
-                if matiere_obj and matiere_obj.actif:
-                    matiere_id = matiere_obj.id
-                    matiere_text = matiere_obj.nom  # Utiliser le nom officiel
+                if matiere_trouvee and matiere_trouvee['actif']:
+                    matiere_id = matiere_trouvee['id']
+                    matiere_text = matiere_trouvee['nom']  # Utiliser le nom officiel
 
             # Récupérer niveau, mention, parcours depuis les IDs ou codes
             niveau_id = data.get('niveau_id') or data.get('niveauId')
@@ -456,6 +477,9 @@ class GenerateFromDocument(Resource):
                 'status': 'draft'
             }
 
+            # Refuser avant de créer le QCM si la file de génération est pleine
+            task_manager.verifier_admission()
+
             qcm = qcm_service.create_qcm(qcm_data, user_id)
 
             # Estimer le temps de génération
@@ -467,17 +491,22 @@ class GenerateFromDocument(Resource):
                 return generate_quiz_from_document_async(
                     task_id_param,
                     qcm['id'],
-                    file_bytes,
+                    chemin,
                     data['file_type'],
                     num_questions,
                     data.get('matiere'),
                     niveau_nom,  # Passer le nom du niveau
                     mention_nom,  # Passer le nom de la mention
-                    parcours_nom  # Passer le nom du parcours
+                    parcours_nom,  # Passer le nom du parcours
+                    user_id=user_id  # Questions transmises en direct à l'enseignant
                 )
             
-            # Lancer la tâche asynchrone (task_id sera passé automatiquement)
-            task_id = task_manager.create_task_with_id(run_generation_doc)
+            # Lancer la tâche asynchrone (task_id sera passé automatiquement); le fichier
+            # temporaire est alors supprimé par la tâche, même annulée avant son exécution
+            task_id = task_manager.create_task_with_id(
+                run_generation_doc, owner_id=user_id,
+                nettoyage=lambda: DocumentParser.supprimer(chemin))
+            confie = True
             
             # Définir l'estimation de temps
             task_manager.set_estimated_duration(task_id, estimated_time)
@@ -487,14 +516,22 @@ class GenerateFromDocument(Resource):
                 'status': 'PENDING',
                 'qcm_id': qcm['id'],
                 'message': 'Génération en cours...',
-                'estimated_duration_seconds': estimated_time
+                'estimated_duration_seconds': estimated_time,
+                'queue_position': task_manager.get_queue_position(task_id)
             }, 202
 
+        except HTTPException:
+            raise
+        except TaskQueueFullError as e:
+            api.abort(503, str(e))
         except ValueError as e:
             api.abort(400, str(e))
         except Exception as e:
             logger.error(f"Erreur génération depuis document: {e}", exc_info=True)
             api.abort(500, f"Erreur interne: {str(e)}")
+        finally:
+            if not confie:
+                DocumentParser.supprimer(chemin)
 
 
 @api.route('/tasks/<string:task_id>')
@@ -517,6 +554,9 @@ class TaskStatus(Resource):
                 'status': task_status['status'],
             }
             
+            if task_status['status'] == 'PENDING':
+                response['queue_position'] = task_status.get('queue_position')
+            
             if task_status['status'] == 'PROGRESS':
                 response['result'] = {
                     'status': task_status.get('message', 'En cours...'),
@@ -528,6 +568,8 @@ class TaskStatus(Resource):
                 response['result'] = task_status.get('result')
             elif task_status['status'] == 'FAILURE':
                 response['error'] = task_status.get('error', 'Erreur inconnue')
+            elif task_status['status'] == 'REVOKED':
+                response['error'] = task_status.get('message', 'Tâche annulée')
             
             return response, 200
 
@@ -536,6 +578,37 @@ class TaskStatus(Resource):
             api.abort(500, f"Erreur interne: {str(e)}")
 
 
+@api.route('/tasks/<string:task_id>/cancel')
+@api.param('task_id', 'ID de la tâche asynchrone')
+class CancelTask(Resource):
+    @api.doc('cancel_task', security='Bearer')
+    @api.marshal_with(task_status_model)
+    @jwt_required()
+    def post(self, task_id):
+        """Annule une génération en attente ou en cours (la génération IA est interrompue)"""
+        task_status = task_manager.get_task_status(task_id)
+        if not task_status:
+            api.abort(404, f"Tâche {task_id} non trouvée")
+
+        # Seul l'auteur de la tâche (ou un admin) peut l'annuler
+        user_id = get_jwt_identity()
+        if task_status.get('owner_id') != user_id:
+            from app.repositories.user_repository import UserRepository
+            from app.models.user import UserRole
+            user = UserRepository().get_by_id(user_id)
+            if not user or user.role != UserRole.ADMIN:
+                api.abort(403, "Vous n'avez pas la permission d'annuler cette tâche")
+
+        if not task_manager.cancel_task(task_id):
+            api.abort(409, f"La tâche {task_id} est déjà terminée")
+
+        return {
+            'task_id': task_id,
+            'status': 'REVOKED',
+            'error': 'Tâche annulée'
+        }, 200
+
+
 @api.route('/<string:qcm_id>/publish')
 @api.param('qcm_id', 'ID du QCM')
 class PublishQCM(Resource):
@@ -601,31 +674,16 @@ class EnvoyerAuxEleves(Resource):
             if not qcm_obj.matiere_id:
                 # Essayer de trouver la matière par le texte
                 if qcm_obj.matiere:
-                    from app.repositories.matiere_repository import MatiereRepository
-                    from app.models.matiere import Matiere
-                    matiere_repo = MatiereRepository()
+                    from app.services.recherche_service import index_matieres
                     
-                    # Chercher d'abord par code exact
-                    matiere_obj = matiere_repo.get_by_code(qcm_obj.matiere.strip())
-                    
-                    # Si pas trouvé, chercher par nom exact
-                    if not matiere_obj:
-                        matiere_obj = matiere_repo.session.query(Matiere).filter(
-                            Matiere.nom.ilike(qcm_obj.matiere.strip())
-                        ).filter(Matiere.actif == True).first()
-                    
-                    # Si toujours pas trouvé, faire une recherche partielle
-                    if not matiere_obj:
-                        results = matiere_repo.search(qcm_obj.matiere.strip())
-                        results = [m for m in results if m.actif]
-                        if results:
-                            matiere_obj = results[0]
+                    # Code, nom exact puis nom partiel (index en mémoire, sans accents ni casse)
+                    matiere_trouvee = index_matieres.resoudre(qcm_obj.matiere)
                     
                     # Si trouvé, mettre à jour le QCM
-                    if matiere_obj and matiere_obj.actif:
-                        logger.info(f"Mise à jour automatique du QCM {qcm_id}: assignation de la matière {matiere_obj.nom} (ID: {matiere_obj.id})")
-                        qcm_obj.matiere_id = matiere_obj.id
-                        qcm_obj.matiere = matiere_obj.nom  # Utiliser le nom officiel
+                    if matiere_trouvee and matiere_trouvee['actif']:
+                        logger.info(f"Mise à jour automatique du QCM {qcm_id}: assignation de la matière {matiere_trouvee['nom']} (ID: {matiere_trouvee['id']})")
+                        qcm_obj.matiere_id = matiere_trouvee['id']
+                        qcm_obj.matiere = matiere_trouvee['nom']  # Utiliser le nom officiel
                         from app import db
                         db.session.commit()
                         # Recharger l'objet
@@ -647,20 +705,8 @@ class EnvoyerAuxEleves(Resource):
             if qcm_obj.status != 'published':
                 qcm_dict = qcm_service.update_qcm(qcm_id, {'status': 'published'}, user_id)
             
-            # Compter le nombre d'étudiants qui suivent cette matière
-            etudiants = user_repo.session.query(user_repo.model).filter(
-                user_repo.model.role == UserRole.ETUDIANT
-            ).all()
-            
-            nombre_etudiants = 0
-            for etudiant in etudiants:
-                # Utiliser le profil étudiant pour accéder aux matières
-                if not etudiant.etudiant_profil:
-                    continue
-                matieres = etudiant.etudiant_profil.matieres.filter_by(actif=True).all()
-                matieres_ids = [m.id for m in matieres]
-                if qcm_obj.matiere_id in matieres_ids:
-                    nombre_etudiants += 1
+            # Compter les étudiants qui suivent cette matière (une requête COUNT)
+            nombre_etudiants = audience_service.count_audience_qcm(qcm_obj)
             
             # Récupérer le nom de la matière
             matiere_nom = qcm_obj.matiere
@@ -673,6 +719,14 @@ class EnvoyerAuxEleves(Resource):
                 'matiere': matiere_nom or 'Non spécifiée'
             }
             
+            # Notifier les étudiants hors de la requête (audience parcourue par lots)
+            if nombre_etudiants:
+                from app.extensions import socketio
+                socketio.start_background_task(
+                    _notifier_audience_qcm, qcm_id,
+                    {'id': qcm_id, 'titre': qcm_obj.titre, 'matiere': response_data['matiere']}
+                )
+            
             # Retourner directement le dictionnaire (Flask-RESTX gère la sérialisation JSON)
             return response_data, 200
 
@@ -685,6 +739,19 @@ class EnvoyerAuxEleves(Resource):
             return {'message': f"Erreur interne: {str(e)}"}, 500
 
 
+def _notifier_audience_qcm(qcm_id, qcm_data):
+    """Notifie les étudiants ciblés par un QCM (tâche de fond Socket.IO)"""
+    from app.events.notifications import notify_qcm_disponible
+    from app.utils.app_context import app_context
+    try:
+        with app_context():
+            qcm_obj = qcm_service.qcm_repo.get_by_id(qcm_id)
+            if qcm_obj:
+                notify_qcm_disponible(audience_service.iter_audience_qcm(qcm_obj), qcm_data)
+    except Exception as e:
+        logger.error(f"Erreur notification des étudiants du QCM {qcm_id}: {e}", exc_info=True)
+
+
 @api.route('/<string:qcm_id>/questions')
 @api.param('qcm_id', 'ID du QCM')
 class QCMQuestions(Resource):
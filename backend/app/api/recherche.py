@@ -0,0 +1,65 @@
+"""
+Routes API de recherche (autocomplétion des utilisateurs, classes et matières)
+"""
+from flask import request
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.exceptions import HTTPException
+from app.services.recherche_service import RechercheService, TYPES_AUTOCOMPLETION
+from app.models.user import UserRole
+from app.utils.identity import charger_identite
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Namespace pour l'API
+api = Namespace('recherche', description='Recherche et autocomplétion')
+
+# Modèle pour la documentation Swagger
+suggestions_model = api.model('SuggestionsRecherche', {
+    'utilisateurs': fields.List(fields.Raw, description='Utilisateurs (id, email, name, role)'),
+    'classes': fields.List(fields.Raw, description='Classes actives (id, code, nom, anneeScolaire)'),
+    'matieres': fields.List(fields.Raw, description='Matières actives (id, code, nom)')
+})
+
+# Service
+recherche_service = RechercheService()
+
+
+@api.route('/autocomplete')
+class Autocompletion(Resource):
+    @api.doc('autocomplete', security='Bearer')
+    @api.param('q', 'Début de saisie', required=True)
+    @api.param('types', 'Types cherchés, séparés par des virgules (utilisateurs, classes, matieres)',
+               default=','.join(TYPES_AUTOCOMPLETION))
+    @api.param('limit', 'Suggestions par type (max 100)', type='integer', default=10)
+    @api.response(200, 'Succès', suggestions_model)
+    @jwt_required()
+    def get(self):
+        """Suggestions classées pour un début de saisie (utilisateurs réservés aux admins et enseignants)"""
+        try:
+            terme = request.args.get('q', '').strip()
+            if not terme:
+                api.abort(400, "Le paramètre q est requis")
+            try:
+                limit = int(request.args.get('limit', 10))
+            except ValueError:
+                api.abort(400, "Le paramètre limit doit être un entier")
+            if limit < 1:
+                api.abort(400, "Le paramètre limit doit être supérieur ou égal à 1")
+
+            types = [t.strip() for t in request.args.get('types', ','.join(TYPES_AUTOCOMPLETION)).split(',')]
+            inconnus = [t for t in types if t not in TYPES_AUTOCOMPLETION]
+            if inconnus:
+                api.abort(400, f"Types inconnus: {', '.join(inconnus)}")
+
+            user = charger_identite(get_jwt_identity())
+            if not user or user.role not in (UserRole.ADMIN, UserRole.ENSEIGNANT):
+                types = [t for t in types if t != 'utilisateurs']
+
+            return recherche_service.autocompleter(terme, types, limit=limit), 200
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur autocomplétion: {e}", exc_info=True)
+            api.abort(500, f"Erreur interne: {str(e)}")
@@ -23,9 +23,11 @@ from app.api.matiere import api as matiere_ns
 from app.api.mention import api as mention_ns
 from app.api.parcours import api as parcours_ns
 from app.api.etablissement import api as etablissement_ns
+from app.api.catalogue import api as catalogue_ns
 
 api.add_namespace(niveau_ns, path='/niveaux')
 api.add_namespace(matiere_ns, path='/matieres')
 api.add_namespace(mention_ns, path='/mentions')
 api.add_namespace(parcours_ns, path='/parcours')
 api.add_namespace(etablissement_ns, path='/etablissements')
+api.add_namespace(catalogue_ns, path='/referentiels')
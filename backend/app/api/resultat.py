@@ -6,8 +6,11 @@ from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.exceptions import HTTPException
 from app.services.resultat_service import ResultatService
+from app.events import exam_timer
 from app.models.user import UserRole
 from app.repositories.user_repository import UserRepository
+from app.utils.identity import charger_identite
+from app.utils.pagination import lire_pagination_curseur
 import logging
 import traceback
 
@@ -66,6 +69,15 @@ resultat_model = api.model('Resultat', {
     'updatedAt': fields.String(description='Date de modification')
 })
 
+# Modèle pour la réponse paginée
+resultat_list_response = api.model('ResultatListResponse', {
+    'data': fields.List(fields.Nested(resultat_model), description='Liste des résultats'),
+    'total': fields.Integer(description='Nombre total de résultats'),
+    'skip': fields.Integer(description='Nombre d\'éléments sautés'),
+    'limit': fields.Integer(description='Nombre d\'éléments retournés'),
+    'next_cursor': fields.String(description='Curseur de la page suivante (pagination par curseur)')
+})
+
 demarrer_examen_model = api.model('DemarrerExamen', {
     'sessionId': fields.String(required=True, description='ID de la session')
 })
@@ -103,7 +115,7 @@ user_repo = UserRepository()
 def require_admin_or_teacher():
     """Vérifie que l'utilisateur est admin ou enseignant"""
     user_id = get_jwt_identity()
-    user = user_repo.get_by_id(user_id)
+    user = charger_identite(user_id)
     if not user or user.role not in [UserRole.ADMIN, UserRole.ENSEIGNANT]:
         api.abort(403, "Accès réservé aux administrateurs et enseignants")
     return user
@@ -117,7 +129,9 @@ class ResultatList(Resource):
     @api.param('etudiant_id', 'Filtrer par étudiant', type='string')
     @api.param('session_id', 'Filtrer par session', type='string')
     @api.param('status', 'Filtrer par statut', type='string')
-    @api.marshal_with(resultat_model, as_list=True)
+    @api.param('cursor', 'Curseur de pagination (vide pour la première page)', type='string')
+    @api.param('include_total', 'Calculer le total (pagination par curseur)', type='boolean', default=False)
+    @api.marshal_with(resultat_list_response)
     @jwt_required()
     def get(self):
         """Liste tous les résultats avec pagination (admin/enseignant)"""
@@ -137,6 +151,19 @@ class ResultatList(Resource):
             if status:
                 filters['status'] = status
 
+            # Pagination par curseur (paramètre cursor présent)
+            pagination_curseur = lire_pagination_curseur()
+            if pagination_curseur:
+                curseur, avec_total = pagination_curseur
+                resultats, curseur_suivant, total = resultat_service.get_resultats_curseur(
+                    limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+                return {
+                    'data': resultats,
+                    'total': total,
+                    'limit': limit,
+                    'next_cursor': curseur_suivant
+                }, 200
+
             resultats, total = resultat_service.get_all_resultats(
                 skip=skip, limit=limit, filters=filters)
 
@@ -147,6 +174,8 @@ class ResultatList(Resource):
                 'limit': limit
             }, 200
 
+        except ValueError as e:
+            api.abort(400, str(e))
         except Exception as e:
             logger.error(f"Erreur récupération résultats: {e}", exc_info=True)
             api.abort(500, f"Erreur interne: {str(e)}")
@@ -310,6 +339,21 @@ class TempsRestant(Resource):
         try:
             user_id = get_jwt_identity()
 
+            # Échéance en cache: seul le statut est relu (la tentative a pu être soumise
+            # par un autre worker), sans charger le résultat ni la session
+            echeance = exam_timer.echeances.get(resultat_id)
+            if echeance and echeance['etudiant_id'] == user_id:
+                if exam_timer.statuts_tentatives([resultat_id]).get(resultat_id) == 'en_cours':
+                    etat = exam_timer.etat_compte_a_rebours(echeance)
+                    return {
+                        'duree_restante_secondes': etat['duree_restante_secondes'],
+                        'date_debut_examen': etat['date_debut_examen'],
+                        'duree_totale_secondes': etat['duree_totale_secondes'],
+                        'temps_ecoule_secondes': etat['duree_totale_secondes'] - etat['duree_restante_secondes'],
+                        'status': 'en_cours'
+                    }, 200
+                exam_timer.echeances.retirer(resultat_id)
+
             # Récupérer le résultat
             resultat = resultat_service.resultat_repo.get_by_id(resultat_id)
             if not resultat:
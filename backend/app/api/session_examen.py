@@ -7,6 +7,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.session_examen_service import SessionExamenService
 from app.models.user import UserRole
 from app.repositories.user_repository import UserRepository
+from app.utils.pagination import lire_pagination_curseur
 import logging
 
 logger = logging.getLogger(__name__)
@@ -57,7 +58,8 @@ session_list_response = api.model('SessionListResponse', {
     'data': fields.List(fields.Nested(session_model), description='Liste des sessions'),
     'total': fields.Integer(description='Nombre total de sessions'),
     'skip': fields.Integer(description='Nombre d\'éléments sautés'),
-    'limit': fields.Integer(description='Nombre d\'éléments retournés')
+    'limit': fields.Integer(description='Nombre d\'éléments retournés'),
+    'next_cursor': fields.String(description='Curseur de la page suivante (pagination par curseur)')
 })
 
 session_create_model = api.model('SessionExamenCreate', {
@@ -101,6 +103,8 @@ class SessionList(Resource):
     @api.param('status', 'Filtrer par statut', type='string')
     @api.param('qcm_id', 'Filtrer par QCM', type='string')
     @api.param('classe_id', 'Filtrer par classe', type='string')
+    @api.param('cursor', 'Curseur de pagination (vide pour la première page)', type='string')
+    @api.param('include_total', 'Calculer le total (pagination par curseur)', type='boolean', default=False)
     @api.marshal_with(session_list_response)
     @jwt_required()
     def get(self):
@@ -128,6 +132,19 @@ class SessionList(Resource):
             if user and user.role == UserRole.ENSEIGNANT:
                 filters['createur_id'] = user_id
 
+            # Pagination par curseur (paramètre cursor présent)
+            pagination_curseur = lire_pagination_curseur()
+            if pagination_curseur:
+                curseur, avec_total = pagination_curseur
+                sessions, curseur_suivant, total = session_service.get_sessions_curseur(
+                    limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+                return {
+                    'data': sessions,
+                    'total': total,
+                    'limit': limit,
+                    'next_cursor': curseur_suivant
+                }, 200
+
             sessions, total = session_service.get_all_sessions(
                 skip=skip, limit=limit, filters=filters)
 
@@ -138,6 +155,8 @@ class SessionList(Resource):
                 'limit': limit
             }, 200
 
+        except ValueError as e:
+            api.abort(400, str(e))
         except Exception as e:
             logger.error(f"Erreur récupération sessions: {e}", exc_info=True)
             api.abort(500, f"Erreur interne: {str(e)}")
@@ -1,5 +1,5 @@
 """
-Blueprint pour les entités utilisateurs (enseignants, étudiants, classes)
+Blueprint pour les entités utilisateurs (enseignants, étudiants, classes) et leur recherche
 Regroupe les namespaces flask_restx pour ces entités
 """
 from flask import Blueprint
@@ -24,8 +24,10 @@ api = Api(
 from app.api.enseignant import api as enseignant_ns
 from app.api.etudiant import api as etudiant_ns
 from app.api.classe import api as classe_ns
+from app.api.recherche import api as recherche_ns
 
 # Enregistrer les namespaces avec leurs préfixes
 api.add_namespace(enseignant_ns, path='/enseignants')
 api.add_namespace(etudiant_ns, path='/etudiants')
 api.add_namespace(classe_ns, path='/classes')
+api.add_namespace(recherche_ns, path='/recherche')
@@ -0,0 +1,486 @@
+"""
+Diffusion Socket.IO entre plusieurs workers
+
+- File de messages: avec plusieurs workers (gunicorn/eventlet) ou des processus émetteurs
+  (workers Celery), chaque emit est publié sur une file partagée (SOCKETIO_MESSAGE_QUEUE) et
+  chaque serveur le remet aux clients connectés chez lui. redis:// utilise Redis, memory://
+  un broker en mémoire du processus (plusieurs serveurs Socket.IO d'un même processus:
+  tests, développement), toute autre URL Kombu (amqp://...). Sans file: un seul processus.
+- Présence: utilisateurs connectés (user_id -> sids) hors du processus avec Redis
+  (SOCKETIO_PRESENCE_URL, par défaut la file si c'est Redis), sinon en mémoire du processus.
+- Signaux entre workers: diffuser_signal() exécute une fonction enregistrée par sur_signal()
+  dans ce processus puis la publie sur la file, où chaque autre serveur l'exécute (invalidation
+  des caches en mémoire du processus). Les signaux voyagent comme des emits vers une room
+  réservée qu'aucun client ne rejoint.
+- Émissions groupées: dans un bloc emissions_groupees(), les notifications sont mises en
+  attente puis envoyées ensemble à la sortie. Les doublons sont fusionnés, un même payload
+  destiné à plusieurs rooms part en un seul emit, et les messages sont publiés sur la file
+  en un seul aller-retour (pipeline Redis).
+"""
+import os
+import json
+import queue
+import pickle
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import socketio as python_socketio
+
+logger = logging.getLogger(__name__)
+
+# Nombre de rooms par emit pour un même payload
+TAILLE_LOT_ROOMS = int(os.getenv('SOCKETIO_EMIT_BATCH_ROOMS', '500'))
+# Événements dont seule la dernière émission par room compte (fusionnés dans un groupe)
+EVENEMENTS_FUSIONNABLES = {'stats_update'}
+# Durée de vie des entrées de présence Redis (un worker arrêté brutalement ne les retire pas)
+PRESENCE_TTL_SECONDES = int(os.getenv('SOCKETIO_PRESENCE_TTL_SECONDS', '86400'))
+# Room réservée aux signaux entre workers (jamais rejointe par un client)
+ROOM_SIGNAUX = '__signaux__'
+
+# Fonctions exécutées à la réception d'un signal (nom -> fonction(donnees))
+_signaux: Dict[str, Callable[[Any], None]] = {}
+
+
+def sur_signal(nom: str):
+    """Décorateur: fonction exécutée par chaque worker qui reçoit le signal nom"""
+    def decorateur(fonction):
+        _signaux[nom] = fonction
+        return fonction
+    return decorateur
+
+
+def executer_signal(nom: str, donnees: Any) -> None:
+    """Exécute la fonction d'un signal dans ce processus (signal inconnu: ignoré)"""
+    fonction = _signaux.get(nom)
+    if fonction is None:
+        logger.warning(f"Signal inconnu ignoré: {nom}")
+        return
+    try:
+        fonction(donnees)
+    except Exception as e:
+        logger.error(f"Erreur exécution du signal {nom}: {e}")
+
+
+class BrokerLocal:
+    """Pub/sub en mémoire du processus, substitut de Redis pour plusieurs serveurs Socket.IO"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._abonnes: Dict[str, List[queue.Queue]] = {}
+        self.publications = 0  # Allers-retours vers le broker (un par publier())
+
+    def abonner(self, canal: str) -> queue.Queue:
+        file = queue.Queue()
+        with self.lock:
+            self._abonnes.setdefault(canal, []).append(file)
+        return file
+
+    def desabonner(self, canal: str, file: queue.Queue) -> None:
+        with self.lock:
+            abonnes = self._abonnes.get(canal, [])
+            if file in abonnes:
+                abonnes.remove(file)
+        file.put(None)
+
+    def publier(self, canal: str, *messages: bytes) -> None:
+        """Publie des messages sérialisés (un seul aller-retour pour tous)"""
+        with self.lock:
+            self.publications += 1
+            abonnes = list(self._abonnes.get(canal, []))
+        for file in abonnes:
+            for message in messages:
+                file.put(message)
+
+    def vider(self) -> None:
+        with self.lock:
+            abonnes = [f for files in self._abonnes.values() for f in files]
+            self._abonnes.clear()
+            self.publications = 0
+        for file in abonnes:
+            file.put(None)
+
+
+broker_local = BrokerLocal()
+
+
+class EmissionLotMixin:
+    """Émission d'un lot de messages: remise locale puis publication groupée sur la file"""
+
+    def emettre_lot(self, messages: List[Dict[str, Any]]) -> None:
+        """messages: dicts {'event', 'data', 'room', 'namespace'} sans callback"""
+        paquets = []
+        for message in messages:
+            paquet = {'method': 'emit', 'event': message['event'], 'data': message['data'],
+                      'namespace': message.get('namespace') or '/', 'room': message['room'],
+                      'skip_sid': None, 'callback': None, 'host_id': self.host_id}
+            self._handle_emit(paquet)  # Clients connectés à ce serveur
+            paquets.append(paquet)
+        if paquets:
+            self._publier_lot(paquets)  # Autres serveurs
+
+    def _publier_lot(self, paquets: List[Dict[str, Any]]) -> None:
+        for paquet in paquets:
+            self._publish(paquet)
+
+    def publier_signal(self, nom: str, donnees: Any) -> None:
+        """Publie un signal aux autres serveurs (l'émetteur ne le reçoit pas)"""
+        self._publish({'method': 'emit', 'event': nom, 'data': donnees, 'namespace': '/',
+                       'room': ROOM_SIGNAUX, 'skip_sid': None, 'callback': None,
+                       'host_id': self.host_id})
+
+    def _recevoir_signal(self, message: Dict[str, Any]) -> bool:
+        """Exécute un signal reçu de la file; False si le message est un emit ordinaire"""
+        if message.get('room') != ROOM_SIGNAUX:
+            return False
+        executer_signal(message['event'], message['data'])
+        return True
+
+    def _handle_emit(self, message):
+        if not self._recevoir_signal(message):
+            super()._handle_emit(message)
+
+
+class GestionnaireFileLocale(EmissionLotMixin, python_socketio.Manager):
+    """
+    Gestionnaire de clients Socket.IO sur le broker en mémoire (URL memory://)
+
+    Relaie les emits entre les serveurs Socket.IO d'un processus comme RedisManager entre
+    workers. Dérivé de Manager et non de PubSubManager (refusé par le client de test de
+    Flask-SocketIO): seuls les emits sans callback sont propagés.
+    """
+    name = 'memory'
+
+    def __init__(self, url: str = 'memory://', channel: str = 'socketio', write_only: bool = False,
+                 logger=None, broker: Optional[BrokerLocal] = None):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self.write_only = write_only
+        self.host_id = uuid.uuid4().hex
+        self.logger = logger
+        self.broker = broker or broker_local
+        self._file: Optional[queue.Queue] = None
+
+    def initialize(self):
+        super().initialize()
+        if not self.write_only and self._file is None:
+            # Abonnement avant le démarrage du thread: aucun message publié ensuite n'est perdu
+            self._file = self.broker.abonner(self.channel)
+            self.server.start_background_task(self._thread, self._file)
+
+    def emit(self, event, data, namespace=None, room=None, skip_sid=None, callback=None, **kwargs):
+        if kwargs.get('ignore_queue') or callback is not None:
+            return super().emit(event, data, namespace=namespace, room=room, skip_sid=skip_sid,
+                                callback=callback)
+        message = {'method': 'emit', 'event': event, 'data': data, 'namespace': namespace or '/',
+                   'room': room, 'skip_sid': skip_sid, 'callback': None, 'host_id': self.host_id}
+        self._handle_emit(message)
+        self._publish(message)
+
+    def _handle_emit(self, message):
+        if self._recevoir_signal(message):
+            return
+        super().emit(message['event'], message['data'], namespace=message.get('namespace'),
+                     room=message.get('room'), skip_sid=message.get('skip_sid'))
+
+    def _publish(self, data):
+        self.broker.publier(self.channel, pickle.dumps(data))
+
+    def _publier_lot(self, paquets):
+        self.broker.publier(self.channel, *[pickle.dumps(p) for p in paquets])
+
+    def _thread(self, file: queue.Queue):
+        while True:
+            message = file.get()
+            if message is None:
+                return
+            try:
+                donnees = pickle.loads(message)
+                if donnees.get('host_id') != self.host_id:
+                    self._handle_emit(donnees)
+            except Exception as e:
+                logger.error(f"Erreur remise d'un message de la file en mémoire: {e}")
+
+    def fermer(self) -> None:
+        """Arrête l'écoute (thread du gestionnaire)"""
+        if self._file is not None:
+            self.broker.desabonner(self.channel, self._file)
+            self._file = None
+
+
+class GestionnaireRedis(EmissionLotMixin, python_socketio.RedisManager):
+    """RedisManager dont les lots sont publiés en un seul pipeline"""
+
+    def _publier_lot(self, paquets):
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for paquet in paquets:
+                pipeline.publish(self.channel, pickle.dumps(paquet))
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Publication groupée Redis impossible ({e}), publication message par message")
+            super()._publier_lot(paquets)
+
+
+class GestionnaireKombu(EmissionLotMixin, python_socketio.KombuManager):
+    pass
+
+
+def gestionnaire_clients(url: Optional[str], canal: str = 'flask-socketio',
+                         write_only: bool = False) -> Optional[python_socketio.Manager]:
+    """Gestionnaire de clients Socket.IO pour une URL de file (None: processus unique)"""
+    if not url:
+        return None
+    if url.startswith('memory://'):
+        return GestionnaireFileLocale(url, channel=canal, write_only=write_only)
+    if url.startswith(('redis://', 'rediss://')):
+        return GestionnaireRedis(url, channel=canal, write_only=write_only)
+    return GestionnaireKombu(url, channel=canal, write_only=write_only)
+
+
+def diffuser_signal(nom: str, donnees: Any) -> None:
+    """Exécute un signal dans ce processus puis le publie aux autres workers (file de messages)"""
+    executer_signal(nom, donnees)
+    from app.extensions import socketio
+    gestionnaire = socketio.server.manager if socketio.server is not None else None
+    if not isinstance(gestionnaire, EmissionLotMixin):
+        return  # Sans file: un seul processus
+    try:
+        gestionnaire.publier_signal(nom, donnees)
+    except Exception as e:
+        logger.error(f"Erreur publication du signal {nom}: {e}")
+
+
+def options_socketio(config) -> Dict[str, Any]:
+    """
+    Options de socketio.init_app() selon la configuration de l'application
+
+    SOCKETIO_MESSAGE_QUEUE: URL de la file partagée (vide: un seul processus)
+    SOCKETIO_CHANNEL: canal de la file (les serveurs d'un même déploiement partagent le canal)
+    SOCKETIO_WRITE_ONLY: processus qui émet sans servir de clients (workers Celery)
+    """
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    gestionnaire = gestionnaire_clients(url, config.get('SOCKETIO_CHANNEL', 'flask-socketio'),
+                                        config.get('SOCKETIO_WRITE_ONLY', False))
+    if gestionnaire is None:
+        # Explicite: init_app() conserve les options d'un appel précédent (tests, create_app répété)
+        return {'client_manager': None}
+    logger.info(f"Socket.IO: file de messages {gestionnaire.name} ({url.split('@')[-1]})")
+    return {'client_manager': gestionnaire}
+
+
+class PresenceMemoire:
+    """Présence des utilisateurs en mémoire du processus (partagée par ses serveurs Socket.IO)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._sids: Dict[str, Set[str]] = {}  # user_id -> sids
+        self._utilisateurs: Dict[str, str] = {}  # sid -> user_id
+
+    def ajouter(self, user_id: str, sid: str) -> None:
+        with self.lock:
+            self._sids.setdefault(user_id, set()).add(sid)
+            self._utilisateurs[sid] = user_id
+
+    def retirer_sid(self, sid: str) -> Optional[str]:
+        """Retire une connexion; retourne l'utilisateur concerné (None si inconnue)"""
+        with self.lock:
+            user_id = self._utilisateurs.pop(sid, None)
+            if user_id is not None:
+                sids = self._sids.get(user_id, set())
+                sids.discard(sid)
+                if not sids:
+                    self._sids.pop(user_id, None)
+            return user_id
+
+    def sids(self, user_id: str) -> Set[str]:
+        with self.lock:
+            return set(self._sids.get(user_id, ()))
+
+    def est_connecte(self, user_id: str) -> bool:
+        return bool(self.sids(user_id))
+
+    def utilisateurs_connectes(self) -> Set[str]:
+        with self.lock:
+            return set(self._sids)
+
+    def vider(self) -> None:
+        with self.lock:
+            self._sids.clear()
+            self._utilisateurs.clear()
+
+
+class PresenceRedis:
+    """Présence des utilisateurs dans Redis, partagée par tous les workers"""
+
+    def __init__(self, url: str, prefixe: str = 'socketio:presence'):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefixe = prefixe
+
+    def _cle_utilisateur(self, user_id: str) -> str:
+        return f"{self.prefixe}:user:{user_id}"
+
+    def _cle_sid(self, sid: str) -> str:
+        return f"{self.prefixe}:sid:{sid}"
+
+    def ajouter(self, user_id: str, sid: str) -> None:
+        pipeline = self.redis.pipeline()
+        pipeline.sadd(self._cle_utilisateur(user_id), sid)
+        pipeline.expire(self._cle_utilisateur(user_id), PRESENCE_TTL_SECONDES)
+        pipeline.sadd(f"{self.prefixe}:users", user_id)
+        pipeline.set(self._cle_sid(sid), user_id, ex=PRESENCE_TTL_SECONDES)
+        pipeline.execute()
+
+    def retirer_sid(self, sid: str) -> Optional[str]:
+        user_id = self.redis.getdel(self._cle_sid(sid))
+        if user_id is None:
+            return None
+        pipeline = self.redis.pipeline()
+        pipeline.srem(self._cle_utilisateur(user_id), sid)
+        pipeline.scard(self._cle_utilisateur(user_id))
+        _, restants = pipeline.execute()
+        if not restants:
+            self.redis.srem(f"{self.prefixe}:users", user_id)
+        return user_id
+
+    def sids(self, user_id: str) -> Set[str]:
+        return set(self.redis.smembers(self._cle_utilisateur(user_id)))
+
+    def est_connecte(self, user_id: str) -> bool:
+        return self.redis.scard(self._cle_utilisateur(user_id)) > 0
+
+    def utilisateurs_connectes(self) -> Set[str]:
+        return set(self.redis.smembers(f"{self.prefixe}:users"))
+
+    def vider(self) -> None:
+        cles = list(self.redis.scan_iter(f"{self.prefixe}:*"))
+        if cles:
+            self.redis.delete(*cles)
+
+
+# Présence du processus, remplacée par configurer_presence() selon la configuration
+presence = PresenceMemoire()
+
+
+def configurer_presence(config) -> None:
+    """Choisit le stockage de la présence (SOCKETIO_PRESENCE_URL, sinon la file si Redis)"""
+    global presence
+    url = config.get('SOCKETIO_PRESENCE_URL') or config.get('SOCKETIO_MESSAGE_QUEUE') or ''
+    if url.startswith(('redis://', 'rediss://')):
+        presence = PresenceRedis(url)
+    elif not isinstance(presence, PresenceMemoire):
+        presence = PresenceMemoire()
+
+
+def get_presence():
+    """Stockage de présence configuré (à appeler plutôt que d'importer presence)"""
+    return presence
+
+
+_groupes = threading.local()
+
+
+@contextmanager
+def emissions_groupees() -> Iterator[None]:
+    """
+    Met en attente les notifications émises dans le bloc et les envoie ensemble à la sortie
+    Les blocs imbriqués rejoignent le groupe le plus externe.
+    """
+    if getattr(_groupes, 'emissions', None) is not None:
+        yield
+        return
+    _groupes.emissions = []
+    try:
+        yield
+    finally:
+        emissions, _groupes.emissions = _groupes.emissions, None
+        envoyer_emissions(emissions)
+
+
+def emettre(evenement: str, donnees: Any, room: str, namespace: str = '/') -> None:
+    """Émet vers une room, ou met en attente dans un bloc emissions_groupees()"""
+    emissions = getattr(_groupes, 'emissions', None)
+    if emissions is not None:
+        emissions.append((evenement, donnees, room, namespace))
+        return
+    from app.extensions import socketio
+    socketio.emit(evenement, donnees, to=room, namespace=namespace)
+
+
+def emettre_vers_rooms(evenement: str, donnees: Any, rooms: Iterable[str], namespace: str = '/',
+                       taille_lot: int = TAILLE_LOT_ROOMS) -> int:
+    """Émet un même payload vers des rooms (un emit par lot de taille_lot); retourne le nombre de rooms"""
+    from app.extensions import socketio
+    total = 0
+    lot: List[str] = []
+    for room in rooms:
+        lot.append(room)
+        if len(lot) >= taille_lot:
+            socketio.emit(evenement, donnees, to=lot, namespace=namespace)
+            total += len(lot)
+            lot = []
+    if lot:
+        socketio.emit(evenement, donnees, to=lot, namespace=namespace)
+        total += len(lot)
+    return total
+
+
+def _cle_payload(donnees: Any) -> str:
+    return json.dumps(donnees, sort_keys=True, default=str)
+
+
+def regrouper_emissions(emissions: List[Tuple[str, Any, str, str]],
+                        taille_lot: int = TAILLE_LOT_ROOMS) -> List[Dict[str, Any]]:
+    """
+    Messages à émettre pour des notifications en attente (ordre de première émission conservé)
+
+    - doublons exacts (événement, room, payload) fusionnés;
+    - événements fusionnables: seule la dernière émission par room est gardée;
+    - un même (événement, payload) vers plusieurs rooms: un message par lot de rooms.
+    """
+    derniers: Dict[Tuple[str, str, str], int] = {}
+    for indice, (evenement, _, room, namespace) in enumerate(emissions):
+        if evenement in EVENEMENTS_FUSIONNABLES:
+            derniers[(evenement, room, namespace)] = indice
+
+    groupes: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for indice, (evenement, donnees, room, namespace) in enumerate(emissions):
+        if evenement in EVENEMENTS_FUSIONNABLES and derniers[(evenement, room, namespace)] != indice:
+            continue
+        cle = (evenement, namespace, _cle_payload(donnees))
+        groupe = groupes.setdefault(cle, {'event': evenement, 'data': donnees, 'namespace': namespace,
+                                          'rooms': {}})
+        groupe['rooms'].setdefault(room, None)  # Dict: ordre conservé, sans doublon
+
+    messages = []
+    for groupe in groupes.values():
+        rooms = list(groupe['rooms'])
+        for debut in range(0, len(rooms), taille_lot):
+            lot = rooms[debut:debut + taille_lot]
+            messages.append({'event': groupe['event'], 'data': groupe['data'],
+                             'namespace': groupe['namespace'],
+                             'room': lot[0] if len(lot) == 1 else lot})
+    return messages
+
+
+def envoyer_emissions(emissions: List[Tuple[str, Any, str, str]]) -> int:
+    """Envoie des notifications regroupées; retourne le nombre de messages émis"""
+    if not emissions:
+        return 0
+    from app.extensions import socketio
+    messages = regrouper_emissions(emissions)
+    try:
+        gestionnaire = socketio.server.manager if socketio.server is not None else None
+        if isinstance(gestionnaire, EmissionLotMixin):
+            gestionnaire.emettre_lot(messages)
+        else:
+            for message in messages:
+                socketio.emit(message['event'], message['data'], to=message['room'],
+                              namespace=message['namespace'])
+    except Exception as e:
+        logger.error(f"Erreur émission groupée ({len(messages)} message(s)): {e}")
+    return len(messages)
@@ -0,0 +1,258 @@
+"""
+Compte à rebours des examens poussé par WebSocket
+
+L'étudiant rejoint la room resultat_{id}: il reçoit une fois l'échéance faisant autorité
+('exam_deadline'), puis des ticks périodiques de correction de dérive ('exam_tick') et,
+à l'échéance, l'événement 'exam_auto_submit' qui déclenche la soumission côté client.
+
+Les échéances des tentatives en cours sont gardées en mémoire du processus. Une échéance
+absente (redémarrage, autre worker) est rechargée une seule fois depuis la base au
+join_exam_timer. Avec plusieurs workers:
+- l'oubli d'une échéance (soumission, suppression) est diffusé à tous les workers par la
+  file de messages Socket.IO (signal, voir app.events.diffusion);
+- chaque worker n'envoie ticks et auto-soumission qu'à ses propres clients (ignore_queue),
+  donc un seul envoi par client même si plusieurs workers ont l'échéance en cache;
+- un signal perdu (worker redémarré, file indisponible) est rattrapé par la base: chaque
+  série de ticks lit en une requête le statut des tentatives en cache.
+"""
+import os
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+
+from flask import current_app, request
+from flask_socketio import emit, join_room, leave_room
+from flask_jwt_extended import decode_token
+
+from app.extensions import socketio
+from app.events.diffusion import diffuser_signal, sur_signal
+
+logger = logging.getLogger(__name__)
+
+# Intervalle entre deux ticks de correction de dérive
+TICK_SECONDES = float(os.getenv('EXAM_TIMER_TICK_SECONDS', '15'))
+# Signal entre workers: oubli de l'échéance d'une tentative
+SIGNAL_OUBLI = 'exam_timer_oublier'
+
+
+def room_resultat(resultat_id: str) -> str:
+    """Nom de la room du compte à rebours d'une tentative"""
+    return f"resultat_{resultat_id}"
+
+
+class EcheancesExamens:
+    """Cache en mémoire des échéances des tentatives en cours (resultat_id -> échéance)"""
+
+    def __init__(self):
+        self.echeances: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def enregistrer(self, resultat_id: str, etudiant_id: str, date_debut: datetime, duree_minutes: int) -> Dict[str, Any]:
+        """Enregistre l'échéance d'une tentative (date_debut + durée de la session)"""
+        echeance = {
+            'resultat_id': resultat_id,
+            'etudiant_id': etudiant_id,
+            'date_debut': date_debut,
+            'duree_totale_secondes': duree_minutes * 60,
+            'deadline': date_debut + timedelta(minutes=duree_minutes)
+        }
+        with self.lock:
+            self.echeances[resultat_id] = echeance
+        return dict(echeance)
+
+    def get(self, resultat_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            echeance = self.echeances.get(resultat_id)
+            return dict(echeance) if echeance else None
+
+    def retirer(self, resultat_id: str) -> None:
+        with self.lock:
+            self.echeances.pop(resultat_id, None)
+
+    def toutes(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [dict(e) for e in self.echeances.values()]
+
+    def vider(self) -> None:
+        with self.lock:
+            self.echeances.clear()
+
+
+echeances = EcheancesExamens()
+
+
+def duree_restante(echeance: Dict[str, Any], maintenant: Optional[datetime] = None) -> int:
+    """Secondes restantes avant l'échéance (0 si dépassée)"""
+    maintenant = maintenant or datetime.utcnow()
+    return max(0, int((echeance['deadline'] - maintenant).total_seconds()))
+
+
+def etat_compte_a_rebours(echeance: Dict[str, Any], maintenant: Optional[datetime] = None) -> Dict[str, Any]:
+    """Payload du compte à rebours (échéance, heure serveur, secondes restantes)"""
+    maintenant = maintenant or datetime.utcnow()
+    return {
+        'resultat_id': echeance['resultat_id'],
+        'deadline': echeance['deadline'].isoformat(),
+        'server_time': maintenant.isoformat(),
+        'duree_restante_secondes': duree_restante(echeance, maintenant),
+        'duree_totale_secondes': echeance['duree_totale_secondes'],
+        'date_debut_examen': echeance['date_debut'].isoformat()
+    }
+
+
+def enregistrer_echeance(resultat, duree_minutes: int) -> None:
+    """Enregistre l'échéance d'une tentative qui démarre (appelé par ResultatService)"""
+    echeances.enregistrer(resultat.id, resultat.etudiant_id, resultat.date_debut, duree_minutes)
+    _demarrer_ticks()
+
+
+@sur_signal(SIGNAL_OUBLI)
+def _oublier_localement(resultat_id: str) -> None:
+    echeances.retirer(resultat_id)
+
+
+def oublier_echeance(resultat_id: str) -> None:
+    """Retire l'échéance d'une tentative soumise ou supprimée, dans tous les workers"""
+    diffuser_signal(SIGNAL_OUBLI, resultat_id)
+
+
+def statuts_tentatives(resultat_ids: List[str]) -> Dict[str, str]:
+    """Statut en base des tentatives (resultat_id -> status, absentes si supprimées)"""
+    from app.repositories.resultat_repository import ResultatRepository
+    return ResultatRepository().get_statuts(resultat_ids)
+
+
+def charger_echeance(resultat_id: str) -> Optional[Dict[str, Any]]:
+    """Échéance en cache, sinon chargée depuis la base si la tentative est en cours"""
+    echeance = echeances.get(resultat_id)
+    if echeance:
+        return echeance
+
+    from app.models.resultat import Resultat
+    from app.models.session_examen import SessionExamen
+    from app import db
+
+    resultat = db.session.get(Resultat, resultat_id)
+    if not resultat or resultat.status != 'en_cours' or not resultat.date_debut:
+        return None
+    session = db.session.get(SessionExamen, resultat.session_id) if resultat.session_id else None
+    if not session:
+        return None
+    echeance = echeances.enregistrer(resultat.id, resultat.etudiant_id, resultat.date_debut, session.duree_minutes)
+    _demarrer_ticks()
+    return echeance
+
+
+def emettre_ticks(maintenant: Optional[datetime] = None) -> List[str]:
+    """
+    Envoie un tick à chaque tentative en cours et l'auto-soumission aux tentatives échues
+
+    Returns:
+        Liste des resultat_id échus (retirés du cache)
+    """
+    maintenant = maintenant or datetime.utcnow()
+    echus = []
+    en_cache = echeances.toutes()
+    if not en_cache:
+        return echus
+    # Tentatives soumises ou supprimées par un autre worker dont le signal n'est pas arrivé
+    try:
+        statuts = statuts_tentatives([e['resultat_id'] for e in en_cache])
+    except Exception as e:
+        logger.error(f"Erreur lecture du statut des tentatives en cours: {e}")
+        statuts = {e['resultat_id']: 'en_cours' for e in en_cache}
+
+    for echeance in en_cache:
+        room = room_resultat(echeance['resultat_id'])
+        if statuts.get(echeance['resultat_id']) != 'en_cours':
+            echeances.retirer(echeance['resultat_id'])
+            continue
+        try:
+            # Clients de ce worker uniquement: chaque worker sert ceux qui l'ont rejoint
+            if echeance['deadline'] <= maintenant:
+                socketio.emit('exam_auto_submit', {
+                    'resultat_id': echeance['resultat_id'],
+                    'deadline': echeance['deadline'].isoformat(),
+                    'server_time': maintenant.isoformat()
+                }, to=room, ignore_queue=True)
+                echeances.retirer(echeance['resultat_id'])
+                echus.append(echeance['resultat_id'])
+            else:
+                socketio.emit('exam_tick', {
+                    'resultat_id': echeance['resultat_id'],
+                    'server_time': maintenant.isoformat(),
+                    'duree_restante_secondes': duree_restante(echeance, maintenant)
+                }, to=room, ignore_queue=True)
+        except Exception as e:
+            logger.error(f"Erreur tick compte à rebours {echeance['resultat_id']}: {e}")
+    return echus
+
+
+_ticks_lock = threading.Lock()
+_ticks_demarres = False
+
+
+def _boucle_ticks(app):
+    """Tâche de fond: ticks périodiques tant que des tentatives sont en cours"""
+    global _ticks_demarres
+    while True:
+        socketio.sleep(TICK_SECONDES)
+        with app.app_context():
+            emettre_ticks()
+        with _ticks_lock:
+            if not echeances.toutes():
+                _ticks_demarres = False
+                return
+
+
+def _demarrer_ticks():
+    """Démarre la tâche de ticks si elle ne tourne pas déjà"""
+    global _ticks_demarres
+    with _ticks_lock:
+        if _ticks_demarres:
+            return
+        _ticks_demarres = True
+    socketio.start_background_task(_boucle_ticks, current_app._get_current_object())
+
+
+@socketio.on('join_exam_timer')
+def handle_join_exam_timer(data):
+    """L'étudiant rejoint le compte à rebours de sa tentative"""
+    try:
+        token = (data or {}).get('token')
+        resultat_id = (data or {}).get('resultat_id')
+        if not token or not resultat_id:
+            emit('error', {'message': 'Token et resultat_id requis'})
+            return
+
+        try:
+            user_id = decode_token(token).get('sub')
+        except Exception as e:
+            logger.error(f"Erreur décodage token: {e}")
+            emit('error', {'message': 'Token invalide'})
+            return
+
+        echeance = charger_echeance(resultat_id)
+        if not echeance:
+            emit('exam_deadline', {'resultat_id': resultat_id, 'duree_restante_secondes': 0, 'status': 'termine'})
+            return
+        if echeance['etudiant_id'] != user_id:
+            emit('error', {'message': 'Vous ne pouvez pas accéder à ce résultat'})
+            return
+
+        join_room(room_resultat(resultat_id), sid=request.sid)
+        logger.info(f"Utilisateur {user_id} rejoint le compte à rebours du résultat {resultat_id}")
+        emit('exam_deadline', {**etat_compte_a_rebours(echeance), 'status': 'en_cours'})
+
+    except Exception as e:
+        logger.error(f"Erreur join_exam_timer: {e}")
+        emit('error', {'message': 'Erreur lors de la connexion au compte à rebours'})
+
+
+@socketio.on('leave_exam_timer')
+def handle_leave_exam_timer(data):
+    """L'étudiant quitte le compte à rebours de sa tentative"""
+    resultat_id = (data or {}).get('resultat_id')
+    if resultat_id:
+        leave_room(room_resultat(resultat_id), sid=request.sid)
@@ -1,7 +1,11 @@
 """
 Événements WebSocket pour les notifications
+
+Les emits passent par app.events.diffusion: file de messages partagée entre workers,
+présence des utilisateurs hors du processus et émissions groupées (emissions_groupees()).
 """
 from app.extensions import socketio
+from app.events.diffusion import emettre, emettre_vers_rooms, emissions_groupees, get_presence
 from flask_socketio import emit, join_room, leave_room
 from flask_jwt_extended import decode_token
 from flask import request
@@ -11,7 +15,15 @@ logger = logging.getLogger(__name__)
 
 # Rooms pour les utilisateurs connectés
 ADMIN_ROOM = 'admins'
-USER_ROOMS = {}  # user_id -> sid
+
+
+def est_connecte(user_id):
+    """Utilisateur connecté à au moins un worker (sa room personnelle rejointe)"""
+    try:
+        return get_presence().est_connecte(str(user_id))
+    except Exception as e:
+        logger.error(f"Erreur lecture présence: {e}")
+        return False
 
 
 @socketio.on('connect')
@@ -26,12 +38,14 @@ def handle_disconnect():
     """Gère la déconnexion d'un client WebSocket"""
     logger.info(f"Client déconnecté: {request.sid}")
 
-    # Nettoyer les rooms utilisateur
-    for user_id, sid in list(USER_ROOMS.items()):
-        if sid == request.sid:
+    # Nettoyer la présence (les rooms de la connexion sont quittées par le serveur)
+    try:
+        user_id = get_presence().retirer_sid(request.sid)
+        if user_id is not None:
             leave_room(f"user_{user_id}", sid=request.sid)
-            del USER_ROOMS[user_id]
             logger.info(f"Utilisateur {user_id} retiré de sa room")
+    except Exception as e:
+        logger.error(f"Erreur nettoyage présence: {e}")
 
 
 @socketio.on('join_admin_room')
@@ -94,7 +108,7 @@ def handle_join_user_room(data):
         # Rejoindre la room utilisateur
         room_name = f"user_{user_id}"
         join_room(room_name, sid=request.sid)
-        USER_ROOMS[user_id] = request.sid
+        get_presence().ajouter(str(user_id), request.sid)
 
         logger.info(f"Utilisateur {user_id} rejoint sa room {room_name}")
 
@@ -127,7 +141,7 @@ def notify_admin_pending_user(user_id, user_data):
         }
 
         logger.info(f"Notification admin: nouvel utilisateur {user_id}")
-        socketio.emit('pending_user', notification, room=ADMIN_ROOM)
+        emettre('pending_user', notification, ADMIN_ROOM)
 
     except Exception as e:
         logger.error(f"Erreur notification admin pending user: {e}")
@@ -149,7 +163,7 @@ def notify_user_activated(user_id):
 
         room_name = f"user_{user_id}"
         logger.info(f"Notification utilisateur {user_id}: compte activé")
-        socketio.emit('account_activated', notification, room=room_name)
+        emettre('account_activated', notification, room_name)
 
     except Exception as e:
         logger.error(f"Erreur notification user activated: {e}")
@@ -172,7 +186,7 @@ def notify_user_rejected(user_id, reason="Votre compte a été rejeté par un ad
 
         room_name = f"user_{user_id}"
         logger.info(f"Notification utilisateur {user_id}: compte rejeté")
-        socketio.emit('account_rejected', notification, room=room_name)
+        emettre('account_rejected', notification, room_name)
 
     except Exception as e:
         logger.error(f"Erreur notification user rejected: {e}")
@@ -184,7 +198,124 @@ def notify_admins_stats_update():
     """
     try:
         logger.info("Notification admin: mise à jour statistiques")
-        socketio.emit('stats_update', {'timestamp': None}, room=ADMIN_ROOM)
+        emettre('stats_update', {'timestamp': None}, ADMIN_ROOM)
 
     except Exception as e:
         logger.error(f"Erreur notification stats update: {e}")
+
+
+def notify_commentaire_resultat(user_id, resultat_id, commentaire=None):
+    """
+    Notifie un étudiant que le commentaire IA de son résultat est disponible
+
+    Args:
+        user_id (str): ID de l'étudiant
+        resultat_id (str): ID du résultat
+        commentaire (str): Commentaire (None si le résultat n'est pas encore publié)
+    """
+    try:
+        notification = {
+            'type': 'commentaire_resultat',
+            'resultat_id': resultat_id,
+            'commentaire': commentaire,
+            'timestamp': None  # Sera ajouté côté client
+        }
+
+        room_name = f"user_{user_id}"
+        logger.info(f"Notification utilisateur {user_id}: commentaire du résultat {resultat_id}")
+        emettre('commentaire_resultat', notification, room_name)
+
+    except Exception as e:
+        logger.error(f"Erreur notification commentaire resultat: {e}")
+
+
+def notify_qcm_disponible(user_ids, qcm_data, taille_lot=500):
+    """
+    Notifie les étudiants ciblés qu'un QCM leur a été envoyé
+
+    Un seul emit par lot de rooms: l'audience peut compter des milliers d'étudiants.
+
+    Args:
+        user_ids (iterable): IDs des étudiants (flux AudienceService.iter_audience_qcm)
+        qcm_data (dict): Informations du QCM (id, titre, matiere)
+        taille_lot (int): Nombre de rooms par emit
+
+    Returns:
+        int: Nombre d'étudiants notifiés
+    """
+    notification = {
+        'type': 'qcm_disponible',
+        'qcm': qcm_data,
+        'timestamp': None  # Sera ajouté côté client
+    }
+    total = 0
+    try:
+        total = emettre_vers_rooms('qcm_disponible', notification,
+                                   (f"user_{user_id}" for user_id in user_ids), taille_lot=taille_lot)
+        logger.info(f"Notification QCM {qcm_data.get('id')} envoyée à {total} étudiant(s)")
+
+    except Exception as e:
+        logger.error(f"Erreur notification QCM disponible: {e}")
+    return total
+
+
+def notify_question_generee(user_id, task_id, qcm_id, question, numero, total):
+    """
+    Transmet à l'enseignant une question dès sa génération (génération en streaming)
+
+    Args:
+        user_id (str): ID de l'enseignant ayant lancé la génération
+        task_id (str): ID de la tâche de génération
+        qcm_id (str): ID du QCM en cours de génération
+        question (dict): Question validée (enonce, type_question, options, explication, points)
+        numero (int): Rang de la question parmi celles déjà générées
+        total (int): Nombre de questions demandées
+    """
+    try:
+        notification = {
+            'type': 'question_generee',
+            'task_id': task_id,
+            'qcm_id': qcm_id,
+            'question': question,
+            'numero': numero,
+            'total': total,
+            'timestamp': None  # Sera ajouté côté client
+        }
+
+        room_name = f"user_{user_id}"
+        emettre('question_generee', notification, room_name)
+
+    except Exception as e:
+        logger.error(f"Erreur notification question générée: {e}")
+
+
+def notify_resultats_publies(resultats, session_data):
+    """
+    Notifie les étudiants de la publication de leurs résultats d'une session
+
+    Émissions groupées: les notifications partent ensemble, en un seul aller-retour vers la
+    file de messages, plutôt qu'un emit par étudiant.
+
+    Args:
+        resultats (iterable): Couples (user_id, resultat_id) des étudiants de la session
+        session_data (dict): Informations de la session (id, titre)
+
+    Returns:
+        int: Nombre d'étudiants notifiés
+    """
+    total = 0
+    try:
+        with emissions_groupees():
+            for user_id, resultat_id in resultats:
+                emettre('resultat_publie', {
+                    'type': 'resultat_publie',
+                    'resultat_id': resultat_id,
+                    'session': session_data,
+                    'timestamp': None  # Sera ajouté côté client
+                }, f"user_{user_id}")
+                total += 1
+        logger.info(f"Notification résultats de la session {session_data.get('id')} envoyée à {total} étudiant(s)")
+
+    except Exception as e:
+        logger.error(f"Erreur notification résultats publiés: {e}")
+    return total
@@ -9,6 +9,7 @@ from app.models.matiere import Matiere
 from app.models.classe import Classe
 from app.models.session_examen import SessionExamen
 from app.models.resultat import Resultat
+from app.models.reponse_resultat import ReponseResultat
 from app.models.ai_config import AIModelConfig
 
 # Importer les nouveaux modèles (refonte)
@@ -18,6 +19,7 @@ from app.models.parcours import Parcours
 from app.models.enseignant import Enseignant
 from app.models.etudiant import Etudiant
 from app.models.admin_notification import AdminNotification
+from app.models.statistiques_qcm import StatistiquesQCM, StatistiquesQuestion
 
 # Importer les tables d'association
 from app.models.associations import (
@@ -49,6 +51,7 @@ __all__ = [
     'Classe',
     'SessionExamen',
     'Resultat',
+    'ReponseResultat',
     'AIModelConfig',
     # Nouveaux modèles (refonte)
     'Etablissement',
@@ -57,6 +60,9 @@ __all__ = [
     'Enseignant',
     'Etudiant',
     'AdminNotification',
+    # Agrégats pré-calculés
+    'StatistiquesQCM',
+    'StatistiquesQuestion',
     # Tables d'association (anciennes)
     'professeur_matieres',
     'professeur_niveaux',
@@ -113,7 +113,9 @@ etudiant_matieres_v2 = db.Table(
     db.Column('matiere_id', db.String(36), db.ForeignKey('matieres.id'), primary_key=True),
     db.Column('annee_scolaire', db.String(20), nullable=False),
     db.Column('semestre', db.Integer, nullable=True),
-    db.Column('created_at', db.DateTime, server_default=db.func.now())
+    db.Column('created_at', db.DateTime, server_default=db.func.now()),
+    # Résolution de l'audience d'un QCM: étudiants d'une matière (clé primaire commençant par etudiant_id)
+    db.Index('ix_etudiant_matieres_v2_matiere_id', 'matiere_id', 'etudiant_id')
 )
 
 # Association Etudiant <-> Classes (nouvelle version)
@@ -122,5 +124,7 @@ etudiant_classes_v2 = db.Table(
     db.Column('etudiant_id', db.String(36), db.ForeignKey('etudiants.id'), primary_key=True),
     db.Column('classe_id', db.String(36), db.ForeignKey('classes.id'), primary_key=True),
     db.Column('annee_scolaire', db.String(20), nullable=False),
-    db.Column('created_at', db.DateTime, server_default=db.func.now())
+    db.Column('created_at', db.DateTime, server_default=db.func.now()),
+    # Résolution de l'audience d'une session: étudiants d'une classe
+    db.Index('ix_etudiant_classes_v2_classe_id', 'classe_id', 'etudiant_id')
 )
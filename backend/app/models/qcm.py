@@ -9,6 +9,10 @@ import uuid
 class QCM(db.Model):
     """Modèle QCM pour les questionnaires"""
     __tablename__ = 'qcms'
+    __table_args__ = (
+        # Pagination par curseur (BaseRepository.get_all_keyset)
+        db.Index('ix_qcms_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     titre = db.Column(db.String(255), nullable=False)
@@ -62,6 +66,20 @@ class QCM(db.Model):
 
     def to_dict(self):
         """Convertit le QCM en dictionnaire"""
+        return self.to_list_dict(
+            nombre_questions=len(self.questions) if self.questions else 0,
+            niveaux=[n.to_dict() for n in self.niveaux] if self.niveaux else []
+        )
+
+    def to_list_dict(self, nombre_questions, niveaux):
+        """
+        Convertit le QCM en dictionnaire à partir d'agrégats pré-calculés (listes)
+
+        Le nombre de questions et les niveaux ciblés sont fournis par l'appelant
+        (requêtes groupées sur la page) au lieu d'être chargés QCM par QCM.
+        Les relations matiere_obj, createur, niveau, mention et parcours doivent
+        être chargées par la requête de liste (voir QCMRepository.OPTIONS_LISTE).
+        """
         def format_date(date_value):
             if date_value is None:
                 return None
@@ -102,8 +120,8 @@ class QCM(db.Model):
                 'name': self.createur.name,
                 'email': self.createur.email
             } if self.createur else None,
-            'nombreQuestions': len(self.questions) if self.questions else 0,
-            'niveaux': [n.to_dict() for n in self.niveaux] if self.niveaux else [],
+            'nombreQuestions': nombre_questions,
+            'niveaux': niveaux,
         }
         
         # Ajouter les nouveaux champs si disponibles (après migration)
@@ -10,6 +10,10 @@ import json
 class Question(db.Model):
     """Modèle Question pour les questions de QCM"""
     __tablename__ = 'questions'
+    __table_args__ = (
+        # Pagination par curseur (BaseRepository.get_all_keyset)
+        db.Index('ix_questions_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     enonce = db.Column(db.Text, nullable=False)
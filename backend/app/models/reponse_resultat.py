@@ -0,0 +1,81 @@
+"""
+Modèle Réponse pour le détail normalisé des réponses d'un résultat
+Une ligne par question répondue, à la place du texte JSON Resultat.reponses_detail
+"""
+from app import db
+import json
+
+
+def encoder_reponse(valeur):
+    """Encode une réponse en JSON stable (clés triées: même encodage que les fréquences de réponses)"""
+    return json.dumps(valeur, ensure_ascii=False, sort_keys=True)
+
+
+def decoder_reponse(valeur):
+    """Décode une réponse stockée (None si absente ou invalide)"""
+    if valeur is None:
+        return None
+    try:
+        return json.loads(valeur)
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return None
+
+
+class ReponseResultat(db.Model):
+    """Réponse d'un étudiant à une question, corrigée"""
+    __tablename__ = 'reponses_resultat'
+    __table_args__ = (
+        # Analyses par question (taux de réussite, réponses fréquentes)
+        db.Index('ix_reponses_resultat_question_correct', 'question_id', 'correct'),
+    )
+
+    resultat_id = db.Column(db.String(36), db.ForeignKey('resultats.id', ondelete='CASCADE'), primary_key=True)
+    resultat = db.relationship('Resultat', back_populates='reponses')
+
+    # Pas de clé étrangère: l'historique des réponses survit au remplacement des questions d'un QCM
+    question_id = db.Column(db.String(36), primary_key=True)
+    # Énoncé et explication tels que soumis: modifier ou supprimer la question ne réécrit pas
+    # l'historique
+    question_enonce = db.Column(db.Text, nullable=True)
+    feedback = db.Column(db.Text, nullable=True)
+
+    numero = db.Column(db.Integer, nullable=True)  # Numéro de la question dans le QCM
+    reponse = db.Column(db.Text, nullable=True)  # Réponse de l'étudiant (JSON)
+    reponse_correcte = db.Column(db.Text, nullable=True)  # Réponse attendue (JSON)
+    correct = db.Column(db.Boolean, default=False, nullable=False)
+    score = db.Column(db.Float, nullable=True)
+    score_max = db.Column(db.Float, nullable=True)
+
+    @classmethod
+    def depuis_detail(cls, question_id, detail):
+        """Construit une réponse à partir d'une entrée de reponses_detail"""
+        return cls(
+            question_id=question_id,
+            numero=detail.get('question_numero'),
+            reponse=encoder_reponse(detail.get('answer')),
+            reponse_correcte=encoder_reponse(detail.get('correct_answer')),
+            correct=bool(detail.get('correct', False)),
+            score=detail.get('score'),
+            score_max=detail.get('max_score'),
+            question_enonce=detail.get('question_enonce'),
+            feedback=detail.get('feedback')
+        )
+
+    def to_detail(self):
+        """Entrée de reponses_detail (format historique du champ JSON)"""
+        detail = {
+            'question_id': self.question_id,
+            'question_numero': self.numero,
+            'answer': decoder_reponse(self.reponse),
+            'correct_answer': decoder_reponse(self.reponse_correcte),
+            'correct': self.correct,
+            'score': self.score,
+            'max_score': self.score_max
+        }
+        if self.question_enonce is not None:
+            detail['question_enonce'] = self.question_enonce
+            detail['feedback'] = self.feedback or ''
+        return detail
+
+    def __repr__(self):
+        return f'<ReponseResultat {self.resultat_id} - {self.question_id}>'
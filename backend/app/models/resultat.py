@@ -10,6 +10,10 @@ import json
 class Resultat(db.Model):
     """Modèle pour les résultats des étudiants"""
     __tablename__ = 'resultats'
+    __table_args__ = (
+        # Pagination par curseur (BaseRepository.get_all_keyset)
+        db.Index('ix_resultats_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
 
@@ -42,7 +46,11 @@ class Resultat(db.Model):
     questions_incorrectes = db.Column(db.Integer, default=0, nullable=False)
     questions_partielles = db.Column(db.Integer, default=0, nullable=False)  # Pour questions ouvertes
 
-    # Détails des réponses (JSON)
+    # Détails des réponses: une ligne ReponseResultat par question (voir get_reponses_detail)
+    reponses = db.relationship('ReponseResultat', back_populates='resultat', cascade='all, delete-orphan',
+                               order_by='ReponseResultat.numero')
+
+    # Ancien détail des réponses (JSON), lu uniquement pour les résultats non migrés
     # Format: {"question_id": {"answer": "...", "score": 0.8, "feedback": "...", "correct": true}}
     reponses_detail = db.Column(db.Text, nullable=True)
 
@@ -64,7 +72,9 @@ class Resultat(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     def get_reponses_detail(self):
-        """Récupère les détails des réponses"""
+        """Récupère les détails des réponses {question_id: {...}} (format historique du champ JSON)"""
+        if self.reponses:
+            return {reponse.question_id: reponse.to_detail() for reponse in self.reponses}
         if not self.reponses_detail:
             return {}
         try:
@@ -80,11 +90,14 @@ class Resultat(db.Model):
             return {}
 
     def set_reponses_detail(self, reponses):
-        """Définit les détails des réponses"""
+        """Définit les détails des réponses (une ligne ReponseResultat par question)"""
+        from app.models.reponse_resultat import ReponseResultat
+
+        # Le détail est désormais stocké en lignes: l'ancien champ JSON n'est plus alimenté
+        self.reponses_detail = None
         try:
-            # S'assurer que les données sont sérialisables
             if reponses is None:
-                self.reponses_detail = None
+                self.reponses = []
                 return
             
             # Convertir les valeurs non-sérialisables
@@ -101,13 +114,17 @@ class Resultat(db.Model):
                     return obj
             
             reponses_serializable = make_serializable(reponses)
-            self.reponses_detail = json.dumps(reponses_serializable, ensure_ascii=False)
-        except (TypeError, ValueError) as e:
+            self.reponses = [
+                ReponseResultat.depuis_detail(str(question_id), detail)
+                for question_id, detail in reponses_serializable.items()
+                if isinstance(detail, dict)
+            ]
+        except (TypeError, ValueError, AttributeError) as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Erreur sérialisation reponses_detail: {e}")
-            # En cas d'erreur, stocker un dictionnaire vide
-            self.reponses_detail = json.dumps({})
+            # En cas d'erreur, ne stocker aucune réponse
+            self.reponses = []
 
     def to_dict(self, include_details=False):
         """Convertit le résultat en dictionnaire"""
@@ -9,6 +9,10 @@ import uuid
 class SessionExamen(db.Model):
     """Modèle pour les sessions d'examen"""
     __tablename__ = 'sessions_examen'
+    __table_args__ = (
+        # Pagination par curseur (BaseRepository.get_all_keyset)
+        db.Index('ix_sessions_examen_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     titre = db.Column(db.String(255), nullable=False)
@@ -59,6 +63,17 @@ class SessionExamen(db.Model):
 
     def to_dict(self):
         """Convertit la session en dictionnaire"""
+        return self.to_list_dict(
+            nombre_participants=len(self.resultats) if hasattr(self, 'resultats') else 0
+        )
+
+    def to_list_dict(self, nombre_participants):
+        """
+        Convertit la session en dictionnaire avec un nombre de participants pré-calculé (listes)
+
+        Les relations qcm (et sa matière), classe, niveau, mention et parcours doivent
+        être chargées par la requête de liste (voir SessionExamenRepository.OPTIONS_LISTE).
+        """
         # Récupérer la matière depuis le QCM
         matiere_nom = None
         if self.qcm:
@@ -98,7 +113,7 @@ class SessionExamen(db.Model):
                 'nom': self.classe.nom
             } if self.classe else None,
             'createurId': self.createur_id,
-            'nombreParticipants': len(self.resultats) if hasattr(self, 'resultats') else 0,
+            'nombreParticipants': nombre_participants,
             'createdAt': self.created_at.isoformat() if self.created_at else None,
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None
         }
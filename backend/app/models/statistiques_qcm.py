@@ -0,0 +1,88 @@
+"""
+Modèles d'agrégats pré-calculés pour les statistiques des QCM
+Mis à jour de manière incrémentale à chaque soumission / correction d'un résultat
+"""
+from datetime import datetime
+from app import db
+import json
+
+
+# Résolution de l'histogramme des notes: 0.1 point (clé = note sur 20 x 10)
+PAS_HISTOGRAMME = 10
+
+
+def _charger_json(valeur):
+    """Parse un champ JSON stocké en texte (dictionnaire vide si invalide)"""
+    if not valeur:
+        return {}
+    try:
+        parsed = json.loads(valeur)
+        return parsed if isinstance(parsed, dict) else {}
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return {}
+
+
+class StatistiquesQCM(db.Model):
+    """Agrégats par QCM (sommes courantes et histogramme des notes)"""
+    __tablename__ = 'statistiques_qcm'
+
+    qcm_id = db.Column(db.String(36), db.ForeignKey('qcms.id', ondelete='CASCADE'), primary_key=True)
+
+    nombre_soumissions = db.Column(db.Integer, default=0, nullable=False)
+    nombre_etudiants_uniques = db.Column(db.Integer, default=0, nullable=False)
+    nombre_reussis = db.Column(db.Integer, default=0, nullable=False)  # note_sur_20 >= 10
+
+    # Sommes courantes pour les moyennes
+    nombre_notes = db.Column(db.Integer, default=0, nullable=False)
+    somme_notes = db.Column(db.Float, default=0.0, nullable=False)
+    nombre_pourcentages = db.Column(db.Integer, default=0, nullable=False)
+    somme_pourcentages = db.Column(db.Float, default=0.0, nullable=False)
+    nombre_durees = db.Column(db.Integer, default=0, nullable=False)
+    somme_durees = db.Column(db.Float, default=0.0, nullable=False)
+
+    note_min = db.Column(db.Float, nullable=True)
+    note_max = db.Column(db.Float, nullable=True)
+
+    # Histogramme des notes (JSON): {"133": 4} = 4 notes dans [13.3, 13.4[
+    histogramme_notes = db.Column(db.Text, nullable=True)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def get_histogramme(self):
+        """Récupère l'histogramme des notes {indice: nombre}"""
+        return {int(k): v for k, v in _charger_json(self.histogramme_notes).items()}
+
+    def set_histogramme(self, histogramme):
+        """Définit l'histogramme des notes (les classes vides sont supprimées)"""
+        self.histogramme_notes = json.dumps({str(k): v for k, v in sorted(histogramme.items()) if v > 0})
+
+    def __repr__(self):
+        return f'<StatistiquesQCM {self.qcm_id} ({self.nombre_soumissions} soumissions)>'
+
+
+class StatistiquesQuestion(db.Model):
+    """Agrégats par question (tentatives, réponses correctes, fréquence des réponses)"""
+    __tablename__ = 'statistiques_question'
+
+    question_id = db.Column(db.String(36), db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    qcm_id = db.Column(db.String(36), db.ForeignKey('qcms.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    nombre_reponses = db.Column(db.Integer, default=0, nullable=False)
+    nombre_correctes = db.Column(db.Integer, default=0, nullable=False)
+
+    # Fréquence des réponses (JSON): {"<réponse encodée en JSON>": nombre}
+    reponses_frequentes = db.Column(db.Text, nullable=True)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def get_reponses_frequentes(self):
+        """Récupère la fréquence des réponses {réponse encodée: nombre}"""
+        return _charger_json(self.reponses_frequentes)
+
+    def set_reponses_frequentes(self, frequences):
+        """Définit la fréquence des réponses (les réponses à zéro sont supprimées)"""
+        self.reponses_frequentes = json.dumps(
+            {k: v for k, v in frequences.items() if v > 0}, ensure_ascii=False)
+
+    def __repr__(self):
+        return f'<StatistiquesQuestion {self.question_id}>'
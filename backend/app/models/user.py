@@ -53,6 +53,10 @@ class UserRoleType(TypeDecorator):
 class User(db.Model):
     """Modèle utilisateur avec support OAuth"""
     __tablename__ = 'users'
+    __table_args__ = (
+        # Pagination par curseur (BaseRepository.get_all_keyset)
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.String(36), primary_key=True,
                    default=lambda: str(uuid.uuid4()))
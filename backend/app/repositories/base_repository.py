@@ -1,15 +1,89 @@
 """
 Repository de base avec méthodes CRUD génériques
+
+Pagination par curseur (keyset): les pages sont triées sur (created_at, id) décroissants
+et la page suivante est désignée par un jeton opaque encodant la dernière clé lue. Le coût
+d'une page ne dépend pas de sa profondeur (pas d'OFFSET). Le total est optionnel: compté
+puis mis en cache quelques secondes, ou estimé par les statistiques PostgreSQL pour une
+grande table sans filtre.
 """
-from typing import TypeVar, Generic, Optional, List, Dict, Any
-from sqlalchemy.orm import Session
+import os
+import json
+import time
+import base64
+import logging
+import threading
+from datetime import datetime
+from typing import TypeVar, Generic, Optional, List, Dict, Any, Tuple
+from sqlalchemy import and_, or_, text
+from sqlalchemy.orm import Session, Query
 from app import db
+from app.repositories import recherche
 
 T = TypeVar('T')
 
+logger = logging.getLogger(__name__)
+
+# Durée de validité d'un total mis en cache (secondes)
+PAGINATION_CACHE_TOTAUX_SECONDES = int(os.getenv('PAGINATION_COUNT_CACHE_SECONDS', '30'))
+# Taille de table à partir de laquelle un total sans filtre est estimé plutôt que compté
+PAGINATION_SEUIL_ESTIMATION = int(os.getenv('PAGINATION_ESTIMATE_MIN_ROWS', '100000'))
+PAGINATION_CACHE_TOTAUX_MAX = 1000
+
+
+def encode_curseur(created_at: datetime, id: str) -> str:
+    """Encode la clé (created_at, id) d'une ligne en jeton de pagination opaque"""
+    contenu = json.dumps([created_at.isoformat(), id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(contenu.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_curseur(curseur: str) -> Tuple[datetime, str]:
+    """Décode un jeton de pagination (ValueError si le jeton est invalide)"""
+    try:
+        contenu = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        created_at, id = json.loads(contenu.decode('utf-8'))
+        return datetime.fromisoformat(created_at), str(id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("Curseur de pagination invalide")
+
+
+class CacheTotaux:
+    """Totaux de requêtes de liste mis en cache quelques secondes (processus courant)"""
+
+    def __init__(self, ttl_secondes: int = PAGINATION_CACHE_TOTAUX_SECONDES):
+        self.ttl_secondes = ttl_secondes
+        self._totaux: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, cle: Tuple[str, str]) -> Optional[int]:
+        with self._lock:
+            entree = self._totaux.get(cle)
+            if entree and entree[0] > time.monotonic():
+                return entree[1]
+            self._totaux.pop(cle, None)
+            return None
+
+    def set(self, cle: Tuple[str, str], total: int) -> None:
+        with self._lock:
+            if len(self._totaux) >= PAGINATION_CACHE_TOTAUX_MAX:
+                self._totaux.clear()
+            self._totaux[cle] = (time.monotonic() + self.ttl_secondes, total)
+
+    def vider(self) -> None:
+        with self._lock:
+            self._totaux.clear()
+
+
+cache_totaux = CacheTotaux()
+
 
 class BaseRepository(Generic[T]):
     """Repository de base avec méthodes CRUD génériques"""
+
+    # Options de chargement (joinedload...) appliquées aux pages de liste
+    OPTIONS_LISTE = ()
+    # Colonnes de la recherche textuelle (voir app.repositories.recherche)
+    COLONNES_RECHERCHE = ()
     
     def __init__(self, model: type[T]):
         self.model = model
@@ -20,9 +94,14 @@ class BaseRepository(Generic[T]):
         return db.session
     
     def get_by_id(self, id: str) -> Optional[T]:
-        """Récupère une entité par son ID"""
-        # Utiliser filter au lieu de get() qui est deprecated
-        return self.session.query(self.model).filter(self.model.id == id).first()
+        """
+        Récupère une entité par son ID
+        Session.get consulte d'abord la carte d'identité de la session: une entité déjà
+        chargée dans la requête (utilisateur courant...) est retournée sans nouvelle requête.
+        """
+        if id is None:
+            return None
+        return self.session.get(self.model, id)
     
     def get_all(self, skip: int = 0, limit: int = 100) -> List[T]:
         """Récupère toutes les entités avec pagination"""
@@ -31,6 +110,89 @@ class BaseRepository(Generic[T]):
     def count(self) -> int:
         """Compte le nombre total d'entités"""
         return self.session.query(self.model).count()
+
+    def _query_liste(self, filters: Optional[Dict[str, Any]] = None) -> Query:
+        """Requête de liste filtrée (surchargée par les repositories qui acceptent des filtres)"""
+        return self.session.query(self.model)
+
+    def get_all_keyset(self, limit: int = 100, curseur: Optional[str] = None,
+                       filters: Optional[Dict[str, Any]] = None,
+                       avec_total: bool = False) -> Tuple[List[T], Optional[str], Optional[int]]:
+        """
+        Récupère une page de la liste par curseur, triée sur (created_at, id) décroissants
+
+        Returns:
+            Tuple (entités, curseur de la page suivante ou None, total ou None)
+        """
+        query = self._query_liste(filters)
+        return self.paginate_keyset(query.options(*self.OPTIONS_LISTE), limit=limit, curseur=curseur,
+                                    avec_total=avec_total, estimer_total=not filters)
+
+    def paginate_keyset(self, query: Query, limit: int = 100, curseur: Optional[str] = None,
+                        avec_total: bool = False,
+                        estimer_total: bool = False) -> Tuple[List[T], Optional[str], Optional[int]]:
+        """Applique la pagination par curseur (created_at, id) à une requête sur self.model"""
+        total = self.count_total(query, estimer=estimer_total) if avec_total else None
+
+        colonne_date, colonne_id = self.model.created_at, self.model.id
+        if curseur:
+            date_curseur, id_curseur = decode_curseur(curseur)
+            # (created_at, id) < curseur; la borne created_at <= date_curseur, redondante,
+            # permet au moteur de parcourir l'index à partir du curseur au lieu du début
+            query = query.filter(and_(
+                colonne_date <= date_curseur,
+                or_(colonne_date < date_curseur, colonne_id < id_curseur)
+            ))
+
+        # Une ligne de plus que la page pour savoir s'il existe une page suivante
+        entites = query.order_by(None).order_by(
+            colonne_date.desc(), colonne_id.desc()).limit(limit + 1).all()
+
+        curseur_suivant = None
+        if len(entites) > limit:
+            entites = entites[:limit]
+            curseur_suivant = encode_curseur(entites[-1].created_at, entites[-1].id)
+        return entites, curseur_suivant, total
+
+    def count_total(self, query: Query, estimer: bool = False) -> int:
+        """
+        Total d'une requête de liste: estimation PostgreSQL pour une grande table sans filtre
+        (estimer=True), sinon COUNT exact mis en cache PAGINATION_COUNT_CACHE_SECONDS secondes
+        """
+        if estimer:
+            estimation = self.estimate_count()
+            if estimation is not None and estimation >= PAGINATION_SEUIL_ESTIMATION:
+                return estimation
+
+        compilee = query.enable_eagerloads(False).statement.compile()
+        cle = (str(compilee), repr(sorted(compilee.params.items())))
+        total = cache_totaux.get(cle)
+        if total is None:
+            total = query.order_by(None).count()
+            cache_totaux.set(cle, total)
+        return total
+
+    def estimate_count(self) -> Optional[int]:
+        """Nombre de lignes estimé par les statistiques PostgreSQL (None si indisponible)"""
+        if self.session.get_bind().dialect.name != 'postgresql':
+            return None
+        try:
+            estimation = self.session.execute(
+                text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)'),
+                {'table': self.model.__tablename__}
+            ).scalar()
+        except Exception as e:
+            logger.debug(f"Estimation du nombre de lignes indisponible: {e}")
+            return None
+        # reltuples vaut -1 tant que la table n'a jamais été analysée
+        return int(estimation) if estimation is not None and estimation >= 0 else None
+    
+    def rechercher(self, terme: str, limit: Optional[int] = None, prefixe: bool = False,
+                   filtres: Tuple[Any, ...] = ()) -> List[T]:
+        """Recherche indexée, classée et limitée sur COLONNES_RECHERCHE (prefixe: autocomplétion)"""
+        colonnes = [getattr(self.model, nom) for nom in self.COLONNES_RECHERCHE]
+        return recherche.rechercher(self.session, self.model, colonnes, terme, limite=limit,
+                          prefixe=prefixe, filtres=filtres)
     
     def create(self, entity: T) -> T:
         """Crée une nouvelle entité"""
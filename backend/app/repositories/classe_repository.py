@@ -10,6 +10,8 @@ from app.models.classe import Classe
 class ClasseRepository(BaseRepository[Classe]):
     """Repository pour les opérations sur les Classes"""
 
+    COLONNES_RECHERCHE = ('code', 'nom')
+
     def __init__(self):
         super().__init__(Classe)
 
@@ -29,15 +31,9 @@ class ClasseRepository(BaseRepository[Classe]):
         """Récupère toutes les classes actives"""
         return self.session.query(Classe).filter(Classe.actif == True).order_by(Classe.nom).all()
 
-    def search(self, query: str) -> List[Classe]:
-        """Recherche des classes par code ou nom"""
-        search_term = f"%{query}%"
-        return self.session.query(Classe).filter(
-            or_(
-                Classe.code.ilike(search_term),
-                Classe.nom.ilike(search_term)
-            )
-        ).all()
+    def search(self, query: str, limit: Optional[int] = None) -> List[Classe]:
+        """Recherche des classes par code ou nom (résultats classés, au plus limit)"""
+        return self.rechercher(query, limit=limit)
 
     def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> tuple[List[Classe], int]:
         """Récupère les classes avec pagination et filtres"""
@@ -1,12 +1,15 @@
 """
 Repository pour la gestion des Étudiants
 """
-from typing import List, Optional
-from sqlalchemy import or_
+from typing import List, Optional, Iterator
+from sqlalchemy import or_, and_, exists, func
+from sqlalchemy.orm import Query
 from app.repositories.base_repository import BaseRepository
 from app.models.etudiant import Etudiant
 from app.models.matiere import Matiere
 from app.models.classe import Classe
+from app.models.user import User, UserRole
+from app.models.associations import etudiant_matieres_v2, etudiant_classes_v2
 
 
 class EtudiantRepository(BaseRepository[Etudiant]):
@@ -65,6 +68,65 @@ class EtudiantRepository(BaseRepository[Etudiant]):
             )
         ).all()
 
+    # Audience (étudiants ciblés par un QCM, une session ou un enseignant)
+
+    def query_audience(self, matiere_ids: Optional[List[str]] = None, classe_id: Optional[str] = None,
+                       niveau_ids: Optional[List[str]] = None, parcours_ids: Optional[List[str]] = None,
+                       mention_ids: Optional[List[str]] = None,
+                       annee_scolaire: Optional[str] = None,
+                       matieres_actives: bool = False) -> Query:
+        """
+        Requête des étudiants actifs correspondant aux critères (None = critère ignoré)
+
+        Les inscriptions (matières, classe) sont testées par EXISTS sur les tables
+        d'association indexées: un étudiant n'apparaît qu'une fois, sans DISTINCT.
+        """
+        query = self.session.query(Etudiant).filter(Etudiant.actif == True)
+
+        if matiere_ids is not None:
+            conditions = [
+                etudiant_matieres_v2.c.etudiant_id == Etudiant.id,
+                etudiant_matieres_v2.c.matiere_id.in_(matiere_ids)
+            ]
+            if matieres_actives:
+                conditions += [Matiere.id == etudiant_matieres_v2.c.matiere_id, Matiere.actif == True]
+            if annee_scolaire:
+                conditions.append(etudiant_matieres_v2.c.annee_scolaire == annee_scolaire)
+            query = query.filter(exists().where(and_(*conditions)))
+
+        if classe_id is not None:
+            query = query.filter(exists().where(and_(
+                etudiant_classes_v2.c.etudiant_id == Etudiant.id,
+                etudiant_classes_v2.c.classe_id == classe_id
+            )))
+
+        if niveau_ids is not None:
+            query = query.filter(Etudiant.niveau_id.in_(niveau_ids))
+        if parcours_ids is not None:
+            query = query.filter(Etudiant.parcours_id.in_(parcours_ids))
+        if mention_ids is not None:
+            query = query.filter(Etudiant.mention_id.in_(mention_ids))
+
+        return query
+
+    def _query_audience_user_ids(self, query: Query) -> Query:
+        """Restreint une requête d'audience aux user_id des comptes étudiants"""
+        return query.join(User, User.id == Etudiant.user_id).filter(
+            User.role == UserRole.ETUDIANT
+        ).with_entities(Etudiant.user_id)
+
+    def count_audience(self, query: Query) -> int:
+        """Compte les comptes étudiants d'une requête d'audience (une requête COUNT)"""
+        return self._query_audience_user_ids(query).with_entities(
+            func.count(Etudiant.user_id)).scalar() or 0
+
+    def iter_audience_user_ids(self, query: Query, batch_size: int = 1000) -> Iterator[str]:
+        """Parcourt les user_id d'une requête d'audience par lots (curseur côté serveur si supporté)"""
+        ids = self._query_audience_user_ids(query).order_by(Etudiant.user_id).execution_options(
+            stream_results=True, yield_per=batch_size)
+        for (user_id,) in ids:
+            yield user_id
+
     # Gestion des relations Many-to-Many
 
     def get_matieres(self, etudiant_id: str) -> List[Matiere]:
@@ -2,7 +2,6 @@
 Repository pour la gestion des Matières
 """
 from typing import List, Optional, Dict, Any
-from sqlalchemy import or_
 from app.repositories.base_repository import BaseRepository
 from app.models.matiere import Matiere
 
@@ -10,6 +9,8 @@ from app.models.matiere import Matiere
 class MatiereRepository(BaseRepository[Matiere]):
     """Repository pour les opérations sur les Matières"""
 
+    COLONNES_RECHERCHE = ('code', 'nom')
+
     def __init__(self):
         super().__init__(Matiere)
 
@@ -21,15 +22,9 @@ class MatiereRepository(BaseRepository[Matiere]):
         """Récupère toutes les matières actives"""
         return self.session.query(Matiere).filter(Matiere.actif == True).order_by(Matiere.nom).all()
 
-    def search(self, query: str) -> List[Matiere]:
-        """Recherche des matières par code ou nom"""
-        search_term = f"%{query}%"
-        return self.session.query(Matiere).filter(
-            or_(
-                Matiere.code.ilike(search_term),
-                Matiere.nom.ilike(search_term)
-            )
-        ).all()
+    def search(self, query: str, limit: Optional[int] = None) -> List[Matiere]:
+        """Recherche des matières par code ou nom (résultats classés, au plus limit)"""
+        return self.rechercher(query, limit=limit)
 
     def get_all_ordered(self) -> List[Matiere]:
         """Récupère toutes les matières triées par nom"""
@@ -3,28 +3,31 @@ Repository pour la gestion des QCM
 """
 from typing import List, Optional, Dict, Any
 from sqlalchemy import or_, func
+from sqlalchemy.orm import Query, joinedload
 from app.repositories.base_repository import BaseRepository
 from app.models.qcm import QCM
+from app.models.question import Question
+from app.models.niveau import Niveau
+from app.models.associations import qcm_niveaux
 
 
 class QCMRepository(BaseRepository[QCM]):
     """Repository pour les opérations sur les QCM"""
 
+    # Relations many-to-one lues par QCM.to_list_dict, chargées dans la requête de liste
+    OPTIONS_LISTE = (
+        joinedload(QCM.matiere_obj),
+        joinedload(QCM.createur),
+        joinedload(QCM.niveau),
+        joinedload(QCM.mention),
+        joinedload(QCM.parcours),
+    )
+
     def __init__(self):
         super().__init__(QCM)
 
-    def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> tuple[List[QCM], int]:
-        """
-        Récupère les QCM avec pagination et filtres
-
-        Args:
-            skip: Nombre d'éléments à sauter
-            limit: Nombre maximum d'éléments à retourner
-            filters: Dictionnaire de filtres (status, createur_id, matiere, search, etc.)
-
-        Returns:
-            Tuple (liste de QCM, total count)
-        """
+    def _query_liste(self, filters: Optional[Dict[str, Any]] = None) -> Query:
+        """Requête des QCM filtrée (status, createur_id, matiere, search)"""
         query = self.session.query(QCM)
 
         if filters:
@@ -50,11 +53,28 @@ class QCMRepository(BaseRepository[QCM]):
                     )
                 )
 
+        return query
+
+    def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> tuple[List[QCM], int]:
+        """
+        Récupère les QCM avec pagination et filtres
+
+        Args:
+            skip: Nombre d'éléments à sauter
+            limit: Nombre maximum d'éléments à retourner
+            filters: Dictionnaire de filtres (status, createur_id, matiere, search, etc.)
+
+        Returns:
+            Tuple (liste de QCM, total count)
+        """
+        query = self._query_liste(filters)
+
         # Compter le total avant pagination
         total = query.count()
 
         # Appliquer pagination
-        qcms = query.order_by(QCM.created_at.desc()).offset(skip).limit(limit).all()
+        qcms = query.options(*self.OPTIONS_LISTE).order_by(
+            QCM.created_at.desc()).offset(skip).limit(limit).all()
 
         return qcms, total
 
@@ -78,7 +98,29 @@ class QCMRepository(BaseRepository[QCM]):
 
     def get_recent_qcms(self, limit: int = 10) -> List[QCM]:
         """Récupère les QCM récemment créés"""
-        return self.session.query(QCM).order_by(QCM.created_at.desc()).limit(limit).all()
+        return self.session.query(QCM).options(*self.OPTIONS_LISTE).order_by(
+            QCM.created_at.desc()).limit(limit).all()
+
+    def count_questions_by_qcm(self, qcm_ids: List[str]) -> Dict[str, int]:
+        """Compte les questions de plusieurs QCM en une requête groupée {qcm_id: nombre}"""
+        if not qcm_ids:
+            return {}
+        lignes = self.session.query(Question.qcm_id, func.count(Question.id)).filter(
+            Question.qcm_id.in_(qcm_ids)
+        ).group_by(Question.qcm_id).all()
+        return {qcm_id: nombre for qcm_id, nombre in lignes}
+
+    def get_niveaux_by_qcm(self, qcm_ids: List[str]) -> Dict[str, List[Niveau]]:
+        """Récupère les niveaux ciblés de plusieurs QCM en une requête {qcm_id: [niveaux]}"""
+        if not qcm_ids:
+            return {}
+        lignes = self.session.query(qcm_niveaux.c.qcm_id, Niveau).join(
+            qcm_niveaux, qcm_niveaux.c.niveau_id == Niveau.id
+        ).filter(qcm_niveaux.c.qcm_id.in_(qcm_ids)).order_by(Niveau.ordre).all()
+        niveaux: Dict[str, List[Niveau]] = {}
+        for qcm_id, niveau in lignes:
+            niveaux.setdefault(qcm_id, []).append(niveau)
+        return niveaux
 
     def count_by_status(self) -> Dict[str, int]:
         """Compte les QCM par statut"""
@@ -104,7 +146,7 @@ class QCMRepository(BaseRepository[QCM]):
         Returns:
             Liste des QCMs publiés
         """
-        return self.session.query(QCM).filter(
+        return self.session.query(QCM).options(*self.OPTIONS_LISTE).filter(
             QCM.status == 'published',
             QCM.matiere_id.in_(matieres_ids)
         ).order_by(QCM.created_at.desc()).all()
@@ -1,11 +1,24 @@
 """
 Repository pour la gestion des Questions
+
+Écriture en masse (génération IA, import, scripts de données): les lignes sont préparées en
+un seul passage (options encodées en JSON une fois) puis envoyées en un executemany, que
+SQLAlchemy regroupe en INSERT multi-lignes. Ces méthodes ne valident pas la transaction:
+l'appelant commit avec le reste de ses modifications (statut du QCM, etc.).
 """
-from typing import List, Optional, Dict, Any
-from sqlalchemy import or_, func
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Dict, Any
+from sqlalchemy import or_, func, insert
+from sqlalchemy.orm import Query
 from app.repositories.base_repository import BaseRepository
 from app.models.question import Question
 
+# Colonnes mises à jour par upsert_many (id, qcm_id et created_at sont conservés)
+COLONNES_MISE_A_JOUR = ('enonce', 'type_question', 'options', 'reponse_correcte', 'points',
+                        'explication', 'updated_at')
+
 
 class QuestionRepository(BaseRepository[Question]):
     """Repository pour les opérations sur les Questions"""
@@ -13,18 +26,8 @@ class QuestionRepository(BaseRepository[Question]):
     def __init__(self):
         super().__init__(Question)
 
-    def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> tuple[List[Question], int]:
-        """
-        Récupère les questions avec pagination et filtres
-
-        Args:
-            skip: Nombre d'éléments à sauter
-            limit: Nombre maximum d'éléments à retourner
-            filters: Dictionnaire de filtres (type_question, qcm_id, search, etc.)
-
-        Returns:
-            Tuple (liste de questions, total count)
-        """
+    def _query_liste(self, filters: Optional[Dict[str, Any]] = None) -> Query:
+        """Requête des questions filtrée (type_question, qcm_id, search)"""
         query = self.session.query(Question)
 
         if filters:
@@ -41,6 +44,22 @@ class QuestionRepository(BaseRepository[Question]):
                 search_term = f"%{filters['search']}%"
                 query = query.filter(Question.enonce.ilike(search_term))
 
+        return query
+
+    def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> tuple[List[Question], int]:
+        """
+        Récupère les questions avec pagination et filtres
+
+        Args:
+            skip: Nombre d'éléments à sauter
+            limit: Nombre maximum d'éléments à retourner
+            filters: Dictionnaire de filtres (type_question, qcm_id, search, etc.)
+
+        Returns:
+            Tuple (liste de questions, total count)
+        """
+        query = self._query_liste(filters)
+
         # Compter le total avant pagination
         total = query.count()
 
@@ -49,6 +68,109 @@ class QuestionRepository(BaseRepository[Question]):
 
         return questions, total
 
+    @staticmethod
+    def _lignes_questions(qcm_id: str, questions_data: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Lignes de la table questions pour une insertion en masse
+
+        Accepte le format des questions générées (type_question) comme celui des scripts de
+        données (type). Les options (liste) sont encodées en JSON comme par Question.set_options.
+        created_at croît d'une microseconde par ligne: l'ordre des questions (tri par created_at)
+        reste celui reçu, comme avec des insertions une à une.
+        """
+        maintenant = datetime.utcnow()
+        lignes = []
+        for rang, q in enumerate(questions_data):
+            horodatage = maintenant + timedelta(microseconds=rang)
+            lignes.append({
+                'id': q.get('id') or str(uuid.uuid4()),
+                'qcm_id': qcm_id,
+                'enonce': q['enonce'],
+                'type_question': q.get('type_question') or q.get('type') or 'qcm',
+                'options': json.dumps(q['options']) if q.get('options') is not None else None,
+                'reponse_correcte': q.get('reponse_correcte'),
+                'points': q.get('points', 1),
+                'explication': q.get('explication', ''),
+                'created_at': horodatage,
+                'updated_at': horodatage,
+            })
+        return lignes
+
+    def insert_many(self, qcm_id: str, questions_data: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Insère des questions dans un QCM en une seule instruction (executemany)
+
+        Args:
+            qcm_id: ID du QCM
+            questions_data: Questions (enonce, type_question ou type, options, reponse_correcte,
+                points, explication; id optionnel)
+
+        Returns:
+            IDs des questions insérées, dans l'ordre reçu
+        """
+        lignes = self._lignes_questions(qcm_id, questions_data)
+        if lignes:
+            self.session.execute(insert(Question.__table__), lignes)
+        return [ligne['id'] for ligne in lignes]
+
+    def replace_for_qcm(self, qcm_id: str, questions_data: Iterable[Dict[str, Any]]) -> List[str]:
+        """Remplace toutes les questions d'un QCM (suppression puis insertion en masse)"""
+        self.session.query(Question).filter(Question.qcm_id == qcm_id).delete(synchronize_session=False)
+        return self.insert_many(qcm_id, questions_data)
+
+    def upsert_many(self, qcm_id: str, questions_data: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Insère ou met à jour des questions d'un QCM selon leur id, en une seule instruction
+        (INSERT ... ON CONFLICT sous PostgreSQL et SQLite)
+
+        Une question portant l'id d'une question d'un autre QCM est ignorée.
+
+        Returns:
+            IDs des questions reçues, dans l'ordre reçu
+        """
+        lignes = self._lignes_questions(qcm_id, questions_data)
+        if not lignes:
+            return []
+
+        dialecte = self.session.get_bind().dialect.name
+        if dialecte == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecte
+        elif dialecte == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecte
+        else:
+            return self._upsert_generique(lignes)
+
+        table = Question.__table__
+        instruction = insert_dialecte(table)
+        instruction = instruction.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={colonne: instruction.excluded[colonne] for colonne in COLONNES_MISE_A_JOUR},
+            where=table.c.qcm_id == instruction.excluded.qcm_id
+        )
+        self.session.execute(instruction, lignes)
+        # Les questions déjà chargées dans la session ne reflètent pas la mise à jour
+        self.session.expire_all()
+        return [ligne['id'] for ligne in lignes]
+
+    def _upsert_generique(self, lignes: List[Dict[str, Any]]) -> List[str]:
+        """Upsert sans ON CONFLICT: ids existants lus en une requête, puis mises à jour et insertions groupées"""
+        qcm_id = lignes[0]['qcm_id']
+        existantes = {
+            question_id: question_qcm_id
+            for question_id, question_qcm_id in self.session.query(Question.id, Question.qcm_id).filter(
+                Question.id.in_([ligne['id'] for ligne in lignes]))
+        }
+        mises_a_jour = [
+            {cle: ligne[cle] for cle in ('id',) + COLONNES_MISE_A_JOUR}
+            for ligne in lignes if existantes.get(ligne['id']) == qcm_id
+        ]
+        nouvelles = [ligne for ligne in lignes if ligne['id'] not in existantes]
+        if mises_a_jour:
+            self.session.bulk_update_mappings(Question, mises_a_jour)
+        if nouvelles:
+            self.session.execute(insert(Question.__table__), nouvelles)
+        return [ligne['id'] for ligne in lignes]
+
     def get_by_qcm(self, qcm_id: str) -> List[Question]:
         """Récupère toutes les questions d'un QCM"""
         return self.session.query(Question).filter(Question.qcm_id == qcm_id).all()
@@ -66,6 +188,31 @@ class QuestionRepository(BaseRepository[Question]):
         """Compte le nombre de questions dans un QCM"""
         return self.session.query(Question).filter(Question.qcm_id == qcm_id).count()
 
+    def get_agregats_par_qcm(self, qcm_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """
+        Calcule en une seule requête le nombre de questions et le total des points de plusieurs QCM
+
+        Args:
+            qcm_ids: Liste des IDs de QCM
+
+        Returns:
+            Dictionnaire {qcm_id: {'nombre_questions': int, 'total_points': int}}
+            Les QCM sans question sont absents du dictionnaire
+        """
+        if not qcm_ids:
+            return {}
+
+        result = self.session.query(
+            Question.qcm_id,
+            func.count(Question.id),
+            func.coalesce(func.sum(Question.points), 0)
+        ).filter(Question.qcm_id.in_(qcm_ids)).group_by(Question.qcm_id).all()
+
+        return {
+            qcm_id: {'nombre_questions': nombre, 'total_points': int(total_points)}
+            for qcm_id, nombre, total_points in result
+        }
+
     def count_by_type(self) -> Dict[str, int]:
         """Compte les questions par type"""
         counts = {
@@ -0,0 +1,192 @@
+"""
+Recherche indexée par texte (utilisateurs, classes, matières)
+
+Un filtre ILIKE '%terme%' sans limite parcourt toute la table. Selon la base:
+- PostgreSQL: index GIN pg_trgm sur les colonnes recherchées (migration 20260118_090000),
+  utilisés par ILIKE '%terme%' et par l'opérateur de similarité % (fautes de frappe).
+  Résultats classés par correspondance en début de mot, puis par similarité.
+- SQLite: table virtuelle FTS5 par table (contenu externe, tenue à jour par des triggers),
+  créée à la première recherche. Chaque mot du terme est cherché comme préfixe d'un mot
+  indexé, sans tenir compte des accents; résultats classés par bm25.
+- Autres bases, ou extension pg_trgm / module FTS5 absent: ILIKE limité.
+Les résultats sont toujours limités (SEARCH_DEFAULT_LIMIT, au plus LIMITE_RECHERCHE_MAX).
+"""
+import os
+import re
+import logging
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import case, func, literal_column, or_, table, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+LIMITE_RECHERCHE_DEFAUT = int(os.getenv('SEARCH_DEFAULT_LIMIT', '20'))
+LIMITE_RECHERCHE_MAX = 100
+
+# Disponibilité de pg_trgm par base PostgreSQL (URL du moteur)
+_trgm_disponible: Dict[str, bool] = {}
+_trgm_lock = threading.Lock()
+
+
+def normaliser(texte: Optional[str]) -> str:
+    """Minuscules, sans accents ni espaces superflus ('  Mathématiques ' -> 'mathematiques')"""
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(sans_accents.casefold().split())
+
+
+def echapper_like(terme: str) -> str:
+    """Échappe les jokers LIKE (% et _) d'un terme saisi (caractère d'échappement /)"""
+    return terme.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+def requete_fts(terme: str) -> str:
+    """Requête FTS5: chaque mot du terme cherché par préfixe ('Jean Dup' -> '"jean"* "dup"*')"""
+    return ' '.join(f'"{mot}"*' for mot in re.findall(r'\w+', normaliser(terme)))
+
+
+def borner_limite(limite: Optional[int]) -> int:
+    """Nombre de résultats demandé ramené entre 1 et LIMITE_RECHERCHE_MAX (défaut si absent ou < 1)"""
+    if not limite or limite < 1:
+        return LIMITE_RECHERCHE_DEFAUT
+    return min(limite, LIMITE_RECHERCHE_MAX)
+
+
+def trgm_disponible(session: Session) -> bool:
+    """Extension pg_trgm installée sur la base PostgreSQL de la session (résultat mis en cache)"""
+    moteur = session.get_bind()
+    cle = str(moteur.url)
+    with _trgm_lock:
+        if cle in _trgm_disponible:
+            return _trgm_disponible[cle]
+    try:
+        disponible = session.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first() is not None
+    except Exception as e:
+        logger.warning(f"Vérification de l'extension pg_trgm impossible: {e}")
+        return False
+    if not disponible:
+        logger.warning("Extension pg_trgm absente: recherche par ILIKE (voir la migration 20260118_090000)")
+    with _trgm_lock:
+        _trgm_disponible[cle] = disponible
+    return disponible
+
+
+def installer_fts(session: Session, nom_table: str, colonnes: Sequence[str]) -> bool:
+    """
+    Crée (ou recrée) la table FTS5 d'une table SQLite et ses triggers, puis l'alimente
+
+    La présence du trigger d'insertion sert de témoin: une table supprimée puis recréée
+    (drop_all/create_all) perd ses triggers et son index est reconstruit. La création et
+    l'alimentation sont validées sur une connexion dédiée, indépendamment de la transaction
+    de la session (une requête de lecture n'est pas validée: annulée, elle emporterait
+    l'alimentation mais pas le trigger témoin).
+
+    Returns:
+        False si FTS5 est indisponible (ou la base verrouillée par une écriture en cours)
+    """
+    fts = f'{nom_table}_fts'
+    temoin = text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :nom")
+    if session.execute(temoin, {'nom': f'{fts}_ai'}).first():
+        return True
+
+    liste = ', '.join(colonnes)
+    nouvelles = ', '.join(f'new.{c}' for c in colonnes)
+    anciennes = ', '.join(f'old.{c}' for c in colonnes)
+    try:
+        with session.get_bind().engine.begin() as connexion:
+            # Un autre processus a pu l'installer entre-temps
+            if connexion.execute(temoin, {'nom': f'{fts}_ai'}).first():
+                return True
+            connexion.execute(text(f'DROP TABLE IF EXISTS {fts}'))
+            connexion.execute(text(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({liste}, content='{nom_table}', "
+                f"content_rowid='rowid', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+            connexion.execute(text(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {nom_table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {liste}) VALUES (new.rowid, {nouvelles}); END"
+            ))
+            connexion.execute(text(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {nom_table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {liste}) VALUES ('delete', old.rowid, {anciennes}); END"
+            ))
+            connexion.execute(text(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {nom_table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {liste}) VALUES ('delete', old.rowid, {anciennes}); "
+                f"INSERT INTO {fts}(rowid, {liste}) VALUES (new.rowid, {nouvelles}); END"
+            ))
+            connexion.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    except Exception as e:
+        logger.warning(f"Index FTS5 de {nom_table} indisponible, recherche par ILIKE: {e}")
+        return False
+    logger.info(f"Index FTS5 {fts} créé")
+    return True
+
+
+def rechercher(session: Session, modele: Any, colonnes: Sequence[Any], terme: str,
+               limite: Optional[int] = None, prefixe: bool = False,
+               filtres: Sequence[Any] = ()) -> List[Any]:
+    """
+    Recherche classée et limitée de terme dans les colonnes d'un modèle
+
+    Args:
+        colonnes: attributs du modèle (ex: (User.email, User.name))
+        prefixe: autocomplétion, le terme doit commencer un mot (sans recherche approchée)
+        filtres: critères SQLAlchemy supplémentaires (ex: Classe.actif == True)
+
+    Returns:
+        Au plus limite entités, les plus pertinentes d'abord
+    """
+    terme = (terme or '').strip()
+    if not terme:
+        return []
+    limite = borner_limite(limite)
+    dialecte = session.get_bind().dialect.name
+    query = session.query(modele).filter(*filtres)
+
+    if dialecte == 'sqlite':
+        requete = requete_fts(terme)
+        if not requete:
+            return []
+        nom_table = modele.__tablename__
+        fts = f'{nom_table}_fts'
+        if installer_fts(session, nom_table, [c.key for c in colonnes]):
+            return query.join(
+                table(fts), literal_column(f'{fts}.rowid') == literal_column(f'{nom_table}.rowid')
+            ).filter(
+                text(f'{fts} MATCH :requete_fts')
+            ).params(requete_fts=requete).order_by(text(f'bm25({fts})')).limit(limite).all()
+
+    debut = f'{echapper_like(terme)}%'
+    en_debut_de_mot = [
+        condition
+        for colonne in colonnes
+        for condition in (colonne.ilike(debut, escape='/'), colonne.ilike(f'% {debut}', escape='/'))
+    ]
+
+    if dialecte == 'postgresql' and trgm_disponible(session):
+        if prefixe:
+            query = query.filter(or_(*en_debut_de_mot))
+        else:
+            contient = f'%{echapper_like(terme)}%'
+            query = query.filter(or_(
+                *[colonne.ilike(contient, escape='/') for colonne in colonnes],
+                *[colonne.op('%')(terme) for colonne in colonnes]
+            ))
+        similarites = [func.similarity(func.coalesce(colonne, ''), terme) for colonne in colonnes]
+        score = func.greatest(*similarites) if len(similarites) > 1 else similarites[0]
+        return query.order_by(
+            case((or_(*en_debut_de_mot), 0), else_=1), score.desc(), colonnes[0]
+        ).limit(limite).all()
+
+    if prefixe:
+        query = query.filter(or_(*en_debut_de_mot))
+    else:
+        contient = f'%{echapper_like(terme)}%'
+        query = query.filter(or_(*[colonne.ilike(contient, escape='/') for colonne in colonnes]))
+    return query.order_by(case((or_(*en_debut_de_mot), 0), else_=1), colonnes[0]).limit(limite).all()
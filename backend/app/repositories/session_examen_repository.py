@@ -3,16 +3,27 @@ Repository pour la gestion des Sessions d'Examen
 """
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from sqlalchemy import or_, and_
-from sqlalchemy.orm import joinedload
+from sqlalchemy import or_, and_, func
+from sqlalchemy.orm import Query, joinedload
 from app.repositories.base_repository import BaseRepository
 from app.models.session_examen import SessionExamen
 from app.models.qcm import QCM
+from app.models.classe import Classe
+from app.models.resultat import Resultat
 
 
 class SessionExamenRepository(BaseRepository[SessionExamen]):
     """Repository pour les opérations sur les Sessions d'Examen"""
 
+    # Relations lues par SessionExamen.to_list_dict, chargées dans la requête de liste
+    OPTIONS_LISTE = (
+        joinedload(SessionExamen.qcm).joinedload(QCM.matiere_obj),
+        joinedload(SessionExamen.classe),
+        joinedload(SessionExamen.niveau),
+        joinedload(SessionExamen.mention),
+        joinedload(SessionExamen.parcours),
+    )
+
     def __init__(self):
         super().__init__(SessionExamen)
 
@@ -25,19 +36,19 @@ class SessionExamenRepository(BaseRepository[SessionExamen]):
     def get_by_qcm(self, qcm_id: str) -> List[SessionExamen]:
         """Récupère toutes les sessions d'un QCM"""
         return self.session.query(SessionExamen).options(
-            joinedload(SessionExamen.qcm).joinedload(QCM.matiere_obj)
+            *self.OPTIONS_LISTE
         ).filter(SessionExamen.qcm_id == qcm_id).order_by(SessionExamen.date_debut.desc()).all()
 
     def get_by_classe(self, classe_id: str) -> List[SessionExamen]:
         """Récupère toutes les sessions d'une classe"""
         return self.session.query(SessionExamen).options(
-            joinedload(SessionExamen.qcm).joinedload(QCM.matiere_obj)
+            *self.OPTIONS_LISTE
         ).filter(SessionExamen.classe_id == classe_id).order_by(SessionExamen.date_debut.desc()).all()
 
     def get_by_createur(self, createur_id: str) -> List[SessionExamen]:
         """Récupère toutes les sessions créées par un enseignant"""
         return self.session.query(SessionExamen).options(
-            joinedload(SessionExamen.qcm).joinedload(QCM.matiere_obj)
+            *self.OPTIONS_LISTE
         ).filter(SessionExamen.createur_id == createur_id).order_by(SessionExamen.date_debut.desc()).all()
 
     def get_by_status(self, status: str) -> List[SessionExamen]:
@@ -58,7 +69,11 @@ class SessionExamenRepository(BaseRepository[SessionExamen]):
         """
         now = datetime.utcnow()
         return self.session.query(SessionExamen).options(
-            joinedload(SessionExamen.qcm).joinedload(QCM.matiere_obj)
+            joinedload(SessionExamen.qcm).joinedload(QCM.matiere_obj),
+            joinedload(SessionExamen.classe).joinedload(Classe.niveau),
+            joinedload(SessionExamen.niveau),
+            joinedload(SessionExamen.mention),
+            joinedload(SessionExamen.parcours)
         ).filter(
             and_(
                 SessionExamen.status.in_(['programmee', 'en_cours']),
@@ -66,12 +81,24 @@ class SessionExamenRepository(BaseRepository[SessionExamen]):
             )
         ).order_by(SessionExamen.date_debut).all()
 
-    def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> tuple[List[SessionExamen], int]:
-        """Récupère les sessions avec pagination et filtres"""
-        # Charger le QCM et sa relation matiere_obj en une seule requête
-        query = self.session.query(SessionExamen).options(
-            joinedload(SessionExamen.qcm).joinedload(QCM.matiere_obj)
-        )
+    def get_terminees_depuis(self, date_limite: datetime) -> List[SessionExamen]:
+        """
+        Récupère les sessions terminées dont la date de fin est postérieure à date_limite
+        Le QCM et la classe (avec son niveau) sont chargés dans la même requête
+        """
+        return self.session.query(SessionExamen).options(
+            joinedload(SessionExamen.qcm).joinedload(QCM.matiere_obj),
+            joinedload(SessionExamen.classe).joinedload(Classe.niveau)
+        ).filter(
+            and_(
+                SessionExamen.status == 'terminee',
+                SessionExamen.date_fin >= date_limite
+            )
+        ).order_by(SessionExamen.date_fin.desc()).all()
+
+    def _query_liste(self, filters: Optional[Dict[str, Any]] = None) -> Query:
+        """Requête des sessions filtrée (status, qcm_id, classe_id, createur_id, search)"""
+        query = self.session.query(SessionExamen)
 
         if filters:
             if 'status' in filters and filters['status']:
@@ -95,6 +122,13 @@ class SessionExamenRepository(BaseRepository[SessionExamen]):
                     )
                 )
 
+        return query
+
+    def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> tuple[List[SessionExamen], int]:
+        """Récupère les sessions avec pagination et filtres"""
+        # Charger le QCM, sa matière et les entités référencées en une seule requête
+        query = self._query_liste(filters).options(*self.OPTIONS_LISTE)
+
         total = query.count()
         sessions = query.order_by(SessionExamen.date_debut.desc()).offset(skip).limit(limit).all()
 
@@ -106,3 +140,12 @@ class SessionExamenRepository(BaseRepository[SessionExamen]):
         return self.session.query(SessionExamen).filter(
             SessionExamen.titre.ilike(search_term)
         ).all()
+
+    def count_participants_by_session(self, session_ids: List[str]) -> Dict[str, int]:
+        """Compte les résultats de plusieurs sessions en une requête groupée {session_id: nombre}"""
+        if not session_ids:
+            return {}
+        lignes = self.session.query(Resultat.session_id, func.count(Resultat.id)).filter(
+            Resultat.session_id.in_(session_ids)
+        ).group_by(Resultat.session_id).all()
+        return {session_id: nombre for session_id, nombre in lignes}
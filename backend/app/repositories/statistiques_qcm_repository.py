@@ -0,0 +1,178 @@
+"""
+Repository pour les agrégats de statistiques des QCM
+"""
+from datetime import datetime
+from typing import List, Optional, Dict, Tuple
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import joinedload
+from app.repositories.base_repository import BaseRepository
+from app.models.statistiques_qcm import StatistiquesQCM, StatistiquesQuestion
+from app.models.resultat import Resultat
+from app.models.reponse_resultat import ReponseResultat
+
+
+class StatistiquesQCMRepository(BaseRepository[StatistiquesQCM]):
+    """Repository pour les opérations sur les agrégats de statistiques"""
+
+    def __init__(self):
+        super().__init__(StatistiquesQCM)
+
+    def get_by_qcm(self, qcm_id: str, verrouiller: bool = False) -> Optional[StatistiquesQCM]:
+        """Récupère les agrégats d'un QCM (verrou de ligne optionnel pour une mise à jour)"""
+        query = self.session.query(StatistiquesQCM).filter(StatistiquesQCM.qcm_id == qcm_id)
+        if verrouiller:
+            query = query.with_for_update()
+        return query.first()
+
+    def get_or_create_by_qcm(self, qcm_id: str) -> StatistiquesQCM:
+        """Récupère (verrouillés) ou crée les agrégats d'un QCM, sans commit"""
+        stats = self.get_by_qcm(qcm_id, verrouiller=True)
+        if not stats:
+            stats = StatistiquesQCM(
+                qcm_id=qcm_id,
+                nombre_soumissions=0,
+                nombre_etudiants_uniques=0,
+                nombre_reussis=0,
+                nombre_notes=0,
+                somme_notes=0.0,
+                nombre_pourcentages=0,
+                somme_pourcentages=0.0,
+                nombre_durees=0,
+                somme_durees=0.0
+            )
+            self.session.add(stats)
+        return stats
+
+    def creer_si_absent(self, qcm_id: str) -> None:
+        """
+        Crée des agrégats vides pour un QCM s'ils n'existent pas (INSERT ... ON CONFLICT DO NOTHING)
+        Deux créations concurrentes ne se heurtent pas sur la clé primaire: la seconde attend la
+        première et n'insère rien. Sans commit.
+        """
+        dialecte = self.session.get_bind().dialect.name
+        if dialecte == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecte
+        elif dialecte == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecte
+        else:
+            self.get_or_create_by_qcm(qcm_id)
+            self.session.flush()
+            return
+
+        self.session.execute(insert_dialecte(StatistiquesQCM.__table__).values(
+            qcm_id=qcm_id,
+            nombre_soumissions=0,
+            nombre_etudiants_uniques=0,
+            nombre_reussis=0,
+            nombre_notes=0,
+            somme_notes=0.0,
+            nombre_pourcentages=0,
+            somme_pourcentages=0.0,
+            nombre_durees=0,
+            somme_durees=0.0,
+            updated_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=['qcm_id']))
+
+    def get_questions_by_qcm(self, qcm_id: str, verrouiller: bool = False) -> Dict[str, StatistiquesQuestion]:
+        """Récupère les agrégats des questions d'un QCM indexés par question_id"""
+        query = self.session.query(StatistiquesQuestion).filter(StatistiquesQuestion.qcm_id == qcm_id)
+        if verrouiller:
+            query = query.with_for_update()
+        return {s.question_id: s for s in query.all()}
+
+    def create_question(self, question_id: str, qcm_id: str) -> StatistiquesQuestion:
+        """Crée les agrégats d'une question, sans commit"""
+        stats = StatistiquesQuestion(
+            question_id=question_id,
+            qcm_id=qcm_id,
+            nombre_reponses=0,
+            nombre_correctes=0
+        )
+        self.session.add(stats)
+        return stats
+
+    def count_autres_soumissions_etudiant(self, qcm_id: str, etudiant_id: str, resultat_id: str) -> int:
+        """Compte les autres résultats terminés d'un étudiant pour un QCM"""
+        return self.session.query(func.count(Resultat.id)).filter(
+            and_(
+                Resultat.qcm_id == qcm_id,
+                Resultat.etudiant_id == etudiant_id,
+                Resultat.status == 'termine',
+                Resultat.id != resultat_id
+            )
+        ).scalar() or 0
+
+    def count_autres_soumissions(self, qcm_id: str, resultat_id: str) -> int:
+        """Compte les autres résultats terminés d'un QCM"""
+        return self.session.query(func.count(Resultat.id)).filter(
+            and_(
+                Resultat.qcm_id == qcm_id,
+                Resultat.status == 'termine',
+                Resultat.id != resultat_id
+            )
+        ).scalar() or 0
+
+    def get_bornes_notes(self, qcm_id: str) -> Tuple[Optional[float], Optional[float]]:
+        """Recalcule la note min et max des résultats terminés d'un QCM"""
+        note_min, note_max = self.session.query(
+            func.min(Resultat.note_sur_20),
+            func.max(Resultat.note_sur_20)
+        ).filter(
+            and_(
+                Resultat.qcm_id == qcm_id,
+                Resultat.status == 'termine'
+            )
+        ).one()
+        return note_min, note_max
+
+    def get_notes_resultats(self, qcm_id: str):
+        """Colonnes utiles aux agrégats des résultats terminés d'un QCM (itérées par lots)"""
+        return self.session.query(
+            Resultat.etudiant_id,
+            Resultat.note_sur_20,
+            Resultat.pourcentage,
+            Resultat.duree_reelle_secondes
+        ).filter(
+            and_(
+                Resultat.qcm_id == qcm_id,
+                Resultat.status == 'termine'
+            )
+        ).yield_per(500)
+
+    def agreger_reponses(self, qcm_id: str) -> List[Tuple[str, Optional[str], int, int]]:
+        """
+        Agrège en SQL les réponses des résultats terminés d'un QCM
+        Returns:
+            Lignes (question_id, réponse JSON, nombre de réponses, nombre de réponses correctes)
+        """
+        return self.session.query(
+            ReponseResultat.question_id,
+            ReponseResultat.reponse,
+            func.count(),
+            func.sum(case((ReponseResultat.correct.is_(True), 1), else_=0))
+        ).join(
+            Resultat, Resultat.id == ReponseResultat.resultat_id
+        ).filter(
+            and_(
+                Resultat.qcm_id == qcm_id,
+                Resultat.status == 'termine'
+            )
+        ).group_by(ReponseResultat.question_id, ReponseResultat.reponse).all()
+
+    def get_derniers_resultats(self, qcm_id: str, limit: int = 50) -> List[Resultat]:
+        """Récupère les derniers résultats terminés d'un QCM"""
+        return self.session.query(Resultat).options(
+            joinedload(Resultat.etudiant)
+        ).filter(
+            and_(
+                Resultat.qcm_id == qcm_id,
+                Resultat.status == 'termine'
+            )
+        ).order_by(Resultat.created_at.desc()).limit(limit).all()
+
+    def delete_by_qcm(self, qcm_id: str) -> None:
+        """Supprime les agrégats d'un QCM et de ses questions, sans commit"""
+        self.session.query(StatistiquesQuestion).filter(
+            StatistiquesQuestion.qcm_id == qcm_id).delete()
+        self.session.query(StatistiquesQCM).filter(
+            StatistiquesQCM.qcm_id == qcm_id).delete()
@@ -3,30 +3,21 @@ Repository pour la gestion des utilisateurs
 """
 from typing import List, Optional, Dict, Any
 from sqlalchemy import or_
+from sqlalchemy.orm import Query
 from app.repositories.base_repository import BaseRepository
 from app.models.user import User, UserRole
 
 
 class UserRepository(BaseRepository[User]):
     """Repository pour les opérations sur les utilisateurs"""
+
+    COLONNES_RECHERCHE = ('email', 'name')
     
     def __init__(self):
         super().__init__(User)
     
-    def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None, sort_by: str = 'created_at', sort_order: str = 'desc') -> tuple[List[User], int]:
-        """
-        Récupère les utilisateurs avec pagination et filtres
-        
-        Args:
-            skip: Nombre d'éléments à sauter
-            limit: Nombre maximum d'éléments à retourner
-            filters: Dictionnaire de filtres (role, search, etc.)
-            sort_by: Colonne de tri (email, name, created_at, role)
-            sort_order: Ordre de tri (asc, desc)
-        
-        Returns:
-            Tuple (liste d'utilisateurs, total count)
-        """
+    def _query_liste(self, filters: Optional[Dict[str, Any]] = None) -> Query:
+        """Requête des utilisateurs filtrée (role, search, active, user_status)"""
         query = self.session.query(User)
         
         if filters:
@@ -55,7 +46,25 @@ class UserRepository(BaseRepository[User]):
                     query = query.filter(User.is_active == True)
                 elif filters['user_status'] == 'pending':
                     query = query.filter(User.is_active == False)
+
+        return query
+
+    def get_all_paginated(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None, sort_by: str = 'created_at', sort_order: str = 'desc') -> tuple[List[User], int]:
+        """
+        Récupère les utilisateurs avec pagination et filtres
         
+        Args:
+            skip: Nombre d'éléments à sauter
+            limit: Nombre maximum d'éléments à retourner
+            filters: Dictionnaire de filtres (role, search, etc.)
+            sort_by: Colonne de tri (email, name, created_at, role)
+            sort_order: Ordre de tri (asc, desc)
+        
+        Returns:
+            Tuple (liste d'utilisateurs, total count)
+        """
+        query = self._query_liste(filters)
+
         # Compter le total avant pagination
         total = query.count()
         
@@ -79,15 +88,9 @@ class UserRepository(BaseRepository[User]):
         """Récupère tous les utilisateurs d'un rôle donné"""
         return self.session.query(User).filter(User.role == role).all()
     
-    def search_by_email_or_name(self, query: str) -> List[User]:
-        """Recherche des utilisateurs par email ou nom"""
-        search_term = f"%{query}%"
-        return self.session.query(User).filter(
-            or_(
-                User.email.ilike(search_term),
-                User.name.ilike(search_term)
-            )
-        ).all()
+    def search_by_email_or_name(self, query: str, limit: Optional[int] = None) -> List[User]:
+        """Recherche des utilisateurs par email ou nom (résultats classés, au plus limit)"""
+        return self.rechercher(query, limit=limit)
     
     def update_role(self, user_id: str, new_role: UserRole) -> Optional[User]:
         """Met à jour le rôle d'un utilisateur"""
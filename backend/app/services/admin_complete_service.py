@@ -9,6 +9,7 @@ from app.repositories.classe_repository import ClasseRepository
 from app.repositories.qcm_repository import QCMRepository
 from app.repositories.session_examen_repository import SessionExamenRepository
 from app.repositories.resultat_repository import ResultatRepository
+from app.services.list_serializer import ListSerializer
 from app.models.user import User, UserRole
 from app.models.associations import (
     etudiant_niveaux, etudiant_classes, etudiant_matieres,
@@ -29,6 +30,7 @@ class AdminCompleteService:
         self.qcm_repo = QCMRepository()
         self.session_repo = SessionExamenRepository()
         self.resultat_repo = ResultatRepository()
+        self.list_serializer = ListSerializer()
 
     # ========================
     # Gestion des Étudiants
@@ -443,7 +445,15 @@ class AdminCompleteService:
         sessions, total = self.session_repo.get_all_paginated(
             skip=skip, limit=limit, filters=filters
         )
-        return [s.to_dict() for s in sessions], total
+        return self.list_serializer.sessions(sessions), total
+
+    def get_sessions_admin_curseur(self, filters: Optional[Dict] = None, limit: int = 100,
+                                   curseur: Optional[str] = None,
+                                   avec_total: bool = False) -> Tuple[List[Dict], Optional[str], Optional[int]]:
+        """Récupère une page de sessions par curseur (accès admin)"""
+        sessions, curseur_suivant, total = self.session_repo.get_all_keyset(
+            limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+        return self.list_serializer.sessions(sessions), curseur_suivant, total
 
     def update_session_admin(self, session_id: str, data: Dict[str, Any]) -> Dict:
         """Met à jour une session (accès admin complet)"""
@@ -487,6 +497,14 @@ class AdminCompleteService:
         )
         return [r.to_dict(include_details=True) for r in resultats], total
 
+    def get_resultats_admin_curseur(self, filters: Optional[Dict] = None, limit: int = 100,
+                                    curseur: Optional[str] = None,
+                                    avec_total: bool = False) -> Tuple[List[Dict], Optional[str], Optional[int]]:
+        """Récupère une page de résultats par curseur (accès admin)"""
+        resultats, curseur_suivant, total = self.resultat_repo.get_all_keyset(
+            limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+        return [r.to_dict(include_details=True) for r in resultats], curseur_suivant, total
+
     def update_resultat_admin(self, resultat_id: str, data: Dict[str, Any]) -> Dict:
         """Met à jour un résultat (accès admin pour validation/invalidation)"""
         resultat = self.resultat_repo.get_by_id(resultat_id)
@@ -512,7 +530,9 @@ class AdminCompleteService:
         if not resultat:
             raise ValueError("Résultat : identifiant invalide ou résultat non trouvé")
 
+        from app.services.statistiques_qcm_service import StatistiquesQCMService
         db.session.delete(resultat)
+        StatistiquesQCMService().retirer_resultat(resultat)
         db.session.commit()
         return True
 
@@ -4,6 +4,7 @@ Service pour les statistiques d'administration
 from typing import Dict, Any, List
 from app.repositories.user_repository import UserRepository
 from app.repositories.qcm_repository import QCMRepository
+from app.services.list_serializer import ListSerializer
 from app.repositories.question_repository import QuestionRepository
 
 
@@ -14,6 +15,7 @@ class AdminStatisticsService:
         self.user_repo = UserRepository()
         self.qcm_repo = QCMRepository()
         self.question_repo = QuestionRepository()
+        self.list_serializer = ListSerializer()
 
     def get_dashboard_metrics(self) -> Dict[str, Any]:
         """
@@ -82,7 +84,7 @@ class AdminStatisticsService:
             Liste de QCM (dict)
         """
         qcms = self.qcm_repo.get_recent_qcms(limit=limit)
-        return [qcm.to_dict() for qcm in qcms]
+        return self.list_serializer.qcms(qcms)
 
     def get_full_dashboard_stats(self) -> Dict[str, Any]:
         """
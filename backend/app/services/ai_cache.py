@@ -0,0 +1,155 @@
+"""
+Cache persistant des questions générées par l'IA
+
+Les entrées sont adressées par le contenu: la clé est un hash SHA-256 du texte nettoyé,
+des paramètres de génération, du modèle et de la version du prompt. Le stockage est un
+fichier SQLite partagé entre les threads de l'application et les workers Celery.
+Éviction LRU (date du dernier accès) bornée par un nombre d'entrées, et expiration (TTL).
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import List, Dict, Any, Optional
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+# Exportés par l'instance PrometheusMetrics de l'application (registre par défaut)
+CACHE_QUESTIONS_REQUETES = Counter(
+    'ai_questions_cache_requests_total',
+    'Consultations du cache de questions IA',
+    ['resultat']
+)
+CACHE_QUESTIONS_EVICTIONS = Counter(
+    'ai_questions_cache_evictions_total',
+    'Entrées retirées du cache de questions IA (LRU ou expiration)'
+)
+
+
+def cle_cache_questions(text: str, parametres: Dict[str, Any], modele: str, version_prompt: str) -> str:
+    """Calcule la clé de cache d'une génération de questions"""
+    contenu = json.dumps({
+        'text': text.strip(),
+        'parametres': parametres,
+        'modele': modele,
+        'version_prompt': version_prompt
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+class QuestionsCache:
+    """Cache clé -> liste de questions validées, stocké dans un fichier SQLite"""
+
+    def __init__(self, chemin: Optional[str] = None, max_entrees: Optional[int] = None,
+                 ttl_secondes: Optional[int] = None, actif: Optional[bool] = None):
+        self.chemin = chemin or os.getenv(
+            'AI_QUESTIONS_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'ai_questions_cache.sqlite3'))
+        self.max_entrees = max_entrees or int(os.getenv('AI_QUESTIONS_CACHE_MAX_ENTRIES', '500'))
+        self.ttl_secondes = ttl_secondes or int(os.getenv('AI_QUESTIONS_CACHE_TTL_HOURS', '168')) * 3600
+        if actif is None:
+            actif = os.getenv('AI_QUESTIONS_CACHE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+        self.actif = actif
+        self.lock = threading.Lock()
+        self._initialise = False
+
+    def _connexion(self) -> sqlite3.Connection:
+        """Ouvre une connexion (une par opération: utilisable depuis plusieurs threads/processus)"""
+        connexion = sqlite3.connect(self.chemin, timeout=5)
+        if not self._initialise:
+            connexion.execute(
+                'CREATE TABLE IF NOT EXISTS questions_cache ('
+                ' cle TEXT PRIMARY KEY,'
+                ' questions TEXT NOT NULL,'
+                ' cree_le REAL NOT NULL,'
+                ' dernier_acces REAL NOT NULL)'
+            )
+            connexion.execute(
+                'CREATE INDEX IF NOT EXISTS idx_questions_cache_dernier_acces'
+                ' ON questions_cache (dernier_acces)'
+            )
+            connexion.commit()
+            self._initialise = True
+        return connexion
+
+    def get(self, cle: str) -> Optional[List[Dict[str, Any]]]:
+        """Retourne les questions en cache (None si absentes ou expirées)"""
+        if not self.actif:
+            return None
+        try:
+            with self.lock:
+                connexion = self._connexion()
+                try:
+                    maintenant = time.time()
+                    ligne = connexion.execute(
+                        'SELECT questions, cree_le FROM questions_cache WHERE cle = ?', (cle,)
+                    ).fetchone()
+                    if ligne and maintenant - ligne[1] > self.ttl_secondes:
+                        connexion.execute('DELETE FROM questions_cache WHERE cle = ?', (cle,))
+                        connexion.commit()
+                        CACHE_QUESTIONS_EVICTIONS.inc()
+                        ligne = None
+                    if ligne:
+                        connexion.execute(
+                            'UPDATE questions_cache SET dernier_acces = ? WHERE cle = ?', (maintenant, cle))
+                        connexion.commit()
+                finally:
+                    connexion.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache questions IA indisponible (lecture): {e}")
+            CACHE_QUESTIONS_REQUETES.labels(resultat='erreur').inc()
+            return None
+
+        if not ligne:
+            CACHE_QUESTIONS_REQUETES.labels(resultat='miss').inc()
+            return None
+        CACHE_QUESTIONS_REQUETES.labels(resultat='hit').inc()
+        return json.loads(ligne[0])
+
+    def set(self, cle: str, questions: List[Dict[str, Any]]) -> None:
+        """Enregistre des questions validées puis applique l'expiration et la borne LRU"""
+        if not self.actif:
+            return
+        try:
+            with self.lock:
+                connexion = self._connexion()
+                try:
+                    maintenant = time.time()
+                    connexion.execute(
+                        'INSERT OR REPLACE INTO questions_cache (cle, questions, cree_le, dernier_acces)'
+                        ' VALUES (?, ?, ?, ?)',
+                        (cle, json.dumps(questions, ensure_ascii=False), maintenant, maintenant)
+                    )
+                    expirees = connexion.execute(
+                        'DELETE FROM questions_cache WHERE cree_le < ?',
+                        (maintenant - self.ttl_secondes,)
+                    ).rowcount
+                    excedent = connexion.execute(
+                        'DELETE FROM questions_cache WHERE cle IN ('
+                        ' SELECT cle FROM questions_cache ORDER BY dernier_acces DESC LIMIT -1 OFFSET ?)',
+                        (self.max_entrees,)
+                    ).rowcount
+                    connexion.commit()
+                finally:
+                    connexion.close()
+            if expirees + excedent:
+                CACHE_QUESTIONS_EVICTIONS.inc(expirees + excedent)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache questions IA indisponible (écriture): {e}")
+
+    def clear(self) -> None:
+        """Vide le cache"""
+        try:
+            with self.lock:
+                connexion = self._connexion()
+                try:
+                    connexion.execute('DELETE FROM questions_cache')
+                    connexion.commit()
+                finally:
+                    connexion.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache questions IA indisponible (vidage): {e}")
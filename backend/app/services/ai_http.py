@@ -0,0 +1,269 @@
+"""
+Couche HTTP des appels aux modèles IA (Hugging Face)
+
+- Une session requests partagée par processus: pool de connexions par hôte et keep-alive,
+  la poignée de main TCP + TLS n'est faite qu'une fois par connexion du pool.
+- Attente entre tentatives: backoff exponentiel avec gigue (full jitter), l'en-tête
+  Retry-After renvoyé par l'API est respecté.
+- Disjoncteur par modèle: un modèle ayant répondu 410 (retiré) ou 503 (indisponible
+  après toutes les tentatives) n'est plus sollicité pendant une durée configurable.
+- Histogrammes Prometheus des durées d'appel par modèle, et latences récentes en mémoire
+  (percentiles: délai de relance de la génération "hedged" d'AIService).
+- Annulation: AnnulationRequetes ferme les réponses en streaming en cours de lecture dès
+  qu'elle est levée (appels perdants d'une course entre modèles).
+"""
+import os
+import time
+import random
+import logging
+import math
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Any
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Exportés par l'instance PrometheusMetrics de l'application (registre par défaut)
+AI_HTTP_DUREE = Histogram(
+    'ai_http_request_duration_seconds',
+    'Durée des appels HTTP aux modèles IA',
+    ['modele', 'statut'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+AI_HTTP_DISJONCTEUR = Counter(
+    'ai_http_circuit_open_total',
+    'Ouvertures du disjoncteur d\'un modèle IA',
+    ['modele', 'statut']
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session_http() -> requests.Session:
+    """Session HTTP partagée par les threads du processus (créée au premier appel)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                taille_pool = int(os.getenv('AI_HTTP_POOL_SIZE', '10'))
+                session = requests.Session()
+                # Pas de nouvelle tentative au niveau urllib3: elles sont gérées par ClientHTTPIA
+                adaptateur = HTTPAdapter(pool_connections=4, pool_maxsize=taille_pool, max_retries=0)
+                session.mount('https://', adaptateur)
+                session.mount('http://', adaptateur)
+                _session = session
+    return _session
+
+
+def fermer_session_http() -> None:
+    """Ferme la session partagée et ses connexions (recréée au prochain appel)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def lire_retry_after(valeur: Optional[str]) -> Optional[float]:
+    """Délai (secondes) indiqué par un en-tête Retry-After (nombre de secondes ou date HTTP)"""
+    if not valeur:
+        return None
+    valeur = valeur.strip()
+    try:
+        return max(0.0, float(valeur))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(valeur)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def delai_backoff(tentative: int, base: float, plafond: float, retry_after: Optional[float] = None) -> float:
+    """
+    Délai avant la tentative suivante
+
+    Backoff exponentiel avec gigue complète: uniforme dans [0, min(plafond, base * 2^tentative)].
+    Un Retry-After explicite est prioritaire (borné par le plafond).
+    """
+    if retry_after is not None:
+        return min(retry_after, plafond)
+    return random.uniform(0, min(plafond, base * (2 ** tentative)))
+
+
+class DisjoncteurModeles:
+    """Disjoncteur par modèle, partagé entre les instances d'AIService (thread-safe)"""
+
+    def __init__(self, durees: Optional[Dict[int, float]] = None):
+        self.durees = durees or {
+            410: float(os.getenv('AI_CIRCUIT_410_SECONDS', '3600')),
+            503: float(os.getenv('AI_CIRCUIT_503_SECONDS', '120')),
+        }
+        self.lock = threading.Lock()
+        self._ouverts: Dict[str, float] = {}  # modele -> fin de l'ouverture (time.monotonic)
+
+    def est_ouvert(self, modele: str) -> bool:
+        """Le modèle est-il à éviter ? (à l'échéance, une nouvelle tentative est autorisée)"""
+        with self.lock:
+            fin = self._ouverts.get(modele)
+            if fin is None:
+                return False
+            if time.monotonic() >= fin:
+                del self._ouverts[modele]
+                return False
+            return True
+
+    def ouvrir(self, modele: str, statut: int) -> None:
+        """Ouvre le disjoncteur d'un modèle après une réponse 410 ou 503"""
+        duree = self.durees.get(statut)
+        if not duree:
+            return
+        with self.lock:
+            self._ouverts[modele] = time.monotonic() + duree
+        AI_HTTP_DISJONCTEUR.labels(modele=modele, statut=str(statut)).inc()
+        logger.warning(f"Modèle {modele} écarté pendant {duree:.0f}s (HTTP {statut})")
+
+    def fermer(self, modele: str) -> None:
+        """Referme le disjoncteur d'un modèle (réponse réussie)"""
+        with self.lock:
+            self._ouverts.pop(modele, None)
+
+    def filtrer(self, modeles: List[str]) -> List[str]:
+        """
+        Modèles dont le disjoncteur est fermé, dans l'ordre donné
+        Si tous sont écartés, la liste complète est retournée plutôt que d'échouer sans essayer.
+        """
+        disponibles = [m for m in modeles if not self.est_ouvert(m)]
+        if not disponibles and modeles:
+            logger.warning("Tous les modèles IA sont écartés par le disjoncteur, nouvel essai de tous les modèles")
+            return list(modeles)
+        return disponibles
+
+    def reinitialiser(self) -> None:
+        """Referme tous les disjoncteurs"""
+        with self.lock:
+            self._ouverts.clear()
+
+
+class LatencesModeles:
+    """Durées des derniers appels réussis par modèle (fenêtre glissante), pour les percentiles"""
+
+    def __init__(self, taille: int = 200, minimum: int = 5):
+        self.taille = taille
+        self.minimum = minimum  # Échantillons requis avant d'estimer un percentile
+        self.lock = threading.Lock()
+        self._durees: Dict[str, deque] = {}
+
+    def enregistrer(self, modele: str, duree: float) -> None:
+        with self.lock:
+            self._durees.setdefault(modele, deque(maxlen=self.taille)).append(duree)
+
+    def percentile(self, modele: str, p: float) -> Optional[float]:
+        """Percentile p (0-1) des durées récentes du modèle (None si trop peu d'échantillons)"""
+        with self.lock:
+            durees = sorted(self._durees.get(modele, ()))
+        if len(durees) < self.minimum:
+            return None
+        return durees[min(len(durees) - 1, max(0, math.ceil(p * len(durees)) - 1))]
+
+    def vider(self) -> None:
+        with self.lock:
+            self._durees.clear()
+
+
+# Instances partagées du processus
+disjoncteur_modeles = DisjoncteurModeles()
+latences_modeles = LatencesModeles()
+
+
+class AnnulationRequetes(threading.Event):
+    """
+    Événement d'annulation qui ferme aussi les réponses en streaming suivies
+
+    Lever l'événement ferme la connexion des réponses en cours de lecture: le thread bloqué
+    dans la lecture est interrompu et le fournisseur cesse de générer. Un appel qui attend
+    encore les en-têtes de sa réponse n'est pas interrompu (requests ne le permet pas); il
+    s'arrête dès leur réception.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock_reponses = threading.Lock()
+        self._reponses: List[requests.Response] = []
+
+    def suivre(self, response: requests.Response) -> bool:
+        """Ferme la réponse à l'annulation; False (réponse fermée) si l'annulation est déjà levée"""
+        with self._lock_reponses:
+            if not self.is_set():
+                self._reponses.append(response)
+                return True
+        response.close()
+        return False
+
+    def oublier(self, response: requests.Response) -> None:
+        with self._lock_reponses:
+            if response in self._reponses:
+                self._reponses.remove(response)
+
+    def set(self) -> None:
+        with self._lock_reponses:
+            super().set()
+            reponses, self._reponses = self._reponses, []
+        for response in reponses:
+            try:
+                response.close()
+            except Exception as e:
+                logger.debug(f"Fermeture d'une réponse annulée: {e}")
+
+
+class ClientHTTPIA:
+    """Envoi des requêtes aux modèles IA sur la session partagée, avec mesure et backoff"""
+
+    def __init__(self, disjoncteur: Optional[DisjoncteurModeles] = None):
+        self.disjoncteur = disjoncteur or disjoncteur_modeles
+        self.backoff_base = float(os.getenv('AI_HTTP_BACKOFF_BASE_SECONDS', '1'))
+        self.backoff_max = float(os.getenv('AI_HTTP_BACKOFF_MAX_SECONDS', '30'))
+
+    def post(self, url: str, modele: str, **kwargs: Any) -> requests.Response:
+        """
+        POST sur la session partagée; la durée est enregistrée par modèle et par statut
+        Une réponse en streaming (stream=True) n'alimente pas latences_modeles: la durée
+        mesurée s'arrête aux en-têtes, pas à la fin de la génération.
+        """
+        debut = time.perf_counter()
+        statut = 'erreur'
+        try:
+            response = session_http().post(url, **kwargs)
+            statut = str(response.status_code)
+            if response.ok and not kwargs.get('stream'):
+                latences_modeles.enregistrer(modele, time.perf_counter() - debut)
+            return response
+        except requests.exceptions.Timeout:
+            statut = 'timeout'
+            raise
+        finally:
+            AI_HTTP_DUREE.labels(modele=modele, statut=statut).observe(time.perf_counter() - debut)
+
+    def attendre(self, tentative: int, response: Optional[requests.Response] = None,
+                 annulation: Optional[threading.Event] = None) -> float:
+        """
+        Attend avant la tentative suivante (tentative: 0 pour la première). Retourne le délai
+        L'attente est interrompue dès que l'événement annulation est levé.
+        """
+        retry_after = lire_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        delai = delai_backoff(tentative, self.backoff_base, self.backoff_max, retry_after)
+        if delai > 0:
+            if annulation is not None:
+                annulation.wait(delai)
+            else:
+                time.sleep(delai)
+        return delai
@@ -0,0 +1,333 @@
+"""
+Récupération du JSON produit par les modèles IA
+
+Les réponses des modèles sont souvent presque du JSON: préambule et blocs ```json, virgules
+finales ou manquantes, guillemets typographiques ou simples, littéraux Python (True, None),
+clés sans guillemets, guillemets non échappés dans un énoncé, réponse tronquée par max_tokens.
+
+reparer_json() réécrit la réponse en JSON valide en un seul parcours: chaque caractère est
+lu une fois (les suites de caractères ordinaires par des expressions précompilées sans retour
+arrière), le coût est linéaire en la taille de la réponse. Une réponse tronquée est coupée
+après le dernier élément complet, puis les conteneurs ouverts sont refermés.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Suites de caractères recopiées telles quelles (classes de caractères: pas de retour arrière)
+_ESPACES = re.compile(r'[ \t\r\n]*')
+_LITTERAL = re.compile(r'[A-Za-z0-9_+\-.]+')
+_NOMBRE = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+_HEX4 = re.compile(r'[0-9a-fA-F]{4}')
+# Contenu ordinaire d'une chaîne selon son délimiteur (guillemets, backslash et contrôles exclus)
+_CONTENU_CHAINE = {
+    '"': re.compile(r'[^"\\\x00-\x1f“”]+'),
+    "'": re.compile(r'[^"\'\\\x00-\x1f“”]+'),
+    '“': re.compile(r'[^"\\\x00-\x1f“”]+'),
+}
+
+_GUILLEMETS_TYPOGRAPHIQUES = '“”„'
+_FERMANTS_CHAINE = {'"': '"', "'": "'", '“': '”"'}
+_LITTERAUX = {
+    'true': 'true', 'True': 'true', 'false': 'false', 'False': 'false',
+    'null': 'null', 'None': 'null', 'undefined': 'null', 'NaN': 'null',
+}
+_ECHAPPEMENTS_JSON = '"\\/bfnrt'
+_CONTROLES = {'\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+# Caractères pouvant suivre la fin d'une chaîne (sinon le guillemet est un guillemet non échappé)
+_APRES_CHAINE = ',:}]'
+
+
+class ErreurJSON(ValueError):
+    """Aucun JSON exploitable dans la réponse du modèle"""
+
+
+def _debut_json(texte: str) -> int:
+    """Position du conteneur racine: bloc ```json s'il existe, sinon le premier objet ou tableau"""
+    bloc = texte.find('```json')
+    depart = bloc + 7 if bloc != -1 else 0
+    accolade = texte.find('{', depart)
+    crochet = texte.find('[', depart)
+    while crochet != -1 and (accolade == -1 or crochet < accolade):
+        # Tableau racine seulement s'il contient des objets ou des chaînes (pas "[3 questions]")
+        suivant = _ESPACES.match(texte, crochet + 1).end()
+        if suivant < len(texte) and texte[suivant] in '{["]':
+            return crochet
+        crochet = texte.find('[', crochet + 1)
+    return accolade
+
+
+def _extraire_tel_quel(texte: str) -> Optional[Any]:
+    """Chemin rapide: le JSON entre le conteneur racine et sa dernière fermeture est déjà valide"""
+    debut = _debut_json(texte)
+    if debut == -1:
+        return None
+    fermeture = '}' if texte[debut] == '{' else ']'
+    fin = texte.rfind(fermeture)
+    if fin <= debut:
+        return None
+    # Fin du bloc ```json en priorité (du texte après le bloc peut contenir une accolade)
+    bloc = texte.find('```', debut)
+    if bloc != -1:
+        fin_bloc = texte.rfind(fermeture, debut, bloc)
+        if fin_bloc > debut:
+            fin = fin_bloc
+    try:
+        return json.loads(texte[debut:fin + 1])
+    except (ValueError, RecursionError):
+        return None
+
+
+class _Reparateur:
+    """Réécriture en un parcours (voir reparer_json)"""
+
+    def __init__(self, texte: str):
+        self.texte = texte
+        self.sortie: List[str] = []
+        # Pile persistante des conteneurs ouverts: (type, parent), copiée en O(1) aux points sûrs
+        self.pile: Optional[Tuple[str, Any]] = None
+        self.attend_virgule = False  # Une valeur vient de se terminer dans le conteneur courant
+        self.attend_cle = False  # Dans un objet, le prochain élément est une clé
+        self.apres_cle = False  # Une clé vient d'être écrite (les deux-points sont attendus)
+        # Par conteneur (id du noeud de pile): dernier point où la sortie, refermée, est un JSON
+        # complet, c'est-à-dire après son ouverture ou son dernier élément complet
+        self.points_surs: Dict[int, Tuple[int, Any]] = {}
+        self.racine_fermee = False
+
+    # --------------------------------------------------------------
+    # Parcours
+    # --------------------------------------------------------------
+
+    def executer(self, debut: int) -> str:
+        texte, n = self.texte, len(self.texte)
+        i = debut
+        while i < n and not self.racine_fermee:
+            c = texte[i]
+            if c in ' \t\r\n':
+                i = _ESPACES.match(texte, i).end()
+            elif c == '{' or c == '[':
+                self._avant_valeur()
+                self.sortie.append(c)
+                self.pile = (c, self.pile)
+                self.attend_virgule = False
+                self.attend_cle = c == '{'
+                self._marquer_point_sur()
+                i += 1
+            elif c == '}' or c == ']':
+                self._fermer(c)
+                i += 1
+            elif c == ',':
+                if self.pile is not None and self.attend_virgule:
+                    self.sortie.append(',')
+                    self.attend_virgule = False
+                    self.attend_cle = self.pile[0] == '{'
+                i += 1
+            elif c == ':':
+                if self.apres_cle:
+                    self.sortie.append(':')
+                    self.apres_cle = False
+                i += 1
+            elif c == '"' or c == "'" or c in _GUILLEMETS_TYPOGRAPHIQUES:
+                i, complete = self._chaine(i)
+                if not complete:
+                    break
+            elif c == '/' and texte.startswith('//', i):
+                # Commentaire de fin de ligne
+                fin = texte.find('\n', i)
+                i = n if fin == -1 else fin
+            else:
+                litteral = _LITTERAL.match(texte, i)
+                if litteral is None:
+                    i += 1  # Caractère parasite hors chaîne
+                    continue
+                self._litteral(litteral.group(0))
+                i = litteral.end()
+
+        if not self.racine_fermee:
+            self._reprendre_point_sur()
+        return ''.join(self.sortie)
+
+    def _avant_valeur(self) -> None:
+        """Ajoute la virgule ou les deux-points manquants avant un élément"""
+        if self.apres_cle:
+            self.sortie.append(':')
+            self.apres_cle = False
+        elif self.attend_virgule:
+            self.sortie.append(',')
+            self.attend_virgule = False
+            self.attend_cle = self.pile is not None and self.pile[0] == '{'
+
+    def _fin_valeur(self) -> None:
+        self.attend_virgule = True
+        self._marquer_point_sur()
+
+    def _marquer_point_sur(self) -> None:
+        self.points_surs[id(self.pile)] = (len(self.sortie), self.pile)
+
+    def _fermer(self, c: str) -> None:
+        """
+        Ferme le conteneur courant. Une fermeture qui ne correspond pas (] au lieu de }) est lue
+        comme une faute de frappe: elle ferme quand même le conteneur courant.
+        """
+        if self.pile is None:
+            return
+        type_ouvert, self.pile = self.pile
+        self._retirer_virgule_finale()
+        if self.apres_cle or self.sortie[-1] == ':':
+            # Clé sans valeur
+            self.sortie.append('null' if self.sortie[-1] == ':' else ':null')
+            self.apres_cle = False
+        self.sortie.append('}' if type_ouvert == '{' else ']')
+        if self.pile is None:
+            self.racine_fermee = True
+            return
+        self.attend_cle = False
+        self._fin_valeur()
+
+    def _retirer_virgule_finale(self) -> None:
+        if self.sortie and self.sortie[-1] == ',':
+            self.sortie.pop()
+
+    def _litteral(self, mot: str) -> None:
+        dans_objet = self.pile is not None and self.pile[0] == '{'
+        if dans_objet and (self.attend_cle or self.attend_virgule):
+            # Clé sans guillemets
+            self._avant_valeur()
+            self.sortie.append(json.dumps(mot))
+            self.attend_cle = False
+            self.apres_cle = True
+            return
+        self._avant_valeur()
+        if mot in _LITTERAUX:
+            self.sortie.append(_LITTERAUX[mot])
+        elif _NOMBRE.fullmatch(mot):
+            self.sortie.append(mot)
+        else:
+            self.sortie.append(json.dumps(mot))  # Valeur sans guillemets (ex: 1pt)
+        self._fin_valeur()
+
+    def _chaine(self, i: int) -> Tuple[int, bool]:
+        """Recopie une chaîne (délimiteurs normalisés, échappements réparés). Retourne (position, complète)"""
+        texte, n = self.texte, len(self.texte)
+        ouvrant = texte[i]
+        if ouvrant in _GUILLEMETS_TYPOGRAPHIQUES:
+            ouvrant = '“'
+        fermants = _FERMANTS_CHAINE[ouvrant]
+        contenu = _CONTENU_CHAINE[ouvrant]
+
+        est_cle = self.pile is not None and self.pile[0] == '{' and (self.attend_cle or self.attend_virgule)
+        self._avant_valeur()
+        debut_sortie = len(self.sortie)
+        self.sortie.append('"')
+        i += 1
+        while i < n:
+            ordinaire = contenu.match(texte, i)
+            if ordinaire is not None:
+                self.sortie.append(ordinaire.group(0))
+                i = ordinaire.end()
+                if i >= n:
+                    break
+            c = texte[i]
+            if c == '\\':
+                suivant = texte[i + 1] if i + 1 < n else ''
+                if suivant and suivant in _ECHAPPEMENTS_JSON:
+                    self.sortie.append('\\' + suivant)
+                    i += 2
+                elif suivant == 'u' and _HEX4.match(texte, i + 2):
+                    self.sortie.append(texte[i:i + 6])
+                    i += 6
+                elif suivant == "'":
+                    self.sortie.append("'")
+                    i += 2
+                elif not suivant:
+                    i += 1  # Échappement coupé par la troncature
+                else:
+                    self.sortie.append('\\\\')  # Backslash littéral (ex: LaTeX \alpha)
+                    i += 1
+            elif c in fermants:
+                if self._fin_de_chaine(i + 1, est_cle):
+                    self.sortie.append('"')
+                    i += 1
+                    if est_cle:
+                        self.attend_cle = False
+                        self.apres_cle = True
+                    else:
+                        self._fin_valeur()
+                    return i, True
+                # Guillemet non échappé dans le texte (ex: l'apostrophe d'une chaîne entre apostrophes)
+                self.sortie.append('\\"' if c == '"' else c)
+                i += 1
+            elif c == '"':
+                self.sortie.append('\\"')  # Guillemet droit dans une chaîne délimitée autrement
+                i += 1
+            elif c in '“”':
+                self.sortie.append(c)
+                i += 1
+            else:
+                self.sortie.append(_CONTROLES.get(c, '\\u%04x' % ord(c)))
+                i += 1
+        # Chaîne non terminée: réponse tronquée
+        del self.sortie[debut_sortie:]
+        return n, False
+
+    def _fin_de_chaine(self, i: int, est_cle: bool) -> bool:
+        """Un guillemet termine la chaîne s'il est suivi d'un séparateur, d'une fermeture ou de la fin"""
+        j = _ESPACES.match(self.texte, i).end()
+        if j >= len(self.texte):
+            return True
+        suivant = self.texte[j]
+        if suivant in _APRES_CHAINE:
+            return True
+        # Virgule oubliée entre deux éléments: "a" "b", "a" {...}
+        return suivant in '"{[' and j > i and not est_cle
+
+    def _reprendre_point_sur(self) -> None:
+        """
+        Réponse tronquée: retour au dernier élément complet du tableau ouvert le plus englobant
+        (le tableau des questions: une question incomplète est écartée en entier, pas seulement
+        ses options manquantes), à défaut de la racine, puis fermeture des conteneurs
+        """
+        ouverts = []
+        noeud = self.pile
+        while noeud is not None:
+            ouverts.append(noeud)
+            noeud = noeud[1]
+        if not ouverts:
+            raise ErreurJSON("Réponse tronquée avant le premier élément JSON")
+        ouverts.reverse()
+        cible = next((noeud for noeud in ouverts if noeud[0] == '['), ouverts[0])
+        # Les points sûrs suivent une ouverture ou une valeur complète: il suffit de refermer
+        taille, pile = self.points_surs[id(cible)]
+        del self.sortie[taille:]
+        while pile is not None:
+            type_ouvert, pile = pile
+            self.sortie.append('}' if type_ouvert == '{' else ']')
+        self.pile = None
+
+
+def reparer_json(texte: str) -> Any:
+    """
+    Décode le JSON d'une réponse de modèle, en le réparant si nécessaire
+
+    Args:
+        texte: Réponse brute du modèle
+
+    Returns:
+        Objet ou tableau décodé
+
+    Raises:
+        ErreurJSON: aucun objet ni tableau JSON exploitable
+    """
+    donnees = _extraire_tel_quel(texte)
+    if donnees is not None:
+        return donnees
+
+    debut = _debut_json(texte)
+    if debut == -1:
+        raise ErreurJSON("Aucun objet ni tableau JSON dans la réponse")
+    repare = _Reparateur(texte).executer(debut)
+    try:
+        return json.loads(repare)
+    except (ValueError, RecursionError) as e:
+        # RecursionError: imbrication trop profonde pour le décodeur (réponse dégénérée)
+        raise ErreurJSON(f"JSON irréparable: {e}") from e
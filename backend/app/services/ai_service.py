@@ -3,14 +3,107 @@ Service IA pour la génération de questions de QCM
 Utilise l'API Hugging Face Inference avec des modèles open-source
 """
 import os
-import json
 import logging
 import re
-from typing import List, Dict, Any, Optional
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Callable, Iterator
 import requests
+from app.services.ai_http import AnnulationRequetes, ClientHTTPIA, latences_modeles
+from app.services.ai_json import ErreurJSON, reparer_json
+from app.services.ai_stream import ExtracteurQuestions, lire_flux_sse
+from app.services.ai_cache import QuestionsCache, cle_cache_questions
+from app.services.commentaire_ia_pipeline import commentaire_par_defaut
+from app.services.document_parser import DocumentParser
 
 logger = logging.getLogger(__name__)
 
+# Version des templates de prompt de génération de questions
+# (à incrémenter à chaque modification de _build_prompt/_build_chat_messages pour invalider le cache)
+PROMPT_QUESTIONS_VERSION = 'questions-v1'
+
+# Estimations (en tokens) pour dimensionner les lots de commentaires
+TOKENS_PROMPT_COMMENTAIRES = 250  # Prompt système + consignes, envoyé une fois par lot
+TOKENS_ENTREE_PAR_COMMENTAIRE = 40  # Une ligne de résultat dans le prompt
+TOKENS_SORTIE_PAR_COMMENTAIRE = 80  # ~200 caractères + structure JSON
+
+
+
+class ErreurModeleIA(Exception):
+    """Échec d'un modèle après ses tentatives (le modèle suivant peut être essayé)"""
+
+
+class GenerationAnnulee(Exception):
+    """La génération a été annulée pendant le streaming de la réponse"""
+
+
+def _cle_enonce(enonce: str) -> str:
+    """Énoncé normalisé pour le dédoublonnage (casse, ponctuation et espaces ignorés)"""
+    return " ".join(re.sub(r'[^\w\s]', ' ', enonce.casefold()).split())
+
+
+class _CollecteQuestions:
+    """Questions reçues en streaming: validées et dédoublonnées une à une (thread-safe)"""
+
+    def __init__(self, service: 'AIService', on_question: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.service = service
+        self.on_question = on_question
+        self.lock = threading.Lock()
+        self.vues = set()
+        self.par_partie: Dict[int, List[Dict[str, Any]]] = {}
+        self.debut = time.perf_counter()
+
+    def ajouter(self, question: Any, partie: int = 0) -> bool:
+        """Valide une question et la transmet si elle est nouvelle. Retourne True si elle est retenue"""
+        try:
+            validee = self.service._validate_questions({'questions': [question]})[0]
+        except (ValueError, TypeError, AttributeError):
+            return False
+
+        cle = _cle_enonce(validee['enonce'])
+        with self.lock:
+            if cle in self.vues:
+                return False
+            self.vues.add(cle)
+            self.par_partie.setdefault(partie, []).append(validee)
+            nombre = sum(len(questions) for questions in self.par_partie.values())
+        if nombre == 1:
+            logger.info(f"Première question validée après {time.perf_counter() - self.debut:.1f}s")
+        if self.on_question:
+            self.on_question(validee)
+        return True
+
+    def questions_ordonnees(self) -> List[Dict[str, Any]]:
+        """Questions retenues dans l'ordre du document"""
+        with self.lock:
+            return [question for partie in sorted(self.par_partie) for question in self.par_partie[partie]]
+
+
+def _repartir_questions(tailles: List[int], total: int) -> List[int]:
+    """
+    Répartit total questions entre des parties proportionnellement à leur taille
+
+    S'il y a plus de parties que de questions, une question est attribuée à des parties
+    réparties uniformément dans le document plutôt qu'aux premières.
+    """
+    nombre = len(tailles)
+    if total <= 0 or nombre == 0:
+        return [0] * nombre
+    if total < nombre:
+        repartition = [0] * nombre
+        for i in range(total):
+            repartition[int((i + 0.5) * nombre / total)] = 1
+        return repartition
+
+    somme = sum(tailles) or nombre
+    parts = [total * (t or 1) / somme for t in tailles]
+    repartition = [int(p) for p in parts]
+    restes = sorted(range(nombre), key=lambda i: parts[i] - repartition[i], reverse=True)
+    for i in restes[:total - sum(repartition)]:
+        repartition[i] += 1
+    return repartition
+
 
 class AIService:
     """Service pour générer des questions de QCM avec l'IA"""
@@ -65,6 +158,27 @@ class AIService:
         self.max_retries = 3
         self.timeout = 60
 
+        # Session HTTP partagée (keep-alive), backoff et disjoncteur par modèle (voir ai_http)
+        self.http = ClientHTTPIA()
+
+        # Génération "hedged" (optionnelle): sans réponse du modèle principal après le délai
+        # de relance (percentile de ses latences récentes), le modèle suivant est lancé en parallèle
+        self.hedging = os.getenv('AI_HEDGED_GENERATION', 'false').lower() in ('true', '1', 'yes')
+        self.hedge_percentile = float(os.getenv('AI_HEDGE_PERCENTILE', '0.95'))
+        self.hedge_delai_defaut = float(os.getenv('AI_HEDGE_DEFAULT_DELAY_SECONDS', '20'))
+        self.hedge_max_modeles = int(os.getenv('AI_HEDGE_MAX_MODELS', '3'))
+
+        # Découpage des textes longs et parallélisme de la génération par parties
+        self.chunk_max_chars = int(os.getenv('AI_GENERATION_CHUNK_CHARS', '8000'))
+        self.max_workers = int(os.getenv('AI_GENERATION_MAX_WORKERS', '4'))
+
+        # Cache persistant des questions générées (voir ai_cache)
+        self.questions_cache = QuestionsCache()
+
+        # Budget de tokens d'une requête de commentaires groupés (entrée + sortie)
+        self.commentaires_budget_tokens = int(
+            os.getenv('HF_COMMENTAIRES_BUDGET_TOKENS', '3500'))
+
     def _build_prompt(self, text: str, num_questions: int, matiere: Optional[str] = None,
                       niveau: Optional[str] = None, mention: Optional[str] = None,
                       parcours: Optional[str] = None) -> str:
@@ -199,15 +313,35 @@ Génère maintenant les {num_questions} questions:"""
             {"role": "user", "content": user_prompt}
         ]
 
-    def _call_huggingface_api_with_messages(self, messages: list, model_override: Optional[str] = None, num_questions: int = 10) -> str:
-        """
-        Appelle l'API Chat Completions avec des messages (format conversationnel)
+    def _modeles_a_essayer(self, modele: Optional[str] = None) -> List[str]:
+        """Modèle demandé (ou modèle par défaut) suivi des modèles de secours, sans doublon"""
+        modeles = []
+        for nom in [modele or self.model, self.model] + self.fallback_models:
+            if nom and nom not in modeles:
+                modeles.append(nom)
+        return modeles
 
-        Args:
-            messages: Liste de messages au format conversationnel
-            model_override: Modèle à utiliser (pour fallback)
-            num_questions: Nombre de questions à générer (pour calculer max_tokens)
-        """
+    def _payload_chat(self, messages: list, num_questions: int = 10, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Corps d'une requête Chat Completions (le modèle est ajouté à chaque appel)"""
+        # Calculer max_tokens en fonction du nombre de questions
+        # Environ 200 tokens par question (énoncé + 4 options + explication)
+        if max_tokens is None:
+            estimated_tokens = num_questions * 200 + 100  # +100 pour le format JSON
+            max_tokens = min(max(estimated_tokens, 1024),
+                             4096)  # Entre 1024 et 4096
+
+        logger.debug(
+            f"max_tokens calculé: {max_tokens} pour {num_questions} questions")
+
+        return {
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": 0.7,
+            "top_p": 0.9
+        }
+
+    def _verifier_token(self) -> None:
+        """Lève une erreur explicite si le token Hugging Face n'est pas configuré"""
         if not self.api_token:
             raise ValueError(
                 "HF_API_TOKEN n'est pas configuré. "
@@ -215,129 +349,234 @@ Génère maintenant les {num_questions} questions:"""
                 "Obtenez un token sur: https://huggingface.co/settings/tokens"
             )
 
+    def _call_huggingface_api_with_messages(self, messages: list, model_override: Optional[str] = None, num_questions: int = 10,
+                                            max_tokens: Optional[int] = None) -> str:
+        """
+        Appelle l'API Chat Completions avec des messages (format conversationnel)
+        Les modèles sont essayés dans l'ordre; le modèle retenu ne vaut que pour cet appel.
+
+        Args:
+            messages: Liste de messages au format conversationnel
+            model_override: Modèle à essayer en premier (modèle par défaut sinon)
+            num_questions: Nombre de questions à générer (pour calculer max_tokens)
+            max_tokens: Limite de tokens générés (remplace le calcul basé sur num_questions)
+        """
+        self._verifier_token()
+        payload = self._payload_chat(messages, num_questions, max_tokens)
+
+        last_error = None
+        for model_name in self.http.disjoncteur.filtrer(self._modeles_a_essayer(model_override)):
+            try:
+                generated_text = self._appeler_modele_chat(model_name, payload)
+            except ErreurModeleIA as e:
+                last_error = str(e)
+                continue
+            if model_name != (model_override or self.model):
+                logger.info(
+                    f"Modèle de fallback {model_name} utilisé avec succès")
+            return generated_text
+
+        # Tous les modèles ont échoué
+        error_msg = (
+            f"Impossible de générer les questions. Tous les modèles ont échoué. "
+            f"Dernière erreur: {last_error}. "
+            f"Veuillez vérifier votre token HF_API_TOKEN et votre connexion internet."
+        )
+        logger.error(error_msg)
+        raise Exception(error_msg)
+
+    def _appeler_modele_chat(self, model_name: str, payload: Dict[str, Any],
+                             annulation: Optional[threading.Event] = None) -> str:
+        """
+        Appelle un modèle de l'API Chat Completions, avec nouvelles tentatives
+
+        Args:
+            model_name: Modèle à appeler
+            payload: Corps de la requête (sans le modèle, non modifié: partageable entre threads)
+            annulation: Interrompt les tentatives restantes lorsqu'il est levé (course entre modèles)
+
+        Raises:
+            ErreurModeleIA: le modèle n'a pas répondu (passer au modèle suivant)
+        """
         headers = {
             "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json"
         }
+        payload = dict(payload, model=model_name)
+        logger.info(f"Tentative avec le modèle: {model_name} (API Chat)")
 
-        # Calculer max_tokens en fonction du nombre de questions
-        # Environ 200 tokens par question (énoncé + 4 options + explication)
-        estimated_tokens = num_questions * 200 + 100  # +100 pour le format JSON
-        max_tokens = min(max(estimated_tokens, 1024),
-                         4096)  # Entre 1024 et 4096
+        last_error = None
+        for attempt in range(self.max_retries):
+            if annulation is not None and annulation.is_set():
+                raise ErreurModeleIA(f"Appel au modèle {model_name} annulé")
+            try:
+                logger.info(
+                    f"Appel API Hugging Face Chat - Modèle: {model_name} (tentative {attempt + 1}/{self.max_retries})")
 
-        logger.debug(
-            f"max_tokens calculé: {max_tokens} pour {num_questions} questions")
+                response = self.http.post(
+                    self.api_url,
+                    model_name,
+                    headers=headers,
+                    json=payload,
+                    timeout=self.timeout
+                )
 
-        payload = {
-            "model": model_override or self.model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": 0.7,
-            "top_p": 0.9
-        }
+                if self._reessayer_apres_statut(model_name, response, attempt, annulation):
+                    continue
 
-        # Liste des modèles à essayer
-        models_to_try = [model_override] if model_override else [self.model]
-        if self.model not in models_to_try:
-            models_to_try = [self.model] + \
-                [m for m in self.fallback_models if m != self.model]
-        else:
-            models_to_try.extend(
-                [m for m in self.fallback_models if m != self.model and m not in models_to_try])
+                response.raise_for_status()
 
-        last_error = None
+                result = response.json()
 
-        for model_name in models_to_try:
-            payload["model"] = model_name
-            logger.info(f"Tentative avec le modèle: {model_name} (API Chat)")
+                # Format de réponse Chat Completions
+                if isinstance(result, dict) and 'choices' in result:
+                    if len(result['choices']) > 0:
+                        generated_text = result['choices'][0].get(
+                            'message', {}).get('content', '')
+                    else:
+                        generated_text = ''
+                else:
+                    generated_text = str(result)
 
-            for attempt in range(self.max_retries):
-                try:
-                    logger.info(
-                        f"Appel API Hugging Face Chat - Modèle: {model_name} (tentative {attempt + 1}/{self.max_retries})")
+                logger.info(
+                    f"Réponse générée avec {model_name}: {len(generated_text)} caractères")
+                self.http.disjoncteur.fermer(model_name)
+                return generated_text
 
-                    response = requests.post(
-                        self.api_url,
-                        headers=headers,
-                        json=payload,
-                        timeout=self.timeout
-                    )
+            except ErreurModeleIA:
+                raise
 
-                    if response.status_code == 503:
-                        logger.warning(
-                            f"Modèle {model_name} en chargement. Tentative {attempt + 1}/{self.max_retries}")
-                        if attempt < self.max_retries - 1:
-                            import time
-                            time.sleep(10)
-                            continue
-                        else:
-                            logger.warning(
-                                f"Modèle {model_name} met trop de temps à charger, passage au suivant...")
-                            last_error = f"Le modèle {model_name} met trop de temps à charger"
-                            break
+            except requests.exceptions.Timeout:
+                logger.error(
+                    f"Timeout avec le modèle {model_name} (tentative {attempt + 1})")
+                last_error = f"Timeout avec le modèle {model_name}"
+                if attempt < self.max_retries - 1:
+                    self.http.attendre(attempt, annulation=annulation)
+
+            except requests.exceptions.HTTPError as e:
+                logger.error(f"Erreur HTTP avec {model_name}: {e}")
+                last_error = f"Erreur HTTP avec {model_name}: {str(e)}"
+                if attempt < self.max_retries - 1:
+                    self.http.attendre(attempt, e.response, annulation)
+
+            except Exception as e:
+                logger.error(f"Erreur avec le modèle {model_name}: {e}")
+                last_error = f"Erreur avec {model_name}: {str(e)}"
+                if attempt < self.max_retries - 1:
+                    self.http.attendre(attempt, annulation=annulation)
+
+        raise ErreurModeleIA(last_error or f"Échec du modèle {model_name}")
+
+    def _reessayer_apres_statut(self, model_name: str, response: requests.Response, attempt: int,
+                                annulation: Optional[threading.Event] = None) -> bool:
+        """
+        Traite les statuts 429/503/410 d'une réponse de l'API Chat
 
-                    if response.status_code == 410:
-                        logger.warning(
-                            f"Modèle {model_name} non disponible (410 Gone), passage au suivant...")
-                        last_error = f"Le modèle {model_name} n'est plus disponible"
-                        break
+        Returns:
+            True si une nouvelle tentative doit être faite (après l'attente), False sinon
 
-                    response.raise_for_status()
+        Raises:
+            ErreurModeleIA: le modèle est à abandonner (410, ou indisponible après toutes les tentatives)
+        """
+        if response.status_code in (429, 503):
+            # 503: modèle en cours de chargement, 429: limite de débit atteinte
+            logger.warning(
+                f"Modèle {model_name} indisponible (HTTP {response.status_code}). Tentative {attempt + 1}/{self.max_retries}")
+            response.close()
+            if attempt < self.max_retries - 1:
+                # Backoff exponentiel avec gigue, ou délai Retry-After de l'API
+                self.http.attendre(attempt, response, annulation)
+                return True
+            logger.warning(
+                f"Modèle {model_name} met trop de temps à charger, passage au suivant...")
+            if response.status_code == 503:
+                self.http.disjoncteur.ouvrir(model_name, 503)
+            raise ErreurModeleIA(f"Le modèle {model_name} met trop de temps à charger")
 
-                    result = response.json()
+        if response.status_code == 410:
+            logger.warning(
+                f"Modèle {model_name} non disponible (410 Gone), passage au suivant...")
+            response.close()
+            self.http.disjoncteur.ouvrir(model_name, 410)
+            raise ErreurModeleIA(f"Le modèle {model_name} n'est plus disponible")
 
-                    # Format de réponse Chat Completions
-                    if isinstance(result, dict) and 'choices' in result:
-                        if len(result['choices']) > 0:
-                            generated_text = result['choices'][0].get(
-                                'message', {}).get('content', '')
-                        else:
-                            generated_text = ''
-                    else:
-                        generated_text = str(result)
+        return False
 
-                    logger.info(
-                        f"Réponse générée avec {model_name}: {len(generated_text)} caractères")
-                    if model_name != self.model:
-                        logger.info(
-                            f"Modèle de fallback {model_name} utilisé avec succès")
-                        self.model = model_name
-                    return generated_text
+    def _delai_relance(self, modele: str) -> float:
+        """Délai avant de lancer le modèle suivant en parallèle: percentile des latences du modèle"""
+        delai = latences_modeles.percentile(modele, self.hedge_percentile)
+        return delai if delai is not None else self.hedge_delai_defaut
 
-                except requests.exceptions.Timeout:
-                    logger.error(
-                        f"Timeout avec le modèle {model_name} (tentative {attempt + 1})")
-                    if attempt < self.max_retries - 1:
-                        continue
-                    last_error = f"Timeout avec le modèle {model_name}"
-                    break
+    def _course_modeles(self, messages: list, num_questions: int,
+                        modele: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Génération "hedged": le modèle principal est appelé, puis, sans réponse après le délai de relance
+        (ou dès un échec), le modèle sain suivant est lancé en parallèle. La première réponse dont les
+        questions passent _validate_questions est retenue; les autres appels sont abandonnés.
 
-                except requests.exceptions.HTTPError as e:
-                    if e.response and e.response.status_code == 410:
-                        logger.warning(
-                            f"Modèle {model_name} non disponible (410), passage au suivant...")
-                        last_error = f"Le modèle {model_name} n'est plus disponible"
-                        break
-                    else:
-                        logger.error(f"Erreur HTTP avec {model_name}: {e}")
-                        if attempt < self.max_retries - 1:
-                            continue
-                        last_error = f"Erreur HTTP avec {model_name}: {str(e)}"
-                        break
+        Les appels sont faits en streaming: la connexion d'un appel perdant est fermée dès qu'une
+        réponse est retenue, ce qui arrête sa génération côté fournisseur (voir AnnulationRequetes).
 
-                except Exception as e:
-                    logger.error(f"Erreur avec le modèle {model_name}: {e}")
-                    if attempt < self.max_retries - 1:
+        Returns:
+            Liste brute des questions de la réponse retenue
+        """
+        self._verifier_token()
+        payload = dict(self._payload_chat(messages, num_questions), stream=True)
+        candidats = self.http.disjoncteur.filtrer(self._modeles_a_essayer(modele))[:max(1, self.hedge_max_modeles)]
+        annulation = AnnulationRequetes()
+
+        def tenter(model_name: str) -> List[Dict[str, Any]]:
+            debut = time.perf_counter()
+            texte = ''.join(self._flux_modele_chat(model_name, payload, annulation))
+            # Durée de la réponse complète (la couche HTTP ne mesure que les en-têtes d'un flux)
+            latences_modeles.enregistrer(model_name, time.perf_counter() - debut)
+            questions = self._parser_questions(texte)
+            self._validate_questions({'questions': questions})
+            return questions
+
+        executor = ThreadPoolExecutor(max_workers=len(candidats))
+        en_attente = list(candidats)
+        en_cours = {}
+        erreurs = []
+
+        def lancer():
+            model_name = en_attente.pop(0)
+            en_cours[executor.submit(tenter, model_name)] = model_name
+
+        try:
+            lancer()
+            while en_cours:
+                delai = self._delai_relance(candidats[0]) if en_attente else None
+                termines, _ = wait(en_cours, timeout=delai, return_when=FIRST_COMPLETED)
+                if not termines:
+                    logger.info(
+                        f"Pas de réponse après {delai:.1f}s: lancement de {en_attente[0]} en parallèle")
+                    lancer()
+                    continue
+
+                for future in termines:
+                    model_name = en_cours.pop(future)
+                    try:
+                        questions = future.result()
+                    except Exception as e:
+                        logger.warning(f"Réponse écartée du modèle {model_name}: {e}")
+                        erreurs.append(f"{model_name}: {e}")
                         continue
-                    last_error = f"Erreur avec {model_name}: {str(e)}"
-                    break
+                    logger.info(f"Génération retenue: modèle {model_name}")
+                    return questions
+
+                # Échec: le modèle suivant est lancé sans attendre le délai de relance
+                if en_attente:
+                    lancer()
+        finally:
+            # Abandon des autres appels: flux en cours fermés, plus de nouvelle tentative,
+            # appels non démarrés annulés
+            annulation.set()
+            executor.shutdown(wait=False, cancel_futures=True)
 
-        # Tous les modèles ont échoué
         error_msg = (
             f"Impossible de générer les questions. Tous les modèles ont échoué. "
-            f"Dernière erreur: {last_error}. "
-            f"Veuillez vérifier votre token HF_API_TOKEN et votre connexion internet."
+            f"Dernière erreur: {erreurs[-1] if erreurs else 'inconnue'}."
         )
         logger.error(error_msg)
         raise Exception(error_msg)
@@ -348,17 +587,12 @@ Génère maintenant les {num_questions} questions:"""
 
         Args:
             prompt: Prompt à envoyer au modèle
-            model_override: Modèle à utiliser (pour fallback)
+            model_override: Modèle à essayer en premier (modèle par défaut sinon)
 
         Returns:
             Réponse générée par le modèle
         """
-        if not self.api_token:
-            raise ValueError(
-                "HF_API_TOKEN n'est pas configuré. "
-                "Définissez la variable d'environnement HF_API_TOKEN avec votre token Hugging Face. "
-                "Obtenez un token sur: https://huggingface.co/settings/tokens"
-            )
+        self._verifier_token()
 
         headers = {
             "Authorization": f"Bearer {self.api_token}",
@@ -395,18 +629,10 @@ Génère maintenant les {num_questions} questions:"""
                 }
             }
 
-        # Liste des modèles à essayer (modèle principal + fallbacks)
-        models_to_try = [model_override] if model_override else [self.model]
-        if self.model not in models_to_try:
-            models_to_try = [self.model] + \
-                [m for m in self.fallback_models if m != self.model]
-        else:
-            models_to_try.extend(
-                [m for m in self.fallback_models if m != self.model and m not in models_to_try])
-
         last_error = None
 
-        for model_name in models_to_try:
+        # Modèle demandé (ou principal) puis modèles de secours
+        for model_name in self.http.disjoncteur.filtrer(self._modeles_a_essayer(model_override)):
             api_url = f"https://api-inference.huggingface.co/models/{model_name}"
             logger.info(f"Tentative avec le modèle: {model_name}")
 
@@ -415,26 +641,29 @@ Génère maintenant les {num_questions} questions:"""
                     logger.info(
                         f"Appel API Hugging Face - Modèle: {model_name} (tentative {attempt + 1}/{self.max_retries})")
 
-                    response = requests.post(
+                    response = self.http.post(
                         api_url,
+                        model_name,
                         headers=headers,
                         json=payload,
                         timeout=self.timeout
                     )
 
-                    if response.status_code == 503:
-                        # Modèle en cours de chargement
+                    if response.status_code in (429, 503):
+                        # 503: modèle en cours de chargement, 429: limite de débit atteinte
                         logger.warning(
-                            f"Modèle {model_name} en chargement. Tentative {attempt + 1}/{self.max_retries}")
+                            f"Modèle {model_name} indisponible (HTTP {response.status_code}). Tentative {attempt + 1}/{self.max_retries}")
                         if attempt < self.max_retries - 1:
-                            import time
-                            time.sleep(10)  # Attendre 10 secondes
+                            # Backoff exponentiel avec gigue, ou délai Retry-After de l'API
+                            self.http.attendre(attempt, response)
                             continue
                         else:
                             # Passer au modèle suivant
                             logger.warning(
                                 f"Modèle {model_name} met trop de temps à charger, passage au suivant...")
                             last_error = f"Le modèle {model_name} met trop de temps à charger"
+                            if response.status_code == 503:
+                                self.http.disjoncteur.ouvrir(model_name, 503)
                             break
 
                     if response.status_code == 410:
@@ -442,6 +671,7 @@ Génère maintenant les {num_questions} questions:"""
                         logger.warning(
                             f"Modèle {model_name} non disponible (410 Gone), passage au suivant...")
                         last_error = f"Le modèle {model_name} n'est plus disponible"
+                        self.http.disjoncteur.ouvrir(model_name, 410)
                         break
 
                     response.raise_for_status()
@@ -471,32 +701,34 @@ Génère maintenant les {num_questions} questions:"""
 
                     logger.info(
                         f"Réponse générée avec {model_name}: {len(generated_text)} caractères")
-                    # Mettre à jour le modèle utilisé si c'était un fallback
-                    if model_name != self.model:
+                    self.http.disjoncteur.fermer(model_name)
+                    # Le modèle de secours ne vaut que pour cet appel (service partagé entre utilisateurs)
+                    if model_name != (model_override or self.model):
                         logger.info(
                             f"Modèle de fallback {model_name} utilisé avec succès")
-                        self.model = model_name
-                        self.api_url = api_url
                     return generated_text
 
                 except requests.exceptions.Timeout:
                     logger.error(
                         f"Timeout avec le modèle {model_name} (tentative {attempt + 1})")
                     if attempt < self.max_retries - 1:
+                        self.http.attendre(attempt)
                         continue
                     last_error = f"Timeout avec le modèle {model_name}"
                     break
 
                 except requests.exceptions.HTTPError as e:
-                    if e.response and e.response.status_code == 410:
+                    if e.response is not None and e.response.status_code == 410:
                         # Erreur 410 - essayer le modèle suivant
                         logger.warning(
                             f"Modèle {model_name} non disponible (410), passage au suivant...")
                         last_error = f"Le modèle {model_name} n'est plus disponible"
+                        self.http.disjoncteur.ouvrir(model_name, 410)
                         break
                     else:
                         logger.error(f"Erreur HTTP avec {model_name}: {e}")
                         if attempt < self.max_retries - 1:
+                            self.http.attendre(attempt, e.response)
                             continue
                         last_error = f"Erreur HTTP avec {model_name}: {str(e)}"
                         break
@@ -504,6 +736,7 @@ Génère maintenant les {num_questions} questions:"""
                 except Exception as e:
                     logger.error(f"Erreur avec le modèle {model_name}: {e}")
                     if attempt < self.max_retries - 1:
+                        self.http.attendre(attempt)
                         continue
                     last_error = f"Erreur avec {model_name}: {str(e)}"
                     break
@@ -521,154 +754,34 @@ Génère maintenant les {num_questions} questions:"""
         """
         Extrait le JSON de la réponse du modèle avec gestion des JSON incomplets
 
+        La réponse est réparée en un seul parcours si nécessaire (voir ai_json: virgules,
+        guillemets, littéraux, réponse tronquée après la dernière question complète).
+
         Args:
             response_text: Texte généré par le modèle
 
         Returns:
-            Dictionnaire Python parsé depuis le JSON
+            Dictionnaire Python parsé depuis le JSON (un tableau de questions est placé sous 'questions')
         """
-        # Essayer de trouver un bloc JSON dans la réponse
-        # Chercher entre ``` ou directement un objet JSON
-
-        # Pattern 1: JSON entre backticks
-        json_match = re.search(
-            r'```json\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Pattern 2: JSON direct - chercher depuis le début jusqu'à la fin
-            json_match = re.search(
-                r'\{.*"questions".*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                # Essayer de parser le texte complet comme JSON
-                json_str = response_text.strip()
-
-        # Essayer de parser le JSON
         try:
-            data = json.loads(json_str)
-            return data
-        except json.JSONDecodeError as e:
-            logger.warning(f"Erreur parsing JSON complet: {e}")
-            logger.info("Tentative de réparation du JSON incomplet...")
-
-            # Essayer de réparer le JSON incomplet en extrayant les questions valides
-            try:
-                # Méthode 1: Chercher toutes les questions complètes avec regex
-                # Pattern pour trouver chaque question complète (plus permissif)
-                questions_list = []
-
-                # Chercher le début du tableau questions
-                questions_start = json_str.find('"questions"')
-                if questions_start == -1:
-                    questions_start = json_str.find('questions')
-
-                if questions_start != -1:
-                    # Extraire la partie après "questions"
-                    questions_section = json_str[questions_start:]
-                    # Chercher le début du tableau [
-                    array_start = questions_section.find('[')
-                    if array_start != -1:
-                        questions_section = questions_section[array_start:]
-
-                # Pattern pour trouver chaque question (plus flexible)
-                # Chercher les blocs qui commencent par { et contiennent enonce, options, etc.
-                question_pattern = r'\{\s*"enonce"\s*:\s*"((?:[^"\\]|\\.)*)"[^}]*"type"\s*:\s*"[^"]*"[^}]*"options"\s*:\s*\[(.*?)\][^}]*"explication"\s*:\s*"((?:[^"\\]|\\.)*)"[^}]*"points"\s*:\s*(\d+)'
-                question_matches = re.finditer(
-                    question_pattern, questions_section or json_str, re.DOTALL)
-
-                for match in question_matches:
-                    try:
-                        enonce = match.group(1).replace(
-                            '\\"', '"').replace('\\n', '\n')
-                        options_str = match.group(2)
-                        explication = match.group(3).replace(
-                            '\\"', '"').replace('\\n', '\n')
-                        points = int(match.group(4))
-
-                        # Parser les options
-                        options = []
-                        option_pattern = r'\{\s*"texte"\s*:\s*"((?:[^"\\]|\\.)*)"[^}]*"estCorrecte"\s*:\s*(true|false)'
-                        option_matches = re.finditer(
-                            option_pattern, options_str, re.DOTALL)
-
-                        for opt_match in option_matches:
-                            texte = opt_match.group(1).replace(
-                                '\\"', '"').replace('\\n', '\n')
-                            est_correcte = opt_match.group(2) == 'true'
-                            options.append({
-                                "texte": texte,
-                                "estCorrecte": est_correcte
-                            })
-
-                        # Vérifier qu'on a au moins 2 options
-                        if len(options) >= 2:
-                            questions_list.append({
-                                "enonce": enonce,
-                                "type": "qcm",
-                                "options": options,
-                                "explication": explication,
-                                "points": points
-                            })
-                    except Exception as q_error:
-                        logger.debug(
-                            f"Erreur lors de l'extraction d'une question: {q_error}")
-                        continue
-
-                if questions_list:
-                    logger.info(
-                        f"Extraction réussie: {len(questions_list)} questions valides extraites du JSON incomplet")
-                    return {"questions": questions_list}
-
-                # Méthode 2: Essayer de fermer le JSON manuellement
-                # Chercher la dernière accolade fermante valide
-                brace_count = 0
-                last_valid_pos = -1
-                for i, char in enumerate(json_str):
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 1:  # On est dans l'objet racine
-                            last_valid_pos = i
-
-                if last_valid_pos > 0:
-                    # Essayer de parser jusqu'à la dernière position valide
-                    truncated_json = json_str[:last_valid_pos + 1]
-                    # Fermer les balises manquantes
-                    if truncated_json.count('[') > truncated_json.count(']'):
-                        truncated_json += ']'
-                    if truncated_json.count('{') > truncated_json.count('}'):
-                        truncated_json += '}'
-
-                    try:
-                        data = json.loads(truncated_json)
-                        logger.info(
-                            f"JSON réparé en tronquant: {len(data.get('questions', []))} questions")
-                        return data
-                    except json.JSONDecodeError:
-                        pass
-
-            except Exception as repair_error:
-                logger.warning(
-                    f"Erreur lors de la tentative de réparation: {repair_error}")
-
-            # Si toutes les tentatives échouent, logger l'erreur et le texte
-            logger.error(f"Impossible de parser ou réparer le JSON")
-            logger.error(f"Erreur JSON: {e}")
-            logger.error(
-                f"Position de l'erreur: ligne {e.lineno}, colonne {e.colno}")
-            logger.error(
-                f"Texte reçu (premiers 1000 caractères): {response_text[:1000]}")
+            data = reparer_json(response_text)
+        except ErreurJSON as e:
+            logger.error(f"Impossible de parser ou réparer le JSON: {e}")
+            logger.error(f"Texte reçu (premiers 1000 caractères): {response_text[:1000]}")
             if len(response_text) > 1000:
-                logger.error(
-                    f"Texte reçu (derniers 500 caractères): {response_text[-500:]}")
+                logger.error(f"Texte reçu (derniers 500 caractères): {response_text[-500:]}")
             raise ValueError(
                 f"Impossible de parser la réponse du modèle en JSON: {str(e)}. "
-                f"Le JSON semble incomplet ou mal formé (erreur à la ligne {e.lineno}, colonne {e.colno}). "
+                f"Le JSON semble incomplet ou mal formé. "
                 f"Essayez de réduire le nombre de questions ou d'augmenter max_tokens.")
 
+        if isinstance(data, list):
+            # Tableau de questions sans objet englobant
+            return {'questions': data}
+        if not isinstance(data, dict):
+            raise ValueError("La réponse du modèle n'est pas un objet JSON")
+        return data
+
     def _validate_questions(self, questions_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Valide et normalise les questions générées
@@ -744,10 +857,18 @@ Génère maintenant les {num_questions} questions:"""
                            matiere: Optional[str] = None,
                            niveau: Optional[str] = None,
                            mention: Optional[str] = None,
-                           parcours: Optional[str] = None) -> List[Dict[str, Any]]:
+                           parcours: Optional[str] = None,
+                           use_cache: bool = True,
+                           progress_callback: Optional[Callable[[int, int], None]] = None,
+                           model: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Génère des questions de QCM à partir d'un texte
 
+        Un texte long n'est plus tronqué: il est découpé en parties (DocumentParser.split_into_chunks),
+        le nombre de questions est réparti entre elles, chaque partie est traitée en parallèle
+        (pool borné à self.max_workers) et les questions sont fusionnées et dédoublonnées
+        avant validation.
+
         Args:
             text: Texte source
             num_questions: Nombre de questions à générer
@@ -755,6 +876,9 @@ Génère maintenant les {num_questions} questions:"""
             niveau: Niveau académique (optionnel)
             mention: Mention académique (optionnel)
             parcours: Parcours académique (optionnel)
+            use_cache: Réutiliser une génération identique (même texte, paramètres et modèle)
+            progress_callback: Appelée avec (parties_terminees, parties_total) après chaque partie
+            model: Modèle à utiliser pour cette génération (modèle par défaut du service sinon)
 
         Returns:
             Liste de questions générées et validées
@@ -765,26 +889,362 @@ Génère maintenant les {num_questions} questions:"""
                 "Définissez la variable d'environnement HF_API_TOKEN avec votre token Hugging Face."
             )
 
+        chunks = DocumentParser.split_into_chunks(text, max_chars=self.chunk_max_chars)
+        if not chunks:
+            raise ValueError("Le texte source est vide")
+
+        cle_cache = self._cle_cache_questions(chunks, num_questions, matiere, niveau, mention, parcours, model)
+        if use_cache:
+            questions_en_cache = self.questions_cache.get(cle_cache)
+            if questions_en_cache:
+                logger.info(f"{len(questions_en_cache)} questions servies depuis le cache ({cle_cache[:12]})")
+                if progress_callback:
+                    progress_callback(len(chunks), len(chunks))
+                return questions_en_cache
+
+        contexte = dict(matiere=matiere, niveau=niveau, mention=mention, parcours=parcours, model=model)
+        if len(chunks) == 1:
+            questions = self._generate_raw_questions(chunks[0], num_questions, **contexte)
+            if progress_callback:
+                progress_callback(1, 1)
+        else:
+            questions = self._generate_raw_questions_chunked(
+                chunks, num_questions, progress_callback, **contexte)
+
+        # Valider les questions (après fusion et dédoublonnage)
+        validated_questions = self._validate_questions(
+            {'questions': self._dedupliquer_questions(questions)})
+
+        if use_cache:
+            self.questions_cache.set(cle_cache, validated_questions)
+
+        return validated_questions
+
+    def _cle_cache_questions(self, chunks: List[str], num_questions: int, matiere: Optional[str],
+                             niveau: Optional[str], mention: Optional[str], parcours: Optional[str],
+                             model: Optional[str]) -> str:
+        """Clé du cache de questions d'une génération (texte découpé, paramètres, modèle, prompt)"""
+        return cle_cache_questions(
+            " ".join(chunks),
+            {
+                'num_questions': num_questions,
+                'matiere': matiere,
+                'niveau': niveau,
+                'mention': mention,
+                'parcours': parcours,
+                'use_chat_api': self.use_chat_api,
+                'chunk_max_chars': self.chunk_max_chars
+            },
+            model or self.model,
+            PROMPT_QUESTIONS_VERSION
+        )
+
+    def generate_questions_stream(self, text: str, num_questions: int = 10,
+                                  matiere: Optional[str] = None,
+                                  niveau: Optional[str] = None,
+                                  mention: Optional[str] = None,
+                                  parcours: Optional[str] = None,
+                                  on_question: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                  annulation: Optional[Any] = None,
+                                  use_cache: bool = True,
+                                  model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Génère des questions de QCM en streaming (API Chat Completions, stream: true)
+
+        Chaque question est validée et dédoublonnée dès que son objet JSON est complet, puis
+        transmise à on_question: la première question arrive en quelques secondes au lieu
+        d'attendre la réponse complète. Un texte long est découpé comme pour generate_questions,
+        les parties sont générées en parallèle.
+
+        Args:
+            text: Texte source
+            num_questions: Nombre de questions à générer
+            matiere, niveau, mention, parcours: Contexte académique (optionnel)
+            on_question: Appelée avec chaque question validée (depuis les threads de génération)
+            annulation: Objet exposant is_set(); la génération s'arrête (connexion fermée,
+                plus de tokens consommés) dès qu'il est levé
+            use_cache: Réutiliser une génération identique
+            model: Modèle à utiliser pour cette génération (modèle par défaut du service sinon)
+
+        Returns:
+            Liste des questions validées (dans l'ordre du document)
+
+        Raises:
+            GenerationAnnulee: la génération a été annulée
+        """
+        if not self.use_chat_api:
+            # L'ancienne API text generation ne diffuse pas la réponse
+            questions = self.generate_questions(text, num_questions, matiere, niveau, mention, parcours,
+                                                use_cache=use_cache, model=model)
+            for question in questions:
+                if on_question:
+                    on_question(question)
+            return questions
+
+        self._verifier_token()
+        chunks = DocumentParser.split_into_chunks(text, max_chars=self.chunk_max_chars)
+        if not chunks:
+            raise ValueError("Le texte source est vide")
+
+        cle_cache = self._cle_cache_questions(chunks, num_questions, matiere, niveau, mention, parcours, model)
+        if use_cache:
+            questions_en_cache = self.questions_cache.get(cle_cache)
+            if questions_en_cache:
+                logger.info(f"{len(questions_en_cache)} questions servies depuis le cache ({cle_cache[:12]})")
+                for question in questions_en_cache:
+                    if on_question:
+                        on_question(question)
+                return questions_en_cache
+
+        collecte = _CollecteQuestions(self, on_question)
+        contexte = dict(matiere=matiere, niveau=niveau, mention=mention, parcours=parcours, model=model)
+        repartition = _repartir_questions([len(c) for c in chunks], num_questions)
+        taches = [(indice, nombre) for indice, nombre in enumerate(repartition) if nombre > 0]
+
+        erreurs = []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(taches)))) as executor:
+            futures = [
+                executor.submit(self._generer_partie_stream, chunks[indice], nombre, indice,
+                                collecte, annulation, **contexte)
+                for indice, nombre in taches
+            ]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except GenerationAnnulee:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Échec de la génération en streaming d'une partie: {e}")
+                    erreurs.append(str(e))
+
+        questions = collecte.questions_ordonnees()
+        if not questions:
+            raise Exception(
+                f"Impossible de générer les questions. "
+                f"Dernière erreur: {erreurs[-1] if erreurs else 'aucune question valide'}")
+
+        if use_cache:
+            self.questions_cache.set(cle_cache, questions)
+        return questions
+
+    def _generer_partie_stream(self, text: str, nombre: int, indice: int, collecte: '_CollecteQuestions',
+                               annulation: Optional[Any] = None, matiere: Optional[str] = None,
+                               niveau: Optional[str] = None, mention: Optional[str] = None,
+                               parcours: Optional[str] = None, model: Optional[str] = None) -> None:
+        """Génère en streaming les questions d'une partie du texte (modèles essayés dans l'ordre)"""
+        messages = self._build_chat_messages(text, nombre, matiere, niveau, mention, parcours)
+        payload = dict(self._payload_chat(messages, nombre), stream=True)
+
+        last_error = None
+        for model_name in self.http.disjoncteur.filtrer(self._modeles_a_essayer(model)):
+            extracteur = ExtracteurQuestions()
+            recues = 0
+            try:
+                flux = self._flux_modele_chat(model_name, payload, annulation)
+                try:
+                    for fragment in flux:
+                        for question in extracteur.ajouter(fragment):
+                            if collecte.ajouter(question, indice):
+                                recues += 1
+                        if recues >= nombre:
+                            # Quota atteint: la fermeture du flux interrompt la génération
+                            break
+                finally:
+                    flux.close()
+            except ErreurModeleIA as e:
+                if recues:
+                    # Questions déjà transmises: la réponse partielle est conservée
+                    logger.warning(f"Flux du modèle {model_name} interrompu après {recues} question(s): {e}")
+                    return
+                last_error = str(e)
+                continue
+
+            if recues == 0:
+                # Réponse hors du format attendu: extraction classique sur le texte complet
+                try:
+                    for question in self._parser_questions(extracteur.texte_complet()):
+                        collecte.ajouter(question, indice)
+                except ValueError as e:
+                    last_error = f"Réponse invalide du modèle {model_name}: {e}"
+                    continue
+            return
+
+        raise Exception(f"Tous les modèles ont échoué. Dernière erreur: {last_error}")
+
+    def _flux_modele_chat(self, model_name: str, payload: Dict[str, Any],
+                          annulation: Optional[Any] = None) -> Iterator[str]:
+        """
+        Fragments de texte générés par un modèle (API Chat en streaming)
+        Nouvelles tentatives tant qu'aucun fragment n'a été reçu; la connexion est fermée
+        à la fin du flux, à sa fermeture par l'appelant ou à l'annulation (immédiatement, même
+        pendant une lecture bloquée, si annulation est une AnnulationRequetes).
+
+        Raises:
+            ErreurModeleIA: le modèle n'a pas répondu ou le flux a été interrompu
+            GenerationAnnulee: annulation levée
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        payload = dict(payload, model=model_name)
+        logger.info(f"Génération en streaming avec le modèle: {model_name}")
+
+        last_error = None
+        for attempt in range(self.max_retries):
+            if annulation is not None and annulation.is_set():
+                raise GenerationAnnulee("Génération annulée")
+            try:
+                response = self.http.post(self.api_url, model_name, headers=headers, json=payload,
+                                          timeout=self.timeout, stream=True)
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Erreur avec le modèle {model_name} (tentative {attempt + 1}): {e}")
+                last_error = f"Erreur avec {model_name}: {str(e)}"
+                if attempt < self.max_retries - 1:
+                    self.http.attendre(attempt, annulation=annulation)
+                continue
+
+            if self._reessayer_apres_statut(model_name, response, attempt, annulation):
+                continue
+            if not response.ok:
+                logger.error(f"Erreur HTTP {response.status_code} avec {model_name}")
+                last_error = f"Erreur HTTP avec {model_name}: {response.status_code}"
+                response.close()
+                if attempt < self.max_retries - 1:
+                    self.http.attendre(attempt, response, annulation)
+                continue
+
+            suivie = isinstance(annulation, AnnulationRequetes)
+            if suivie and not annulation.suivre(response):
+                raise GenerationAnnulee("Génération annulée")
+            debut = time.perf_counter()
+            try:
+                premier = True
+                for fragment in lire_flux_sse(response.iter_lines()):
+                    if annulation is not None and annulation.is_set():
+                        raise GenerationAnnulee("Génération annulée")
+                    if premier:
+                        logger.info(f"Premier token de {model_name} après {time.perf_counter() - debut:.1f}s")
+                        premier = False
+                    yield fragment
+            except Exception as e:
+                # Connexion fermée par l'annulation pendant la lecture: erreur de lecture quelconque
+                if annulation is not None and annulation.is_set():
+                    raise GenerationAnnulee("Génération annulée") from e
+                if isinstance(e, requests.exceptions.RequestException):
+                    raise ErreurModeleIA(f"Flux interrompu avec {model_name}: {str(e)}")
+                raise
+            finally:
+                if suivie:
+                    annulation.oublier(response)
+                # Fermer la connexion arrête la génération côté fournisseur
+                response.close()
+
+            self.http.disjoncteur.fermer(model_name)
+            return
+
+        raise ErreurModeleIA(last_error or f"Échec du modèle {model_name}")
+
+    def max_source_chars(self, num_questions: int) -> int:
+        """
+        Quantité de texte source exploitable pour num_questions questions
+        (au plus une partie complète par question); permet d'arrêter l'extraction d'un document plus tôt
+        """
+        return self.chunk_max_chars * max(1, num_questions)
+
+    def _generate_raw_questions(self, text: str, num_questions: int,
+                                matiere: Optional[str] = None,
+                                niveau: Optional[str] = None,
+                                mention: Optional[str] = None,
+                                parcours: Optional[str] = None,
+                                model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Appelle le modèle pour un texte et retourne la liste brute (non validée) des questions"""
         # Appeler l'API selon le type utilisé
         if self.use_chat_api:
             # Construire les messages pour l'API chat
             messages = self._build_chat_messages(
                 text, num_questions, matiere, niveau, mention, parcours)
+            if self.hedging:
+                # Course entre modèles: la réponse retenue est déjà validée
+                return self._course_modeles(messages, num_questions, model)
             # Appeler l'API Chat Completions
             response_text = self._call_huggingface_api_with_messages(
-                messages, num_questions=num_questions)
+                messages, model_override=model, num_questions=num_questions)
         else:
             # Ancienne méthode avec prompt texte
             prompt = self._build_prompt(text, num_questions, matiere, niveau, mention, parcours)
-            response_text = self._call_huggingface_api(prompt)
+            response_text = self._call_huggingface_api(prompt, model_override=model)
 
+        return self._parser_questions(response_text)
+
+    def _parser_questions(self, response_text: str) -> List[Dict[str, Any]]:
+        """Extrait la liste brute des questions d'une réponse du modèle"""
         # Extraire et parser le JSON
         questions_data = self._extract_json_from_response(response_text)
+        if 'questions' not in questions_data:
+            raise ValueError(
+                "Le JSON généré ne contient pas de clé 'questions'")
+        if not isinstance(questions_data['questions'], list):
+            raise ValueError("'questions' doit être une liste")
+        return questions_data['questions']
 
-        # Valider les questions
-        validated_questions = self._validate_questions(questions_data)
-
-        return validated_questions
+    def _generate_raw_questions_chunked(self, chunks: List[str], num_questions: int,
+                                        progress_callback: Optional[Callable[[int, int], None]] = None,
+                                        **contexte) -> List[Dict[str, Any]]:
+        """
+        Génère les questions de chaque partie en parallèle et les concatène dans l'ordre du document
+        Une partie en échec est ignorée tant qu'au moins une partie a produit des questions.
+        """
+        repartition = _repartir_questions([len(c) for c in chunks], num_questions)
+        taches = [(indice, nombre) for indice, nombre in enumerate(repartition) if nombre > 0]
+        logger.info(
+            f"Génération en {len(taches)} parties ({len(chunks)} disponibles) pour {num_questions} questions")
+
+        resultats: Dict[int, List[Dict[str, Any]]] = {}
+        erreurs = []
+        terminees = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(taches)))) as executor:
+            futures = {
+                executor.submit(self._generate_raw_questions, chunks[indice], nombre, **contexte): indice
+                for indice, nombre in taches
+            }
+            for future in as_completed(futures):
+                indice = futures[future]
+                try:
+                    resultats[indice] = future.result()
+                except Exception as e:
+                    logger.warning(f"Échec de la génération pour la partie {indice + 1}: {e}")
+                    erreurs.append(str(e))
+                terminees += 1
+                if progress_callback:
+                    progress_callback(terminees, len(taches))
+
+        if not resultats:
+            raise Exception(
+                f"Impossible de générer les questions: toutes les parties ont échoué. "
+                f"Dernière erreur: {erreurs[-1] if erreurs else 'inconnue'}")
+
+        questions = []
+        for indice in sorted(resultats):
+            questions.extend(resultats[indice])
+        return questions
+
+    def _dedupliquer_questions(self, questions: List[Any]) -> List[Any]:
+        """Supprime les questions dont l'énoncé normalisé est déjà présent (ordre conservé)"""
+        vues = set()
+        uniques = []
+        for question in questions:
+            enonce = question.get('enonce') if isinstance(question, dict) else None
+            if isinstance(enonce, str):
+                cle = _cle_enonce(enonce)
+                if cle in vues:
+                    continue
+                vues.add(cle)
+            uniques.append(question)
+        if len(uniques) < len(questions):
+            logger.info(f"{len(questions) - len(uniques)} question(s) en double supprimée(s)")
+        return uniques
 
     def generate_commentaire_resultat(self, note_sur_20: float, pourcentage: float, 
                                      questions_correctes: int, questions_total: int,
@@ -804,12 +1264,7 @@ Génère maintenant les {num_questions} questions:"""
         """
         if not self.api_token:
             # Fallback si pas de token IA
-            if est_reussi:
-                return "Excellent travail ! Continuez ainsi."
-            elif pourcentage >= 50:
-                return "Bon travail. Quelques révisions nécessaires."
-            else:
-                return "À améliorer. Revoyez les concepts de base."
+            return commentaire_par_defaut(pourcentage)
         
         # Déterminer le ton selon le nombre de réponses correctes
         est_strict = questions_correctes < 10
@@ -863,29 +1318,131 @@ Génère uniquement le commentaire, sans guillemets ni texte supplémentaire:"""
                 messages, num_questions=1
             )
             
-            # Nettoyer la réponse (enlever guillemets, espaces, etc.)
-            commentaire = response_text.strip()
-            # Enlever les guillemets s'ils sont présents
-            if commentaire.startswith('"') and commentaire.endswith('"'):
-                commentaire = commentaire[1:-1]
-            if commentaire.startswith("'") and commentaire.endswith("'"):
-                commentaire = commentaire[1:-1]
-            
-            # Limiter strictement à 200 caractères (pas de "...")
-            if len(commentaire) > 200:
-                commentaire = commentaire[:200]
-            
-            return commentaire.strip()
+            return self._nettoyer_commentaire(response_text)
             
         except Exception as e:
             logger.warning(f"Erreur génération commentaire IA: {e}, utilisation du fallback")
             # Fallback si l'IA échoue
-            if est_reussi:
-                return "Excellent travail ! Continuez ainsi."
-            elif pourcentage >= 50:
-                return "Bon travail. Quelques révisions nécessaires."
+            return commentaire_par_defaut(pourcentage)
+
+    def _nettoyer_commentaire(self, commentaire: str) -> str:
+        """Nettoie un commentaire généré (guillemets, espaces, 200 caractères max)"""
+        commentaire = commentaire.strip()
+        # Enlever les guillemets s'ils sont présents
+        if commentaire.startswith('"') and commentaire.endswith('"'):
+            commentaire = commentaire[1:-1]
+        if commentaire.startswith("'") and commentaire.endswith("'"):
+            commentaire = commentaire[1:-1]
+
+        # Limiter strictement à 200 caractères (pas de "...")
+        if len(commentaire) > 200:
+            commentaire = commentaire[:200]
+
+        return commentaire.strip()
+
+    def _taille_lot_commentaires(self) -> int:
+        """Nombre maximal de résultats par requête selon le budget de tokens"""
+        disponible = self.commentaires_budget_tokens - TOKENS_PROMPT_COMMENTAIRES
+        return max(1, disponible // (TOKENS_ENTREE_PAR_COMMENTAIRE + TOKENS_SORTIE_PAR_COMMENTAIRE))
+
+    def generate_commentaires_resultats(self, resultats: List[Dict[str, Any]]) -> List[str]:
+        """
+        Génère les commentaires de plusieurs résultats avec une requête par lot
+
+        Le prompt système n'est envoyé qu'une fois par lot et le modèle répond avec un
+        tableau JSON [{"id": n, "commentaire": "..."}]. Un élément absent ou invalide
+        reçoit le commentaire de fallback sans invalider le reste du lot.
+
+        Args:
+            resultats: Liste de dictionnaires avec note_sur_20, pourcentage,
+                questions_correctes, questions_total et est_reussi
+
+        Returns:
+            Liste des commentaires, dans le même ordre que resultats
+        """
+        if not resultats:
+            return []
+
+        fallbacks = [commentaire_par_defaut(r.get('pourcentage')) for r in resultats]
+        if not self.api_token:
+            return fallbacks
+
+        commentaires = list(fallbacks)
+        taille_lot = self._taille_lot_commentaires()
+        for debut in range(0, len(resultats), taille_lot):
+            lot = resultats[debut:debut + taille_lot]
+            try:
+                generes = self._generer_lot_commentaires(lot)
+            except Exception as e:
+                logger.warning(f"Erreur génération commentaires IA groupés ({len(lot)}): {e}, utilisation du fallback")
+                continue
+            for indice, commentaire in generes.items():
+                if 0 <= indice < len(lot) and commentaire:
+                    commentaires[debut + indice] = commentaire
+
+        return commentaires
+
+    def _generer_lot_commentaires(self, lot: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Appelle le modèle pour un lot et retourne {indice dans le lot: commentaire}"""
+        system_message = """Tu es un enseignant bienveillant mais ferme qui rédige des commentaires constructifs sur des résultats d'examen.
+Pour chaque résultat fourni, rédige un commentaire en français, critique mais constructif, centré uniquement sur la note et la performance. Si le ton demandé est "strict", sois direct et incite à plus d'efforts. Objectif: 100 caractères, maximum strict de 200 caractères par commentaire. N'utilise JAMAIS de mentions de matières spécifiques.
+Réponds UNIQUEMENT avec un tableau JSON, sans texte avant ou après, au format:
+[{"id": 1, "commentaire": "..."}]"""
+
+        lignes = []
+        for numero, r in enumerate(lot, start=1):
+            lignes.append(
+                f"{numero}. Note: {(r.get('note_sur_20') or 0):.1f}/20 | "
+                f"Pourcentage: {(r.get('pourcentage') or 0):.1f}% | "
+                f"Questions correctes: {r.get('questions_correctes') or 0}/{r.get('questions_total') or 0} | "
+                f"Statut: {'Réussi' if r.get('est_reussi') else 'Non réussi'} | "
+                f"Ton: {'strict' if (r.get('questions_correctes') or 0) < 10 else 'bienveillant'}"
+            )
+
+        user_prompt = (
+            f"Génère un commentaire pour chacun des {len(lot)} résultats suivants "
+            f"(un objet par résultat, avec le même id):\n\n" + "\n".join(lignes)
+        )
+
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        response_text = self._call_huggingface_api_with_messages(
+            messages,
+            max_tokens=len(lot) * TOKENS_SORTIE_PAR_COMMENTAIRE + 50
+        )
+        return self._parser_commentaires(response_text)
+
+    def _parser_commentaires(self, response_text: str) -> Dict[int, str]:
+        """
+        Extrait {indice: commentaire} d'une réponse en tableau JSON (éléments invalides ignorés)
+
+        La réponse est réparée si nécessaire (voir ai_json): un tableau tronqué par max_tokens
+        garde ses éléments complets, seuls les résultats manquants reçoivent le fallback.
+        """
+        elements = reparer_json(response_text)
+        if not isinstance(elements, list):
+            raise ValueError("La réponse n'est pas un tableau JSON")
+
+        commentaires = {}
+        for position, element in enumerate(elements):
+            if isinstance(element, str):
+                # Tableau de chaînes: l'ordre fait foi
+                identifiant, commentaire = position + 1, element
+            elif isinstance(element, dict):
+                identifiant = element.get('id', position + 1)
+                commentaire = element.get('commentaire')
             else:
-                return "À améliorer. Revoyez les concepts de base."
+                continue
+            try:
+                indice = int(identifiant) - 1
+            except (TypeError, ValueError):
+                continue
+            if isinstance(commentaire, str) and commentaire.strip() and indice not in commentaires:
+                commentaires[indice] = self._nettoyer_commentaire(commentaire)
+        return commentaires
 
 
 # Instance singleton
@@ -0,0 +1,144 @@
+"""
+Lecture incrémentale des réponses en streaming des modèles IA
+
+- lire_flux_sse: extrait les fragments de texte d'un flux Server-Sent Events Chat Completions
+  (`data: {...}` par ligne, terminé par `data: [DONE]`).
+- ExtracteurQuestions: analyseur JSON incrémental qui retourne chaque objet du tableau
+  "questions" dès que son accolade fermante est reçue, sans attendre la fin de la réponse.
+  Chaque caractère n'est examiné qu'une fois (coût linéaire en la taille de la réponse).
+"""
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.services.ai_json import ErreurJSON, reparer_json
+
+logger = logging.getLogger(__name__)
+
+
+def lire_flux_sse(lignes: Iterable[Any]) -> Iterator[str]:
+    """
+    Fragments de texte générés d'un flux SSE Chat Completions
+
+    Args:
+        lignes: Lignes du flux (bytes ou str), par exemple response.iter_lines()
+    """
+    for ligne in lignes:
+        if isinstance(ligne, bytes):
+            ligne = ligne.decode('utf-8', errors='replace')
+        ligne = ligne.strip()
+        if not ligne.startswith('data:'):
+            continue
+        donnees = ligne[5:].strip()
+        if donnees == '[DONE]':
+            return
+        try:
+            evenement = json.loads(donnees)
+        except ValueError:
+            logger.debug(f"Événement SSE ignoré: {donnees[:100]}")
+            continue
+        if not isinstance(evenement, dict):
+            continue
+        for choix in evenement.get('choices') or []:
+            fragment = (choix.get('delta') or {}).get('content') or (choix.get('message') or {}).get('content')
+            if fragment:
+                yield fragment
+
+
+class ExtracteurQuestions:
+    """
+    Analyseur JSON incrémental des questions d'une réponse en cours de génération
+
+    Un objet est une question lorsqu'il est élément direct du tableau associé à la clé
+    "questions", ou d'un tableau de premier niveau (réponse sous forme de liste). Le texte
+    hors JSON (préambule, blocs ```json) est ignoré.
+    """
+
+    def __init__(self):
+        self.texte: List[str] = []  # Réponse complète (repli sur l'extraction classique)
+        self._pile: List[str] = []  # Conteneurs ouverts: '{', '[' ou 'Q' (tableau de questions)
+        self._dans_chaine = False
+        self._echappement = False
+        self._chaine: List[str] = []  # Chaîne en cours (pour reconnaître la clé "questions")
+        self._derniere_chaine: Optional[str] = None
+        self._apres_deux_points = False
+        self._cle: Optional[str] = None
+        self._objet: Optional[List[str]] = None  # Texte de la question en cours
+        self._profondeur_objet = 0
+
+    def ajouter(self, fragment: str) -> List[Dict[str, Any]]:
+        """Analyse un fragment et retourne les questions complétées par celui-ci"""
+        self.texte.append(fragment)
+        questions = []
+        for caractere in fragment:
+            question = self._caractere(caractere)
+            if question is not None:
+                questions.append(question)
+        return questions
+
+    def texte_complet(self) -> str:
+        return ''.join(self.texte)
+
+    def _caractere(self, c: str) -> Optional[Dict[str, Any]]:
+        if self._objet is not None:
+            self._objet.append(c)
+
+        if self._dans_chaine:
+            if self._echappement:
+                self._echappement = False
+            elif c == '\\':
+                self._echappement = True
+            elif c == '"':
+                self._dans_chaine = False
+                self._derniere_chaine = ''.join(self._chaine)
+            elif len(self._chaine) < 32:
+                self._chaine.append(c)
+            return None
+
+        if c == '"':
+            if self._pile:
+                self._dans_chaine = True
+                self._chaine = []
+            return None
+        if c == ':':
+            self._cle = self._derniere_chaine
+            self._apres_deux_points = True
+            return None
+        if c in ' \t\r\n':
+            return None
+
+        apres_cle = self._apres_deux_points
+        self._apres_deux_points = False
+
+        if c == '[':
+            parent = self._pile[-1] if self._pile else None
+            est_questions = parent is None or (parent == '{' and apres_cle and self._cle == 'questions')
+            self._pile.append('Q' if est_questions else '[')
+        elif c == '{':
+            if self._pile and self._pile[-1] == 'Q' and self._objet is None:
+                self._objet = ['{']
+                self._profondeur_objet = len(self._pile) + 1
+            self._pile.append('{')
+        elif c in '}]':
+            if not self._pile:
+                return None
+            ouverture = self._pile.pop()
+            if c == '}' and ouverture == '{' and self._objet is not None \
+                    and len(self._pile) + 1 == self._profondeur_objet:
+                texte_objet = ''.join(self._objet)
+                self._objet = None
+                return self._decoder(texte_objet)
+        return None
+
+    @staticmethod
+    def _decoder(texte_objet: str) -> Optional[Dict[str, Any]]:
+        """Décode une question (réparée si mal formée, voir ai_json); None si l'objet est invalide"""
+        try:
+            objet = json.loads(texte_objet)
+        except ValueError:
+            try:
+                objet = reparer_json(texte_objet)
+            except ErreurJSON:
+                logger.debug(f"Question ignorée (JSON invalide): {texte_objet[:100]}")
+                return None
+        return objet if isinstance(objet, dict) else None
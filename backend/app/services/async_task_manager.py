@@ -1,170 +1,395 @@
 """
 Gestionnaire de tâches asynchrones en mémoire (sans Redis/Celery)
+
+Les tâches sont exécutées par un nombre fixe de threads (TASK_MANAGER_MAX_WORKERS) qui
+consomment une file à priorité bornée (TASK_MANAGER_MAX_QUEUE). L'état des tâches est
+conservé dans un TaskStore (mémoire ou SQLite, voir task_store) et les tâches terminées
+sont supprimées après TASK_MANAGER_TTL_SECONDS.
+
+Une tâche peut être annulée (statut REVOKED): en attente, elle n'est pas exécutée; en cours,
+la fonction consulte annulation(task_id) pour s'arrêter au plus tôt.
 """
+import os
+import queue
 import threading
 import uuid
+import itertools
 import time
 import logging
-from typing import Dict, Optional, Callable, Any
+from typing import Dict, Optional, Callable, Any, List, Tuple
 from datetime import datetime, timedelta
+from app.services.task_store import STATUTS_TERMINES, TaskStore, create_task_store
 
 logger = logging.getLogger(__name__)
 
+# Priorités (la plus petite valeur est exécutée en premier)
+PRIORITE_HAUTE = 0
+PRIORITE_NORMALE = 5
+PRIORITE_BASSE = 10
+
+# Intervalle minimal entre deux évictions des tâches terminées
+INTERVALLE_EVICTION_SECONDES = 60
+
+# Intervalle minimal entre deux lectures du store pour détecter une annulation d'un autre processus
+INTERVALLE_VERIFICATION_ANNULATION = 1.0
+
+
+class TaskQueueFullError(Exception):
+    """La file d'attente des tâches est pleine (admission refusée)"""
+    pass
+
+
+class AnnulationTache:
+    """
+    Indicateur d'annulation d'une tâche (interface de threading.Event: is_set, wait)
+
+    L'annulation demandée dans ce processus est vue immédiatement; celle demandée par un autre
+    processus (store partagé) au plus INTERVALLE_VERIFICATION_ANNULATION secondes plus tard.
+    """
+
+    def __init__(self, manager: 'AsyncTaskManager', task_id: str, evenement: threading.Event):
+        self.manager = manager
+        self.task_id = task_id
+        self.evenement = evenement
+        self.derniere_verification = time.monotonic()
+
+    def is_set(self) -> bool:
+        if self.evenement.is_set():
+            return True
+        maintenant = time.monotonic()
+        if maintenant - self.derniere_verification >= INTERVALLE_VERIFICATION_ANNULATION:
+            self.derniere_verification = maintenant
+            task = self.manager.store.get(self.task_id)
+            if task and task['status'] == 'REVOKED':
+                self.evenement.set()
+                return True
+        return False
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.evenement.wait(timeout)
+
 
 class AsyncTaskManager:
-    """Gestionnaire de tâches asynchrones en mémoire"""
+    """Gestionnaire de tâches asynchrones: pool de threads borné et file à priorité"""
     
-    def __init__(self):
-        self.tasks: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 ttl_seconds: Optional[int] = None, store: Optional[TaskStore] = None):
+        self.max_workers = max_workers or int(os.getenv('TASK_MANAGER_MAX_WORKERS', '4'))
+        self.max_queue = max_queue or int(os.getenv('TASK_MANAGER_MAX_QUEUE', '50'))
+        self.ttl_seconds = ttl_seconds or int(os.getenv('TASK_MANAGER_TTL_SECONDS', str(24 * 3600)))
+        self.store = store or create_task_store()
+
         self.lock = threading.Lock()
-    
-    def create_task(self, task_func: Callable, *args, **kwargs) -> str:
+        self.file: "queue.PriorityQueue[Tuple[int, int, str, Callable, tuple, dict]]" = queue.PriorityQueue()
+        self.compteur = itertools.count()
+        # Tâches en attente de ce processus: task_id -> (priorité, numéro d'ordre)
+        self.en_attente: Dict[str, Tuple[int, int]] = {}
+        # Annulations des tâches non terminées de ce processus
+        self.annulations: Dict[str, threading.Event] = {}
+        # Nettoyages à exécuter quand la tâche quitte la file (exécutée ou annulée)
+        self.nettoyages: Dict[str, Callable[[], None]] = {}
+        self.workers: List[threading.Thread] = []
+        self.derniere_eviction = datetime.now()
+
+    # ------------------------------------------------------------------
+    # Soumission
+    # ------------------------------------------------------------------
+
+    def create_task(self, task_func: Callable, *args, priority: int = PRIORITE_NORMALE, **kwargs) -> str:
         """
-        Crée et lance une tâche asynchrone
+        Crée une tâche asynchrone et la place dans la file d'attente
         
         Args:
             task_func: Fonction à exécuter
             *args: Arguments positionnels
+            priority: Priorité (PRIORITE_HAUTE, PRIORITE_NORMALE, PRIORITE_BASSE)
             **kwargs: Arguments nommés
         
         Returns:
             ID de la tâche
+
+        Raises:
+            TaskQueueFullError: si la file d'attente est pleine
         """
         task_id = str(uuid.uuid4())
-        
-        # Initialiser l'état de la tâche
-        with self.lock:
-            self.tasks[task_id] = {
-                'status': 'PENDING',
-                'result': None,
-                'error': None,
-                'progress': 0,
-                'message': 'Tâche en attente...',
-                'started_at': datetime.now(),
-                'estimated_duration': None,
-                'estimated_completion': None,
-            }
-        
-        # Lancer la tâche dans un thread séparé
-        thread = threading.Thread(
-            target=self._execute_task,
-            args=(task_id, task_func, args, kwargs),
-            daemon=True
-        )
-        thread.start()
-        
+        self._enqueue(task_id, task_func, args, kwargs, priority)
         return task_id
     
-    def create_task_with_id(self, task_func: Callable) -> str:
+    def create_task_with_id(self, task_func: Callable, priority: int = PRIORITE_NORMALE,
+                            owner_id: Optional[str] = None,
+                            nettoyage: Optional[Callable[[], None]] = None) -> str:
         """
-        Crée et lance une tâche asynchrone où la fonction reçoit le task_id en premier argument
+        Crée une tâche asynchrone où la fonction reçoit le task_id en premier argument
         
         Args:
             task_func: Fonction à exécuter qui prend task_id comme premier paramètre
+            priority: Priorité (PRIORITE_HAUTE, PRIORITE_NORMALE, PRIORITE_BASSE)
+            owner_id: Utilisateur ayant soumis la tâche (autorisé à l'annuler)
+            nettoyage: Appelée une fois la tâche sortie de la file, même si elle a été annulée
+                avant son exécution (ex: suppression d'un fichier temporaire)
         
         Returns:
             ID de la tâche
+
+        Raises:
+            TaskQueueFullError: si la file d'attente est pleine
         """
         task_id = str(uuid.uuid4())
-        
+        self._enqueue(task_id, task_func, (task_id,), {}, priority, owner_id, nettoyage)
+        return task_id
+
+    def verifier_admission(self) -> None:
+        """Lève TaskQueueFullError si une nouvelle tâche serait refusée"""
+        with self.lock:
+            if len(self.en_attente) >= self.max_queue:
+                raise TaskQueueFullError(
+                    f"Trop de tâches en attente ({len(self.en_attente)}). Réessayez dans quelques instants.")
+
+    def _enqueue(self, task_id: str, task_func: Callable, args: tuple, kwargs: dict, priority: int,
+                 owner_id: Optional[str] = None, nettoyage: Optional[Callable[[], None]] = None) -> None:
+        """Admission, enregistrement de l'état initial et mise en file"""
+        self._evict_if_due()
+        self.verifier_admission()
+
         # Initialiser l'état de la tâche
+        self.store.create(task_id, {
+            'status': 'PENDING',
+            'result': None,
+            'error': None,
+            'progress': 0,
+            'message': 'Tâche en attente...',
+            'priority': priority,
+            'queue_position': None,
+            'started_at': datetime.now(),
+            'finished_at': None,
+            'estimated_duration': None,
+            'estimated_completion': None,
+            'owner_id': owner_id,
+        })
+
         with self.lock:
-            self.tasks[task_id] = {
-                'status': 'PENDING',
-                'result': None,
-                'error': None,
-                'progress': 0,
-                'message': 'Tâche en attente...',
-                'started_at': datetime.now(),
-                'estimated_duration': None,
-                'estimated_completion': None,
-            }
-        
-        # Lancer la tâche dans un thread séparé avec task_id comme premier argument
-        thread = threading.Thread(
-            target=self._execute_task,
-            args=(task_id, task_func, (task_id,), {}),
-            daemon=True
-        )
-        thread.start()
-        
-        return task_id
+            self.annulations[task_id] = threading.Event()
+            if nettoyage is not None:
+                self.nettoyages[task_id] = nettoyage
+            ordre = next(self.compteur)
+            self.en_attente[task_id] = (priority, ordre)
+            self.file.put((priority, ordre, task_id, task_func, args, kwargs))
+            self._demarrer_workers()
+        self._rafraichir_positions()
+
+    def _demarrer_workers(self) -> None:
+        """Démarre les threads du pool à la première tâche (appelé sous self.lock)"""
+        self.workers = [w for w in self.workers if w.is_alive()]
+        while len(self.workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f'async-task-{len(self.workers)}',
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+
+    def _rafraichir_positions(self) -> None:
+        """Enregistre la position de chaque tâche en attente (visible par les autres processus)"""
+        with self.lock:
+            ordonnees = sorted(self.en_attente.items(), key=lambda item: item[1])
+        self.store.update_many({
+            task_id: {'queue_position': position}
+            for position, (task_id, _) in enumerate(ordonnees, start=1)
+        })
+
+    def get_queue_position(self, task_id: str) -> Optional[int]:
+        """Position (1 = prochaine exécutée) d'une tâche en attente de ce processus"""
+        with self.lock:
+            cle = self.en_attente.get(task_id)
+            if cle is None:
+                return None
+            return sum(1 for autre in self.en_attente.values() if autre < cle) + 1
+
+    # ------------------------------------------------------------------
+    # Exécution
+    # ------------------------------------------------------------------
+
+    def _worker_loop(self) -> None:
+        """Boucle d'un thread du pool"""
+        while True:
+            _, _, task_id, task_func, args, kwargs = self.file.get()
+            with self.lock:
+                self.en_attente.pop(task_id, None)
+            self._rafraichir_positions()
+            try:
+                if self._est_annulee(task_id):
+                    logger.info(f"Tâche {task_id} annulée avant son exécution")
+                else:
+                    self._execute_task(task_id, task_func, args, kwargs)
+            finally:
+                with self.lock:
+                    self.annulations.pop(task_id, None)
+                    nettoyage = self.nettoyages.pop(task_id, None)
+                if nettoyage is not None:
+                    try:
+                        nettoyage()
+                    except Exception as e:
+                        logger.warning(f"Nettoyage de la tâche {task_id} impossible: {e}")
+                self.file.task_done()
     
     def _execute_task(self, task_id: str, task_func: Callable, args: tuple, kwargs: dict):
-        """Exécute une tâche dans un thread séparé"""
+        """
+        Exécute une tâche dans un thread du pool
+
+        Les écritures de statut sont conditionnelles (update_unless_status): une annulation
+        enregistrée entre-temps, y compris par un autre processus, n'est jamais écrasée.
+        """
         try:
-            with self.lock:
-                self.tasks[task_id]['status'] = 'PROGRESS'
-                self.tasks[task_id]['message'] = 'Tâche en cours...'
+            self.store.update_unless_status(task_id, STATUTS_TERMINES, status='PROGRESS',
+                                            message='Tâche en cours...', queue_position=None)
             
             # Exécuter la tâche
             result = task_func(*args, **kwargs)
             
             # Mettre à jour le statut
-            with self.lock:
-                self.tasks[task_id]['status'] = 'SUCCESS'
-                self.tasks[task_id]['result'] = result
-                self.tasks[task_id]['progress'] = 100
-                self.tasks[task_id]['message'] = 'Tâche terminée avec succès'
+            if not self.store.update_unless_status(
+                task_id,
+                STATUTS_TERMINES,
+                status='SUCCESS',
+                result=result,
+                progress=100,
+                message='Tâche terminée avec succès',
+                finished_at=datetime.now()
+            ):
+                logger.info(f"Tâche {task_id} annulée pendant son exécution")
                 
         except Exception as e:
-            logger.error(f"Erreur dans la tâche {task_id}: {e}", exc_info=True)
-            with self.lock:
-                self.tasks[task_id]['status'] = 'FAILURE'
-                self.tasks[task_id]['error'] = str(e)
-                self.tasks[task_id]['message'] = f'Erreur: {str(e)}'
+            if self.store.update_unless_status(
+                task_id,
+                STATUTS_TERMINES,
+                status='FAILURE',
+                error=str(e),
+                message=f'Erreur: {str(e)}',
+                finished_at=datetime.now()
+            ):
+                logger.error(f"Erreur dans la tâche {task_id}: {e}", exc_info=True)
+            else:
+                logger.info(f"Tâche {task_id} interrompue par son annulation: {e}")
     
     def update_task_progress(self, task_id: str, progress: int, message: str = None):
-        """Met à jour la progression d'une tâche"""
+        """Met à jour la progression d'une tâche (sans effet une fois la tâche annulée)"""
+        with self.lock:
+            evenement = self.annulations.get(task_id)
+        if evenement is not None and evenement.is_set():
+            return
+        fields = {'progress': progress, 'status': 'PROGRESS'}
+        if message:
+            fields['message'] = message
+        if not self.store.update_unless_status(task_id, STATUTS_TERMINES, **fields):
+            # Annulée par un autre processus: la tâche le voit dès sa prochaine vérification
+            if evenement is not None and self._est_annulee(task_id):
+                evenement.set()
+
+    # ------------------------------------------------------------------
+    # Annulation
+    # ------------------------------------------------------------------
+
+    def cancel_task(self, task_id: str) -> bool:
+        """
+        Annule une tâche en attente ou en cours
+
+        Une tâche en attente ne sera pas exécutée; une tâche en cours est prévenue par son
+        indicateur annulation(task_id). Le store partagé rend l'annulation visible des autres
+        processus.
+
+        Returns:
+            False si la tâche n'existe pas ou est déjà terminée
+        """
+        # Vérification du statut et écriture de REVOKED en une seule opération: une tâche
+        # qui se termine au même moment n'est pas marquée annulée après coup
+        if not self.store.update_unless_status(task_id, STATUTS_TERMINES, status='REVOKED',
+                                               message='Tâche annulée', queue_position=None,
+                                               finished_at=datetime.now()):
+            return False
         with self.lock:
-            if task_id in self.tasks:
-                self.tasks[task_id]['progress'] = progress
-                if message:
-                    self.tasks[task_id]['message'] = message
-                self.tasks[task_id]['status'] = 'PROGRESS'
+            evenement = self.annulations.get(task_id)
+            self.en_attente.pop(task_id, None)
+        if evenement is not None:
+            evenement.set()
+        self._rafraichir_positions()
+        logger.info(f"Tâche {task_id} annulée")
+        return True
+
+    def annulation(self, task_id: str) -> AnnulationTache:
+        """Indicateur d'annulation à consulter par la fonction de la tâche"""
+        with self.lock:
+            evenement = self.annulations.get(task_id)
+        return AnnulationTache(self, task_id, evenement or threading.Event())
+
+    def _est_annulee(self, task_id: str) -> bool:
+        task = self.store.get(task_id)
+        return bool(task) and task['status'] == 'REVOKED'
+
+    # ------------------------------------------------------------------
+    # Consultation
+    # ------------------------------------------------------------------
     
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """Récupère le statut d'une tâche"""
-        with self.lock:
-            task = self.tasks.get(task_id)
-            if not task:
-                return None
-            
-            # Calculer le temps écoulé
-            elapsed = datetime.now() - task['started_at']
-            task_copy = task.copy()
-            task_copy['elapsed_seconds'] = elapsed.total_seconds()
-            
-            # Calculer le temps estimé restant si on a une estimation
-            if task.get('estimated_duration'):
-                remaining = task['estimated_duration'] - elapsed.total_seconds()
-                task_copy['estimated_remaining_seconds'] = max(0, remaining)
+        """Récupère le statut d'une tâche (depuis le store: fonctionne entre processus)"""
+        task = self.store.get(task_id)
+        if not task:
+            return None
+
+        # Position exacte si la tâche attend dans ce processus, sinon dernière position enregistrée
+        if task['status'] == 'PENDING':
+            position = self.get_queue_position(task_id)
+            if position is not None:
+                task['queue_position'] = position
             
-            return task_copy
+        # Calculer le temps écoulé
+        elapsed = datetime.now() - task['started_at']
+        task['elapsed_seconds'] = elapsed.total_seconds()
+        
+        # Calculer le temps estimé restant si on a une estimation
+        if task.get('estimated_duration'):
+            remaining = task['estimated_duration'] - elapsed.total_seconds()
+            task['estimated_remaining_seconds'] = max(0, remaining)
+        
+        return task
     
     def set_estimated_duration(self, task_id: str, duration_seconds: int):
         """Définit la durée estimée d'une tâche"""
+        task = self.store.get(task_id)
+        if task:
+            self.store.update(
+                task_id,
+                estimated_duration=duration_seconds,
+                estimated_completion=task['started_at'] + timedelta(seconds=duration_seconds)
+            )
+
+    # ------------------------------------------------------------------
+    # Éviction
+    # ------------------------------------------------------------------
+
+    def _evict_if_due(self) -> None:
+        """Supprime les tâches terminées depuis plus de ttl_seconds (au plus une fois par minute)"""
+        maintenant = datetime.now()
         with self.lock:
-            if task_id in self.tasks:
-                self.tasks[task_id]['estimated_duration'] = duration_seconds
-                self.tasks[task_id]['estimated_completion'] = (
-                    self.tasks[task_id]['started_at'] + timedelta(seconds=duration_seconds)
-                )
+            if (maintenant - self.derniere_eviction).total_seconds() < INTERVALLE_EVICTION_SECONDES:
+                return
+            self.derniere_eviction = maintenant
+        self.evict_finished_tasks()
+
+    def evict_finished_tasks(self) -> int:
+        """Supprime les tâches terminées depuis plus de ttl_seconds. Retourne le nombre supprimé"""
+        supprimees = self.store.delete_finished_before(datetime.now() - timedelta(seconds=self.ttl_seconds))
+        if supprimees:
+            logger.info(f"Éviction de {supprimees} tâche(s) terminée(s)")
+        return supprimees
     
     def cleanup_old_tasks(self, max_age_hours: int = 24):
         """Nettoie les anciennes tâches (plus de max_age_hours)"""
         cutoff = datetime.now() - timedelta(hours=max_age_hours)
-        with self.lock:
-            to_remove = [
-                task_id for task_id, task in self.tasks.items()
-                if task['started_at'] < cutoff
-            ]
-            for task_id in to_remove:
-                del self.tasks[task_id]
-            if to_remove:
-                logger.info(f"Nettoyage de {len(to_remove)} anciennes tâches")
+        supprimees = self.store.delete_started_before(cutoff)
+        if supprimees:
+            logger.info(f"Nettoyage de {supprimees} anciennes tâches")
 
 
 # Instance globale du gestionnaire
 task_manager = AsyncTaskManager()
-
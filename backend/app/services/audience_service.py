@@ -0,0 +1,72 @@
+"""
+Service de résolution de l'audience: étudiants ciblés par un QCM, une session d'examen
+ou rattachés à un enseignant
+
+Le filtrage est fait en SQL (EXISTS sur les tables d'association indexées): l'appelant
+obtient un nombre (une requête COUNT) ou un flux de user_id parcouru par lots, sans
+charger les profils ni les matières de chaque étudiant.
+"""
+import logging
+from typing import Optional, List, Iterator
+from sqlalchemy.orm import Query
+from app.repositories.etudiant_repository import EtudiantRepository
+
+logger = logging.getLogger(__name__)
+
+
+class AudienceService:
+    """Service de résolution de l'audience des QCM et sessions"""
+
+    def __init__(self):
+        self.etudiant_repo = EtudiantRepository()
+
+    def query_etudiants(self, matiere_ids: Optional[List[str]] = None, classe_id: Optional[str] = None,
+                        niveau_ids: Optional[List[str]] = None, parcours_ids: Optional[List[str]] = None,
+                        mention_ids: Optional[List[str]] = None,
+                        annee_scolaire: Optional[str] = None,
+                        matieres_actives: bool = False) -> Query:
+        """Requête des étudiants actifs correspondant aux critères (None = critère ignoré)"""
+        return self.etudiant_repo.query_audience(
+            matiere_ids=matiere_ids,
+            classe_id=classe_id,
+            niveau_ids=niveau_ids,
+            parcours_ids=parcours_ids,
+            mention_ids=mention_ids,
+            annee_scolaire=annee_scolaire,
+            matieres_actives=matieres_actives
+        )
+
+    def query_audience_qcm(self, qcm) -> Query:
+        """Étudiants inscrits à la matière (active) du QCM, aucun si le QCM n'a pas de matière"""
+        return self.query_etudiants(matiere_ids=[qcm.matiere_id] if qcm.matiere_id else [],
+                                    matieres_actives=True)
+
+    def query_audience_session(self, session) -> Query:
+        """Étudiants de la classe de la session, sinon ceux de la matière de son QCM"""
+        if session.classe_id:
+            return self.query_etudiants(classe_id=session.classe_id)
+        return self.query_audience_qcm(session.qcm)
+
+    def count(self, query: Query) -> int:
+        """Nombre de comptes étudiants de l'audience"""
+        return self.etudiant_repo.count_audience(query)
+
+    def iter_user_ids(self, query: Query, batch_size: int = 1000) -> Iterator[str]:
+        """Flux des user_id de l'audience (lus par lots de batch_size)"""
+        return self.etudiant_repo.iter_audience_user_ids(query, batch_size=batch_size)
+
+    def count_audience_qcm(self, qcm) -> int:
+        """Nombre d'étudiants ciblés par un QCM"""
+        return self.count(self.query_audience_qcm(qcm))
+
+    def iter_audience_qcm(self, qcm, batch_size: int = 1000) -> Iterator[str]:
+        """Flux des user_id des étudiants ciblés par un QCM"""
+        return self.iter_user_ids(self.query_audience_qcm(qcm), batch_size=batch_size)
+
+    def count_audience_session(self, session) -> int:
+        """Nombre d'étudiants ciblés par une session d'examen"""
+        return self.count(self.query_audience_session(session))
+
+    def iter_audience_session(self, session, batch_size: int = 1000) -> Iterator[str]:
+        """Flux des user_id des étudiants ciblés par une session d'examen"""
+        return self.iter_user_ids(self.query_audience_session(session), batch_size=batch_size)
@@ -207,7 +207,7 @@ class ClasseService:
 
         return self.classe_repo.delete(classe)
 
-    def search_classes(self, query: str) -> List[Dict[str, Any]]:
-        """Recherche des classes"""
-        classes = self.classe_repo.search(query)
+    def search_classes(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recherche des classes (les plus pertinentes d'abord)"""
+        classes = self.classe_repo.search(query, limit=limit)
         return [classe.to_dict() for classe in classes]
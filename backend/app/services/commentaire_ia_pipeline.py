@@ -0,0 +1,159 @@
+"""
+Pipeline d'arrière-plan pour les commentaires IA des résultats
+
+La soumission d'un examen enregistre immédiatement un commentaire déterministe;
+les commentaires IA sont ensuite générés par lots dans un thread dédié, écrits dans
+commentaire_prof puis poussés à l'étudiant sur sa room Socket.IO `user_{id}`.
+
+La file est en mémoire du processus: les résultats encore en attente lors d'un arrêt ou
+d'un redémarrage gardent le commentaire déterministe (ils ne sont pas replanifiés).
+"""
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Tuple, Optional
+from flask import current_app, Flask
+from app import db
+from app.repositories.resultat_repository import ResultatRepository
+
+logger = logging.getLogger(__name__)
+
+
+def commentaire_par_defaut(pourcentage: Optional[float]) -> str:
+    """Commentaire déterministe utilisé en attendant (ou à défaut) du commentaire IA"""
+    pourcentage = pourcentage or 0
+    if pourcentage >= 80:
+        return "Excellent travail ! Continuez ainsi."
+    elif pourcentage >= 50:
+        return "Bon travail. Quelques révisions nécessaires."
+    return "À améliorer. Revoyez les concepts de base."
+
+
+def donnees_commentaire(resultat) -> Dict[str, Any]:
+    """Données d'un résultat attendues par ai_service.generate_commentaires_resultats"""
+    return {
+        'note_sur_20': resultat.note_sur_20 or 0,
+        'pourcentage': resultat.pourcentage or 0,
+        'questions_correctes': resultat.questions_correctes or 0,
+        'questions_total': resultat.questions_total,
+        'est_reussi': resultat.est_reussi
+    }
+
+
+class CommentaireIAPipeline:
+    """File de résultats à commenter, traitée par lots dans un thread unique"""
+
+    def __init__(self, taille_lot: Optional[int] = None, delai_max_secondes: Optional[float] = None):
+        self.taille_lot = taille_lot or int(os.getenv('COMMENTAIRES_IA_TAILLE_LOT', '20'))
+        self.delai_max_secondes = delai_max_secondes if delai_max_secondes is not None else float(
+            os.getenv('COMMENTAIRES_IA_DELAI_SECONDES', '2'))
+        self.file: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker: Optional[threading.Thread] = None
+        self.app: Optional[Flask] = None
+
+    def planifier(self, resultat_id: str, commentaire_initial: str) -> bool:
+        """
+        Ajoute un résultat à la file des commentaires IA (contexte d'application requis)
+
+        Args:
+            resultat_id: ID du résultat déjà commité
+            commentaire_initial: Commentaire enregistré à la soumission; il n'est remplacé
+                que s'il n'a pas été modifié entre-temps (ex: par l'enseignant)
+
+        Returns:
+            False si les commentaires IA en arrière-plan sont désactivés
+        """
+        app = current_app._get_current_object()
+        if not app.config.get('COMMENTAIRES_IA_ACTIFS', True):
+            return False
+
+        self.file.put((resultat_id, commentaire_initial))
+        self._demarrer(app)
+        return True
+
+    def _demarrer(self, app: Flask) -> None:
+        """Démarre le thread de traitement s'il ne tourne pas déjà"""
+        with self.lock:
+            self.app = app
+            if self.worker and self.worker.is_alive():
+                return
+            self.worker = threading.Thread(target=self._boucle, name='commentaires-ia', daemon=True)
+            self.worker.start()
+
+    def _boucle(self) -> None:
+        """Boucle du thread: collecte un lot puis le traite (session fermée à la sortie du contexte)"""
+        while True:
+            lot = self._collecter_lot()
+            try:
+                with self.app.app_context():
+                    self.traiter_lot(lot)
+            except Exception as e:
+                logger.error(f"Erreur pipeline commentaires IA: {e}", exc_info=True)
+
+    def _collecter_lot(self) -> List[Tuple[str, str]]:
+        """Attend un premier élément puis regroupe ceux qui arrivent pendant delai_max_secondes"""
+        lot = [self.file.get()]
+        limite = time.monotonic() + self.delai_max_secondes
+        while len(lot) < self.taille_lot:
+            restant = limite - time.monotonic()
+            if restant <= 0:
+                break
+            try:
+                lot.append(self.file.get(timeout=restant))
+            except queue.Empty:
+                break
+        return lot
+
+    def traiter_lot(self, lot: List[Tuple[str, str]]) -> int:
+        """
+        Génère et enregistre les commentaires IA d'un lot (contexte d'application requis)
+
+        Returns:
+            Nombre de résultats mis à jour
+        """
+        from app.services.ai_service import ai_service
+        from app.events.diffusion import emissions_groupees
+        from app.events.notifications import notify_commentaire_resultat
+
+        commentaires_initiaux = dict(lot)
+        resultat_repo = ResultatRepository()
+        notifications = []
+        try:
+            resultats = resultat_repo.get_by_ids(list(commentaires_initiaux.keys()))
+            donnees = [donnees_commentaire(r) for r in resultats]
+            cibles = [(r.id, r.etudiant_id, r.est_publie) for r in resultats]
+            # Connexion rendue au pool pendant l'appel IA (jusqu'à plusieurs minutes)
+            db.session.rollback()
+
+            # Une requête IA par lot (fallback par résultat en cas de réponse invalide)
+            commentaires = ai_service.generate_commentaires_resultats(donnees)
+
+            for (resultat_id, etudiant_id, est_publie), commentaire in zip(cibles, commentaires):
+                initial = commentaires_initiaux[resultat_id]
+                if not commentaire or commentaire == initial:
+                    continue
+                # Écriture conditionnelle: un commentaire saisi pendant l'appel IA (ex: par
+                # l'enseignant) n'est pas écrasé
+                if resultat_repo.remplacer_commentaire(resultat_id, initial, commentaire):
+                    # Le commentaire n'est envoyé à l'étudiant qu'une fois le résultat publié
+                    notifications.append((etudiant_id, resultat_id, commentaire if est_publie else None))
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Notifications du lot envoyées ensemble
+        with emissions_groupees():
+            for etudiant_id, resultat_id, commentaire in notifications:
+                notify_commentaire_resultat(etudiant_id, resultat_id, commentaire)
+
+        logger.info(f"Commentaires IA: {len(notifications)}/{len(lot)} résultat(s) mis à jour")
+        return len(notifications)
+
+
+# Instance globale du pipeline
+commentaire_pipeline = CommentaireIAPipeline()
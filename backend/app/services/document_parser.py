@@ -1,40 +1,290 @@
 """
 Service d'extraction de texte depuis des documents (PDF, DOCX)
+
+Les documents téléversés sont écrits par blocs dans un fichier temporaire (enregistrer,
+enregistrer_base64) dont le chemin est transmis à la tâche de génération: le contenu n'est
+jamais entièrement en mémoire. Une source en mémoire est copiée de la même façon. Le
+fichier est lu via mmap; les pages
+d'un PDF volumineux sont extraites par lots dans un pool de processus et le texte
+est produit au fil de l'eau (générateur), ce qui permet d'arrêter l'extraction dès
+que l'appelant a assez de texte.
 """
-import io
+import os
+import re
+import mmap
+import base64
+import shutil
 import logging
-from typing import Optional
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Extraction parallèle des PDF: taille d'un lot de pages envoyé à un processus,
+# et nombre de pages à partir duquel le pool de processus est utilisé
+PAGES_PAR_LOT = 8
+SEUIL_PAGES_PARALLELE = 24
+
+# Source d'un document: contenu en mémoire, fichier ouvert ou chemin
+SourceDocument = Union[bytes, BinaryIO, str]
+
+# Taille des blocs copiés ou décodés vers un fichier temporaire
+TAILLE_BLOC = 1024 * 1024
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> Tuple[Optional[ProcessPoolExecutor], int]:
+    """Pool de processus partagé (créé à la demande), None si indisponible"""
+    global _process_pool, _process_pool_workers
+    # Les workers Celery (prefork) sont des processus daemon: ils ne peuvent pas avoir d'enfants
+    if multiprocessing.current_process().daemon:
+        return None, 0
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool_workers = int(os.getenv('DOCUMENT_PARSER_WORKERS', '0')) or min(4, os.cpu_count() or 1)
+            if _process_pool_workers <= 1:
+                return None, 0
+            # spawn: pas de fork d'un serveur multi-thread
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_process_pool_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool, _process_pool_workers
+
+
+def _reset_process_pool() -> None:
+    """Abandonne un pool cassé (processus tué), il sera recréé au prochain appel"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+def _extraire_pages_pdf(chemin: str, debut: int, fin: int) -> List[str]:
+    """Extrait le texte des pages [debut, fin[ d'un PDF (exécuté dans un processus du pool)"""
+    import PyPDF2
+
+    with open(chemin, 'rb') as fichier, mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as contenu:
+        reader = PyPDF2.PdfReader(contenu)
+        return [reader.pages[i].extract_text() or '' for i in range(debut, fin)]
+
 
 class DocumentParser:
     """Parser pour extraire du texte depuis différents formats de documents"""
 
     @staticmethod
-    def extract_from_pdf(file_bytes: bytes) -> str:
+    def _fichier_temporaire(suffix: str, ecrire) -> str:
+        """Crée un fichier temporaire rempli par ecrire(fichier); supprimé si l'écriture échoue"""
+        fd, chemin = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as fichier:
+                ecrire(fichier)
+        except BaseException:
+            DocumentParser.supprimer(chemin)
+            raise
+        return chemin
+
+    @staticmethod
+    def enregistrer(flux: BinaryIO, suffix: str) -> str:
         """
-        Extrait le texte d'un fichier PDF
+        Copie un flux (fichier téléversé) par blocs dans un fichier temporaire
 
-        Args:
-            file_bytes: Contenu du fichier PDF en bytes
+        Returns:
+            Chemin du fichier, à supprimer par l'appelant (supprimer)
+        """
+        return DocumentParser._fichier_temporaire(
+            suffix, lambda fichier: shutil.copyfileobj(flux, fichier, length=TAILLE_BLOC))
+
+    @staticmethod
+    def enregistrer_base64(contenu: str, suffix: str) -> str:
+        """
+        Décode un contenu base64 par blocs dans un fichier temporaire (caractères hors de
+        l'alphabet base64 ignorés, comme base64.b64decode)
 
         Returns:
-            Texte extrait du PDF
+            Chemin du fichier, à supprimer par l'appelant (supprimer)
+
+        Raises:
+            ValueError: contenu base64 invalide ou tronqué
         """
+        def ecrire(fichier):
+            reste = ''
+            for debut in range(0, len(contenu), TAILLE_BLOC):
+                bloc = reste + re.sub(r'[^A-Za-z0-9+/=]', '', contenu[debut:debut + TAILLE_BLOC])
+                coupure = len(bloc) - len(bloc) % 4
+                fichier.write(base64.b64decode(bloc[:coupure]))
+                reste = bloc[coupure:]
+            if reste:
+                raise ValueError("Contenu base64 tronqué")
+
+        return DocumentParser._fichier_temporaire(suffix, ecrire)
+
+    @staticmethod
+    def supprimer(chemin: Optional[str]) -> None:
+        """Supprime un fichier temporaire (sans erreur s'il n'existe plus)"""
+        if not chemin:
+            return
+        try:
+            os.unlink(chemin)
+        except OSError:
+            pass
+
+    @staticmethod
+    @contextmanager
+    def _spool(source: SourceDocument, suffix: str) -> Iterator[str]:
+        """Copie la source dans un fichier temporaire (supprimé à la sortie) et retourne son chemin"""
+        if isinstance(source, str):
+            yield source
+            return
+
+        fd, chemin = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as fichier:
+                if isinstance(source, (bytes, bytearray, memoryview)):
+                    fichier.write(source)
+                else:
+                    shutil.copyfileobj(source, fichier, length=1024 * 1024)
+            yield chemin
+        finally:
+            try:
+                os.unlink(chemin)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _pages_pdf_en_parallele(chemin: str, nombre_pages: int, pool: ProcessPoolExecutor,
+                                workers: int) -> Iterator[str]:
+        """Produit le texte des pages dans l'ordre, avec au plus 2 x workers lots en cours"""
+        lots = iter([(debut, min(debut + PAGES_PAR_LOT, nombre_pages))
+                     for debut in range(0, nombre_pages, PAGES_PAR_LOT)])
+        en_cours = deque()
         try:
-            import PyPDF2
+            for debut, fin in lots:
+                en_cours.append(pool.submit(_extraire_pages_pdf, chemin, debut, fin))
+                if len(en_cours) >= 2 * workers:
+                    break
+            while en_cours:
+                textes = en_cours.popleft().result()
+                suivant = next(lots, None)
+                if suivant:
+                    en_cours.append(pool.submit(_extraire_pages_pdf, chemin, *suivant))
+                yield from textes
+        finally:
+            # Arrêt anticipé: les lots non démarrés sont annulés
+            for future in en_cours:
+                future.cancel()
+
+    @staticmethod
+    def iter_pdf_text(source: SourceDocument, max_chars: Optional[int] = None) -> Iterator[str]:
+        """
+        Produit le texte d'un PDF page par page (pages vides ignorées)
 
-            pdf_file = io.BytesIO(file_bytes)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+        Args:
+            source: Contenu du PDF (bytes), fichier ouvert ou chemin
+            max_chars: Arrête l'extraction dès que ce nombre de caractères a été produit
 
-            text_parts = []
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_parts.append(text)
+        Yields:
+            Texte de chaque page
+        """
+        import PyPDF2
 
-            full_text = "\n\n".join(text_parts)
+        with DocumentParser._spool(source, '.pdf') as chemin:
+            with open(chemin, 'rb') as fichier, mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as contenu:
+                reader = PyPDF2.PdfReader(contenu)
+                nombre_pages = len(reader.pages)
+
+                pool, workers = (None, 0)
+                if nombre_pages >= SEUIL_PAGES_PARALLELE:
+                    pool, workers = _get_process_pool()
+
+                if pool is None:
+                    pages = (page.extract_text() or '' for page in reader.pages)
+                else:
+                    pages = DocumentParser._pages_pdf_en_parallele(chemin, nombre_pages, pool, workers)
+
+                total = 0
+                try:
+                    for texte in pages:
+                        if not texte:
+                            continue
+                        yield texte
+                        total += len(texte)
+                        if max_chars and total >= max_chars:
+                            logger.info(f"Extraction PDF arrêtée après {total} caractères")
+                            break
+                except BrokenProcessPool:
+                    _reset_process_pool()
+                    raise
+                finally:
+                    pages.close()
+
+    @staticmethod
+    def iter_docx_text(source: SourceDocument, max_chars: Optional[int] = None) -> Iterator[str]:
+        """
+        Produit le texte d'un DOCX paragraphe par paragraphe (paragraphes vides ignorés)
+
+        Args:
+            source: Contenu du DOCX (bytes), fichier ouvert ou chemin
+            max_chars: Arrête l'extraction dès que ce nombre de caractères a été produit
+
+        Yields:
+            Texte de chaque paragraphe
+        """
+        import docx
+
+        with DocumentParser._spool(source, '.docx') as chemin:
+            doc = docx.Document(chemin)
+            total = 0
+            for paragraph in doc.paragraphs:
+                if not paragraph.text.strip():
+                    continue
+                yield paragraph.text
+                total += len(paragraph.text)
+                if max_chars and total >= max_chars:
+                    logger.info(f"Extraction DOCX arrêtée après {total} caractères")
+                    break
+
+    @staticmethod
+    def iter_text(source: SourceDocument, file_type: str, max_chars: Optional[int] = None) -> Iterator[str]:
+        """
+        Produit le texte d'un document par morceaux selon son type
+
+        Args:
+            source: Contenu du fichier (bytes), fichier ouvert ou chemin
+            file_type: Type de fichier ('pdf' ou 'docx')
+            max_chars: Arrête l'extraction dès que ce nombre de caractères a été produit
+        """
+        if file_type.lower() == 'pdf':
+            return DocumentParser.iter_pdf_text(source, max_chars)
+        elif file_type.lower() in ['docx', 'doc']:
+            return DocumentParser.iter_docx_text(source, max_chars)
+        else:
+            raise ValueError(f"Type de fichier non supporté: {file_type}")
+
+    @staticmethod
+    def extract_from_pdf(file_bytes: SourceDocument, max_chars: Optional[int] = None) -> str:
+        """
+        Extrait le texte d'un fichier PDF
+
+        Args:
+            file_bytes: Contenu du fichier PDF en bytes (ou fichier ouvert / chemin)
+            max_chars: Arrête l'extraction dès que ce nombre de caractères est atteint
+
+        Returns:
+            Texte extrait du PDF
+        """
+        try:
+            full_text = "\n\n".join(DocumentParser.iter_pdf_text(file_bytes, max_chars))
 
             if not full_text.strip():
                 raise ValueError("Le PDF ne contient pas de texte extractible")
@@ -51,28 +301,19 @@ class DocumentParser:
             raise ValueError(f"Impossible d'extraire le texte du PDF: {str(e)}")
 
     @staticmethod
-    def extract_from_docx(file_bytes: bytes) -> str:
+    def extract_from_docx(file_bytes: SourceDocument, max_chars: Optional[int] = None) -> str:
         """
         Extrait le texte d'un fichier DOCX
 
         Args:
-            file_bytes: Contenu du fichier DOCX en bytes
+            file_bytes: Contenu du fichier DOCX en bytes (ou fichier ouvert / chemin)
+            max_chars: Arrête l'extraction dès que ce nombre de caractères est atteint
 
         Returns:
             Texte extrait du DOCX
         """
         try:
-            import docx
-
-            docx_file = io.BytesIO(file_bytes)
-            doc = docx.Document(docx_file)
-
-            text_parts = []
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text_parts.append(paragraph.text)
-
-            full_text = "\n\n".join(text_parts)
+            full_text = "\n\n".join(DocumentParser.iter_docx_text(file_bytes, max_chars))
 
             if not full_text.strip():
                 raise ValueError("Le DOCX ne contient pas de texte")
@@ -89,21 +330,22 @@ class DocumentParser:
             raise ValueError(f"Impossible d'extraire le texte du DOCX: {str(e)}")
 
     @staticmethod
-    def extract_text(file_bytes: bytes, file_type: str) -> str:
+    def extract_text(file_bytes: SourceDocument, file_type: str, max_chars: Optional[int] = None) -> str:
         """
         Extrait le texte d'un document selon son type
 
         Args:
-            file_bytes: Contenu du fichier en bytes
+            file_bytes: Contenu du fichier en bytes (ou fichier ouvert / chemin)
             file_type: Type de fichier ('pdf' ou 'docx')
+            max_chars: Arrête l'extraction dès que ce nombre de caractères est atteint
 
         Returns:
             Texte extrait du document
         """
         if file_type.lower() == 'pdf':
-            return DocumentParser.extract_from_pdf(file_bytes)
+            return DocumentParser.extract_from_pdf(file_bytes, max_chars)
         elif file_type.lower() in ['docx', 'doc']:
-            return DocumentParser.extract_from_docx(file_bytes)
+            return DocumentParser.extract_from_docx(file_bytes, max_chars)
         else:
             raise ValueError(f"Type de fichier non supporté: {file_type}")
 
@@ -128,3 +370,52 @@ class DocumentParser:
             logger.warning(f"Texte tronqué à {max_length} caractères")
 
         return text
+
+    @staticmethod
+    def split_into_chunks(text: str, max_chars: int = 8000) -> List[str]:
+        """
+        Découpe le texte en parties nettoyées d'au plus max_chars caractères
+
+        Les coupures se font aux limites de paragraphes, puis de phrases pour les
+        paragraphes trop longs (et en dernier recours aux espaces), afin que chaque
+        partie reste un passage cohérent du document.
+
+        Args:
+            text: Texte brut extrait du document
+            max_chars: Taille maximale d'une partie
+
+        Returns:
+            Liste des parties (vide si le texte est vide)
+        """
+        segments = []
+        for paragraphe in re.split(r'\n\s*\n', text):
+            paragraphe = " ".join(paragraphe.split())
+            if not paragraphe:
+                continue
+            if len(paragraphe) <= max_chars:
+                segments.append(paragraphe)
+                continue
+            for phrase in re.split(r'(?<=[.!?;:])\s+', paragraphe):
+                while len(phrase) > max_chars:
+                    coupure = phrase.rfind(' ', 0, max_chars)
+                    if coupure <= 0:
+                        coupure = max_chars
+                    segments.append(phrase[:coupure])
+                    phrase = phrase[coupure:].strip()
+                if phrase:
+                    segments.append(phrase)
+
+        chunks = []
+        courant = ""
+        for segment in segments:
+            if courant and len(courant) + 1 + len(segment) > max_chars:
+                chunks.append(courant)
+                courant = segment
+            else:
+                courant = f"{courant} {segment}" if courant else segment
+        if courant:
+            chunks.append(courant)
+
+        if len(chunks) > 1:
+            logger.info(f"Texte découpé en {len(chunks)} parties ({len(text)} caractères)")
+        return chunks
@@ -17,7 +17,9 @@ from app.repositories.qcm_repository import QCMRepository
 from app.models.enseignant import Enseignant
 from app.models.user import UserRole
 from app import db
+from app.utils.identity import invalider_identite
 from app.services.pdf_service import PDFService
+from app.services.audience_service import AudienceService
 
 
 class EnseignantService:
@@ -36,6 +38,7 @@ class EnseignantService:
         self.resultat_repo = ResultatRepository()
         self.qcm_repo = QCMRepository()
         self.pdf_service = PDFService()
+        self.audience_service = AudienceService()
 
     def get_all_enseignants(self, actifs_seulement: bool = False, page: int = 1, per_page: int = 50) -> Dict[str, Any]:
         """Récupère tous les enseignants avec pagination"""
@@ -120,6 +123,7 @@ class EnseignantService:
         # Créer l'enseignant
         enseignant = Enseignant(**data)
         enseignant = self.enseignant_repo.create(enseignant)
+        invalider_identite(enseignant.user_id)
 
         return enseignant.to_dict()
 
@@ -273,48 +277,22 @@ class EnseignantService:
         enseignant_parcours_ids = [p.id for p in enseignant.parcours]
         enseignant_mentions_ids = [m.id for m in enseignant.mentions]
 
-        # Construire la requête pour les étudiants
-        from app.models.etudiant import Etudiant
-        from app.models.associations import etudiant_matieres_v2
-
-        query = db.session.query(Etudiant).filter(Etudiant.actif == True)
-
-        # Appliquer les filtres si spécifiés
-        if niveau_id:
-            query = query.filter(Etudiant.niveau_id == niveau_id)
-        elif enseignant_niveaux_ids:
-            query = query.filter(
-                Etudiant.niveau_id.in_(enseignant_niveaux_ids))
-
-        if parcours_id:
-            query = query.filter(Etudiant.parcours_id == parcours_id)
-        elif enseignant_parcours_ids:
-            query = query.filter(
-                Etudiant.parcours_id.in_(enseignant_parcours_ids))
-
-        if mention_id:
-            query = query.filter(Etudiant.mention_id == mention_id)
-        elif enseignant_mentions_ids:
-            query = query.filter(
-                Etudiant.mention_id.in_(enseignant_mentions_ids))
-
-        # Filtrer par matière (relation many-to-many)
-        if matiere_id:
-            query = query.join(etudiant_matieres_v2).filter(
-                etudiant_matieres_v2.c.matiere_id == matiere_id
-            )
-        elif enseignant_matieres_ids:
-            query = query.join(etudiant_matieres_v2).filter(
-                etudiant_matieres_v2.c.matiere_id.in_(enseignant_matieres_ids)
-            )
-
-        # Filtrer par année scolaire si spécifié
-        if annee_scolaire and matiere_id:
-            query = query.filter(
-                etudiant_matieres_v2.c.annee_scolaire == annee_scolaire)
-
-        # Dédoublonner et compter
-        query = query.distinct()
+        # Construire la requête pour les étudiants (filtre explicite, sinon critères de l'enseignant)
+        def _critere(valeur, valeurs_enseignant):
+            if valeur:
+                return [valeur]
+            return valeurs_enseignant or None
+
+        query = self.audience_service.query_etudiants(
+            matiere_ids=_critere(matiere_id, enseignant_matieres_ids),
+            niveau_ids=_critere(niveau_id, enseignant_niveaux_ids),
+            parcours_ids=_critere(parcours_id, enseignant_parcours_ids),
+            mention_ids=_critere(mention_id, enseignant_mentions_ids),
+            # Filtrer par année scolaire si spécifié
+            annee_scolaire=annee_scolaire if matiere_id else None
+        )
+
+        # Les inscriptions sont testées par EXISTS: pas de doublons à éliminer
         total = query.count()
 
         # Pagination
@@ -0,0 +1,49 @@
+"""
+Sérialisation des listes de QCM et de sessions d'examen
+
+Le to_dict de détail calcule ses compteurs objet par objet (len(questions),
+len(resultats), niveaux dynamiques), soit plusieurs requêtes par ligne. Pour une page
+de liste, les compteurs et les niveaux sont calculés par des requêtes groupées sur
+tous les identifiants de la page, et les entités référencées sont chargées par la
+requête de liste du repository (OPTIONS_LISTE). Le coût d'une page est donc constant,
+quel que soit le nombre de lignes.
+"""
+from typing import List, Dict, Any
+from app.models.qcm import QCM
+from app.models.session_examen import SessionExamen
+from app.repositories.qcm_repository import QCMRepository
+from app.repositories.session_examen_repository import SessionExamenRepository
+
+
+class ListSerializer:
+    """Sérialiseur des pages de QCM et de sessions (mêmes clés que to_dict)"""
+
+    def __init__(self):
+        self.qcm_repo = QCMRepository()
+        self.session_repo = SessionExamenRepository()
+
+    def qcms(self, qcms: List[QCM]) -> List[Dict[str, Any]]:
+        """Sérialise une liste de QCM avec deux requêtes groupées (questions, niveaux)"""
+        if not qcms:
+            return []
+        ids = [qcm.id for qcm in qcms]
+        nombres_questions = self.qcm_repo.count_questions_by_qcm(ids)
+        niveaux = self.qcm_repo.get_niveaux_by_qcm(ids)
+        return [
+            qcm.to_list_dict(
+                nombre_questions=nombres_questions.get(qcm.id, 0),
+                niveaux=[n.to_dict() for n in niveaux.get(qcm.id, [])]
+            )
+            for qcm in qcms
+        ]
+
+    def sessions(self, sessions: List[SessionExamen]) -> List[Dict[str, Any]]:
+        """Sérialise une liste de sessions avec une requête groupée (participants)"""
+        if not sessions:
+            return []
+        participants = self.session_repo.count_participants_by_session([s.id for s in sessions])
+        return [
+            session.to_list_dict(nombre_participants=participants.get(session.id, 0))
+            for session in sessions
+        ]
+
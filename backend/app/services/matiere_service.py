@@ -165,7 +165,7 @@ class MatiereService:
 
         return self.matiere_repo.delete(matiere)
 
-    def search_matieres(self, query: str) -> List[Dict[str, Any]]:
-        """Recherche des matières"""
-        matieres = self.matiere_repo.search(query)
+    def search_matieres(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recherche des matières (les plus pertinentes d'abord)"""
+        matieres = self.matiere_repo.search(query, limit=limit)
         return [matiere.to_dict() for matiere in matieres]
@@ -3,6 +3,7 @@ Service pour la gestion des QCMs côté étudiant
 """
 from typing import List, Dict, Any
 from app.repositories.qcm_repository import QCMRepository
+from app.services.list_serializer import ListSerializer
 from app.repositories.user_repository import UserRepository
 from app.models.user import UserRole
 
@@ -13,6 +14,7 @@ class QCMEtudiantService:
     def __init__(self):
         self.qcm_repo = QCMRepository()
         self.user_repo = UserRepository()
+        self.list_serializer = ListSerializer()
     
     def get_qcms_disponibles(self, etudiant_id: str) -> List[Dict[str, Any]]:
         """
@@ -53,7 +55,7 @@ class QCMEtudiantService:
         qcms = self.qcm_repo.get_published_by_matieres(matieres_ids)
         logger.info(f"Trouvé {len(qcms)} QCM(s) publié(s) pour les matières de l'étudiant {etudiant_id}")
         
-        return [qcm.to_dict() for qcm in qcms]
+        return self.list_serializer.qcms(qcms)
     
     def can_access_qcm(self, qcm_id: str, etudiant_id: str) -> bool:
         """
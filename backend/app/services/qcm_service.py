@@ -4,6 +4,7 @@ Service pour la gestion des QCM avec logique métier
 from typing import Dict, Any, Optional, Tuple, List
 from app.repositories.qcm_repository import QCMRepository
 from app.repositories.user_repository import UserRepository
+from app.services.list_serializer import ListSerializer
 from app.models.qcm import QCM
 from app.models.user import UserRole
 
@@ -14,6 +15,7 @@ class QCMService:
     def __init__(self):
         self.qcm_repo = QCMRepository()
         self.user_repo = UserRepository()
+        self.list_serializer = ListSerializer()
 
     def get_qcms(self, filters: Optional[Dict[str, Any]] = None, skip: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], int]:
         """
@@ -23,7 +25,20 @@ class QCMService:
             Tuple (liste de QCM, total count)
         """
         qcms, total = self.qcm_repo.get_all_paginated(skip=skip, limit=limit, filters=filters)
-        return [qcm.to_dict() for qcm in qcms], total
+        return self.list_serializer.qcms(qcms), total
+
+    def get_qcms_curseur(self, filters: Optional[Dict[str, Any]] = None, limit: int = 100,
+                         curseur: Optional[str] = None,
+                         avec_total: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Récupère une page de QCM par curseur (created_at, id)
+
+        Returns:
+            Tuple (liste de QCM, curseur suivant, total ou None)
+        """
+        qcms, curseur_suivant, total = self.qcm_repo.get_all_keyset(
+            limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+        return self.list_serializer.qcms(qcms), curseur_suivant, total
 
     def get_qcm_by_id(self, qcm_id: str) -> Optional[Dict[str, Any]]:
         """Récupère un QCM par son ID"""
@@ -87,32 +102,14 @@ class QCMService:
             if not matiere:
                 matiere = matiere_obj.nom
         elif matiere:
-            # Si matiereId n'est pas fourni mais matiere (texte) l'est, chercher la matière par nom
-            from app.repositories.matiere_repository import MatiereRepository
-            from app.models.matiere import Matiere
-            matiere_repo = MatiereRepository()
+            # Si matiereId n'est pas fourni mais matiere (texte) l'est, chercher la matière par
+            # code, nom exact puis nom partiel (index en mémoire, sans accents ni casse)
+            from app.services.recherche_service import index_matieres
+            matiere_trouvee = index_matieres.resoudre(matiere)
             
-            # Chercher d'abord par code exact
-            matiere_obj = matiere_repo.get_by_code(matiere)
-            
-            # Si pas trouvé, chercher par nom exact
-            if not matiere_obj:
-                matiere_obj = matiere_repo.session.query(Matiere).filter(
-                    Matiere.nom.ilike(matiere.strip())
-                ).filter(Matiere.actif == True).first()
-            
-            # Si toujours pas trouvé, faire une recherche partielle
-            if not matiere_obj:
-                results = matiere_repo.search(matiere)
-                # Filtrer pour ne garder que les matières actives
-                results = [m for m in results if m.actif]
-                if results:
-                    # Prendre la première correspondance
-                    matiere_obj = results[0]
-            
-            if matiere_obj and matiere_obj.actif:
-                matiere_id = matiere_obj.id
-                matiere = matiere_obj.nom  # Utiliser le nom officiel
+            if matiere_trouvee and matiere_trouvee['actif']:
+                matiere_id = matiere_trouvee['id']
+                matiere = matiere_trouvee['nom']  # Utiliser le nom officiel
 
         # Validation status
         status = data.get('status', 'draft')
@@ -241,31 +238,14 @@ class QCMService:
         elif 'matiere' in data and data['matiere']:
             # Si matiereId n'est pas fourni mais matiere (texte) l'est, chercher la matière par nom
             matiere_text = data['matiere'].strip()
-            from app.repositories.matiere_repository import MatiereRepository
-            from app.models.matiere import Matiere
-            matiere_repo = MatiereRepository()
+            from app.services.recherche_service import index_matieres
             
-            # Chercher d'abord par code exact
-            matiere_obj = matiere_repo.get_by_code(matiere_text)
-            
-            # Si pas trouvé, chercher par nom exact
-            if not matiere_obj:
-                matiere_obj = matiere_repo.session.query(Matiere).filter(
-                    Matiere.nom.ilike(matiere_text)
-                ).filter(Matiere.actif == True).first()
-            
-            # Si toujours pas trouvé, faire une recherche partielle
-            if not matiere_obj:
-                results = matiere_repo.search(matiere_text)
-                # Filtrer pour ne garder que les matières actives
-                results = [m for m in results if m.actif]
-                if results:
-                    # Prendre la première correspondance
-                    matiere_obj = results[0]
+            # Code, nom exact puis nom partiel (index en mémoire, sans accents ni casse)
+            matiere_trouvee = index_matieres.resoudre(matiere_text)
             
-            if matiere_obj and matiere_obj.actif:
-                qcm.matiere_id = matiere_obj.id
-                qcm.matiere = matiere_obj.nom  # Utiliser le nom officiel
+            if matiere_trouvee and matiere_trouvee['actif']:
+                qcm.matiere_id = matiere_trouvee['id']
+                qcm.matiere = matiere_trouvee['nom']  # Utiliser le nom officiel
 
         # Validation status
         if 'status' in data:
@@ -298,7 +278,7 @@ class QCMService:
     def get_recent_qcms(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Récupère les QCM récemment créés"""
         qcms = self.qcm_repo.get_recent_qcms(limit=limit)
-        return [qcm.to_dict() for qcm in qcms]
+        return self.list_serializer.qcms(qcms)
 
     def get_qcms_by_status(self) -> Dict[str, int]:
         """Récupère le nombre de QCM par statut"""
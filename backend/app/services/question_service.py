@@ -27,6 +27,19 @@ class QuestionService:
         questions, total = self.question_repo.get_all_paginated(skip=skip, limit=limit, filters=filters)
         return [question.to_dict() for question in questions], total
 
+    def get_questions_curseur(self, filters: Optional[Dict[str, Any]] = None, limit: int = 100,
+                              curseur: Optional[str] = None,
+                              avec_total: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Récupère une page de questions par curseur (created_at, id)
+
+        Returns:
+            Tuple (liste de questions, curseur suivant, total ou None)
+        """
+        questions, curseur_suivant, total = self.question_repo.get_all_keyset(
+            limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+        return [question.to_dict() for question in questions], curseur_suivant, total
+
     def get_question_by_id(self, question_id: str) -> Optional[Dict[str, Any]]:
         """Récupère une question par son ID"""
         question = self.question_repo.get_by_id(question_id)
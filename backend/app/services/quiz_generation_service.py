@@ -2,12 +2,14 @@
 Service de génération de QCM asynchrone (sans Celery)
 """
 import logging
-from app import db, create_app
+import threading
+from app import db
 from app.models.qcm import QCM
-from app.models.question import Question
+from app.repositories.question_repository import QuestionRepository
 from app.services.ai_service import ai_service
 from app.services.document_parser import DocumentParser
 from app.services.async_task_manager import task_manager
+from app.utils.app_context import app_context
 
 logger = logging.getLogger(__name__)
 
@@ -38,10 +40,43 @@ def estimate_generation_time(num_questions: int, is_document: bool = False) -> i
     return int(total * 1.2)
 
 
+def _generer_questions_en_direct(task_id: str, qcm_id: str, user_id: str, text: str,
+                                 num_questions: int, debut: int, fin: int, **contexte):
+    """
+    Génère les questions en streaming: chaque question validée fait avancer la progression
+    de la tâche et est transmise à l'enseignant (Socket.IO) sans attendre la fin de la réponse.
+    La génération s'arrête dès que la tâche est annulée.
+    """
+    from app.events.notifications import notify_question_generee
+
+    lock = threading.Lock()
+    recues = [0]
+
+    def on_question(question):
+        with lock:
+            recues[0] += 1
+            numero = recues[0]
+        task_manager.update_task_progress(
+            task_id,
+            debut + int((fin - debut) * min(numero, num_questions) / num_questions),
+            f'{min(numero, num_questions)}/{num_questions} questions générées...'
+        )
+        if user_id:
+            notify_question_generee(user_id, task_id, qcm_id, question, numero, num_questions)
+
+    return ai_service.generate_questions_stream(
+        text=text,
+        num_questions=num_questions,
+        on_question=on_question,
+        annulation=task_manager.annulation(task_id),
+        **contexte
+    )
+
+
 def generate_quiz_from_text_async(task_id: str, qcm_id: str, text: str, 
                                   num_questions: int = 10, matiere: str = None, 
                                   niveau: str = None, mention: str = None,
-                                  parcours: str = None):
+                                  parcours: str = None, user_id: str = None):
     """
     Génère un QCM à partir de texte brut (version asynchrone)
     
@@ -54,6 +89,7 @@ def generate_quiz_from_text_async(task_id: str, qcm_id: str, text: str,
         niveau: Niveau académique (optionnel)
         mention: Mention académique (optionnel)
         parcours: Parcours académique (optionnel)
+        user_id: Enseignant à qui transmettre les questions au fil de la génération (optionnel)
     
     Returns:
         Dictionnaire avec les informations du QCM généré
@@ -66,21 +102,16 @@ def generate_quiz_from_text_async(task_id: str, qcm_id: str, text: str,
             task_id, 10, 'Analyse du texte en cours...'
         )
         
-        # Nettoyer le texte
-        clean_text = DocumentParser.clean_text(text, max_length=8000)
-        
         # Mise à jour: génération IA
         task_manager.update_task_progress(
             task_id, 30, 'Génération des questions avec l\'IA...'
         )
         
-        # Générer les questions avec l'IA
+        # Générer les questions avec l'IA en streaming (texte long découpé en parties, sans troncature)
         try:
-            questions_data = ai_service.generate_questions(
-                text=clean_text,
-                num_questions=num_questions,
-                matiere=matiere,
-                niveau=niveau
+            questions_data = _generer_questions_en_direct(
+                task_id, qcm_id, user_id, text, num_questions, 30, 70,
+                matiere=matiere, niveau=niveau, mention=mention, parcours=parcours
             )
         except Exception as e:
             error_msg = str(e)
@@ -98,32 +129,15 @@ def generate_quiz_from_text_async(task_id: str, qcm_id: str, text: str,
             task_id, 70, 'Enregistrement du QCM dans la base de données...'
         )
         
-        # Créer le contexte d'application pour accéder à la DB
-        app = create_app()
-        
-        with app.app_context():
+        # Contexte de l'application du processus (pas de create_app() par tâche)
+        with app_context():
             # Récupérer le QCM depuis la base
             qcm = QCM.query.get(qcm_id)
             if not qcm:
                 raise ValueError(f"QCM {qcm_id} non trouvé")
             
-            # Supprimer les anciennes questions si existantes
-            Question.query.filter_by(qcm_id=qcm_id).delete()
-            
-            # Créer les questions dans la base de données
-            for q_data in questions_data:
-                question = Question(
-                    qcm_id=qcm_id,
-                    enonce=q_data['enonce'],
-                    type_question=q_data.get('type_question', 'qcm'),
-                    points=q_data.get('points', 1),
-                    explication=q_data.get('explication', '')
-                )
-                
-                # Définir les options (stockées en JSON)
-                question.set_options(q_data['options'])
-                
-                db.session.add(question)
+            # Remplacer les questions du QCM (insertion en masse, une seule instruction)
+            QuestionRepository().replace_for_qcm(qcm_id, questions_data)
             
             # Mettre à jour le statut du QCM
             qcm.status = 'draft'
@@ -149,8 +163,7 @@ def generate_quiz_from_text_async(task_id: str, qcm_id: str, text: str,
         
         # Mettre le QCM en état d'erreur (brouillon)
         try:
-            app = create_app()
-            with app.app_context():
+            with app_context():
                 qcm = QCM.query.get(qcm_id)
                 if qcm:
                     qcm.status = 'draft'
@@ -161,23 +174,26 @@ def generate_quiz_from_text_async(task_id: str, qcm_id: str, text: str,
         raise
 
 
-def generate_quiz_from_document_async(task_id: str, qcm_id: str, file_bytes: bytes, 
+def generate_quiz_from_document_async(task_id: str, qcm_id: str, file_path: str,
                                       file_type: str, num_questions: int = 10, 
                                       matiere: str = None, niveau: str = None,
-                                      mention: str = None, parcours: str = None):
+                                      mention: str = None, parcours: str = None,
+                                      user_id: str = None):
     """
     Génère un QCM à partir d'un document (PDF ou DOCX) - version asynchrone
     
     Args:
         task_id: ID de la tâche pour le suivi
         qcm_id: ID du QCM à remplir
-        file_bytes: Contenu du fichier en bytes
+        file_path: Chemin du document (fichier temporaire écrit par l'endpoint, supprimé
+            par le nettoyage de la tâche)
         file_type: Type de fichier ('pdf' ou 'docx')
         num_questions: Nombre de questions à générer
         matiere: Matière (optionnel)
         niveau: Niveau académique (optionnel)
         mention: Mention académique (optionnel)
         parcours: Parcours académique (optionnel)
+        user_id: Enseignant à qui transmettre les questions au fil de la génération (optionnel)
     
     Returns:
         Dictionnaire avec les informations du QCM généré
@@ -190,33 +206,22 @@ def generate_quiz_from_document_async(task_id: str, qcm_id: str, file_bytes: byt
             task_id, 10, f'Extraction du texte depuis le document {file_type.upper()}...'
         )
         
-        # Extraire le texte du document
-        text = DocumentParser.extract_text(file_bytes, file_type)
+        # Extraire le texte du document (arrêt dès que le texte suffit pour la génération)
+        text = DocumentParser.extract_text(
+            file_path, file_type, max_chars=ai_service.max_source_chars(num_questions))
         
         logger.info(f"Texte extrait: {len(text)} caractères")
         
-        # Mise à jour: nettoyage
-        task_manager.update_task_progress(
-            task_id, 20, 'Préparation du texte...'
-        )
-        
-        # Nettoyer le texte
-        clean_text = DocumentParser.clean_text(text, max_length=8000)
-        
         # Mise à jour: génération IA
         task_manager.update_task_progress(
             task_id, 40, 'Génération des questions avec l\'IA...'
         )
         
-        # Générer les questions avec l'IA
+        # Générer les questions avec l'IA en streaming (texte long découpé en parties, sans troncature)
         try:
-            questions_data = ai_service.generate_questions(
-                text=clean_text,
-                num_questions=num_questions,
-                matiere=matiere,
-                niveau=niveau,
-                mention=mention,
-                parcours=parcours
+            questions_data = _generer_questions_en_direct(
+                task_id, qcm_id, user_id, text, num_questions, 40, 80,
+                matiere=matiere, niveau=niveau, mention=mention, parcours=parcours
             )
         except Exception as e:
             error_msg = str(e)
@@ -234,32 +239,15 @@ def generate_quiz_from_document_async(task_id: str, qcm_id: str, file_bytes: byt
             task_id, 80, 'Enregistrement du QCM dans la base de données...'
         )
         
-        # Créer le contexte d'application pour accéder à la DB
-        app = create_app()
-        
-        with app.app_context():
+        # Contexte de l'application du processus (pas de create_app() par tâche)
+        with app_context():
             # Récupérer le QCM depuis la base
             qcm = QCM.query.get(qcm_id)
             if not qcm:
                 raise ValueError(f"QCM {qcm_id} non trouvé")
             
-            # Supprimer les anciennes questions si existantes
-            Question.query.filter_by(qcm_id=qcm_id).delete()
-            
-            # Créer les questions dans la base de données
-            for q_data in questions_data:
-                question = Question(
-                    qcm_id=qcm_id,
-                    enonce=q_data['enonce'],
-                    type_question=q_data.get('type_question', 'qcm'),
-                    points=q_data.get('points', 1),
-                    explication=q_data.get('explication', '')
-                )
-                
-                # Définir les options (stockées en JSON)
-                question.set_options(q_data['options'])
-                
-                db.session.add(question)
+            # Remplacer les questions du QCM (insertion en masse, une seule instruction)
+            QuestionRepository().replace_for_qcm(qcm_id, questions_data)
             
             # Mettre à jour le statut du QCM
             qcm.status = 'draft'
@@ -285,8 +273,7 @@ def generate_quiz_from_document_async(task_id: str, qcm_id: str, file_bytes: byt
         
         # Mettre le QCM en état d'erreur (brouillon)
         try:
-            app = create_app()
-            with app.app_context():
+            with app_context():
                 qcm = QCM.query.get(qcm_id)
                 if qcm:
                     qcm.status = 'draft'
@@ -0,0 +1,151 @@
+"""
+Service de recherche: autocomplétion (utilisateurs, classes, matières) et résolution des matières
+
+- Utilisateurs et classes: recherche indexée en base (app.repositories.recherche), par préfixe
+  de mot, résultats classés et limités.
+- Matières: index en mémoire des codes et noms normalisés (minuscules, sans accents), construit
+  à partir de la liste du catalogue des référentiels et reconstruit quand son ETag change
+  (écriture sur une matière, expiration du cache). Sert l'autocomplétion et la résolution d'un
+  nom de matière saisi librement (création et modification de QCM, envoi aux étudiants) sans
+  requête SQL.
+"""
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.models.classe import Classe
+from app.repositories.classe_repository import ClasseRepository
+from app.repositories.user_repository import UserRepository
+from app.repositories.recherche import normaliser, borner_limite, LIMITE_RECHERCHE_DEFAUT
+from app.services.referentiel_service import catalogue_referentiels
+
+logger = logging.getLogger(__name__)
+
+TYPES_AUTOCOMPLETION = ('utilisateurs', 'classes', 'matieres')
+
+
+class IndexMatieres:
+    """Codes et noms de matières normalisés en mémoire (processus courant, thread-safe)"""
+
+    def __init__(self, catalogue=catalogue_referentiels):
+        self.catalogue = catalogue
+        # (etag, par code, par nom, entrées (code, nom, mots du nom, matière)) remplacé d'un bloc
+        self._index: Tuple[Optional[str], Dict[str, Dict], Dict[str, Dict], List[Tuple]] = (None, {}, {}, [])
+        self._lock = threading.Lock()
+
+    def _courant(self) -> Tuple[Optional[str], Dict[str, Dict], Dict[str, Dict], List[Tuple]]:
+        matieres, etag = self.catalogue.lister('matieres')
+        index = self._index
+        if index[0] == etag:
+            return index
+        with self._lock:
+            if self._index[0] != etag:
+                par_code, par_nom, entrees = {}, {}, []
+                for matiere in matieres:
+                    code, nom = normaliser(matiere.get('code')), normaliser(matiere.get('nom'))
+                    par_code.setdefault(code, matiere)
+                    # Nom exact: une matière active est préférée à une homonyme inactive
+                    homonyme = par_nom.get(nom)
+                    if homonyme is None or (matiere.get('actif') and not homonyme.get('actif')):
+                        par_nom[nom] = matiere
+                    entrees.append((code, nom, nom.split(), matiere))
+                self._index = (etag, par_code, par_nom, entrees)
+                logger.debug(f"Index des matières reconstruit ({len(entrees)} matières)")
+            return self._index
+
+    def resoudre(self, texte: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Matière désignée par un texte libre (même ordre que l'ancienne résolution SQL)
+
+        1. code exact (matière active ou non);
+        2. nom exact d'une matière active;
+        3. matière active dont le code ou le nom contient le texte, la plus proche d'abord
+           (nom commençant par le texte, puis nom le plus court).
+        Les comparaisons ignorent la casse, les accents et les espaces superflus.
+
+        Returns:
+            Dictionnaire de la matière (format to_dict) ou None
+        """
+        terme = normaliser(texte)
+        if not terme:
+            return None
+        _, par_code, par_nom, entrees = self._courant()
+        if terme in par_code:
+            return par_code[terme]
+        matiere = par_nom.get(terme)
+        if matiere and matiere.get('actif'):
+            return matiere
+
+        candidates = [
+            (not nom.startswith(terme), len(nom), nom, matiere)
+            for code, nom, _, matiere in entrees
+            if matiere.get('actif') and (terme in nom or terme in code)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: c[:3])[3]
+
+    def completer(self, terme: Optional[str], limite: int = LIMITE_RECHERCHE_DEFAUT,
+                  actives_seulement: bool = True) -> List[Dict[str, Any]]:
+        """Matières dont le code, ou un mot du nom, commence par le terme (code exact puis nom)"""
+        terme = normaliser(terme)
+        if not terme:
+            return []
+        mots_terme = terme.split()
+        resultats = []
+        for code, nom, mots, matiere in self._courant()[3]:
+            if actives_seulement and not matiere.get('actif'):
+                continue
+            if code.startswith(terme):
+                resultats.append((0 if code == terme else 1, nom, matiere))
+            elif nom.startswith(terme) or all(any(m.startswith(t) for m in mots) for t in mots_terme):
+                resultats.append((2 if nom.startswith(terme) else 3, nom, matiere))
+        resultats.sort(key=lambda r: r[:2])
+        return [matiere for _, _, matiere in resultats[:borner_limite(limite)]]
+
+
+index_matieres = IndexMatieres()
+
+
+class RechercheService:
+    """Service d'autocomplétion (champs de recherche et de sélection de l'interface)"""
+
+    def __init__(self):
+        self.user_repo = UserRepository()
+        self.classe_repo = ClasseRepository()
+        self.index_matieres = index_matieres
+
+    def autocompleter(self, terme: str, types: Iterable[str] = TYPES_AUTOCOMPLETION,
+                      limit: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Suggestions par type pour un début de saisie
+
+        Args:
+            terme: début de saisie (chaque mot doit commencer un mot du résultat)
+            types: parmi 'utilisateurs', 'classes', 'matieres'
+            limit: suggestions par type (borner_limite: défaut SEARCH_DEFAULT_LIMIT, au plus 100)
+
+        Returns:
+            {type: [{id, code/email, nom/name...}]} pour chaque type demandé
+        """
+        types = [t for t in types if t in TYPES_AUTOCOMPLETION]
+        limit = borner_limite(limit)
+        suggestions: Dict[str, List[Dict[str, Any]]] = {}
+
+        if 'utilisateurs' in types:
+            suggestions['utilisateurs'] = [
+                {'id': u.id, 'email': u.email, 'name': u.name, 'role': u.role.value}
+                for u in self.user_repo.rechercher(terme, limit=limit, prefixe=True)
+            ]
+        if 'classes' in types:
+            suggestions['classes'] = [
+                {'id': c.id, 'code': c.code, 'nom': c.nom, 'anneeScolaire': c.annee_scolaire}
+                for c in self.classe_repo.rechercher(terme, limit=limit, prefixe=True,
+                                                     filtres=(Classe.actif == True,))
+            ]
+        if 'matieres' in types:
+            suggestions['matieres'] = [
+                {'id': m['id'], 'code': m['code'], 'nom': m['nom']}
+                for m in self.index_matieres.completer(terme, limite=limit)
+            ]
+        return suggestions
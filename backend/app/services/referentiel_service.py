@@ -0,0 +1,141 @@
+"""
+Catalogue des référentiels (niveaux, mentions, parcours, matières, établissements)
+
+Les listes changent quelques fois par an mais sont lues par chaque formulaire: elles sont
+conservées en mémoire du processus avec un ETag (empreinte du contenu, identique d'un
+worker à l'autre) pour les réponses 304.
+
+- Invalidation: tout commit SQLAlchemy ayant créé, modifié ou supprimé un objet référentiel
+  vide le cache (services, seed, scripts). Un compteur de version empêche de remettre en
+  cache une liste lue avant l'invalidation.
+- Dans un déploiement à plusieurs processus, l'invalidation est locale: la durée du cache
+  (REFERENTIELS_CACHE_SECONDS) borne le délai de prise en compte par les autres.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from itertools import chain
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.niveau import Niveau
+from app.models.mention import Mention
+from app.models.parcours import Parcours
+from app.models.matiere import Matiere
+from app.models.etablissement import Etablissement
+from app.services.niveau_service import NiveauService
+from app.services.mention_service import MentionService
+from app.services.parcours_service import ParcoursService
+from app.services.matiere_service import MatiereService
+from app.services.etablissement_service import EtablissementService
+
+logger = logging.getLogger(__name__)
+
+# Durée de validité des listes en cache (secondes, 0 pour désactiver le cache)
+REFERENTIELS_CACHE_SECONDES = float(os.getenv('REFERENTIELS_CACHE_SECONDS', '300'))
+
+MODELES_REFERENTIELS = (Niveau, Mention, Parcours, Matiere, Etablissement)
+
+
+def calculer_etag(donnees: Any) -> str:
+    """Empreinte du contenu sérialisé (sans guillemets)"""
+    contenu = json.dumps(donnees, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(contenu.encode('utf-8')).hexdigest()[:20]
+
+
+class CatalogueReferentiels:
+    """Listes des référentiels en cache (processus courant, thread-safe)"""
+
+    ENTITES = ('niveaux', 'mentions', 'parcours', 'matieres', 'etablissements')
+
+    def __init__(self, ttl_secondes: float = REFERENTIELS_CACHE_SECONDES):
+        self.ttl_secondes = ttl_secondes
+        self.niveau_service = NiveauService()
+        self.mention_service = MentionService()
+        self.parcours_service = ParcoursService()
+        self.matiere_service = MatiereService()
+        self.etablissement_service = EtablissementService()
+        self._entrees: Dict[Tuple[str, bool], Tuple[float, Any, str]] = {}
+        self._lock = threading.Lock()
+        # Incrémentée à chaque invalidation
+        self.version = 0
+
+    def _chargeur(self, entite: str) -> Callable[[bool], List[Dict[str, Any]]]:
+        """Lecture en base d'une liste (mêmes données que les routes de chaque référentiel)"""
+        chargeurs = {
+            'niveaux': self.niveau_service.get_all_niveaux,
+            'mentions': self.mention_service.get_all_mentions,
+            'parcours': self.parcours_service.get_all_parcours,
+            'matieres': self.matiere_service.get_all_matieres,
+            'etablissements': self.etablissement_service.get_all_etablissements,
+        }
+        if entite not in chargeurs:
+            raise ValueError(f"Référentiel inconnu: {entite}")
+        return chargeurs[entite]
+
+    def _lire(self, cle: Tuple[str, bool], charger: Callable[[], Any]) -> Tuple[Any, str]:
+        with self._lock:
+            entree = self._entrees.get(cle)
+            if entree and entree[0] > time.monotonic():
+                return entree[1], entree[2]
+
+        version = self.version
+        donnees = charger()
+        etag = calculer_etag(donnees)
+        if self.ttl_secondes > 0:
+            with self._lock:
+                if version == self.version:
+                    self._entrees[cle] = (time.monotonic() + self.ttl_secondes, donnees, etag)
+        return donnees, etag
+
+    def lister(self, entite: str, actifs_seulement: bool = False) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Liste d'un référentiel et son ETag
+
+        Returns:
+            (liste, etag); la liste est partagée entre les requêtes et ne doit pas être modifiée
+        """
+        charger = self._chargeur(entite)
+        return self._lire((entite, actifs_seulement), lambda: charger(actifs_seulement))
+
+    def catalogue(self, actifs_seulement: bool = False) -> Tuple[Dict[str, Any], str]:
+        """Tous les référentiels en une seule réponse (listes déroulantes des formulaires) et leur ETag"""
+        return self._lire(('catalogue', actifs_seulement), lambda: {
+            entite: self.lister(entite, actifs_seulement)[0] for entite in self.ENTITES
+        })
+
+    def invalider(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entrees.clear()
+
+
+catalogue_referentiels = CatalogueReferentiels()
+
+
+@event.listens_for(Session, 'after_flush')
+def _noter_ecritures_referentiels(session, flush_context):
+    """Repère les transactions qui modifient un référentiel (listes new/dirty/deleted avant flush)"""
+    if session.info.get('referentiels_modifies'):
+        return
+    for objet in chain(session.new, session.dirty, session.deleted):
+        if isinstance(objet, MODELES_REFERENTIELS):
+            session.info['referentiels_modifies'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalider_apres_commit(session):
+    if session.info.pop('referentiels_modifies', False):
+        catalogue_referentiels.invalider()
+        logger.debug("Catalogue des référentiels invalidé")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _oublier_ecritures_annulees(session):
+    session.info.pop('referentiels_modifies', None)
@@ -7,6 +7,11 @@ from app.repositories.resultat_repository import ResultatRepository
 from app.repositories.session_examen_repository import SessionExamenRepository
 from app.repositories.user_repository import UserRepository
 from app.repositories.qcm_repository import QCMRepository
+from app.services.statistiques_qcm_service import StatistiquesQCMService
+from app.services.commentaire_ia_pipeline import (
+    commentaire_pipeline, commentaire_par_defaut, donnees_commentaire
+)
+from app.events.exam_timer import enregistrer_echeance, oublier_echeance
 from app.models.resultat import Resultat
 from app.models.user import UserRole
 
@@ -19,6 +24,7 @@ class ResultatService:
         self.session_repo = SessionExamenRepository()
         self.user_repo = UserRepository()
         self.qcm_repo = QCMRepository()
+        self.statistiques_service = StatistiquesQCMService()
 
     def get_all_resultats(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], int]:
         """Récupère tous les résultats avec pagination"""
@@ -26,6 +32,14 @@ class ResultatService:
             skip=skip, limit=limit, filters=filters)
         return [resultat.to_dict() for resultat in resultats], total
 
+    def get_resultats_curseur(self, limit: int = 100, curseur: Optional[str] = None,
+                              filters: Optional[Dict[str, Any]] = None,
+                              avec_total: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """Récupère une page de résultats par curseur (created_at, id)"""
+        resultats, curseur_suivant, total = self.resultat_repo.get_all_keyset(
+            limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+        return [resultat.to_dict() for resultat in resultats], curseur_suivant, total
+
     def get_resultat_by_id(self, resultat_id: str, include_details: bool = False) -> Optional[Dict[str, Any]]:
         """Récupère un résultat par son ID"""
         import logging
@@ -99,8 +113,8 @@ class ResultatService:
         if not qcm:
             raise ValueError(f"QCM {qcm_id} non trouvé")
         
-        # Récupérer les statistiques depuis le repository
-        stats = self.resultat_repo.get_statistiques_qcm(qcm_id)
+        # Récupérer les statistiques depuis les agrégats pré-calculés
+        stats = self.statistiques_service.get_statistiques_qcm(qcm_id)
         
         # Ajouter des informations sur le QCM
         stats['qcm'] = {
@@ -169,6 +183,9 @@ class ResultatService:
         )
 
         resultat = self.resultat_repo.create(resultat)
+
+        # Échéance gardée en mémoire pour le compte à rebours WebSocket
+        enregistrer_echeance(resultat, session.duree_minutes)
         return resultat.to_dict()
 
     def demarrer_examen_format(self, session_id: str, etudiant_id: str) -> Dict[str, Any]:
@@ -381,28 +398,8 @@ class ResultatService:
         
         resultat.status = 'termine'
         
-        # Générer un commentaire automatique avec l'IA
-        try:
-            from app.services.ai_service import ai_service
-            commentaire_ia = ai_service.generate_commentaire_resultat(
-                note_sur_20=resultat.note_sur_20 or 0,
-                pourcentage=resultat.pourcentage or 0,
-                questions_correctes=questions_correctes,
-                questions_total=resultat.questions_total,
-                est_reussi=resultat.est_reussi
-            )
-            resultat.commentaire_prof = commentaire_ia
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Erreur génération commentaire IA: {e}, utilisation du fallback")
-            # Fallback si l'IA échoue
-            if resultat.pourcentage >= 80:
-                resultat.commentaire_prof = "Excellent travail ! Continuez ainsi."
-            elif resultat.pourcentage >= 50:
-                resultat.commentaire_prof = "Bon travail. Quelques révisions nécessaires."
-            else:
-                resultat.commentaire_prof = "À améliorer. Revoyez les concepts de base."
+        # Commentaire déterministe immédiat; le commentaire IA est généré en arrière-plan
+        resultat.commentaire_prof = commentaire_par_defaut(resultat.pourcentage)
         
         # Générer un feedback automatique basique (pour compatibilité)
         if resultat.pourcentage >= 80:
@@ -412,7 +409,19 @@ class ResultatService:
         else:
             resultat.feedback_auto = "N'hésitez pas à revoir les concepts et à refaire l'examen."
 
+        # Mettre à jour les statistiques agrégées du QCM dans la même transaction
+        self.statistiques_service.enregistrer_resultat(resultat, reponses_detail)
+
         resultat = self.resultat_repo.update(resultat)
+        oublier_echeance(resultat.id)
+
+        try:
+            commentaire_pipeline.planifier(resultat.id, resultat.commentaire_prof)
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Impossible de planifier le commentaire IA du résultat {resultat.id}: {e}")
+
         return resultat.to_dict(include_details=True)
     
     def _get_correct_answer(self, question) -> Any:
@@ -491,6 +500,9 @@ class ResultatService:
         if not resultat:
             raise ValueError("Résultat non trouvé")
 
+        ancienne_note = resultat.note_sur_20
+        ancien_pourcentage = resultat.pourcentage
+
         # Mise à jour des scores
         if 'score_total' in correction_data:
             resultat.score_total = float(correction_data['score_total'])
@@ -526,6 +538,9 @@ class ResultatService:
         if 'feedback_auto' in correction_data:
             resultat.feedback_auto = correction_data['feedback_auto']
 
+        # Mettre à jour les statistiques agrégées du QCM dans la même transaction
+        self.statistiques_service.corriger_resultat(resultat, ancienne_note, ancien_pourcentage)
+
         resultat = self.resultat_repo.update(resultat)
         return resultat.to_dict(include_details=True)
 
@@ -584,28 +599,17 @@ class ResultatService:
         if session and resultat.note_sur_20 is not None:
             resultat.est_reussi = resultat.note_sur_20 >= session.note_passage
 
-        # Générer un nouveau commentaire avec l'IA
+        # Générer un nouveau commentaire avec l'IA (API groupée, fallback intégré)
         try:
             from app.services.ai_service import ai_service
-            commentaire_ia = ai_service.generate_commentaire_resultat(
-                note_sur_20=resultat.note_sur_20 or 0,
-                pourcentage=resultat.pourcentage or 0,
-                questions_correctes=resultat.questions_correctes,
-                questions_total=resultat.questions_total,
-                est_reussi=resultat.est_reussi
-            )
-            resultat.commentaire_prof = commentaire_ia
+            resultat.commentaire_prof = ai_service.generate_commentaires_resultats(
+                [donnees_commentaire(resultat)])[0]
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
             logger.warning(f"Erreur régénération commentaire IA: {e}, utilisation du fallback")
             # Fallback si l'IA échoue
-            if resultat.pourcentage >= 80:
-                resultat.commentaire_prof = "Excellent travail ! Continuez ainsi."
-            elif resultat.pourcentage >= 50:
-                resultat.commentaire_prof = "Bon travail. Quelques révisions nécessaires."
-            else:
-                resultat.commentaire_prof = "À améliorer. Revoyez les concepts de base."
+            resultat.commentaire_prof = commentaire_par_defaut(resultat.pourcentage)
 
         resultat = self.resultat_repo.update(resultat)
         return resultat.to_dict(include_details=True)
@@ -622,7 +626,11 @@ class ResultatService:
         if not resultat:
             raise ValueError("Résultat non trouvé")
 
-        return self.resultat_repo.delete(resultat)
+        self.resultat_repo.session.delete(resultat)
+        self.statistiques_service.retirer_resultat(resultat)
+        self.resultat_repo.session.commit()
+        oublier_echeance(resultat_id)
+        return True
 
     def get_stats_etudiant_format(self, etudiant_id: str) -> Dict[str, Any]:
         """
@@ -805,18 +813,39 @@ class ResultatService:
         resultats_termines = [r for r in resultats if r.status == 'termine']
         
         # Publier tous les résultats terminés
-        count_publies = 0
-        for resultat in resultats_termines:
-            if not resultat.est_publie:
-                resultat.est_publie = True
-                self.resultat_repo.update(resultat)
-                count_publies += 1
-        
-        # Mettre à jour le flag de publication globale de la session
+        a_publier = [r for r in resultats_termines if not r.est_publie]
+        for resultat in a_publier:
+            resultat.est_publie = True
+        count_publies = len(a_publier)
+
+        # Remplacer les commentaires encore par défaut (IA indisponible à la soumission)
+        # par des commentaires IA générés en requêtes groupées
+        sans_commentaire_ia = [
+            r for r in a_publier
+            if not r.commentaire_prof or r.commentaire_prof == commentaire_par_defaut(r.pourcentage)
+        ]
+        if sans_commentaire_ia:
+            try:
+                from app.services.ai_service import ai_service
+                commentaires = ai_service.generate_commentaires_resultats(
+                    [donnees_commentaire(r) for r in sans_commentaire_ia])
+                for resultat, commentaire in zip(sans_commentaire_ia, commentaires):
+                    resultat.commentaire_prof = commentaire
+            except Exception as e:
+                logger.warning(f"Erreur génération commentaires IA de la session {session_id}: {e}")
+
+        # Mettre à jour le flag de publication globale de la session (un seul commit)
         session.resultats_publies = True
         self.session_repo.update(session)
         
         logger.info(f"Session {session_id}: {count_publies} résultats publiés")
+
+        # Notifications des étudiants après le commit, émises ensemble (un aller-retour vers la file)
+        if a_publier:
+            from app.events.notifications import notify_resultats_publies
+            notify_resultats_publies(
+                [(r.etudiant_id, r.id) for r in a_publier],
+                {'id': session_id, 'titre': session.titre})
         
         return {
             'session_id': session_id,
@@ -7,6 +7,7 @@ from app.repositories.session_examen_repository import SessionExamenRepository
 from app.repositories.qcm_repository import QCMRepository
 from app.repositories.classe_repository import ClasseRepository
 from app.repositories.user_repository import UserRepository
+from app.services.list_serializer import ListSerializer
 from app.models.session_examen import SessionExamen
 from app.models.user import UserRole
 
@@ -19,12 +20,21 @@ class SessionExamenService:
         self.qcm_repo = QCMRepository()
         self.classe_repo = ClasseRepository()
         self.user_repo = UserRepository()
+        self.list_serializer = ListSerializer()
 
     def get_all_sessions(self, skip: int = 0, limit: int = 100, filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], int]:
         """Récupère toutes les sessions avec pagination"""
         sessions, total = self.session_repo.get_all_paginated(
             skip=skip, limit=limit, filters=filters)
-        return [session.to_dict() for session in sessions], total
+        return self.list_serializer.sessions(sessions), total
+
+    def get_sessions_curseur(self, limit: int = 100, curseur: Optional[str] = None,
+                             filters: Optional[Dict[str, Any]] = None,
+                             avec_total: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """Récupère une page de sessions par curseur (created_at, id)"""
+        sessions, curseur_suivant, total = self.session_repo.get_all_keyset(
+            limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+        return self.list_serializer.sessions(sessions), curseur_suivant, total
 
     def get_session_by_id(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Récupère une session par son ID"""
@@ -34,45 +44,41 @@ class SessionExamenService:
     def get_sessions_by_qcm(self, qcm_id: str) -> List[Dict[str, Any]]:
         """Récupère les sessions d'un QCM"""
         sessions = self.session_repo.get_by_qcm(qcm_id)
-        return [session.to_dict() for session in sessions]
+        return self.list_serializer.sessions(sessions)
 
     def get_sessions_by_classe(self, classe_id: str) -> List[Dict[str, Any]]:
         """Récupère les sessions d'une classe"""
         sessions = self.session_repo.get_by_classe(classe_id)
-        return [session.to_dict() for session in sessions]
+        return self.list_serializer.sessions(sessions)
 
     def get_sessions_disponibles(self, etudiant_id: str) -> List[Dict[str, Any]]:
         """Récupère les sessions disponibles pour un étudiant"""
         sessions = self.session_repo.get_disponibles_etudiant(etudiant_id)
-        return [session.to_dict() for session in sessions]
+        return self.list_serializer.sessions(sessions)
 
     def get_sessions_disponibles_format(self, etudiant_id: str) -> List[Dict[str, Any]]:
         """
         Récupère les sessions disponibles formatées pour le frontend (format Examen[])
         Inclut les sessions programmées (actuelles et futures), en cours, et terminées récemment
+
+        Le nombre de requêtes est constant quel que soit le nombre de sessions :
+        sessions (avec QCM et classe chargés), agrégats des questions, état des tentatives.
         """
         from app.repositories.resultat_repository import ResultatRepository
-        from datetime import datetime, timedelta
-        from sqlalchemy import and_, or_
+        from app.repositories.question_repository import QuestionRepository
+        from datetime import timedelta
 
         now = datetime.utcnow()
         resultat_repo = ResultatRepository()
+        question_repo = QuestionRepository()
         
         # Récupérer les sessions disponibles (programmées ou en cours)
         # La date de début n'est plus une restriction - seule la date de fin (limite de soumission) compte
         sessions_disponibles = self.session_repo.get_disponibles_etudiant(etudiant_id)
         
-        # Plus besoin de récupérer séparément les sessions futures car elles sont déjà incluses
-        # dans get_disponibles_etudiant si leur date_fin n'est pas passée
-        
         # Récupérer les sessions terminées récemment (30 derniers jours) pour l'historique
         date_limite = now - timedelta(days=30)
-        sessions_terminees = self.session_repo.session.query(SessionExamen).filter(
-            and_(
-                SessionExamen.status == 'terminee',
-                SessionExamen.date_fin >= date_limite
-            )
-        ).order_by(SessionExamen.date_fin.desc()).all()
+        sessions_terminees = self.session_repo.get_terminees_depuis(date_limite)
         
         # Combiner les sessions disponibles et terminées (sans doublons)
         sessions_ids = {s.id for s in sessions_disponibles}
@@ -82,48 +88,37 @@ class SessionExamenService:
                 sessions.append(s)
                 sessions_ids.add(s.id)
 
+        # Agrégats calculés en SQL pour l'ensemble des sessions
+        agregats_qcm = question_repo.get_agregats_par_qcm(
+            list({s.qcm_id for s in sessions}))
+        etats_tentatives = resultat_repo.get_etat_tentatives_par_session(
+            etudiant_id, [s.id for s in sessions])
+
         examens_formates = []
         for session in sessions:
-            # Récupérer le QCM
-            qcm = self.qcm_repo.get_by_id(session.qcm_id)
+            qcm = session.qcm
             if not qcm:
                 continue
 
-            # Compter les questions
-            nombre_questions = len(qcm.questions) if qcm.questions else 0
-            total_points = sum(
-                [q.points for q in qcm.questions]) if qcm.questions else 0
+            agregats = agregats_qcm.get(qcm.id, {})
+            nombre_questions = agregats.get('nombre_questions', 0)
+            total_points = agregats.get('total_points', 0)
 
-            # Compter les tentatives
-            nb_tentatives = resultat_repo.count_tentatives(
-                etudiant_id, session.id)
             # NOTE: tentatives_restantes désactivé temporairement (pas de limite)
             tentatives_restantes = 999  # Valeur arbitraire élevée pour indiquer "illimité"
 
             # Déterminer le statut
             # Vérifier d'abord si la session est terminée
+            etat = etats_tentatives.get(session.id, {})
             if session.status == 'terminee':
                 statut = 'termine'
+            elif etat.get('terminees'):
+                # Un résultat terminé est prioritaire
+                statut = 'termine'
+            elif etat.get('en_cours'):
+                statut = 'en_cours'
             else:
-                # Vérifier les résultats de l'étudiant pour cette session
-                resultats_etudiant = resultat_repo.get_by_etudiant(etudiant_id)
-                resultats_session = [r for r in resultats_etudiant if r.session_id == session.id]
-                
-                # Vérifier s'il y a un résultat terminé (priorité)
-                resultat_termine = next(
-                    (r for r in resultats_session if r.status == 'termine'), None)
-                
-                if resultat_termine:
-                    statut = 'termine'
-                else:
-                    # Vérifier s'il y a un résultat en cours
-                    resultat_en_cours = next(
-                        (r for r in resultats_session if r.status == 'en_cours'), None)
-                    
-                    if resultat_en_cours:
-                        statut = 'en_cours'
-                    else:
-                        statut = 'disponible'  # Session disponible (peut être démarrée)
+                statut = 'disponible'  # Session disponible (peut être démarrée)
 
             # Récupérer le niveau depuis la classe si disponible
             niveau = 'Non spécifié'
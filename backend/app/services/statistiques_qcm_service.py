@@ -0,0 +1,366 @@
+"""
+Service de statistiques des QCM basé sur des agrégats pré-calculés
+
+Les agrégats (StatistiquesQCM / StatistiquesQuestion) sont mis à jour de manière
+incrémentale dans la transaction qui enregistre un résultat. La lecture des
+statistiques est ainsi en O(questions), quel que soit le nombre de soumissions.
+
+La lecture n'écrit jamais: les agrégats d'un QCM sont créés par sa première soumission
+terminée, ceux des QCM ayant des résultats antérieurs par `flask rebuild-stats-qcm`.
+Un QCM sans agrégats est lu comme n'ayant aucune soumission.
+"""
+import json
+import logging
+import math
+from typing import Dict, Any, Optional, List
+from app.repositories.statistiques_qcm_repository import StatistiquesQCMRepository
+from app.repositories.question_repository import QuestionRepository
+from app.models.statistiques_qcm import StatistiquesQCM, PAS_HISTOGRAMME
+from app.models.resultat import Resultat
+from app.models.reponse_resultat import encoder_reponse, decoder_reponse
+
+logger = logging.getLogger(__name__)
+
+# Seuil de réussite utilisé par les statistiques QCM (note sur 20)
+SEUIL_REUSSITE = 10.0
+
+
+def _indice_note(note: float) -> int:
+    """Indice de la classe de l'histogramme contenant la note"""
+    return int(math.floor(note * PAS_HISTOGRAMME + 1e-9))
+
+
+def _cle_reponse(answer: Any) -> str:
+    """Encode une réponse en clé JSON stable pour l'histogramme des réponses"""
+    return encoder_reponse(answer)
+
+
+def _estimer_mediane(histogramme: Dict[int, int], nombre: int) -> float:
+    """Estime la médiane à partir de l'histogramme (précision: 1 / PAS_HISTOGRAMME)"""
+    if nombre <= 0:
+        return 0
+    rangs = [(nombre - 1) // 2, nombre // 2]
+    valeurs = []
+    cumul = 0
+    for indice in sorted(histogramme):
+        effectif = histogramme[indice]
+        while rangs and rangs[0] < cumul + effectif:
+            valeurs.append(indice / PAS_HISTOGRAMME)
+            rangs.pop(0)
+        cumul += effectif
+    if not valeurs:
+        return 0
+    return sum(valeurs) / len(valeurs)
+
+
+class StatistiquesQCMService:
+    """Service pour la maintenance et la lecture des agrégats de statistiques"""
+
+    def __init__(self):
+        self.stats_repo = StatistiquesQCMRepository()
+        self.question_repo = QuestionRepository()
+
+    # ------------------------------------------------------------------
+    # Mise à jour incrémentale
+    # ------------------------------------------------------------------
+
+    def enregistrer_resultat(self, resultat: Resultat, reponses_detail: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Ajoute la contribution d'un résultat terminé aux agrégats (sans commit)
+
+        Les agrégats sont créés à la première soumission terminée du QCM. Un QCM ayant déjà
+        d'autres résultats sans agrégats n'est pas mis à jour (reconstruction complète
+        nécessaire: `flask rebuild-stats-qcm`).
+        """
+        stats = self.stats_repo.get_by_qcm(resultat.qcm_id, verrouiller=True)
+        if not stats:
+            stats = self._creer_agregats(resultat)
+            if not stats:
+                logger.warning(f"Agrégats absents pour le QCM {resultat.qcm_id}: "
+                               f"exécuter `flask rebuild-stats-qcm --qcm-id {resultat.qcm_id}`")
+                return
+
+        if reponses_detail is None:
+            reponses_detail = resultat.get_reponses_detail()
+
+        stats.nombre_soumissions += 1
+        if self.stats_repo.count_autres_soumissions_etudiant(
+                resultat.qcm_id, resultat.etudiant_id, resultat.id) == 0:
+            stats.nombre_etudiants_uniques += 1
+
+        self._appliquer_note(stats, resultat.note_sur_20, resultat.pourcentage,
+                             resultat.duree_reelle_secondes, 1)
+        self._appliquer_reponses(resultat.qcm_id, reponses_detail, 1)
+
+    def _creer_agregats(self, resultat: Resultat) -> Optional[StatistiquesQCM]:
+        """
+        Agrégats (verrouillés) d'un QCM sans agrégats, créés vides si ce résultat est sa première
+        soumission terminée; None si d'autres résultats n'y figurent pas
+
+        Deux premières soumissions concurrentes ne voient pas le résultat de l'autre: chacune
+        crée les agrégats (ON CONFLICT DO NOTHING), la seconde attend le verrou de la première
+        puis ajoute sa contribution.
+        """
+        if self.stats_repo.count_autres_soumissions(resultat.qcm_id, resultat.id) == 0:
+            self.stats_repo.creer_si_absent(resultat.qcm_id)
+        # Relu aussi lorsque d'autres résultats existent: créés entre-temps par leur soumission
+        return self.stats_repo.get_by_qcm(resultat.qcm_id, verrouiller=True)
+
+    def corriger_resultat(self, resultat: Resultat, ancienne_note: Optional[float],
+                          ancien_pourcentage: Optional[float]) -> None:
+        """Remplace la contribution de la note d'un résultat terminé corrigé (sans commit)"""
+        if resultat.status != 'termine':
+            return
+        stats = self.stats_repo.get_by_qcm(resultat.qcm_id, verrouiller=True)
+        if not stats:
+            return
+
+        self._appliquer_note(stats, ancienne_note, ancien_pourcentage, None, -1)
+        self._appliquer_note(stats, resultat.note_sur_20, resultat.pourcentage, None, 1)
+        self._recalculer_bornes_si_besoin(stats, ancienne_note)
+
+    def retirer_resultat(self, resultat: Resultat) -> None:
+        """
+        Retire la contribution d'un résultat terminé (sans commit)
+        À appeler après session.delete(resultat) pour que les bornes soient recalculées sans lui
+        """
+        if resultat.status != 'termine':
+            return
+        stats = self.stats_repo.get_by_qcm(resultat.qcm_id, verrouiller=True)
+        if not stats:
+            return
+
+        stats.nombre_soumissions = max(0, stats.nombre_soumissions - 1)
+        if self.stats_repo.count_autres_soumissions_etudiant(
+                resultat.qcm_id, resultat.etudiant_id, resultat.id) == 0:
+            stats.nombre_etudiants_uniques = max(0, stats.nombre_etudiants_uniques - 1)
+
+        self._appliquer_note(stats, resultat.note_sur_20, resultat.pourcentage,
+                             resultat.duree_reelle_secondes, -1)
+        self._appliquer_reponses(resultat.qcm_id, resultat.get_reponses_detail(), -1)
+        self._recalculer_bornes_si_besoin(stats, resultat.note_sur_20)
+
+    def _appliquer_note(self, stats: StatistiquesQCM, note: Optional[float], pourcentage: Optional[float],
+                        duree: Optional[int], signe: int) -> None:
+        """Ajoute (signe=1) ou retire (signe=-1) une note des sommes courantes et de l'histogramme"""
+        if note is not None:
+            stats.nombre_notes += signe
+            stats.somme_notes += signe * note
+            if note >= SEUIL_REUSSITE:
+                stats.nombre_reussis += signe
+
+            histogramme = stats.get_histogramme()
+            indice = _indice_note(note)
+            histogramme[indice] = histogramme.get(indice, 0) + signe
+            stats.set_histogramme(histogramme)
+
+            if signe > 0:
+                stats.note_min = note if stats.note_min is None else min(stats.note_min, note)
+                stats.note_max = note if stats.note_max is None else max(stats.note_max, note)
+
+        if pourcentage is not None:
+            stats.nombre_pourcentages += signe
+            stats.somme_pourcentages += signe * pourcentage
+
+        if duree is not None:
+            stats.nombre_durees += signe
+            stats.somme_durees += signe * duree
+
+    def _recalculer_bornes_si_besoin(self, stats: StatistiquesQCM, note_retiree: Optional[float]) -> None:
+        """Recalcule min/max en SQL si la note retirée était une des bornes"""
+        if note_retiree is None:
+            return
+        if note_retiree == stats.note_min or note_retiree == stats.note_max:
+            self.stats_repo.session.flush()
+            stats.note_min, stats.note_max = self.stats_repo.get_bornes_notes(stats.qcm_id)
+
+    def _appliquer_reponses(self, qcm_id: str, reponses_detail: Dict[str, Any], signe: int) -> None:
+        """Ajoute ou retire les réponses d'une soumission des agrégats par question"""
+        if not reponses_detail:
+            return
+
+        stats_questions = self.stats_repo.get_questions_by_qcm(qcm_id, verrouiller=True)
+        for question_id, reponse_data in reponses_detail.items():
+            if not isinstance(reponse_data, dict):
+                continue
+
+            stats_question = stats_questions.get(question_id)
+            if not stats_question:
+                if signe < 0:
+                    continue
+                stats_question = self.stats_repo.create_question(question_id, qcm_id)
+                stats_questions[question_id] = stats_question
+
+            stats_question.nombre_reponses += signe
+            if reponse_data.get('correct', False):
+                stats_question.nombre_correctes += signe
+
+            answer = reponse_data.get('answer', '')
+            if answer:
+                frequences = stats_question.get_reponses_frequentes()
+                cle = _cle_reponse(answer)
+                frequences[cle] = frequences.get(cle, 0) + signe
+                stats_question.set_reponses_frequentes(frequences)
+
+    # ------------------------------------------------------------------
+    # Reconstruction (backfill)
+    # ------------------------------------------------------------------
+
+    def reconstruire_qcm(self, qcm_id: str) -> StatistiquesQCM:
+        """
+        Reconstruit intégralement les agrégats d'un QCM à partir des résultats terminés
+        Les réponses sont agrégées en SQL par (question, réponse). Commit à la fin.
+        """
+        session = self.stats_repo.session
+        self.stats_repo.delete_by_qcm(qcm_id)
+        stats = self.stats_repo.get_or_create_by_qcm(qcm_id)
+        questions_valides = {q.id for q in self.question_repo.get_by_qcm(qcm_id)}
+
+        etudiants = set()
+        histogramme = {}
+        par_question = {}  # question_id -> [nombre_reponses, nombre_correctes, frequences]
+
+        for etudiant_id, note, pourcentage, duree in self.stats_repo.get_notes_resultats(qcm_id):
+            stats.nombre_soumissions += 1
+            etudiants.add(etudiant_id)
+
+            if note is not None:
+                stats.nombre_notes += 1
+                stats.somme_notes += note
+                if note >= SEUIL_REUSSITE:
+                    stats.nombre_reussis += 1
+                indice = _indice_note(note)
+                histogramme[indice] = histogramme.get(indice, 0) + 1
+                stats.note_min = note if stats.note_min is None else min(stats.note_min, note)
+                stats.note_max = note if stats.note_max is None else max(stats.note_max, note)
+            if pourcentage is not None:
+                stats.nombre_pourcentages += 1
+                stats.somme_pourcentages += pourcentage
+            if duree is not None:
+                stats.nombre_durees += 1
+                stats.somme_durees += duree
+
+        for question_id, cle, nombre, nombre_correctes in self.stats_repo.agreger_reponses(qcm_id):
+            if question_id not in questions_valides:
+                continue
+            agregat = par_question.setdefault(question_id, [0, 0, {}])
+            agregat[0] += nombre
+            agregat[1] += nombre_correctes or 0
+            # Les réponses vides ne figurent pas dans les réponses fréquentes
+            if cle is not None and decoder_reponse(cle):
+                agregat[2][cle] = agregat[2].get(cle, 0) + nombre
+
+        stats.nombre_etudiants_uniques = len(etudiants)
+        stats.set_histogramme(histogramme)
+        for question_id, (nombre_reponses, nombre_correctes, frequences) in par_question.items():
+            stats_question = self.stats_repo.create_question(question_id, qcm_id)
+            stats_question.nombre_reponses = nombre_reponses
+            stats_question.nombre_correctes = nombre_correctes
+            stats_question.set_reponses_frequentes(frequences)
+
+        session.commit()
+        logger.info(f"Statistiques du QCM {qcm_id} reconstruites: {stats.nombre_soumissions} soumissions")
+        return stats
+
+    def reconstruire_tous(self) -> int:
+        """Reconstruit les agrégats de tous les QCM ayant des résultats. Retourne le nombre de QCM traités"""
+        session = self.stats_repo.session
+        qcm_ids = [row[0] for row in session.query(Resultat.qcm_id).distinct().all()]
+        for qcm_id in qcm_ids:
+            self.reconstruire_qcm(qcm_id)
+        return len(qcm_ids)
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def get_statistiques_qcm(self, qcm_id: str) -> Dict[str, Any]:
+        """Récupère les statistiques complètes d'un QCM depuis les agrégats (sans écriture)"""
+        stats = self.stats_repo.get_by_qcm(qcm_id)
+
+        if not stats or stats.nombre_soumissions <= 0:
+            return {
+                'nombre_soumissions': 0,
+                'nombre_etudiants_uniques': 0,
+                'moyenne_note_sur_20': 0,
+                'moyenne_pourcentage': 0,
+                'taux_reussite': 0,
+                'note_min': 0,
+                'note_max': 0,
+                'note_mediane': 0,
+                'duree_moyenne_secondes': 0,
+                'distribution_notes': [],
+                'statistiques_par_question': [],
+                'resultats': []
+            }
+
+        histogramme = stats.get_histogramme()
+
+        # Distribution des notes (histogramme par tranches de 2 points)
+        distribution = {}
+        for indice, effectif in histogramme.items():
+            tranche = (indice // (2 * PAS_HISTOGRAMME)) * 2
+            distribution[tranche] = distribution.get(tranche, 0) + effectif
+        distribution_liste = [{'tranche': f'{k}-{k+2}', 'nombre': v}
+                              for k, v in sorted(distribution.items()) if v > 0]
+
+        return {
+            'nombre_soumissions': stats.nombre_soumissions,
+            'nombre_etudiants_uniques': stats.nombre_etudiants_uniques,
+            'moyenne_note_sur_20': round(stats.somme_notes / stats.nombre_notes, 2) if stats.nombre_notes else 0,
+            'moyenne_pourcentage': round(stats.somme_pourcentages / stats.nombre_pourcentages, 2) if stats.nombre_pourcentages else 0,
+            'taux_reussite': round(stats.nombre_reussis / stats.nombre_soumissions * 100, 2),
+            'note_min': round(stats.note_min, 2) if stats.note_min is not None else 0,
+            'note_max': round(stats.note_max, 2) if stats.note_max is not None else 0,
+            'note_mediane': round(_estimer_mediane(histogramme, stats.nombre_notes), 2),
+            'duree_moyenne_secondes': round(stats.somme_durees / stats.nombre_durees, 0) if stats.nombre_durees else 0,
+            'distribution_notes': distribution_liste,
+            'statistiques_par_question': self._formater_statistiques_questions(qcm_id),
+            'resultats': self._formater_derniers_resultats(qcm_id)
+        }
+
+    def _formater_statistiques_questions(self, qcm_id: str) -> List[Dict[str, Any]]:
+        """Formate les agrégats par question (dans l'ordre des questions du QCM)"""
+        questions = self.question_repo.get_by_qcm(qcm_id)
+        stats_questions = self.stats_repo.get_questions_by_qcm(qcm_id)
+
+        stats_par_question = []
+        for numero, question in enumerate(questions, start=1):
+            stats_question = stats_questions.get(question.id)
+            total = stats_question.nombre_reponses if stats_question else 0
+            correctes = stats_question.nombre_correctes if stats_question else 0
+            frequences = stats_question.get_reponses_frequentes() if stats_question else {}
+
+            reponses_frequentes_liste = sorted(
+                [{'reponse': json.loads(k), 'nombre': v} for k, v in frequences.items()],
+                key=lambda x: x['nombre'],
+                reverse=True
+            )[:5]  # Top 5 réponses
+
+            stats_par_question.append({
+                'question_id': question.id,
+                'question_enonce': question.enonce[:100] + '...' if len(question.enonce) > 100 else question.enonce,
+                'question_numero': numero,
+                'taux_reussite': round((correctes / total * 100) if total > 0 else 0, 2),
+                'nombre_reponses': total,
+                'nombre_correctes': correctes,
+                'reponses_frequentes': reponses_frequentes_liste
+            })
+
+        return stats_par_question
+
+    def _formater_derniers_resultats(self, qcm_id: str) -> List[Dict[str, Any]]:
+        """Liste des résultats (limitée à 50 pour éviter une réponse trop lourde)"""
+        return [{
+            'id': r.id,
+            'etudiant_id': r.etudiant_id,
+            'etudiant_nom': r.etudiant.name if r.etudiant else 'Inconnu',
+            'etudiant_email': r.etudiant.email if r.etudiant else '',
+            'note_sur_20': r.note_sur_20,
+            'pourcentage': r.pourcentage,
+            'questions_correctes': r.questions_correctes,
+            'questions_total': r.questions_total,
+            'duree_secondes': r.duree_reelle_secondes,
+            'date_fin': r.date_fin.isoformat() if r.date_fin else None,
+            'est_reussi': r.est_reussi
+        } for r in self.stats_repo.get_derniers_resultats(qcm_id, limit=50)]
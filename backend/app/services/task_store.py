@@ -0,0 +1,244 @@
+"""
+Stockage de l'état des tâches asynchrones (AsyncTaskManager)
+
+- MemoryTaskStore: dictionnaire en mémoire, visible uniquement par le processus courant
+- SQLiteTaskStore: fichier SQLite partagé, le statut d'une tâche est visible par tous les
+  workers (gunicorn) d'une même machine et survit à un redémarrage
+
+Le backend est choisi par la variable d'environnement TASK_STORE ('memory' ou 'sqlite').
+"""
+import os
+import json
+import sqlite3
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Statuts terminaux (tâches éligibles à l'éviction)
+STATUTS_TERMINES = ('SUCCESS', 'FAILURE', 'REVOKED')
+
+# Champs de date sérialisés en ISO 8601 par les stores persistants
+CHAMPS_DATE = ('started_at', 'estimated_completion', 'finished_at')
+
+
+class TaskStore:
+    """Interface d'un stockage d'état de tâches"""
+
+    def create(self, task_id: str, data: Dict[str, Any]) -> None:
+        """Enregistre une nouvelle tâche"""
+        raise NotImplementedError
+
+    def update(self, task_id: str, **fields) -> None:
+        """Met à jour des champs d'une tâche existante (sans effet si elle n'existe pas)"""
+        raise NotImplementedError
+
+    def update_unless_status(self, task_id: str, statuts: Tuple[str, ...], **fields) -> bool:
+        """
+        Met à jour une tâche sauf si son statut est dans statuts, en une opération atomique
+        (vérification et écriture indivisibles, y compris entre processus)
+
+        Returns:
+            True si la tâche existe et a été mise à jour
+        """
+        raise NotImplementedError
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Met à jour plusieurs tâches {task_id: champs}"""
+        for task_id, fields in updates.items():
+            self.update(task_id, **fields)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne une copie de l'état d'une tâche"""
+        raise NotImplementedError
+
+    def delete_finished_before(self, cutoff: datetime) -> int:
+        """Supprime les tâches terminées avant cutoff. Retourne le nombre de tâches supprimées"""
+        raise NotImplementedError
+
+    def delete_started_before(self, cutoff: datetime) -> int:
+        """Supprime toutes les tâches démarrées avant cutoff (quel que soit leur statut)"""
+        raise NotImplementedError
+
+
+class MemoryTaskStore(TaskStore):
+    """Stockage en mémoire (processus courant uniquement)"""
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def create(self, task_id: str, data: Dict[str, Any]) -> None:
+        with self.lock:
+            self.tasks[task_id] = dict(data)
+
+    def update(self, task_id: str, **fields) -> None:
+        with self.lock:
+            if task_id in self.tasks:
+                self.tasks[task_id].update(fields)
+
+    def update_unless_status(self, task_id: str, statuts: Tuple[str, ...], **fields) -> bool:
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if not task or task['status'] in statuts:
+                return False
+            task.update(fields)
+            return True
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            task = self.tasks.get(task_id)
+            return task.copy() if task else None
+
+    def _delete_where(self, condition) -> int:
+        with self.lock:
+            to_remove = [task_id for task_id, task in self.tasks.items() if condition(task)]
+            for task_id in to_remove:
+                del self.tasks[task_id]
+        return len(to_remove)
+
+    def delete_finished_before(self, cutoff: datetime) -> int:
+        return self._delete_where(
+            lambda t: t['status'] in STATUTS_TERMINES and (t.get('finished_at') or t['started_at']) < cutoff)
+
+    def delete_started_before(self, cutoff: datetime) -> int:
+        return self._delete_where(lambda t: t['started_at'] < cutoff)
+
+
+class SQLiteTaskStore(TaskStore):
+    """Stockage dans un fichier SQLite partagé entre processus"""
+
+    def __init__(self, chemin: Optional[str] = None):
+        self.chemin = chemin or os.getenv(
+            'TASK_STORE_PATH', os.path.join(tempfile.gettempdir(), 'ai_ko_tasks.sqlite3'))
+        self.lock = threading.Lock()
+        with self._connexion() as connexion:
+            # WAL: lectures concurrentes des autres processus pendant les écritures
+            connexion.execute('PRAGMA journal_mode=WAL')
+            connexion.execute(
+                'CREATE TABLE IF NOT EXISTS async_tasks ('
+                ' task_id TEXT PRIMARY KEY,'
+                ' status TEXT NOT NULL,'
+                ' started_at TEXT NOT NULL,'
+                ' finished_at TEXT,'
+                ' data TEXT NOT NULL)'
+            )
+            connexion.execute(
+                'CREATE INDEX IF NOT EXISTS idx_async_tasks_status_finished'
+                ' ON async_tasks (status, finished_at)'
+            )
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte: une transaction validée (ou annulée) puis fermée"""
+        connexion = sqlite3.connect(self.chemin, timeout=10)
+        try:
+            with connexion:
+                yield connexion
+        finally:
+            connexion.close()
+
+    @staticmethod
+    def _serialiser(data: Dict[str, Any]) -> str:
+        valeurs = dict(data)
+        for champ in CHAMPS_DATE:
+            if isinstance(valeurs.get(champ), datetime):
+                valeurs[champ] = valeurs[champ].isoformat()
+        return json.dumps(valeurs, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def _deserialiser(texte: str) -> Dict[str, Any]:
+        valeurs = json.loads(texte)
+        for champ in CHAMPS_DATE:
+            if valeurs.get(champ):
+                valeurs[champ] = datetime.fromisoformat(valeurs[champ])
+        return valeurs
+
+    def _ecrire(self, connexion: sqlite3.Connection, task_id: str, data: Dict[str, Any]) -> None:
+        finished_at = data.get('finished_at')
+        connexion.execute(
+            'INSERT OR REPLACE INTO async_tasks (task_id, status, started_at, finished_at, data)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            (
+                task_id,
+                data['status'],
+                data['started_at'].isoformat(),
+                finished_at.isoformat() if finished_at else None,
+                self._serialiser(data)
+            )
+        )
+
+    def create(self, task_id: str, data: Dict[str, Any]) -> None:
+        with self.lock, self._connexion() as connexion:
+            self._ecrire(connexion, task_id, data)
+
+    def update(self, task_id: str, **fields) -> None:
+        self.update_many({task_id: fields})
+
+    def update_unless_status(self, task_id: str, statuts: Tuple[str, ...], **fields) -> bool:
+        # Un seul UPDATE conditionnel: les champs sont écrits dans le JSON par json_set
+        valeurs = json.loads(self._serialiser(fields))
+        chemins = ', '.join('?, json(?)' for _ in valeurs)
+        colonnes = [c for c in ('status', 'finished_at') if c in valeurs]
+        parametres = [v for champ, valeur in valeurs.items() for v in (f'$.{champ}', json.dumps(valeur))]
+        parametres += [valeurs[c] for c in colonnes]
+        exclus = ', '.join('?' * len(statuts))
+        with self.lock, self._connexion() as connexion:
+            return connexion.execute(
+                f'UPDATE async_tasks SET data = json_set(data, {chemins})'
+                f'{"".join(f", {c} = ?" for c in colonnes)}'
+                f' WHERE task_id = ? AND status NOT IN ({exclus})',
+                (*parametres, task_id, *statuts)
+            ).rowcount == 1
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        if not updates:
+            return
+        with self.lock, self._connexion() as connexion:
+            # Verrou d'écriture pris avant la lecture: une écriture d'un autre processus
+            # (annulation) ne peut pas s'intercaler entre le SELECT et l'INSERT OR REPLACE
+            connexion.execute('BEGIN IMMEDIATE')
+            for task_id, fields in updates.items():
+                ligne = connexion.execute(
+                    'SELECT data FROM async_tasks WHERE task_id = ?', (task_id,)).fetchone()
+                if not ligne:
+                    continue
+                data = self._deserialiser(ligne[0])
+                data.update(fields)
+                self._ecrire(connexion, task_id, data)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._connexion() as connexion:
+            ligne = connexion.execute(
+                'SELECT data FROM async_tasks WHERE task_id = ?', (task_id,)).fetchone()
+        return self._deserialiser(ligne[0]) if ligne else None
+
+    def delete_finished_before(self, cutoff: datetime) -> int:
+        with self.lock, self._connexion() as connexion:
+            statuts = ', '.join('?' * len(STATUTS_TERMINES))
+            return connexion.execute(
+                f'DELETE FROM async_tasks WHERE status IN ({statuts}) AND COALESCE(finished_at, started_at) < ?',
+                (*STATUTS_TERMINES, cutoff.isoformat())
+            ).rowcount
+
+    def delete_started_before(self, cutoff: datetime) -> int:
+        with self.lock, self._connexion() as connexion:
+            return connexion.execute(
+                'DELETE FROM async_tasks WHERE started_at < ?', (cutoff.isoformat(),)).rowcount
+
+
+def create_task_store(backend: Optional[str] = None) -> TaskStore:
+    """Crée le store configuré (TASK_STORE=memory|sqlite, memory par défaut)"""
+    backend = (backend or os.getenv('TASK_STORE', 'memory')).lower()
+    if backend == 'sqlite':
+        try:
+            return SQLiteTaskStore()
+        except sqlite3.Error as e:
+            logger.error(f"Store SQLite des tâches indisponible ({e}), utilisation du store mémoire")
+    elif backend != 'memory':
+        logger.warning(f"TASK_STORE inconnu: {backend}, utilisation du store mémoire")
+    return MemoryTaskStore()
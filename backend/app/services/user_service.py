@@ -6,6 +6,7 @@ from app.repositories.user_repository import UserRepository
 from app.models.user import User, UserRole
 from werkzeug.security import generate_password_hash
 from app import db
+from app.utils.identity import invalider_identite
 
 
 class UserService:
@@ -24,6 +25,20 @@ class UserService:
         users, total = self.user_repo.get_all_paginated(skip=skip, limit=limit, filters=filters, sort_by=sort_by, sort_order=sort_order)
         return [user.to_dict() for user in users], total
     
+    
+    def get_users_curseur(self, filters: Optional[Dict[str, Any]] = None, limit: int = 100,
+                          curseur: Optional[str] = None,
+                          avec_total: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Récupère une page d'utilisateurs par curseur (created_at, id décroissants)
+        
+        Returns:
+            Tuple (liste d'utilisateurs, curseur suivant, total ou None)
+        """
+        users, curseur_suivant, total = self.user_repo.get_all_keyset(
+            limit=limit, curseur=curseur, filters=filters, avec_total=avec_total)
+        return [user.to_dict() for user in users], curseur_suivant, total
+    
     def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Récupère un utilisateur par son ID"""
         user = self.user_repo.get_by_id(user_id)
@@ -122,6 +137,7 @@ class UserService:
             user.set_password(data['password'])
         
         user = self.user_repo.update(user)
+        invalider_identite(user_id)
         return user.to_dict()
     
     def delete_user(self, user_id: str, current_user_id: Optional[str] = None) -> bool:
@@ -153,7 +169,9 @@ class UserService:
             db.session.delete(user.enseignant_profil)
         
         # Maintenant supprimer l'utilisateur
-        return self.user_repo.delete(user)
+        supprime = self.user_repo.delete(user)
+        invalider_identite(user_id)
+        return supprime
     
     def change_role(self, user_id: str, new_role_str: str, current_user_id: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -175,6 +193,8 @@ class UserService:
         if not user:
             raise ValueError("Utilisateur non trouvé")
         
+        # Le nouveau rôle s'applique dès la requête suivante (cache des identités)
+        invalider_identite(user_id)
         return user.to_dict()
     
     def toggle_status(self, user_id: str, current_user_id: Optional[str] = None) -> Dict[str, Any]:
@@ -217,6 +237,7 @@ class UserService:
         
         # Effectuer le toggle
         updated_user = self.user_repo.toggle_status(user_id)
+        invalider_identite(user_id)
         
         if not updated_user:
             logger.error(f"[UserService.toggle_status] Échec de la mise à jour pour: {user_id}")
@@ -9,10 +9,11 @@ except ImportError:
     generate_quiz_from_document = None
 
 try:
-    from .correction import correct_student_answer, batch_correct_answers
+    from .correction import correct_student_answer, batch_correct_answers, batch_correct_copies
 except ImportError:
     correct_student_answer = None
     batch_correct_answers = None
+    batch_correct_copies = None
 
 try:
     from .reports import generate_pdf_report
@@ -24,5 +25,6 @@ __all__ = [
     'generate_quiz_from_document',
     'correct_student_answer',
     'batch_correct_answers',
+    'batch_correct_copies',
     'generate_pdf_report'
 ]
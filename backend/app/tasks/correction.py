@@ -5,6 +5,9 @@ from celery_app import celery
 from app import db
 from app.models.qcm import QCM
 from app.models.question import Question
+from app.models.session_examen import SessionExamen
+from app.repositories.resultat_repository import ResultatRepository
+from app.utils.app_context import app_context
 import os
 import logging
 
@@ -77,62 +80,114 @@ def mean_pooling(model_output, attention_mask):
     )
 
 
-def calculate_semantic_similarity(text1, text2):
+def _similarite_fallback(text1, text2):
+    """Similarité sans modèle: comparaison exacte (insensible à la casse)"""
+    return 0.5 if text1.lower() == text2.lower() else 0.0
+
+
+def _lots_par_longueur(textes, taille_lot):
     """
-    Calcule la similarité sémantique entre deux textes
+    Regroupe les indices des textes en lots de longueurs voisines
+
+    Les textes sont triés par longueur avant découpage: chaque lot est complété (padding)
+    jusqu'à la longueur de son plus long texte, et non du plus long texte de la session.
+    """
+    ordre = sorted(range(len(textes)), key=lambda i: len(textes[i]))
+    return [ordre[i:i + taille_lot] for i in range(0, len(ordre), taille_lot)]
+
+
+def encode_texts(textes, taille_lot=None):
+    """
+    Calcule les embeddings normalisés (norme L2) d'une liste de textes
 
     Args:
-        text1: Premier texte
-        text2: Deuxième texte
+        textes: Liste de textes
+        taille_lot: Nombre de textes par passe du modèle (CORRECTION_BATCH_SIZE par défaut)
 
     Returns:
-        float: Score de similarité entre 0 et 1
+        Tensor (len(textes) x dimension), dans l'ordre des textes
+    """
+    bert_model = get_bert_model()
+    tokenizer = bert_model['tokenizer']
+    model = bert_model['model']
+    taille_lot = taille_lot or int(os.getenv('CORRECTION_BATCH_SIZE', '32'))
+
+    embeddings = [None] * len(textes)
+    with torch.inference_mode():
+        for lot in _lots_par_longueur(textes, taille_lot):
+            encoded = tokenizer(
+                [textes[i] for i in lot],
+                padding=True,
+                truncation=True,
+                max_length=512,
+                return_tensors='pt'
+            )
+            model_output = model(**encoded)
+            vecteurs = F.normalize(mean_pooling(model_output, encoded['attention_mask']), p=2, dim=1)
+            for position, i in enumerate(lot):
+                embeddings[i] = vecteurs[position]
+    return torch.stack(embeddings)
+
+
+def calculate_semantic_similarities(pairs):
     """
+    Calcule la similarité sémantique d'une liste de paires (réponse étudiant, réponse attendue)
+
+    Les réponses attendues (et les réponses étudiantes identiques) ne sont encodées qu'une
+    fois; les cosinus sont obtenus par un seul produit matriciel.
+
+    Args:
+        pairs: Liste de tuples (texte étudiant, texte de référence)
+
+    Returns:
+        list: Scores de similarité entre 0 et 1, dans l'ordre des paires
+    """
+    if not pairs:
+        return []
     try:
         if not TRANSFORMERS_AVAILABLE or not TORCH_AVAILABLE:
             # Fallback: comparaison simple si les modules IA ne sont pas disponibles
             logger.warning("Modules IA non disponibles, utilisation du fallback simple")
-            return 0.5 if text1.lower() == text2.lower() else 0.0
-        
-        bert_model = get_bert_model()
-        tokenizer = bert_model['tokenizer']
-        model = bert_model['model']
-
-        # Tokeniser les textes
-        encoded = tokenizer(
-            [text1, text2],
-            padding=True,
-            truncation=True,
-            max_length=512,
-            return_tensors='pt'
-        )
+            return [_similarite_fallback(t1, t2) for t1, t2 in pairs]
 
-        # Obtenir les embeddings
-        with torch.no_grad():
-            model_output = model(**encoded)
-
-        # Mean pooling
-        embeddings = mean_pooling(model_output, encoded['attention_mask'])
+        # Textes uniques: chaque réponse de référence n'est encodée qu'une fois
+        references = list(dict.fromkeys(ref for _, ref in pairs))
+        reponses = list(dict.fromkeys(rep for rep, _ in pairs))
+        index_references = {texte: i for i, texte in enumerate(references)}
+        index_reponses = {texte: i for i, texte in enumerate(reponses)}
 
-        # Normaliser les embeddings
-        embeddings = F.normalize(embeddings, p=2, dim=1)
+        embeddings_references = encode_texts(references)
+        embeddings_reponses = encode_texts(reponses)
 
-        # Calculer la similarité cosinus
-        similarity = torch.mm(embeddings[0:1], embeddings[1:2].T).item()
+        # Matrice des cosinus (réponses x références), puis une valeur par paire
+        cosinus = torch.mm(embeddings_reponses, embeddings_references.T)
+        lignes = torch.tensor([index_reponses[rep] for rep, _ in pairs])
+        colonnes = torch.tensor([index_references[ref] for _, ref in pairs])
+        similarites = cosinus[lignes, colonnes].tolist()
 
         # Convertir en score 0-1
-        score = (similarity + 1) / 2
-
-        return score
+        return [(similarite + 1) / 2 for similarite in similarites]
 
     except ImportError as e:
         logger.warning(f"Modules IA non disponibles: {e}, utilisation du fallback")
-        # Fallback: simple comparaison de longueur
-        return 0.5 if text1.lower() == text2.lower() else 0.0
+        return [_similarite_fallback(t1, t2) for t1, t2 in pairs]
     except Exception as e:
         logger.error(f"Erreur calcul similarité: {e}")
-        # Fallback: simple comparaison de longueur
-        return 0.5 if text1.lower() == text2.lower() else 0.0
+        return [_similarite_fallback(t1, t2) for t1, t2 in pairs]
+
+
+def calculate_semantic_similarity(text1, text2):
+    """
+    Calcule la similarité sémantique entre deux textes
+
+    Args:
+        text1: Premier texte
+        text2: Deuxième texte
+
+    Returns:
+        float: Score de similarité entre 0 et 1
+    """
+    return calculate_semantic_similarities([(text1, text2)])[0]
 
 
 def extract_keywords(text):
@@ -215,13 +270,14 @@ def correct_qcm_answer(question, student_answer):
     }
 
 
-def correct_open_answer(question, student_answer):
+def correct_open_answer(question, student_answer, semantic_score=None):
     """
     Corrige une réponse ouverte
 
     Args:
         question: Objet Question
         student_answer: Réponse textuelle de l'étudiant
+        semantic_score: Similarité déjà calculée par lot (calculée ici si None)
 
     Returns:
         dict: Résultat de la correction
@@ -237,7 +293,8 @@ def correct_open_answer(question, student_answer):
         }
 
     # Calculer la similarité sémantique
-    semantic_score = calculate_semantic_similarity(student_answer, correct_answer)
+    if semantic_score is None:
+        semantic_score = calculate_semantic_similarity(student_answer, correct_answer)
 
     # Calculer le score basé sur les mots-clés
     keyword_score = calculate_keyword_score(student_answer, correct_answer)
@@ -284,10 +341,7 @@ def correct_student_answer(self, question_id, student_answer):
         logger.info(f"Début correction question {question_id}")
         self.update_state(state='PROGRESS', meta={'status': 'Chargement de la question...'})
 
-        from app import create_app
-        app = create_app()
-
-        with app.app_context():
+        with app_context():
             question = Question.query.get(question_id)
             if not question:
                 raise ValueError(f"Question {question_id} non trouvée")
@@ -317,6 +371,129 @@ def correct_student_answer(self, question_id, student_answer):
         raise
 
 
+def _est_reponse_ouverte(question, student_answer):
+    """Vrai si la réponse est corrigée par similarité textuelle"""
+    return (question.type_question != 'qcm' and isinstance(student_answer, str)
+            and bool(question.reponse_correcte))
+
+
+def compute_open_answer_scores(questions, copies):
+    """
+    Calcule en un seul lot la similarité sémantique de toutes les réponses ouvertes
+
+    Args:
+        questions: Liste d'objets Question du QCM
+        copies: Dict {copie_id: {question_id: answer}}
+
+    Returns:
+        dict: {copie_id: {question_id: score sémantique}}
+    """
+    cles = []
+    paires = []
+    for copie_id, student_answers in copies.items():
+        for question in questions:
+            student_answer = student_answers.get(question.id)
+            if _est_reponse_ouverte(question, student_answer):
+                cles.append((copie_id, question.id))
+                paires.append((student_answer, question.reponse_correcte))
+
+    if paires:
+        logger.info(f"Similarité sémantique par lot: {len(paires)} réponses ouvertes")
+
+    scores = {copie_id: {} for copie_id in copies}
+    for (copie_id, question_id), score in zip(cles, calculate_semantic_similarities(paires)):
+        scores[copie_id][question_id] = score
+    return scores
+
+
+def grade_answer_sheet(questions, student_answers, semantic_scores=None, on_question=None):
+    """
+    Corrige toutes les réponses d'une copie
+
+    Args:
+        questions: Liste d'objets Question du QCM
+        student_answers: Dict {question_id: answer}
+        semantic_scores: Dict {question_id: score} pré-calculé par lot (optionnel)
+        on_question: Callback (index, total) appelé avant chaque question (optionnel)
+
+    Returns:
+        dict: Résultats par question, score total et feedback global
+    """
+    semantic_scores = semantic_scores or {}
+    total_questions = len(questions)
+    results = []
+    total_score = 0.0
+    total_points = 0
+
+    for i, question in enumerate(questions):
+        if on_question:
+            on_question(i, total_questions)
+
+        question_id = question.id
+        student_answer = student_answers.get(question_id)
+
+        if student_answer is None:
+            # Question non répondue
+            result = {
+                'question_id': question_id,
+                'is_correct': False,
+                'score': 0.0,
+                'feedback': 'Question non répondue',
+                'max_points': question.points,
+                'points_earned': 0.0
+            }
+        else:
+            # Corriger la question
+            if question.type_question == 'qcm':
+                result = correct_qcm_answer(question, student_answer)
+            else:
+                result = correct_open_answer(question, student_answer,
+                                             semantic_score=semantic_scores.get(question_id))
+
+            result['question_id'] = question_id
+            result['max_points'] = question.points
+            result['points_earned'] = result['score'] * question.points
+
+        results.append(result)
+        total_score += result['points_earned']
+        total_points += question.points
+
+    # Calculer le score final en pourcentage
+    final_score_percentage = (total_score / total_points * 100) if total_points > 0 else 0
+
+    # Générer un feedback global
+    if final_score_percentage >= 90:
+        global_feedback = "Excellent travail! Vous maîtrisez parfaitement le sujet."
+    elif final_score_percentage >= 75:
+        global_feedback = "Bon travail! Quelques points à revoir."
+    elif final_score_percentage >= 50:
+        global_feedback = "Résultat moyen. Il est recommandé de revoir certains concepts."
+    else:
+        global_feedback = "Résultat insuffisant. Une révision approfondie est nécessaire."
+
+    return {
+        'total_questions': total_questions,
+        'questions_answered': len([a for a in student_answers.values() if a is not None]),
+        'results': results,
+        'total_score': total_score,
+        'total_points': total_points,
+        'score_percentage': final_score_percentage,
+        'global_feedback': global_feedback
+    }
+
+
+def _charger_questions(qcm_id):
+    """Charge les questions d'un QCM (erreur si le QCM est absent ou vide)"""
+    qcm = QCM.query.get(qcm_id)
+    if not qcm:
+        raise ValueError(f"QCM {qcm_id} non trouvé")
+
+    questions = Question.query.filter_by(qcm_id=qcm_id).all()
+    if not questions:
+        raise ValueError("Ce QCM ne contient aucune question")
+    return questions
+
+
 @celery.task(name='app.tasks.correction.batch_correct_answers', bind=True)
 def batch_correct_answers(self, qcm_id, student_answers):
     """
@@ -333,89 +510,87 @@ def batch_correct_answers(self, qcm_id, student_answers):
         logger.info(f"Début correction batch pour QCM {qcm_id}")
         self.update_state(state='PROGRESS', meta={'status': 'Chargement du QCM...'})
 
-        from app import create_app
-        app = create_app()
-
-        with app.app_context():
-            qcm = QCM.query.get(qcm_id)
-            if not qcm:
-                raise ValueError(f"QCM {qcm_id} non trouvé")
-
-            questions = Question.query.filter_by(qcm_id=qcm_id).all()
-            total_questions = len(questions)
-
-            if total_questions == 0:
-                raise ValueError("Ce QCM ne contient aucune question")
+        with app_context():
+            questions = _charger_questions(qcm_id)
 
-            results = []
-            total_score = 0.0
-            total_points = 0
+            # Réponses ouvertes de la copie encodées en un seul lot
+            semantic_scores = compute_open_answer_scores(questions, {'copie': student_answers})['copie']
 
-            for i, question in enumerate(questions):
+            def _progression(i, total):
                 self.update_state(
                     state='PROGRESS',
                     meta={
-                        'status': f'Correction question {i+1}/{total_questions}...',
-                        'progress': int(((i + 1) / total_questions) * 100)
+                        'status': f'Correction question {i+1}/{total}...',
+                        'progress': int(((i + 1) / total) * 100)
                     }
                 )
 
-                question_id = question.id
-                student_answer = student_answers.get(question_id)
-
-                if student_answer is None:
-                    # Question non répondue
-                    result = {
-                        'question_id': question_id,
-                        'is_correct': False,
-                        'score': 0.0,
-                        'feedback': 'Question non répondue',
-                        'max_points': question.points,
-                        'points_earned': 0.0
-                    }
-                else:
-                    # Corriger la question
-                    if question.type_question == 'qcm':
-                        result = correct_qcm_answer(question, student_answer)
-                    else:
-                        result = correct_open_answer(question, student_answer)
-
-                    result['question_id'] = question_id
-                    result['max_points'] = question.points
-                    result['points_earned'] = result['score'] * question.points
-
-                results.append(result)
-                total_score += result['points_earned']
-                total_points += question.points
-
-            # Calculer le score final en pourcentage
-            final_score_percentage = (total_score / total_points * 100) if total_points > 0 else 0
-
-            # Générer un feedback global
-            if final_score_percentage >= 90:
-                global_feedback = "Excellent travail! Vous maîtrisez parfaitement le sujet."
-            elif final_score_percentage >= 75:
-                global_feedback = "Bon travail! Quelques points à revoir."
-            elif final_score_percentage >= 50:
-                global_feedback = "Résultat moyen. Il est recommandé de revoir certains concepts."
-            else:
-                global_feedback = "Résultat insuffisant. Une révision approfondie est nécessaire."
+            correction = grade_answer_sheet(questions, student_answers, semantic_scores, _progression)
 
-            logger.info(f"Correction batch terminée: {final_score_percentage:.2f}%")
+            logger.info(f"Correction batch terminée: {correction['score_percentage']:.2f}%")
 
             return {
                 'status': 'success',
                 'qcm_id': qcm_id,
-                'total_questions': total_questions,
-                'questions_answered': len([a for a in student_answers.values() if a is not None]),
-                'results': results,
-                'total_score': total_score,
-                'total_points': total_points,
-                'score_percentage': final_score_percentage,
-                'global_feedback': global_feedback
+                **correction
             }
 
     except Exception as e:
         logger.error(f"Erreur correction batch: {e}", exc_info=True)
         self.update_state(state='FAILURE', meta={'error': str(e)})
         raise
+
+
+@celery.task(name='app.tasks.correction.batch_correct_copies', bind=True)
+def batch_correct_copies(self, session_id):
+    """
+    Corrige les copies de tous les étudiants d'une session d'examen
+
+    Les copies sont les réponses des résultats terminés de la session, lues en base.
+    Toutes les réponses ouvertes de la session sont encodées ensemble (références
+    encodées une seule fois, réponses par lots de longueurs voisines).
+
+    Args:
+        session_id: ID de la session d'examen
+
+    Returns:
+        dict: Résultat de la correction de chaque copie (par resultat_id)
+    """
+    try:
+        self.update_state(state='PROGRESS', meta={'status': 'Chargement des copies...', 'progress': 0})
+
+        with app_context():
+            session = SessionExamen.query.get(session_id)
+            if not session:
+                raise ValueError(f"Session {session_id} non trouvée")
+            qcm_id = session.qcm_id
+            copies = ResultatRepository().get_copies_session(session_id)
+            logger.info(f"Début correction de {len(copies)} copies de la session {session_id}")
+            questions = _charger_questions(qcm_id)
+
+            self.update_state(state='PROGRESS', meta={
+                'status': 'Analyse sémantique des réponses ouvertes...', 'progress': 10})
+            scores = compute_open_answer_scores(questions, copies)
+
+            resultats = {}
+            for i, (copie_id, student_answers) in enumerate(copies.items()):
+                resultats[copie_id] = grade_answer_sheet(questions, student_answers, scores[copie_id])
+                self.update_state(state='PROGRESS', meta={
+                    'status': f'Correction copie {i+1}/{len(copies)}...',
+                    'progress': 10 + int(((i + 1) / len(copies)) * 90)
+                })
+
+            logger.info(f"Correction de {len(copies)} copies terminée")
+
+            return {
+                'status': 'success',
+                'session_id': session_id,
+                'qcm_id': qcm_id,
+                'total_copies': len(copies),
+                'copies': resultats
+            }
+
+    except Exception as e:
+        logger.error(f"Erreur correction des copies: {e}", exc_info=True)
+        self.update_state(state='FAILURE', meta={'error': str(e)})
+        raise
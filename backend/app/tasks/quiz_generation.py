@@ -7,9 +7,10 @@ from celery import Task
 from celery_app import celery
 from app import db
 from app.models.qcm import QCM
-from app.models.question import Question
+from app.repositories.question_repository import QuestionRepository
 from app.services.ai_service import ai_service
 from app.services.document_parser import DocumentParser
+from app.utils.app_context import app_context
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +24,20 @@ class CallbackTask(Task):
         super().on_failure(exc, task_id, args, kwargs, einfo)
 
 
+def _progression_generation(task: Task, debut: int, fin: int):
+    """Callback de progression par partie pour ai_service.generate_questions"""
+    def _callback(terminees: int, total: int):
+        if total > 1:
+            task.update_state(
+                state='PROGRESS',
+                meta={
+                    'status': f'Génération des questions avec l\'IA (partie {terminees}/{total})...',
+                    'progress': debut + int((fin - debut) * terminees / total)
+                }
+            )
+    return _callback
+
+
 @celery.task(bind=True, base=CallbackTask, name='app.tasks.quiz_generation.generate_quiz_from_text')
 def generate_quiz_from_text(self, qcm_id: str, text: str, num_questions: int = 10,
                             matiere: str = None, niveau: str = None):
@@ -51,9 +66,6 @@ def generate_quiz_from_text(self, qcm_id: str, text: str, num_questions: int = 1
             }
         )
 
-        # Nettoyer le texte
-        clean_text = DocumentParser.clean_text(text, max_length=8000)
-
         # Mise à jour de l'état: génération IA
         self.update_state(
             state='PROGRESS',
@@ -63,12 +75,13 @@ def generate_quiz_from_text(self, qcm_id: str, text: str, num_questions: int = 1
             }
         )
 
-        # Générer les questions avec l'IA
+        # Générer les questions avec l'IA (texte long découpé en parties, sans troncature)
         questions_data = ai_service.generate_questions(
-            text=clean_text,
+            text=text,
             num_questions=num_questions,
             matiere=matiere,
-            niveau=niveau
+            niveau=niveau,
+            progress_callback=_progression_generation(self, 30, 70)
         )
 
         logger.info(f"{len(questions_data)} questions générées par l'IA")
@@ -82,37 +95,22 @@ def generate_quiz_from_text(self, qcm_id: str, text: str, num_questions: int = 1
             }
         )
 
-        # Créer le contexte d'application pour accéder à la DB
-        from app import create_app
-        app = create_app()
-
-        with app.app_context():
+        # Contexte de l'application du worker (créée une fois par processus)
+        with app_context():
             # Récupérer le QCM depuis la base
             qcm = QCM.query.get(qcm_id)
             if not qcm:
                 raise ValueError(f"QCM {qcm_id} non trouvé")
 
-            # Supprimer les anciennes questions si existantes
-            Question.query.filter_by(qcm_id=qcm_id).delete()
-
-            # Créer les questions dans la base de données
-            for q_data in questions_data:
-                question = Question(
-                    qcm_id=qcm_id,
-                    enonce=q_data['enonce'],
-                    type_question=q_data.get('type_question', 'qcm'),
-                    points=q_data.get('points', 1),
-                    explication=q_data.get('explication', '')
-                )
-
-                # Définir les options (stockées en JSON)
-                question.set_options(q_data['options'])
-
-                db.session.add(question)
+            # Remplacer les questions du QCM (insertion en masse, une seule instruction)
+            QuestionRepository().replace_for_qcm(qcm_id, questions_data)
 
             # Mettre à jour le statut du QCM
             qcm.status = 'draft'
 
+            # Récupérer les valeurs nécessaires AVANT de fermer le contexte
+            qcm_titre = qcm.titre
+
             db.session.commit()
 
         logger.info(f"QCM {qcm_id} généré avec succès: {len(questions_data)} questions")
@@ -120,7 +118,7 @@ def generate_quiz_from_text(self, qcm_id: str, text: str, num_questions: int = 1
         # Retourner le résultat
         return {
             'qcm_id': qcm_id,
-            'titre': qcm.titre if qcm else 'QCM',
+            'titre': qcm_titre,
             'num_questions': len(questions_data),
             'status': 'success',
             'message': f'QCM généré avec succès: {len(questions_data)} questions créées'
@@ -131,9 +129,7 @@ def generate_quiz_from_text(self, qcm_id: str, text: str, num_questions: int = 1
 
         # Mettre le QCM en état d'erreur (brouillon)
         try:
-            from app import create_app
-            app = create_app()
-            with app.app_context():
+            with app_context():
                 qcm = QCM.query.get(qcm_id)
                 if qcm:
                     qcm.status = 'draft'
@@ -146,14 +142,15 @@ def generate_quiz_from_text(self, qcm_id: str, text: str, num_questions: int = 1
 
 
 @celery.task(bind=True, base=CallbackTask, name='app.tasks.quiz_generation.generate_quiz_from_document')
-def generate_quiz_from_document(self, qcm_id: str, file_bytes: bytes, file_type: str,
+def generate_quiz_from_document(self, qcm_id: str, file_path: str, file_type: str,
                                 num_questions: int = 10, matiere: str = None, niveau: str = None):
     """
     Génère un QCM à partir d'un document (PDF ou DOCX)
 
     Args:
         qcm_id: ID du QCM à remplir
-        file_bytes: Contenu du fichier en bytes
+        file_path: Chemin du document sur un disque accessible au worker (même machine ou
+            volume partagé: le contenu ne transite pas par le broker); supprimé après l'extraction
         file_type: Type de fichier ('pdf' ou 'docx')
         num_questions: Nombre de questions à générer
         matiere: Matière (optionnel)
@@ -174,23 +171,15 @@ def generate_quiz_from_document(self, qcm_id: str, file_bytes: bytes, file_type:
             }
         )
 
-        # Extraire le texte du document
-        text = DocumentParser.extract_text(file_bytes, file_type)
+        # Extraire le texte du document (arrêt dès que le texte suffit pour la génération)
+        try:
+            text = DocumentParser.extract_text(
+                file_path, file_type, max_chars=ai_service.max_source_chars(num_questions))
+        finally:
+            DocumentParser.supprimer(file_path)
 
         logger.info(f"Texte extrait: {len(text)} caractères")
 
-        # Mise à jour de l'état: nettoyage
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'status': 'Préparation du texte...',
-                'progress': 20
-            }
-        )
-
-        # Nettoyer le texte
-        clean_text = DocumentParser.clean_text(text, max_length=8000)
-
         # Mise à jour de l'état: génération IA
         self.update_state(
             state='PROGRESS',
@@ -200,12 +189,13 @@ def generate_quiz_from_document(self, qcm_id: str, file_bytes: bytes, file_type:
             }
         )
 
-        # Générer les questions avec l'IA
+        # Générer les questions avec l'IA (texte long découpé en parties, sans troncature)
         questions_data = ai_service.generate_questions(
-            text=clean_text,
+            text=text,
             num_questions=num_questions,
             matiere=matiere,
-            niveau=niveau
+            niveau=niveau,
+            progress_callback=_progression_generation(self, 40, 80)
         )
 
         logger.info(f"{len(questions_data)} questions générées par l'IA")
@@ -219,37 +209,22 @@ def generate_quiz_from_document(self, qcm_id: str, file_bytes: bytes, file_type:
             }
         )
 
-        # Créer le contexte d'application pour accéder à la DB
-        from app import create_app
-        app = create_app()
-
-        with app.app_context():
+        # Contexte de l'application du worker (créée une fois par processus)
+        with app_context():
             # Récupérer le QCM depuis la base
             qcm = QCM.query.get(qcm_id)
             if not qcm:
                 raise ValueError(f"QCM {qcm_id} non trouvé")
 
-            # Supprimer les anciennes questions si existantes
-            Question.query.filter_by(qcm_id=qcm_id).delete()
-
-            # Créer les questions dans la base de données
-            for q_data in questions_data:
-                question = Question(
-                    qcm_id=qcm_id,
-                    enonce=q_data['enonce'],
-                    type_question=q_data.get('type_question', 'qcm'),
-                    points=q_data.get('points', 1),
-                    explication=q_data.get('explication', '')
-                )
-
-                # Définir les options (stockées en JSON)
-                question.set_options(q_data['options'])
-
-                db.session.add(question)
+            # Remplacer les questions du QCM (insertion en masse, une seule instruction)
+            QuestionRepository().replace_for_qcm(qcm_id, questions_data)
 
             # Mettre à jour le statut du QCM
             qcm.status = 'draft'
 
+            # Récupérer les valeurs nécessaires AVANT de fermer le contexte
+            qcm_titre = qcm.titre
+
             db.session.commit()
 
         logger.info(f"QCM {qcm_id} généré avec succès: {len(questions_data)} questions")
@@ -257,7 +232,7 @@ def generate_quiz_from_document(self, qcm_id: str, file_bytes: bytes, file_type:
         # Retourner le résultat
         return {
             'qcm_id': qcm_id,
-            'titre': qcm.titre if qcm else 'QCM',
+            'titre': qcm_titre,
             'num_questions': len(questions_data),
             'status': 'success',
             'message': f'QCM généré avec succès depuis {file_type.upper()}: {len(questions_data)} questions créées'
@@ -268,9 +243,7 @@ def generate_quiz_from_document(self, qcm_id: str, file_bytes: bytes, file_type:
 
         # Mettre le QCM en état d'erreur (brouillon)
         try:
-            from app import create_app
-            app = create_app()
-            with app.app_context():
+            with app_context():
                 qcm = QCM.query.get(qcm_id)
                 if qcm:
                     qcm.status = 'draft'
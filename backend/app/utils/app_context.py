@@ -0,0 +1,55 @@
+"""
+Application Flask partagée par les traitements hors requête (workers Celery, threads de tâches)
+
+create_app() relit le .env, sonde PostgreSQL, reconstruit le moteur SQLAlchemy et réenregistre
+les blueprints: trop coûteux pour être appelé à chaque tâche. L'application du processus est
+enregistrée par create_app() (serveur web) ou construite une seule fois par processus worker
+Celery (signal worker_process_init, voir celery_app.py), puis réutilisée via app_context().
+"""
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from flask import Flask, current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+_app: Optional[Flask] = None
+_lock = threading.RLock()
+
+
+def register_app(app: Flask) -> None:
+    """Enregistre l'application du processus (la dernière créée est utilisée)"""
+    global _app
+    with _lock:
+        _app = app
+
+
+def get_app() -> Flask:
+    """Retourne l'application du processus, créée à la première demande"""
+    global _app
+    if _app is None:
+        with _lock:
+            if _app is None:
+                from app import create_app
+                logger.info("Création de l'application Flask du processus")
+                # create_app() enregistre elle-même l'application (verrou réentrant)
+                create_app()
+    return _app
+
+
+@contextmanager
+def app_context() -> Iterator[Flask]:
+    """
+    Contexte d'application pour une tâche
+
+    Réutilise le contexte courant s'il existe (appel imbriqué), sinon pousse un contexte
+    de l'application du processus. La session SQLAlchemy est retirée à la sortie.
+    """
+    if has_app_context():
+        yield current_app._get_current_object()
+        return
+    app = get_app()
+    with app.app_context():
+        yield app
@@ -1,16 +1,22 @@
 """
 Décorateurs utilitaires pour la protection des routes
+
+L'utilisateur est lu via app.utils.identity: une seule requête (utilisateur et profils)
+partagée par les décorateurs et la route, et évitée tant que l'identité est en cache.
 """
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-from app.models.user import User, UserRole
+from flask_jwt_extended import verify_jwt_in_request
+from app.models.user import UserRole
+from app.utils.identity import identite_courante
 
 
 def require_role(role_name):
     """
     Décorateur vérifiant que l'utilisateur a un rôle spécifique
-    Passe l'utilisateur courant comme premier argument à la fonction décorée
+    Passe l'identité de l'utilisateur courant (IdentiteUtilisateur: id, email, name, role,
+    is_active) comme premier argument à la fonction décorée; l'objet User complet est
+    disponible via app.utils.identity.utilisateur_courant()
     
     Usage:
         @require_role('admin')
@@ -21,8 +27,7 @@ def require_role(role_name):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
+            user = identite_courante()
             
             if not user:
                 return jsonify({'message': 'Utilisateur non trouvé'}), 404
@@ -54,8 +59,7 @@ def require_complete_profile(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = identite_courante()
         
         if not user:
             return jsonify({'message': 'Utilisateur non trouvé'}), 404
@@ -65,12 +69,7 @@ def require_complete_profile(f):
             return f(*args, **kwargs)
         
         # Vérifier si l'utilisateur a un profil complet
-        has_profile = (
-            (hasattr(user, 'etudiant_profil') and user.etudiant_profil is not None) or
-            (hasattr(user, 'enseignant_profil') and user.enseignant_profil is not None)
-        )
-        
-        if not has_profile:
+        if not user.a_profil:
             return jsonify({
                 'message': 'Profil incomplet. Veuillez terminer votre inscription.',
                 'requiresOnboarding': True
@@ -0,0 +1,23 @@
+"""
+Requêtes conditionnelles (ETag / If-None-Match) pour les routes flask-restx
+"""
+from typing import Any, Dict, Tuple
+
+from flask import request
+from werkzeug.http import quote_etag
+
+
+def reponse_etag(donnees: Any, etag: str, code: int = 200) -> Tuple[Any, int, Dict[str, str]]:
+    """
+    Réponse (données, code, en-têtes) portant l'ETag; 304 sans corps si le client a déjà
+    cette version (If-None-Match, comparaison faible: les proxys peuvent affaiblir l'ETag)
+
+    Compatible avec marshal_with / marshal_list_with: werkzeug n'envoie pas de corps en 304.
+    """
+    entetes = {
+        'ETag': quote_etag(etag),
+        'Cache-Control': 'no-cache'  # Le navigateur revalide à chaque fois (304 si inchangé)
+    }
+    if request.if_none_match.contains_weak(etag):
+        return ([] if isinstance(donnees, list) else {}), 304, entetes
+    return donnees, code, entetes
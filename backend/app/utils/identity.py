@@ -0,0 +1,225 @@
+"""
+Identité de l'utilisateur authentifié, partagée par les décorateurs, les routes et les services
+
+- IdentiteUtilisateur: instantané (id, email, nom, rôle, statut, profils) obtenu par une seule
+  requête: l'utilisateur et ses profils étudiant/enseignant en jointure externe.
+- Dans une requête HTTP (ou une tâche), l'identité et l'objet User chargés sont conservés
+  dans flask.g. L'objet User reste dans la carte d'identité de la session SQLAlchemy: les
+  recherches suivantes par clé primaire (BaseRepository.get_by_id, session.get) ne refont pas
+  de requête, et ses profils sont déjà chargés.
+- Entre requêtes, les identités sont conservées quelques secondes en mémoire du processus
+  (IDENTITY_CACHE_SECONDS), et invalidées explicitement lors d'un changement de rôle, de
+  statut ou de profil. L'invalidation est locale au processus: dans un déploiement à plusieurs
+  processus, la durée du cache borne le délai de prise en compte par les autres.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from flask import g, has_app_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from app.models.user import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+# Durée de validité d'une identité en cache (secondes, 0 pour désactiver le cache)
+IDENTITE_CACHE_SECONDES = float(os.getenv('IDENTITY_CACHE_SECONDS', '15'))
+IDENTITE_CACHE_MAX = 10000
+
+
+class IdentiteUtilisateur:
+    """Instantané en lecture seule d'un utilisateur (attributs id, email, name, role, is_active)"""
+
+    __slots__ = ('id', 'email', 'name', 'role', 'is_active', 'etudiant_id', 'enseignant_id')
+
+    def __init__(self, id: str, email: str, name: Optional[str], role: UserRole, is_active: bool,
+                 etudiant_id: Optional[str] = None, enseignant_id: Optional[str] = None):
+        self.id = id
+        self.email = email
+        self.name = name
+        self.role = role
+        self.is_active = is_active
+        self.etudiant_id = etudiant_id
+        self.enseignant_id = enseignant_id
+
+    @classmethod
+    def depuis_utilisateur(cls, user: User, etudiant_id: Optional[str] = None,
+                           enseignant_id: Optional[str] = None) -> 'IdentiteUtilisateur':
+        return cls(user.id, user.email, user.name, user.role, bool(user.is_active),
+                   etudiant_id, enseignant_id)
+
+    @property
+    def est_admin(self) -> bool:
+        return self.role == UserRole.ADMIN
+
+    @property
+    def a_profil(self) -> bool:
+        """Profil Étudiant ou Enseignant créé (onboarding terminé)"""
+        return self.etudiant_id is not None or self.enseignant_id is not None
+
+    def claims(self) -> Dict[str, Any]:
+        """Claims additionnels du token JWT"""
+        return {
+            'role': self.role.value if hasattr(self.role, 'value') else str(self.role),
+            'email': self.email,
+            'name': self.name
+        }
+
+    def __repr__(self):
+        return f'<IdentiteUtilisateur {self.email}>'
+
+
+class CacheIdentites:
+    """Identités conservées quelques secondes (processus courant, thread-safe)"""
+
+    def __init__(self, ttl_secondes: float = IDENTITE_CACHE_SECONDES):
+        self.ttl_secondes = ttl_secondes
+        self._identites: Dict[str, Tuple[float, IdentiteUtilisateur]] = {}
+        self._lock = threading.Lock()
+        # Incrémentée à chaque invalidation: une identité lue avant une invalidation
+        # n'est pas mise en cache après celle-ci
+        self.version = 0
+
+    def get(self, user_id: str) -> Optional[IdentiteUtilisateur]:
+        with self._lock:
+            entree = self._identites.get(user_id)
+            if entree and entree[0] > time.monotonic():
+                return entree[1]
+            self._identites.pop(user_id, None)
+            return None
+
+    def set(self, identite: IdentiteUtilisateur, version: int) -> None:
+        """Met en cache une identité lue alors que le cache était à la version donnée"""
+        if self.ttl_secondes <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            if len(self._identites) >= IDENTITE_CACHE_MAX:
+                self._identites.clear()
+            self._identites[identite.id] = (time.monotonic() + self.ttl_secondes, identite)
+
+    def invalider(self, user_id: str) -> None:
+        with self._lock:
+            self.version += 1
+            self._identites.pop(str(user_id), None)
+
+    def vider(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._identites.clear()
+
+
+cache_identites = CacheIdentites()
+
+
+def _memoire_requete() -> Optional[Dict[str, Tuple[Optional[IdentiteUtilisateur], Optional[User]]]]:
+    """Identités et utilisateurs chargés pendant la requête courante (None hors contexte Flask)"""
+    if not has_app_context():
+        return None
+    memoire = g.get('_identites')
+    if memoire is None:
+        memoire = g._identites = {}
+    return memoire
+
+
+def liberer_memoire_requete(exception=None) -> None:
+    """
+    Oublie les identités de la requête (teardown_request)
+    Le contexte d'application peut survivre à la requête (tests, requêtes imbriquées).
+    """
+    if has_app_context():
+        g.pop('_identites', None)
+
+
+def _charger(user_id: str) -> Tuple[Optional[IdentiteUtilisateur], Optional[User]]:
+    """Utilisateur et profils en une requête; l'identité obtenue est mise en cache"""
+    from app.models.etudiant import Etudiant
+    from app.models.enseignant import Enseignant
+
+    version = cache_identites.version
+    ligne = db.session.query(User, Etudiant, Enseignant) \
+        .outerjoin(Etudiant, Etudiant.user_id == User.id) \
+        .outerjoin(Enseignant, Enseignant.user_id == User.id) \
+        .filter(User.id == user_id) \
+        .first()
+    if ligne is None:
+        return None, None
+
+    user, etudiant, enseignant = ligne
+    # Relations renseignées sans requête supplémentaire (user.etudiant_profil...)
+    set_committed_value(user, 'etudiant_profil', etudiant)
+    set_committed_value(user, 'enseignant_profil', enseignant)
+    identite = IdentiteUtilisateur.depuis_utilisateur(
+        user, etudiant.id if etudiant else None, enseignant.id if enseignant else None)
+    cache_identites.set(identite, version)
+    return identite, user
+
+
+def charger_identite(user_id: Optional[str]) -> Optional[IdentiteUtilisateur]:
+    """
+    Identité d'un utilisateur (None s'il n'existe pas)
+    Recherchée dans la requête courante, puis dans le cache du processus, puis en base.
+    """
+    if not user_id:
+        return None
+    user_id = str(user_id)
+    memoire = _memoire_requete()
+    if memoire is not None and user_id in memoire:
+        return memoire[user_id][0]
+
+    identite, user = cache_identites.get(user_id), None
+    if identite is None:
+        identite, user = _charger(user_id)
+    if memoire is not None:
+        memoire[user_id] = (identite, user)
+    return identite
+
+
+def charger_utilisateur(user_id: Optional[str]) -> Optional[User]:
+    """
+    Objet User d'un utilisateur, profils compris, chargé au plus une fois par requête
+    """
+    if not user_id:
+        return None
+    user_id = str(user_id)
+    memoire = _memoire_requete()
+    if memoire is not None and user_id in memoire:
+        identite, user = memoire[user_id]
+        if identite is None:
+            return None
+        if user is not None and user in db.session:
+            return user
+
+    identite, user = _charger(user_id)
+    if memoire is not None:
+        memoire[user_id] = (identite, user)
+    return user
+
+
+def identite_courante() -> Optional[IdentiteUtilisateur]:
+    """Identité de l'utilisateur du token JWT vérifié (verify_jwt_in_request / jwt_required)"""
+    return charger_identite(get_jwt_identity())
+
+
+def utilisateur_courant() -> Optional[User]:
+    """Objet User de l'utilisateur du token JWT vérifié"""
+    return charger_utilisateur(get_jwt_identity())
+
+
+def invalider_identite(user_id: Optional[str]) -> None:
+    """
+    Oublie l'identité d'un utilisateur après un changement de rôle, de statut ou de profil
+    (cache du processus et requête courante)
+    """
+    if not user_id:
+        return
+    cache_identites.invalider(user_id)
+    memoire = _memoire_requete()
+    if memoire is not None:
+        memoire.pop(str(user_id), None)
@@ -0,0 +1,23 @@
+"""
+Paramètres de pagination par curseur des endpoints de liste
+
+Un endpoint passe en pagination par curseur dès que le paramètre `cursor` est présent
+(vide pour la première page). Le jeton `next_cursor` de la réponse désigne la page
+suivante (null sur la dernière). Le total n'est calculé que si `include_total=true`.
+"""
+from typing import Optional, Tuple
+from flask import request
+
+
+def lire_pagination_curseur() -> Optional[Tuple[Optional[str], bool]]:
+    """
+    Lit les paramètres cursor et include_total de la requête courante
+
+    Returns:
+        None si la requête utilise la pagination par offset, sinon (curseur, avec_total)
+    """
+    if 'cursor' not in request.args:
+        return None
+    curseur = request.args.get('cursor') or None
+    avec_total = request.args.get('include_total', 'false').lower() in ('true', '1', 'yes')
+    return curseur, avec_total
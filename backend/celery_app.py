@@ -2,6 +2,7 @@
 Configuration Celery
 """
 from celery import Celery
+from celery.signals import worker_process_init
 import os
 import logging
 
@@ -86,4 +87,23 @@ def make_celery():
 celery = make_celery()
 
 
+@worker_process_init.connect
+def init_worker_app(**kwargs):
+    """
+    Construit l'application Flask (et son moteur SQLAlchemy) une fois par processus worker
+
+    Exécuté dans chaque processus enfant après le fork: le pool de connexions n'est pas
+    partagé avec le processus parent. Les tâches l'utilisent via app.utils.app_context.
+    Le worker émet des notifications Socket.IO sans servir de clients (SOCKETIO_WRITE_ONLY).
+    """
+    os.environ.setdefault('SOCKETIO_WRITE_ONLY', 'true')
+    try:
+        from app.utils.app_context import get_app
+        get_app()
+        logger.info("Application Flask initialisée pour le processus worker")
+    except Exception as e:
+        # Les tâches retenteront la création à leur première exécution
+        logger.error(f"Erreur initialisation de l'application du worker: {e}", exc_info=True)
+
+
 
@@ -5,10 +5,11 @@ import bcrypt
 from app.models import (
     User, UserRole,
     Niveau, Matiere, Classe,
-    QCM, Question,
+    QCM,
     SessionExamen, Resultat
 )
 from app import create_app, db
+from app.repositories.question_repository import QuestionRepository
 import os
 import sys
 from datetime import datetime, timedelta, timezone
@@ -125,24 +126,8 @@ def create_qcm_with_questions(enseignant, matiere, titre, description, questions
     db.session.add(qcm)
     db.session.flush()
 
-    # Créer les questions
-    for idx, q_data in enumerate(questions_data):
-        question = Question(
-            enonce=q_data['enonce'],
-            type_question=q_data['type'],
-            points=q_data['points'],
-            qcm_id=qcm.id,
-            explication=q_data.get('explication')
-        )
-
-        if q_data['type'] == 'qcm':
-            # Options pour QCM
-            options = q_data['options']
-            question.set_options(options)
-        elif q_data['type'] == 'vrai_faux':
-            question.reponse_correcte = q_data['reponse_correcte']
-
-        db.session.add(question)
+    # Créer les questions (insertion en masse, une seule instruction)
+    QuestionRepository().insert_many(qcm.id, questions_data)
 
     db.session.commit()
     print(f"✅ QCM créé: {titre} avec {len(questions_data)} questions")
@@ -0,0 +1,58 @@
+"""add_statistiques_qcm
+
+Revision ID: 20260110_090000
+Revises: add_niveau_mention_parcours
+Create Date: 2026-01-10 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '20260110_090000'
+down_revision = 'add_niveau_mention_parcours'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Agrégats par QCM (remplis par `flask rebuild-stats-qcm`, puis à chaque soumission)
+    op.create_table(
+        'statistiques_qcm',
+        sa.Column('qcm_id', sa.String(36), primary_key=True, nullable=False),
+        sa.Column('nombre_soumissions', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('nombre_etudiants_uniques', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('nombre_reussis', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('nombre_notes', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('somme_notes', sa.Float, nullable=False, server_default='0'),
+        sa.Column('nombre_pourcentages', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('somme_pourcentages', sa.Float, nullable=False, server_default='0'),
+        sa.Column('nombre_durees', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('somme_durees', sa.Float, nullable=False, server_default='0'),
+        sa.Column('note_min', sa.Float, nullable=True),
+        sa.Column('note_max', sa.Float, nullable=True),
+        sa.Column('histogramme_notes', sa.Text, nullable=True),
+        sa.Column('updated_at', sa.DateTime, nullable=False),
+        sa.ForeignKeyConstraint(['qcm_id'], ['qcms.id'], ondelete='CASCADE'),
+    )
+
+    # Agrégats par question
+    op.create_table(
+        'statistiques_question',
+        sa.Column('question_id', sa.String(36), primary_key=True, nullable=False),
+        sa.Column('qcm_id', sa.String(36), nullable=False),
+        sa.Column('nombre_reponses', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('nombre_correctes', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('reponses_frequentes', sa.Text, nullable=True),
+        sa.Column('updated_at', sa.DateTime, nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['qcm_id'], ['qcms.id'], ondelete='CASCADE'),
+    )
+    op.create_index('ix_statistiques_question_qcm_id', 'statistiques_question', ['qcm_id'])
+
+
+def downgrade():
+    op.drop_index('ix_statistiques_question_qcm_id', table_name='statistiques_question')
+    op.drop_table('statistiques_question')
+    op.drop_table('statistiques_qcm')
@@ -0,0 +1,29 @@
+"""add_audience_indexes
+
+Revision ID: 20260112_090000
+Revises: 20260110_090000
+Create Date: 2026-01-12 09:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers
+revision = '20260112_090000'
+down_revision = '20260110_090000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Étudiants d'une matière / d'une classe (AudienceService): la clé primaire
+    # (etudiant_id, matiere_id) ne sert pas les recherches par matière
+    op.create_index('ix_etudiant_matieres_v2_matiere_id', 'etudiant_matieres_v2',
+                    ['matiere_id', 'etudiant_id'])
+    op.create_index('ix_etudiant_classes_v2_classe_id', 'etudiant_classes_v2',
+                    ['classe_id', 'etudiant_id'])
+
+
+def downgrade():
+    op.drop_index('ix_etudiant_classes_v2_classe_id', table_name='etudiant_classes_v2')
+    op.drop_index('ix_etudiant_matieres_v2_matiere_id', table_name='etudiant_matieres_v2')
@@ -0,0 +1,28 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: 20260114_090000
+Revises: 20260112_090000
+Create Date: 2026-01-14 09:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers
+revision = '20260114_090000'
+down_revision = '20260112_090000'
+branch_labels = None
+depends_on = None
+
+# Tables paginées par curseur sur (created_at, id) (BaseRepository.get_all_keyset)
+TABLES = ('resultats', 'qcms', 'questions', 'sessions_examen', 'users')
+
+
+def upgrade():
+    for table in TABLES:
+        op.create_index(f'ix_{table}_created_at_id', table, ['created_at', 'id'])
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_created_at_id', table_name=table)
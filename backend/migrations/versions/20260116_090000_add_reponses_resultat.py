@@ -0,0 +1,212 @@
+"""add_reponses_resultat
+
+Revision ID: 20260116_090000
+Revises: 20260114_090000
+Create Date: 2026-01-16 09:00:00
+
+"""
+import json
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '20260116_090000'
+down_revision = '20260114_090000'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger(__name__)
+
+# Résultats traités par lot lors de la reprise des anciens détails JSON
+TAILLE_LOT = 500
+# Longueur de reponses_resultat.question_id
+LONGUEUR_QUESTION_ID = 36
+
+resultats = sa.table(
+    'resultats',
+    sa.column('id', sa.String),
+    sa.column('reponses_detail', sa.Text),
+)
+
+reponses_resultat = sa.table(
+    'reponses_resultat',
+    sa.column('resultat_id', sa.String),
+    sa.column('question_id', sa.String),
+    sa.column('numero', sa.Integer),
+    sa.column('reponse', sa.Text),
+    sa.column('reponse_correcte', sa.Text),
+    sa.column('correct', sa.Boolean),
+    sa.column('score', sa.Float),
+    sa.column('score_max', sa.Float),
+    sa.column('question_enonce', sa.Text),
+    sa.column('feedback', sa.Text),
+)
+
+questions = sa.table(
+    'questions',
+    sa.column('id', sa.String),
+    sa.column('enonce', sa.Text),
+    sa.column('explication', sa.Text),
+)
+
+
+def _encoder(valeur):
+    return json.dumps(valeur, ensure_ascii=False, sort_keys=True)
+
+
+def _nombre(valeur):
+    """Nombre tel que stocké dans l'ancien JSON (None si non numérique)"""
+    if isinstance(valeur, bool) or not isinstance(valeur, (int, float)):
+        return None
+    return float(valeur)
+
+
+def _texte(valeur):
+    """Texte tel que stocké dans l'ancien JSON (None si absent ou non textuel)"""
+    return valeur if isinstance(valeur, str) else None
+
+
+def lignes_depuis_detail(resultat_id, texte):
+    """Convertit un ancien reponses_detail (texte JSON) en lignes reponses_resultat"""
+    try:
+        detail = json.loads(texte)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(detail, dict):
+        return None
+
+    lignes = []
+    for question_id, reponse in detail.items():
+        if not isinstance(reponse, dict):
+            continue
+        if len(str(question_id)) > LONGUEUR_QUESTION_ID:
+            # Un id tronqué pourrait en heurter un autre (clé primaire): détail JSON conservé
+            logger.warning(f"Résultat {resultat_id}: question_id trop long ({question_id!r}), "
+                           f"détail JSON conservé")
+            return None
+        numero = reponse.get('question_numero')
+        lignes.append({
+            'resultat_id': resultat_id,
+            'question_id': str(question_id),
+            'numero': numero if isinstance(numero, int) and not isinstance(numero, bool) else None,
+            'reponse': _encoder(reponse.get('answer')),
+            'reponse_correcte': _encoder(reponse.get('correct_answer')),
+            'correct': bool(reponse.get('correct', False)),
+            'score': _nombre(reponse.get('score')),
+            'score_max': _nombre(reponse.get('max_score')),
+            'question_enonce': _texte(reponse.get('question_enonce')),
+            'feedback': _texte(reponse.get('feedback')),
+        })
+    return lignes
+
+
+def upgrade():
+    op.create_table(
+        'reponses_resultat',
+        sa.Column('resultat_id', sa.String(length=36), nullable=False),
+        sa.Column('question_id', sa.String(length=36), nullable=False),
+        sa.Column('numero', sa.Integer(), nullable=True),
+        sa.Column('reponse', sa.Text(), nullable=True),
+        sa.Column('reponse_correcte', sa.Text(), nullable=True),
+        sa.Column('correct', sa.Boolean(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=True),
+        sa.Column('score_max', sa.Float(), nullable=True),
+        # Énoncé et explication au moment de la soumission (l'historique survit aux questions)
+        sa.Column('question_enonce', sa.Text(), nullable=True),
+        sa.Column('feedback', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['resultat_id'], ['resultats.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('resultat_id', 'question_id')
+    )
+    op.create_index('ix_reponses_resultat_question_correct', 'reponses_resultat', ['question_id', 'correct'])
+
+    # Reprise des anciens détails JSON, par lots de résultats (parcours sur l'id)
+    bind = op.get_bind()
+    dernier_id = ''
+    while True:
+        lot = bind.execute(
+            sa.select(resultats.c.id, resultats.c.reponses_detail)
+            .where(resultats.c.reponses_detail.isnot(None), resultats.c.id > dernier_id)
+            .order_by(resultats.c.id)
+            .limit(TAILLE_LOT)
+        ).fetchall()
+        if not lot:
+            break
+        dernier_id = lot[-1][0]
+
+        lignes, migres = [], []
+        for resultat_id, texte in lot:
+            converties = lignes_depuis_detail(resultat_id, texte)
+            # Un détail illisible, ou dont un question_id dépasse la colonne, est conservé tel quel
+            # (toujours lu par Resultat.get_reponses_detail)
+            if converties is None:
+                continue
+            lignes.extend(converties)
+            migres.append(resultat_id)
+
+        if lignes:
+            bind.execute(reponses_resultat.insert(), lignes)
+        if migres:
+            bind.execute(resultats.update().where(resultats.c.id.in_(migres)).values(reponses_detail=None))
+
+    # Détails sans énoncé recopié: repris sur la question si elle existe encore
+    question = sa.select(questions).where(questions.c.id == reponses_resultat.c.question_id)
+    bind.execute(
+        reponses_resultat.update()
+        .where(reponses_resultat.c.question_enonce.is_(None), question.exists())
+        .values(
+            question_enonce=question.with_only_columns(questions.c.enonce).scalar_subquery(),
+            feedback=question.with_only_columns(
+                sa.func.coalesce(questions.c.explication, '')).scalar_subquery(),
+        )
+    )
+
+
+def downgrade():
+    # Reconstruction des détails JSON (énoncé recopié, à défaut relu sur la question)
+    bind = op.get_bind()
+    dernier_id = ''
+    while True:
+        resultat_ids = [ligne[0] for ligne in bind.execute(
+            sa.select(reponses_resultat.c.resultat_id).distinct()
+            .where(reponses_resultat.c.resultat_id > dernier_id)
+            .order_by(reponses_resultat.c.resultat_id)
+            .limit(TAILLE_LOT)
+        ).fetchall()]
+        if not resultat_ids:
+            break
+        dernier_id = resultat_ids[-1]
+
+        details = {}
+        lignes = bind.execute(
+            sa.select(reponses_resultat, questions.c.enonce, questions.c.explication)
+            .select_from(reponses_resultat.outerjoin(questions, questions.c.id == reponses_resultat.c.question_id))
+            .where(reponses_resultat.c.resultat_id.in_(resultat_ids))
+            .order_by(reponses_resultat.c.resultat_id, reponses_resultat.c.numero)
+        ).mappings().all()
+        for ligne in lignes:
+            detail = {
+                'question_id': ligne['question_id'],
+                'question_numero': ligne['numero'],
+                'answer': json.loads(ligne['reponse']) if ligne['reponse'] else None,
+                'correct_answer': json.loads(ligne['reponse_correcte']) if ligne['reponse_correcte'] else None,
+                'correct': ligne['correct'],
+                'score': ligne['score'],
+                'max_score': ligne['score_max'],
+            }
+            if ligne['question_enonce'] is not None:
+                detail['question_enonce'] = ligne['question_enonce']
+                detail['feedback'] = ligne['feedback'] or ''
+            elif ligne['enonce'] is not None:
+                detail['question_enonce'] = ligne['enonce']
+                detail['feedback'] = ligne['explication'] or ''
+            details.setdefault(ligne['resultat_id'], {})[ligne['question_id']] = detail
+
+        for resultat_id, detail in details.items():
+            bind.execute(resultats.update().where(resultats.c.id == resultat_id)
+                         .values(reponses_detail=json.dumps(detail, ensure_ascii=False)))
+
+    op.drop_index('ix_reponses_resultat_question_correct', table_name='reponses_resultat')
+    op.drop_table('reponses_resultat')
@@ -0,0 +1,43 @@
+"""add_recherche_trgm_indexes
+
+Revision ID: 20260118_090000
+Revises: 20260116_090000
+Create Date: 2026-01-18 09:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers
+revision = '20260118_090000'
+down_revision = '20260116_090000'
+branch_labels = None
+depends_on = None
+
+# Colonnes de la recherche textuelle (app.repositories.recherche): index GIN pg_trgm, utilisés
+# par ILIKE '%terme%' et l'opérateur de similarité %. Sous SQLite, l'index FTS5 est créé par
+# l'application à la première recherche.
+COLONNES = (
+    ('users', 'email'),
+    ('users', 'name'),
+    ('classes', 'code'),
+    ('classes', 'nom'),
+    ('matieres', 'code'),
+    ('matieres', 'nom'),
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, colonne in COLONNES:
+        op.create_index(f'ix_{table}_{colonne}_trgm', table, [colonne],
+                        postgresql_using='gin', postgresql_ops={colonne: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, colonne in reversed(COLONNES):
+        op.drop_index(f'ix_{table}_{colonne}_trgm', table_name=table)
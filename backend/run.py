@@ -60,7 +60,8 @@ def init_database():
             from app.models import (
                 User, UserRole, QCM, Question,
                 Niveau, Matiere, Classe, SessionExamen, Resultat, AIModelConfig,
-                Etablissement, Mention, Parcours, Enseignant, Etudiant, AdminNotification
+                Etablissement, Mention, Parcours, Enseignant, Etudiant, AdminNotification,
+                StatistiquesQCM, StatistiquesQuestion
             )
             
             # Vérifier si les tables existent
@@ -115,6 +116,24 @@ def seed_users_command(force):
         raise
 
 
+@app.cli.command('rebuild-stats-qcm')
+@click.option('--qcm-id', default=None, help='Reconstruit uniquement les statistiques de ce QCM')
+def rebuild_stats_qcm_command(qcm_id):
+    """Reconstruit les agrégats de statistiques des QCM à partir des résultats"""
+    from app.services.statistiques_qcm_service import StatistiquesQCMService
+    try:
+        service = StatistiquesQCMService()
+        if qcm_id:
+            stats = service.reconstruire_qcm(qcm_id)
+            click.echo(f'✅ Statistiques du QCM {qcm_id} reconstruites ({stats.nombre_soumissions} soumissions)')
+        else:
+            nombre = service.reconstruire_tous()
+            click.echo(f'✅ Statistiques reconstruites pour {nombre} QCM')
+    except Exception as e:
+        click.echo(f'❌ Erreur: {str(e)}', err=True)
+        raise
+
+
 if __name__ == '__main__':
     # Mode développement uniquement
     # Supporte FLASK_DEBUG=1, FLASK_DEBUG=True, ou FLASK_ENV=development
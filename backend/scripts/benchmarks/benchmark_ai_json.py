@@ -0,0 +1,163 @@
+"""
+Benchmark de la récupération du JSON des réponses IA
+
+Compare l'extraction historique d'AIService._extract_json_from_response (expressions
+régulières recompilées à chaque appel, recherche question par question, parcours des
+accolades) avec ai_json.reparer_json (un seul parcours, coût linéaire):
+- sur le corpus de réponses mal formées des tests (questions récupérées et durée);
+- sur des réponses synthétiques de taille croissante, valides, tronquées ou pathologiques.
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_ai_json.py --tailles 2000 8000 32000 --limite 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.ai_json import reparer_json  # noqa: E402
+
+CHEMIN_CORPUS = os.path.join(os.path.dirname(__file__), '..', '..', 'tests', 'donnees',
+                             'reponses_ia_mal_formees.json')
+
+
+def extraction_historique(json_str: str):
+    """Implémentation précédente de _extract_json_from_response (journalisation retirée)"""
+    json_match = re.search(r'```json\s*(\{.*?\})\s*```', json_str, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(1)
+    else:
+        json_match = re.search(r'\{.*"questions".*\}', json_str, re.DOTALL)
+        json_str = json_match.group(0) if json_match else json_str.strip()
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        questions_list = []
+        questions_section = None
+        questions_start = json_str.find('"questions"')
+        if questions_start == -1:
+            questions_start = json_str.find('questions')
+        if questions_start != -1:
+            questions_section = json_str[questions_start:]
+            array_start = questions_section.find('[')
+            if array_start != -1:
+                questions_section = questions_section[array_start:]
+        question_pattern = r'\{\s*"enonce"\s*:\s*"((?:[^"\\]|\\.)*)"[^}]*"type"\s*:\s*"[^"]*"[^}]*"options"\s*:\s*\[(.*?)\][^}]*"explication"\s*:\s*"((?:[^"\\]|\\.)*)"[^}]*"points"\s*:\s*(\d+)'
+        for match in re.finditer(question_pattern, questions_section or json_str, re.DOTALL):
+            options = [
+                {"texte": o.group(1), "estCorrecte": o.group(2) == 'true'}
+                for o in re.finditer(r'\{\s*"texte"\s*:\s*"((?:[^"\\]|\\.)*)"[^}]*"estCorrecte"\s*:\s*(true|false)',
+                                     match.group(2), re.DOTALL)
+            ]
+            if len(options) >= 2:
+                questions_list.append({"enonce": match.group(1), "type": "qcm", "options": options,
+                                       "explication": match.group(3), "points": int(match.group(4))})
+        if questions_list:
+            return {"questions": questions_list}
+        brace_count = 0
+        last_valid_pos = -1
+        for i, char in enumerate(json_str):
+            if char == '{':
+                brace_count += 1
+            elif char == '}':
+                brace_count -= 1
+                if brace_count == 1:
+                    last_valid_pos = i
+        if last_valid_pos > 0:
+            truncated_json = json_str[:last_valid_pos + 1]
+            if truncated_json.count('[') > truncated_json.count(']'):
+                truncated_json += ']'
+            if truncated_json.count('{') > truncated_json.count('}'):
+                truncated_json += '}'
+            return json.loads(truncated_json)
+        raise ValueError("JSON irréparable")
+
+
+def nombre_questions(fonction, texte):
+    try:
+        donnees = fonction(texte)
+    except (ValueError, RecursionError):
+        return 0
+    questions = donnees if isinstance(donnees, list) else donnees.get('questions', [])
+    return len(questions) if isinstance(questions, list) else 0
+
+
+def _mesurer(fonction, texte, file):
+    debut = time.perf_counter()
+    questions = nombre_questions(fonction, texte)
+    file.put((time.perf_counter() - debut, questions))
+
+
+def chronometrer(fonction, texte, limite: float):
+    """(secondes, nombre de questions); None si la fonction dépasse limite secondes"""
+    # Processus séparé: une expression régulière qui recule garde le GIL, seul un processus s'interrompt
+    file = multiprocessing.Queue()
+    processus = multiprocessing.Process(target=_mesurer, args=(fonction, texte, file), daemon=True)
+    processus.start()
+    processus.join(limite)
+    if processus.is_alive():
+        processus.terminate()
+        processus.join()
+        return None
+    return file.get()
+
+
+def reponse_synthetique(taille: int) -> str:
+    """Réponse valide d'environ taille caractères"""
+    questions = []
+    texte = ''
+    while len(texte) < taille:
+        i = len(questions)
+        questions.append({
+            'enonce': f'Question {i}: quel est le rôle de la couche {i % 7} du modèle OSI ?',
+            'type': 'qcm',
+            'options': [{'texte': f'Réponse {j}', 'estCorrecte': j == 0} for j in range(4)],
+            'explication': 'Voir le chapitre "Réseaux", section {couches}.',
+            'points': 1
+        })
+        texte = 'Voici le QCM :\n```json\n' + json.dumps({'questions': questions}, ensure_ascii=False, indent=2)
+    return texte + '\n```'
+
+
+def formater(mesure):
+    return f"{'> limite':>18}" if mesure is None else f"{mesure[0] * 1000:>9.2f}ms {mesure[1]:>3} q."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tailles', type=int, nargs='+', default=[2000, 8000, 32000])
+    parser.add_argument('--limite', type=float, default=10.0, help='Durée maximale par mesure (secondes)')
+    args = parser.parse_args()
+
+    with open(CHEMIN_CORPUS, encoding='utf-8') as fichier:
+        corpus = json.load(fichier)
+
+    print(f"{'corpus':<40} | {'attendu':>7} | {'historique':>18} | {'reparer_json':>18}")
+    for cas in corpus:
+        print(f"{cas['nom']:<40} | {len(cas['enonces']):>5} q. | "
+              f"{formater(chronometrer(extraction_historique, cas['reponse'], args.limite))} | "
+              f"{formater(chronometrer(reparer_json, cas['reponse'], args.limite))}")
+
+    print()
+    print(f"{'synthétique':<28} {'car.':>8} | {'historique':>18} | {'reparer_json':>18}")
+    for taille in args.tailles:
+        valide = reponse_synthetique(taille)
+        variantes = {
+            'valide': valide,
+            'tronquée': valide[:int(len(valide) * 0.9)],
+            'virgules finales': valide.replace('"points": 1\n', '"points": 1,\n'),
+            'pathologique': '{"questions": [' + '{"enonce": "a", "type": "qcm", "options": [' * (taille // 45),
+        }
+        for nom, texte in variantes.items():
+            print(f"{nom:<28} {len(texte):>8} | "
+                  f"{formater(chronometrer(extraction_historique, texte, args.limite))} | "
+                  f"{formater(chronometrer(reparer_json, texte, args.limite))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark du coût fixe par tâche de l'accès à la base depuis une tâche Celery
+
+Compare l'implémentation historique (create_app() puis app.app_context() à chaque tâche:
+relecture du .env, sondage de PostgreSQL, nouveau moteur SQLAlchemy, blueprints et métriques
+réenregistrés) avec le contexte de l'application du worker (app.utils.app_context), créée
+une seule fois par processus. La tâche mesurée se limite à une requête SELECT 1.
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_app_context.py --taches 200
+    DATABASE_URL=postgresql://... python scripts/benchmarks/benchmark_app_context.py
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def mesurer(tache, nombre: int):
+    """Durées (ms) de nombre exécutions de tache"""
+    durees = []
+    for _ in range(nombre):
+        debut = time.perf_counter()
+        tache()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return durees
+
+
+def afficher(nom: str, durees) -> None:
+    durees = sorted(durees)
+    p95 = durees[int(len(durees) * 0.95) - 1]
+    print(f"{nom:<32} moyenne {statistics.mean(durees):8.2f} ms   "
+          f"médiane {statistics.median(durees):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--taches', type=int, default=100, help='Nombre de tâches simulées par variante')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        fichier = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{fichier}'
+    logging.disable(logging.WARNING)
+
+    from sqlalchemy import text
+    from app import create_app, db
+    from app.utils.app_context import app_context, get_app
+
+    def tache_historique():
+        app = create_app()
+        with app.app_context():
+            db.session.execute(text('SELECT 1'))
+        # Libérer les connexions du moteur jetable, comme à la fin d'un processus
+        with app.app_context():
+            db.engine.dispose()
+
+    def tache_worker():
+        with app_context():
+            db.session.execute(text('SELECT 1'))
+
+    # Initialisation du worker (signal worker_process_init), hors mesure
+    debut = time.perf_counter()
+    get_app()
+    print(f"Initialisation unique du worker: {(time.perf_counter() - debut) * 1000:.1f} ms")
+    print(f"Base: {os.environ['DATABASE_URL'].split('@')[-1]}   tâches: {args.taches}\n")
+
+    # create_app() écrit sur stdout: le rendre silencieux pendant la mesure
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        historique = mesurer(tache_historique, args.taches)
+        worker = mesurer(tache_worker, args.taches)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    afficher('create_app() par tâche', historique)
+    afficher('application du worker', worker)
+    print(f"\nGain par tâche: x{statistics.mean(historique) / statistics.mean(worker):.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark de l'extraction de texte PDF (DocumentParser)
+
+Compare l'implémentation historique (BytesIO + PyPDF2 page par page sur un thread,
+puis jointure) avec l'extraction en flux (fichier temporaire + mmap, lots de pages
+en parallèle, générateur avec arrêt anticipé) sur des PDF synthétiques.
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_document_parser.py --pages 50 200 --workers 4
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def creer_pdf(nombre_pages: int, lignes_par_page: int = 45) -> bytes:
+    """Génère un PDF synthétique de nombre_pages pages de texte"""
+    from reportlab.pdfgen import canvas
+
+    tampon = io.BytesIO()
+    pdf = canvas.Canvas(tampon)
+    for page in range(nombre_pages):
+        for ligne in range(lignes_par_page):
+            pdf.drawString(40, 810 - ligne * 17,
+                           f"Page {page}, ligne {ligne}: contenu synthétique du support de cours.")
+        pdf.showPage()
+    pdf.save()
+    return tampon.getvalue()
+
+
+def extraction_historique(file_bytes: bytes) -> str:
+    """Implémentation précédente de DocumentParser.extract_from_pdf"""
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+    text_parts = []
+    for page in pdf_reader.pages:
+        text = page.extract_text()
+        if text:
+            text_parts.append(text)
+    return "\n\n".join(text_parts)
+
+
+def mesurer(fonction, *args):
+    """Exécute fonction et retourne (résultat, secondes, pic mémoire Mo du processus principal)"""
+    tracemalloc.start()
+    debut = time.perf_counter()
+    resultat = fonction(*args)
+    duree = time.perf_counter() - debut
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultat, duree, pic / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-chars', type=int, default=80000,
+                        help="Seuil d'arrêt anticipé (ex: 10 questions x 8000 caractères)")
+    args = parser.parse_args()
+
+    os.environ['DOCUMENT_PARSER_WORKERS'] = str(args.workers)
+    from app.services.document_parser import DocumentParser
+    from app.services import document_parser
+
+    # Démarrage du pool hors mesure (coût payé une fois par processus)
+    list(DocumentParser.iter_pdf_text(creer_pdf(document_parser.SEUIL_PAGES_PARALLELE, 1)))
+
+    print(f"{'pages':>6} {'Mo':>7} | {'historique':>18} | {'flux complet':>18} | {'flux arrêt anticipé':>20}")
+    for nombre_pages in args.pages:
+        contenu = creer_pdf(nombre_pages)
+
+        texte_ref, t_ref, m_ref = mesurer(extraction_historique, contenu)
+        texte, t_flux, m_flux = mesurer(DocumentParser.extract_from_pdf, contenu)
+        texte_court, t_court, m_court = mesurer(DocumentParser.extract_from_pdf, contenu, args.max_chars)
+
+        assert texte == texte_ref, "Le texte extrait diffère de l'implémentation historique"
+        print(f"{nombre_pages:>6} {len(contenu) / 1e6:>7.2f} | "
+              f"{t_ref:>7.2f}s {m_ref:>7.1f}Mo | "
+              f"{t_flux:>7.2f}s {m_flux:>7.1f}Mo | "
+              f"{t_court:>7.2f}s {m_court:>7.1f}Mo ({len(texte_court)} car.)")
+
+
+if __name__ == '__main__':
+    main()
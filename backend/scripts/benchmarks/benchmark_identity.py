@@ -0,0 +1,112 @@
+"""
+Benchmark du chargement de l'utilisateur authentifié sur des routes protégées
+
+Mesure, par requête authentifiée (client de test Flask, token Bearer), la durée médiane et le
+nombre de requêtes SQL:
+- route minimale protégée par l'ancien require_role (User.query.get à chaque requête, puis
+  chargement paresseux des profils) et par require_role actuel (app.utils.identity);
+- GET /api/admin/users (require_role('admin')), cache des identités désactivé puis activé.
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_identity.py
+    python scripts/benchmarks/benchmark_identity.py --requetes 2000
+    DATABASE_URL=postgresql://... python scripts/benchmarks/benchmark_identity.py
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from functools import wraps
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requetes', type=int, default=500, help='Requêtes par scénario')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        fichier = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{fichier}'
+    logging.disable(logging.WARNING)
+
+    from flask import jsonify
+    from flask_jwt_extended import create_access_token, get_jwt_identity, verify_jwt_in_request
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.models.user import User, UserRole
+    from app.utils.decorators import require_role
+    from app.utils.identity import cache_identites
+
+    def ancien_require_role(f):
+        """require_role('admin') précédent, avec la vérification de profil de require_complete_profile"""
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            verify_jwt_in_request()
+            user = User.query.get(get_jwt_identity())
+            if not user:
+                return jsonify({'message': 'Utilisateur non trouvé'}), 404
+            if user.role != UserRole.ADMIN:
+                return jsonify({'message': 'Accès réservé aux administrateurs'}), 403
+            _ = user.etudiant_profil is not None or user.enseignant_profil is not None
+            return f(user, *args, **kwargs)
+        return decorated_function
+
+    app = create_app()
+
+    @app.route('/bench/ancien')
+    @ancien_require_role
+    def route_ancienne(current_user):
+        return jsonify({'id': current_user.id})
+
+    @app.route('/bench/nouveau')
+    @require_role('admin')
+    def route_nouvelle(current_user):
+        return jsonify({'id': current_user.id})
+
+    with app.app_context():
+        db.create_all()
+        suffixe = uuid.uuid4().hex[:8]
+        admin = User(email=f'admin-{suffixe}@test.com', name='Admin', role=UserRole.ADMIN, is_active=True)
+        db.session.add(admin)
+        db.session.commit()
+        entetes = {'Authorization': f'Bearer {create_access_token(identity=admin.id)}'}
+        moteur = db.engine
+
+    # Requêtes hors contexte d'application: chacune a son contexte et sa session, comme en production
+    instructions = []
+    event.listen(moteur, 'before_cursor_execute', lambda *a: instructions.append(1))
+    client = app.test_client()
+
+    def mesurer(libelle, url, ttl):
+        cache_identites.ttl_secondes = ttl
+        cache_identites.vider()
+        assert client.get(url, headers=entetes).status_code == 200, url
+        durees = []
+        instructions.clear()
+        for _ in range(args.requetes):
+            debut = time.perf_counter()
+            client.get(url, headers=entetes)
+            durees.append((time.perf_counter() - debut) * 1000)
+        print(f"  {libelle:<42} {statistics.median(durees):>8.2f} ms {len(instructions) / args.requetes:>8.1f}")
+
+    print(f"{args.requetes} requêtes par scénario ({moteur.dialect.name})")
+    print(f"  {'scénario':<42} {'médiane':>11} {'SQL/req':>8}")
+    mesurer('route minimale, ancien require_role', '/bench/ancien', 0)
+    mesurer('route minimale, require_role sans cache', '/bench/nouveau', 0)
+    mesurer('route minimale, require_role avec cache', '/bench/nouveau', 15)
+    mesurer('/api/admin/users, sans cache', '/api/admin/users?per_page=20', 0)
+    mesurer('/api/admin/users, avec cache', '/api/admin/users?per_page=20', 15)
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
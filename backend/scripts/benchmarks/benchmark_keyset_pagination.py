@@ -0,0 +1,124 @@
+"""
+Benchmark de la pagination des listes: OFFSET/LIMIT + COUNT contre curseur (created_at, id)
+
+Remplit la table des résultats (1 000 000 de lignes par défaut) puis mesure, à plusieurs
+profondeurs, le temps d'obtention d'une page avec l'implémentation historique
+(ResultatRepository.get_all_paginated: COUNT complet puis OFFSET) et avec la pagination
+par curseur (ResultatRepository.get_all_keyset, sans total puis avec total en cache).
+La liste mesurée est la liste sans filtre (admin /resultats par défaut), servie par l'index
+(created_at, id).
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_keyset_pagination.py
+    python scripts/benchmarks/benchmark_keyset_pagination.py --lignes 200000 --taille-page 50
+    DATABASE_URL=postgresql://... python scripts/benchmarks/benchmark_keyset_pagination.py
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+TAILLE_LOT_INSERTION = 20000
+
+
+def mesurer(fonction, repetitions: int):
+    """Durée médiane (ms) de repetitions appels de fonction"""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return statistics.median(durees)
+
+
+def remplir(db, Resultat, lignes: int, etudiant_id: str, qcm_id: str) -> None:
+    """Insère lignes résultats par lots (Core executemany)"""
+    debut = datetime(2024, 9, 1)
+    table = Resultat.__table__
+    for depart in range(0, lignes, TAILLE_LOT_INSERTION):
+        lot = [{
+            'id': str(uuid.uuid4()),
+            'etudiant_id': etudiant_id,
+            'qcm_id': qcm_id,
+            'date_debut': debut,
+            'score_maximum': 20,
+            'questions_total': 10,
+            'status': 'termine',
+            # Plusieurs lignes par seconde: le départage sur l'id est exercé
+            'created_at': debut + timedelta(seconds=i // 4),
+            'updated_at': debut
+        } for i in range(depart, min(depart + TAILLE_LOT_INSERTION, lignes))]
+        db.session.execute(table.insert(), lot)
+        db.session.commit()
+        print(f"\r  {min(depart + TAILLE_LOT_INSERTION, lignes):>9} / {lignes} lignes", end='', flush=True)
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lignes', type=int, default=1_000_000, help='Nombre de résultats insérés')
+    parser.add_argument('--taille-page', type=int, default=50, help='Taille d\'une page')
+    parser.add_argument('--repetitions', type=int, default=5, help='Mesures par point (médiane)')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        fichier = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{fichier}'
+    logging.disable(logging.WARNING)
+
+    from app import create_app, db
+    from app.models.user import User, UserRole
+    from app.models.qcm import QCM
+    from app.models.resultat import Resultat
+    from app.repositories.base_repository import cache_totaux, encode_curseur
+    from app.repositories.resultat_repository import ResultatRepository
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        etudiant = User(email=f'bench-{uuid.uuid4()}@test.com', name='Benchmark', role=UserRole.ETUDIANT)
+        db.session.add(etudiant)
+        db.session.flush()
+        qcm = QCM(titre='Benchmark pagination', createur_id=etudiant.id)
+        db.session.add(qcm)
+        db.session.commit()
+
+        print(f"Insertion de {args.lignes} résultats...")
+        remplir(db, Resultat, args.lignes, etudiant.id, qcm.id)
+
+        repo = ResultatRepository()
+        taille = args.taille_page
+
+        # Curseurs de départ à chaque profondeur: clé de la dernière ligne de la page précédente
+        profondeurs = [0, args.lignes // 10, args.lignes // 2, args.lignes * 9 // 10]
+        print(f"\n{'profondeur':>12} {'offset+count':>14} {'curseur':>10} {'curseur+total':>15}")
+        for profondeur in profondeurs:
+            profondeur = min(profondeur, max(args.lignes - taille, 0))
+            curseur = None
+            if profondeur:
+                precedent = db.session.query(Resultat.created_at, Resultat.id).order_by(Resultat.created_at.desc(), Resultat.id.desc()).offset(profondeur - 1).first()
+                curseur = encode_curseur(*precedent)
+
+            offset = mesurer(lambda: repo.get_all_paginated(skip=profondeur, limit=taille),
+                             args.repetitions)
+            keyset = mesurer(lambda: repo.get_all_keyset(limit=taille, curseur=curseur),
+                             args.repetitions)
+            cache_totaux.vider()
+            keyset_total = mesurer(lambda: repo.get_all_keyset(limit=taille, curseur=curseur, avec_total=True),
+                                   args.repetitions)
+            db.session.expunge_all()
+            print(f"{profondeur:>12} {offset:>11.1f} ms {keyset:>7.1f} ms {keyset_total:>12.1f} ms")
+
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
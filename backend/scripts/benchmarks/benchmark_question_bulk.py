@@ -0,0 +1,116 @@
+"""
+Benchmark de l'enregistrement des questions: ajout ORM ligne par ligne contre écriture en masse
+
+Mesure, pour un QCM de 10 000 questions par défaut:
+- l'implémentation historique des générations (suppression des questions une par une, puis
+  Question() + set_options() + session.add() pour chaque question, un INSERT par ligne au flush);
+- QuestionRepository.insert_many (un executemany Core);
+- QuestionRepository.replace_for_qcm (DELETE ... WHERE qcm_id puis executemany) sur le QCM rempli;
+- QuestionRepository.upsert_many (INSERT ... ON CONFLICT) sur les mêmes questions modifiées.
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_question_bulk.py
+    python scripts/benchmarks/benchmark_question_bulk.py --questions 50000
+    DATABASE_URL=postgresql://... python scripts/benchmarks/benchmark_question_bulk.py
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def questions_generees(nombre: int, prefixe: str = 'Question'):
+    """Questions au format retourné par AIService.generate_questions"""
+    return [{
+        'enonce': f'{prefixe} {i} : quelle est la bonne réponse ?',
+        'type_question': 'qcm',
+        'options': [{'texte': f'Option {j}', 'estCorrecte': j == 0} for j in range(4)],
+        'explication': f'La première option est correcte ({i}).',
+        'points': 1
+    } for i in range(nombre)]
+
+
+def chronometrer(libelle: str, fonction, db) -> float:
+    debut = time.perf_counter()
+    fonction()
+    db.session.commit()
+    duree = time.perf_counter() - debut
+    print(f"  {libelle:<38} {duree * 1000:>10.1f} ms")
+    return duree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=10_000, help='Nombre de questions du QCM')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        fichier = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{fichier}'
+    logging.disable(logging.WARNING)
+
+    from app import create_app, db
+    from app.models.user import User, UserRole
+    from app.models.qcm import QCM
+    from app.models.question import Question
+    from app.repositories.question_repository import QuestionRepository
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        enseignant = User(email=f'bench-{uuid.uuid4()}@test.com', name='Benchmark', role=UserRole.ENSEIGNANT)
+        db.session.add(enseignant)
+        db.session.flush()
+        qcms = [QCM(titre=f'Benchmark questions {i}', createur_id=enseignant.id) for i in range(2)]
+        db.session.add_all(qcms)
+        db.session.commit()
+        qcm_orm, qcm_masse = qcms[0].id, qcms[1].id
+
+        repo = QuestionRepository()
+        donnees = questions_generees(args.questions)
+
+        def ajout_orm():
+            # Implémentation précédente de _generate_questions_async / generate_quiz_questions
+            for existante in Question.query.filter_by(qcm_id=qcm_orm).all():
+                db.session.delete(existante)
+            for q in donnees:
+                question = Question(
+                    enonce=q['enonce'],
+                    type_question=q.get('type_question', 'qcm'),
+                    qcm_id=qcm_orm,
+                    explication=q.get('explication', ''),
+                    points=q.get('points', 1)
+                )
+                if 'options' in q:
+                    question.set_options(q['options'])
+                db.session.add(question)
+
+        print(f"{args.questions} questions ({db.engine.dialect.name})")
+        orm = chronometrer('ORM ligne par ligne (création)', ajout_orm, db)
+        db.session.expunge_all()
+        orm_remplacement = chronometrer('ORM ligne par ligne (remplacement)', ajout_orm, db)
+        db.session.expunge_all()
+
+        masse = chronometrer('insert_many', lambda: repo.insert_many(qcm_masse, donnees), db)
+        remplacement = chronometrer('replace_for_qcm',
+                                    lambda: repo.replace_for_qcm(qcm_masse, donnees), db)
+
+        ids = [q.id for q in db.session.query(Question.id).filter_by(qcm_id=qcm_masse)]
+        modifiees = [dict(q, id=id_question, enonce=q['enonce'] + ' (révisée)')
+                     for q, id_question in zip(questions_generees(len(ids)), ids)]
+        chronometrer('upsert_many (mise à jour)', lambda: repo.upsert_many(qcm_masse, modifiees), db)
+
+        assert repo.count_by_qcm(qcm_orm) == repo.count_by_qcm(qcm_masse) == args.questions
+        print(f"\n  Gain création: x{orm / masse:.1f}, remplacement: x{orm_remplacement / remplacement:.1f}")
+
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark de la recherche d'utilisateurs et de la résolution des matières
+
+Mesure la durée médiane d'une recherche sur --utilisateurs utilisateurs:
+- ancienne recherche: ILIKE '%terme%' sur email et nom, sans limite;
+- UserRepository.search_by_email_or_name (FTS5 sous SQLite, pg_trgm sous PostgreSQL), limitée;
+- autocomplétion par préfixe (RechercheService, utilisateurs seulement);
+puis la résolution d'un nom de matière saisi librement: requêtes SQL (code, nom exact, ILIKE)
+contre l'index en mémoire (app.services.recherche_service.index_matieres).
+
+Sous PostgreSQL, appliquer d'abord la migration 20260118_090000 (extension et index pg_trgm).
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_recherche.py
+    python scripts/benchmarks/benchmark_recherche.py --utilisateurs 200000 --repetitions 50
+    DATABASE_URL=postgresql://... python scripts/benchmarks/benchmark_recherche.py
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+PRENOMS = ['Jean', 'Marie', 'Hélène', 'Paul', 'Rivo', 'Fara', 'Nirina', 'Lova', 'Tiana', 'Hery']
+NOMS = ['Dupont', 'Rakoto', 'Randria', 'Durand', 'Rasoa', 'Martin', 'Andria', 'Rabe', 'Leroy', 'Razafy']
+TERMES = ['dupont', 'rakoto 42', 'helene', 'marie.rasoa1', 'zzz-introuvable']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--utilisateurs', type=int, default=100000, help='Utilisateurs créés')
+    parser.add_argument('--repetitions', type=int, default=20, help='Mesures par terme et par scénario')
+    parser.add_argument('--limite', type=int, default=20, help='Résultats par recherche')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        fichier = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{fichier}'
+    logging.disable(logging.WARNING)
+
+    from sqlalchemy import or_
+    from app import create_app, db
+    from app.models.user import User, UserRole
+    from app.models.matiere import Matiere
+    from app.repositories.user_repository import UserRepository
+    from app.repositories.matiere_repository import MatiereRepository
+    from app.services.recherche_service import RechercheService, index_matieres
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        suffixe = uuid.uuid4().hex[:6]
+        debut = time.perf_counter()
+        lot = []
+        for i in range(args.utilisateurs):
+            prenom, nom = PRENOMS[i % len(PRENOMS)], NOMS[(i // len(PRENOMS)) % len(NOMS)]
+            lot.append({
+                'id': str(uuid.uuid4()), 'role': UserRole.ETUDIANT,
+                'email': f'{prenom.lower()}.{nom.lower()}{i}.{suffixe}@bench.test',
+                'name': f'{prenom} {nom} {i}',
+            })
+            if len(lot) == 10000:
+                db.session.execute(User.__table__.insert(), lot)
+                lot = []
+        if lot:
+            db.session.execute(User.__table__.insert(), lot)
+        for i in range(200):
+            db.session.add(Matiere(code=f'B{i}{suffixe}'.upper(), nom=f'Matière Banc {i} Générale'))
+        db.session.commit()
+        print(f"{args.utilisateurs} utilisateurs créés en {time.perf_counter() - debut:.1f} s "
+              f"({db.engine.dialect.name})")
+
+        user_repo = UserRepository()
+        matiere_repo = MatiereRepository()
+        recherche_service = RechercheService()
+        # Création de l'index FTS5 (SQLite) hors mesure
+        debut = time.perf_counter()
+        user_repo.search_by_email_or_name('amorce')
+        db.session.commit()
+        print(f"Préparation de l'index: {(time.perf_counter() - debut) * 1000:.0f} ms")
+
+        def ancienne_recherche(terme):
+            motif = f'%{terme}%'
+            return db.session.query(User).filter(or_(User.email.ilike(motif), User.name.ilike(motif))).all()
+
+        def mesurer(libelle, rechercher):
+            durees, resultats = [], []
+            for terme in TERMES:
+                for _ in range(args.repetitions):
+                    debut = time.perf_counter()
+                    trouves = rechercher(terme)
+                    durees.append((time.perf_counter() - debut) * 1000)
+                    db.session.expunge_all()
+                resultats.append(len(trouves))
+            print(f"  {libelle:<42} {statistics.median(durees):>9.2f} ms   résultats {resultats}")
+
+        print(f"  {'scénario':<42} {'médiane':>12}   termes {TERMES}")
+        mesurer('ILIKE email/nom sans limite (ancien)', ancienne_recherche)
+        mesurer('search_by_email_or_name (indexée)',
+                lambda t: user_repo.search_by_email_or_name(t, limit=args.limite))
+        mesurer('autocomplétion utilisateurs (préfixe)',
+                lambda t: recherche_service.autocompleter(t, ['utilisateurs'], limit=10)['utilisateurs'])
+
+        def resolution_sql(texte):
+            matiere = matiere_repo.get_by_code(texte)
+            if not matiere:
+                matiere = db.session.query(Matiere).filter(Matiere.nom.ilike(texte), Matiere.actif == True).first()
+            if not matiere:
+                resultats = [m for m in matiere_repo.session.query(Matiere).filter(or_(
+                    Matiere.code.ilike(f'%{texte}%'), Matiere.nom.ilike(f'%{texte}%'))).all() if m.actif]
+                matiere = resultats[0] if resultats else None
+            return matiere
+
+        textes = ['Matière Banc 150 Générale', 'banc 7', 'matiere banc 42', 'Inconnue']
+        for libelle, resoudre in (('résolution matière, SQL (ancien)', resolution_sql),
+                                  ('résolution matière, index en mémoire', index_matieres.resoudre)):
+            resoudre(textes[0])
+            durees = []
+            for _ in range(args.repetitions * 10):
+                for texte in textes:
+                    debut = time.perf_counter()
+                    resoudre(texte)
+                    durees.append((time.perf_counter() - debut) * 1000)
+            print(f"  {libelle:<42} {statistics.median(durees):>9.3f} ms")
+
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
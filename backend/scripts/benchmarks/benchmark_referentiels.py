@@ -0,0 +1,110 @@
+"""
+Benchmark du chargement des référentiels par un formulaire (listes déroulantes)
+
+Mesure, par chargement de formulaire (client de test Flask), la durée médiane et le nombre de
+requêtes SQL:
+- cinq routes de liste (niveaux, mentions, parcours, matières, établissements), cache désactivé
+  puis activé;
+- GET /api/referentiels (catalogue combiné), puis revalidation avec If-None-Match (304).
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_referentiels.py
+    python scripts/benchmarks/benchmark_referentiels.py --chargements 200 --matieres 300
+    DATABASE_URL=postgresql://... python scripts/benchmarks/benchmark_referentiels.py
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+LISTES = ['/api/niveaux', '/api/mentions', '/api/parcours', '/api/matieres', '/api/etablissements']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chargements', type=int, default=100, help='Chargements de formulaire par scénario')
+    parser.add_argument('--matieres', type=int, default=200, help='Matières créées')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        fichier = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{fichier}'
+    logging.disable(logging.WARNING)
+
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.models.etablissement import Etablissement
+    from app.models.matiere import Matiere
+    from app.models.mention import Mention
+    from app.models.niveau import Niveau
+    from app.models.parcours import Parcours
+    from app.services.referentiel_service import catalogue_referentiels
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        suffixe = uuid.uuid4().hex[:6].upper()
+        etablissement = Etablissement(code=f'E{suffixe}', nom='Université', type_etablissement='université')
+        db.session.add(etablissement)
+        db.session.flush()
+        for i in range(8):
+            db.session.add(Niveau(code=f'N{i}{suffixe}', nom=f'Niveau {i}', ordre=i, cycle='licence'))
+        for i in range(20):
+            mention = Mention(code=f'M{i}{suffixe}', nom=f'Mention {i}', etablissement_id=etablissement.id)
+            db.session.add(mention)
+            db.session.flush()
+            db.session.add(Parcours(code=f'P{i}{suffixe}', nom=f'Parcours {i}', mention_id=mention.id))
+        for i in range(args.matieres):
+            db.session.add(Matiere(code=f'X{i}{suffixe}', nom=f'Matière {i}', coefficient=1.0))
+        db.session.commit()
+        moteur = db.engine
+
+    instructions = []
+    event.listen(moteur, 'before_cursor_execute', lambda *a: instructions.append(1))
+    client = app.test_client()
+
+    def mesurer(libelle, charger, ttl):
+        catalogue_referentiels.ttl_secondes = ttl
+        catalogue_referentiels.invalider()
+        charger()
+        durees = []
+        instructions.clear()
+        for _ in range(args.chargements):
+            debut = time.perf_counter()
+            charger()
+            durees.append((time.perf_counter() - debut) * 1000)
+        print(f"  {libelle:<38} {statistics.median(durees):>8.2f} ms {len(instructions) / args.chargements:>8.1f}")
+
+    def cinq_listes():
+        for url in LISTES:
+            assert client.get(url).status_code == 200, url
+
+    etag = {}
+
+    def catalogue():
+        reponse = client.get('/api/referentiels')
+        etag['valeur'] = reponse.headers['ETag']
+
+    def revalidation():
+        assert client.get('/api/referentiels', headers={'If-None-Match': etag['valeur']}).status_code == 304
+
+    print(f"{args.chargements} chargements par scénario, {args.matieres} matières ({moteur.dialect.name})")
+    print(f"  {'scénario':<38} {'médiane':>11} {'SQL':>8}")
+    mesurer('5 routes de liste, sans cache', cinq_listes, 0)
+    mesurer('5 routes de liste, avec cache', cinq_listes, 300)
+    mesurer('/api/referentiels', catalogue, 300)
+    mesurer('/api/referentiels, If-None-Match (304)', revalidation, 300)
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de la diffusion Socket.IO entre workers (app.events.diffusion)
+
+Notification de N étudiants (publication des résultats d'une session), un emit par étudiant
+puis émissions groupées (emissions_groupees), sur la file de messages configurée:
+durée et nombre d'allers-retours vers la file.
+
+Utilisation (depuis le dossier backend):
+    python scripts/benchmarks/benchmark_socketio_fanout.py
+    python scripts/benchmarks/benchmark_socketio_fanout.py --etudiants 5000
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 python scripts/benchmarks/benchmark_socketio_fanout.py
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--etudiants', type=int, default=2000, help='Étudiants notifiés')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        fichier = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{fichier}'
+    os.environ.setdefault('SOCKETIO_MESSAGE_QUEUE', 'memory://')
+    logging.disable(logging.WARNING)
+
+    from app import create_app
+    from app.events import diffusion
+    from app.events.notifications import notify_commentaire_resultat, notify_resultats_publies
+    from app.extensions import socketio
+
+    app = create_app()
+    gestionnaire = socketio.server.manager
+    publications = []
+
+    # Allers-retours vers la file, quel que soit le backend
+    publier = gestionnaire._publish
+    gestionnaire._publish = lambda message: (publications.append(1), publier(message))
+    if hasattr(gestionnaire, '_publier_lot'):
+        publier_lot = gestionnaire._publier_lot
+        gestionnaire._publier_lot = lambda paquets: (publications.append(1), publier_lot(paquets))
+
+    resultats = [(f'etudiant-{i}', f'resultat-{i}') for i in range(args.etudiants)]
+    session = {'id': 'session-benchmark', 'titre': 'Benchmark'}
+
+    def mesurer(libelle, fonction):
+        publications.clear()
+        debut = time.perf_counter()
+        fonction()
+        duree = (time.perf_counter() - debut) * 1000
+        print(f"  {libelle:<40} {duree:>10.1f} ms {len(publications):>12}")
+
+    def un_emit_par_etudiant():
+        for user_id, resultat_id in resultats:
+            notify_commentaire_resultat(user_id, resultat_id, 'Bien')
+
+    def emissions_groupees():
+        with diffusion.emissions_groupees():
+            for user_id, resultat_id in resultats:
+                notify_commentaire_resultat(user_id, resultat_id, 'Bien')
+
+    print(f"{args.etudiants} étudiants, file {gestionnaire.name}")
+    print(f"  {'scénario':<40} {'durée':>13} {'publications':>12}")
+    with app.app_context():
+        mesurer('un emit par étudiant', un_emit_par_etudiant)
+        mesurer('emissions_groupees()', emissions_groupees)
+        mesurer('notify_resultats_publies', lambda: notify_resultats_publies(resultats, session))
+
+
+if __name__ == '__main__':
+    main()
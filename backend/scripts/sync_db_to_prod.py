@@ -5,19 +5,40 @@ vers la base de données de production.
 
 Usage:
     python scripts/sync_db_to_prod.py [--dry-run] [--skip-existing] [--update-existing]
+                                      [--mode flux|ligne] [--taille-lot N] [--paralleles N]
+                                      [--reprise FICHIER]
     
 Options:
     --dry-run: Affiche ce qui serait fait sans effectuer les modifications
     --skip-existing: Ignore les enregistrements qui existent déjà (par défaut)
     --update-existing: Met à jour les enregistrements existants au lieu de les ignorer
+    --mode: flux (par défaut) ou ligne (une requête par enregistrement, ancien mode)
+    --taille-lot: Lignes par lot en mode flux
+    --paralleles: Tables synchronisées en parallèle en mode flux (tables indépendantes)
+    --reprise: Fichier de points de reprise (mode flux): une synchronisation interrompue
+               reprend après le dernier lot validé
+
+Mode flux:
+    Chaque table est lue par un curseur serveur (lots de --taille-lot lignes, jamais toute la
+    table en mémoire), chaque lot est chargé par COPY dans une table temporaire de la base
+    cible puis appliqué en une requête INSERT ... SELECT ... ON CONFLICT. Les valeurs passent
+    par leur représentation texte PostgreSQL (SELECT col::text), valable pour tous les types.
+    Une table attend les tables qu'elle référence (clés étrangères de la base cible); les
+    tables indépendantes sont synchronisées en parallèle, chacune dans sa transaction (une
+    transaction par lot avec --reprise).
 """
 
 import os
+import io
 import sys
+import json
+import time
 import argparse
 import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, List, Any, Optional, Sequence, Set, Tuple
 from urllib.parse import urlparse
 
 # Ajouter le répertoire backend au path
@@ -39,6 +60,74 @@ logger = logging.getLogger(__name__)
 # Charger les variables d'environnement
 load_dotenv()
 
+TAILLE_LOT_DEFAUT = 10000
+
+
+def echapper_copy(valeur: Optional[str]) -> str:
+    """Valeur texte au format de COPY ... FROM STDIN (format text, \\N pour NULL)"""
+    if valeur is None:
+        return '\\N'
+    return (valeur.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def lignes_copy(lignes: Iterable[Sequence[Optional[str]]]) -> io.StringIO:
+    """Tampon COPY (format text) pour des lignes de valeurs texte"""
+    tampon = io.StringIO()
+    for ligne in lignes:
+        tampon.write('\t'.join(echapper_copy(valeur) for valeur in ligne))
+        tampon.write('\n')
+    tampon.seek(0)
+    return tampon
+
+
+def tables_pretes(restantes: List[str], terminees: Set[str], dependances: Dict[str, Set[str]],
+                  aucune_en_cours: bool) -> List[str]:
+    """
+    Tables dont toutes les tables référencées sont synchronisées (ordre de la liste conservé)
+
+    En cas de cycle de clés étrangères (aucune table prête et aucune en cours), la première
+    table restante est débloquée pour garder l'ordre de TABLE_ORDER.
+    """
+    pretes = [t for t in restantes if dependances.get(t, set()) <= terminees]
+    if not pretes and aucune_en_cours and restantes:
+        return restantes[:1]
+    return pretes
+
+
+class PointsDeReprise:
+    """Avancement de la synchronisation en mode flux (fichier JSON, écritures atomiques)"""
+
+    def __init__(self, chemin: Optional[str]):
+        self.chemin = chemin
+        self.lock = threading.Lock()
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        if chemin and os.path.exists(chemin):
+            with open(chemin, encoding='utf-8') as fichier:
+                self.tables = json.load(fichier).get('tables', {})
+            logger.info(f"Reprise depuis {chemin}: {len(self.tables)} table(s) déjà entamée(s)")
+
+    @property
+    def actif(self) -> bool:
+        return bool(self.chemin)
+
+    def table_terminee(self, table: str) -> bool:
+        return self.tables.get(table, {}).get('terminee', False)
+
+    def derniere_cle(self, table: str) -> Optional[str]:
+        return self.tables.get(table, {}).get('derniere_cle')
+
+    def enregistrer(self, table: str, derniere_cle: Optional[str] = None, terminee: bool = False):
+        if not self.chemin:
+            return
+        with self.lock:
+            self.tables[table] = {'derniere_cle': derniere_cle, 'terminee': terminee,
+                                  'misAJour': datetime.now().isoformat()}
+            temporaire = f"{self.chemin}.tmp"
+            with open(temporaire, 'w', encoding='utf-8') as fichier:
+                json.dump({'tables': self.tables}, fichier, indent=2)
+            os.replace(temporaire, self.chemin)
+
 
 class DatabaseSyncer:
     """Classe pour synchroniser les données entre deux bases PostgreSQL"""
@@ -66,7 +155,9 @@ class DatabaseSyncer:
     ]
     
     def __init__(self, local_db_url: str, prod_db_url: str, dry_run: bool = False, 
-                 update_existing: bool = False):
+                 update_existing: bool = False, mode: str = 'flux',
+                 taille_lot: int = TAILLE_LOT_DEFAUT, paralleles: int = 2,
+                 reprise: Optional[str] = None):
         """
         Initialise le synchroniseur de base de données
         
@@ -75,13 +166,22 @@ class DatabaseSyncer:
             prod_db_url: URL de connexion à la base de production
             dry_run: Si True, n'effectue pas les modifications
             update_existing: Si True, met à jour les enregistrements existants
+            mode: 'flux' (lots COPY + ON CONFLICT) ou 'ligne' (une requête par enregistrement)
+            taille_lot: Lignes par lot (mode flux)
+            paralleles: Tables synchronisées en parallèle (mode flux)
+            reprise: Fichier de points de reprise (mode flux)
         """
         self.local_db_url = local_db_url
         self.prod_db_url = prod_db_url
         self.dry_run = dry_run
         self.update_existing = update_existing
+        self.mode = mode
+        self.taille_lot = taille_lot
+        self.paralleles = max(1, paralleles)
+        self.reprise = PointsDeReprise(reprise)
         self.local_conn = None
         self.prod_conn = None
+        self.stats_lock = threading.Lock()
         self.stats = {
             'tables_processed': 0,
             'rows_inserted': 0,
@@ -318,11 +418,287 @@ class DatabaseSyncer:
         logger.info(f"✓ Table {table_name} synchronisée: {inserted} insérés, {updated} mis à jour, {skipped} ignorés")
         self.stats['tables_processed'] += 1
     
+    # ------------------------------------------------------------------
+    # Mode flux: curseur serveur -> COPY dans une table temporaire -> ON CONFLICT
+    # ------------------------------------------------------------------
+
+    def connecter_session(self, url: str):
+        """Connexion dédiée (une par table synchronisée), représentation texte des valeurs fixée"""
+        conn = psycopg2.connect(url)
+        with conn.cursor() as cur:
+            # Texte produit par la source et relu par la cible: mêmes conventions des deux côtés
+            cur.execute("SET DateStyle TO 'ISO, MDY'")
+            cur.execute("SET IntervalStyle TO 'postgres'")
+            cur.execute("SET extra_float_digits TO 3")
+            cur.execute("SET bytea_output TO 'hex'")
+        conn.commit()
+        return conn
+
+    def get_primary_key_columns(self, conn, table_name: str) -> List[str]:
+        """Colonnes de la clé primaire d'une table (dans l'ordre de la contrainte)"""
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT a.attname
+                FROM pg_index i
+                JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, rang) ON TRUE
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                WHERE i.indrelid = %s::regclass
+                AND i.indisprimary
+                ORDER BY k.rang
+            """, (table_name,))
+            return [row[0] for row in cur.fetchall()]
+
+    def get_dependances(self, conn, tables: List[str]) -> Dict[str, Set[str]]:
+        """Tables synchronisées référencées par chaque table (clés étrangères de la base cible)"""
+        dependances = {table: set() for table in tables}
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT enfant.relname, parent.relname
+                FROM pg_constraint c
+                JOIN pg_class enfant ON enfant.oid = c.conrelid
+                JOIN pg_class parent ON parent.oid = c.confrelid
+                JOIN pg_namespace n ON n.oid = enfant.relnamespace
+                WHERE c.contype = 'f' AND n.nspname = current_schema()
+            """)
+            for enfant, parent in cur.fetchall():
+                if enfant in dependances and parent in dependances and parent != enfant:
+                    dependances[enfant].add(parent)
+        return dependances
+
+    def _ajouter_stats(self, **compteurs):
+        with self.stats_lock:
+            for cle, valeur in compteurs.items():
+                self.stats[cle] += valeur
+
+    def _requete_fusion(self, table_name: str, staging: str, colonnes: List[str],
+                        cle: List[str], filtre_ctid: bool = False) -> sql.Composed:
+        """
+        INSERT ... SELECT depuis la table temporaire, avec ON CONFLICT selon la stratégie
+        Retourne (insérés, mis à jour); xmax = 0 distingue une insertion d'une mise à jour.
+        """
+        liste = sql.SQL(', ').join(sql.Identifier(c) for c in colonnes)
+        mises_a_jour = [c for c in colonnes if c not in cle]
+        if cle and self.update_existing and mises_a_jour:
+            conflit = sql.SQL("ON CONFLICT ({}) DO UPDATE SET {}").format(
+                sql.SQL(', ').join(sql.Identifier(c) for c in cle),
+                sql.SQL(', ').join(
+                    sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(c), sql.Identifier(c))
+                    for c in mises_a_jour))
+        else:
+            conflit = sql.SQL("ON CONFLICT DO NOTHING")
+        return sql.SQL("""
+            WITH fusion AS (
+                INSERT INTO {table} ({colonnes})
+                SELECT {colonnes} FROM {staging} {filtre}
+                {conflit}
+                RETURNING (xmax = 0) AS insere
+            )
+            SELECT count(*) FILTER (WHERE insere), count(*) FILTER (WHERE NOT insere) FROM fusion
+        """).format(table=sql.Identifier(table_name), colonnes=liste, staging=sql.Identifier(staging),
+                    filtre=sql.SQL("WHERE ctid = %s::tid") if filtre_ctid else sql.SQL(""),
+                    conflit=conflit)
+
+    def _appliquer_lot(self, cur, table_name: str, staging: str, colonnes: List[str],
+                       cle: List[str], lignes: List[Tuple]) -> Tuple[int, int, int, int]:
+        """
+        Charge un lot dans la table temporaire et l'applique en une requête
+
+        Si la requête groupée échoue (autre contrainte d'unicité, donnée invalide), le lot est
+        appliqué ligne par ligne comme en mode ligne: seules les lignes en erreur sont écartées.
+
+        Returns:
+            (insérés, mis à jour, ignorés, erreurs)
+        """
+        cur.copy_expert(
+            sql.SQL("COPY {} ({}) FROM STDIN").format(
+                sql.Identifier(staging),
+                sql.SQL(', ').join(sql.Identifier(c) for c in colonnes)).as_string(cur),
+            lignes_copy(lignes))
+
+        inseres = mis_a_jour = erreurs = 0
+        cur.execute("SAVEPOINT sync_lot")
+        try:
+            cur.execute(self._requete_fusion(table_name, staging, colonnes, cle))
+            inseres, mis_a_jour = cur.fetchone()
+            cur.execute("RELEASE SAVEPOINT sync_lot")
+        except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+            cur.execute("ROLLBACK TO SAVEPOINT sync_lot")
+            logger.warning(f"{table_name}: lot de {len(lignes)} lignes appliqué ligne par ligne ({e})")
+            requete = self._requete_fusion(table_name, staging, colonnes, cle, filtre_ctid=True)
+            cur.execute(sql.SQL("SELECT ctid::text FROM {}").format(sql.Identifier(staging)))
+            for (ctid,) in cur.fetchall():
+                cur.execute("SAVEPOINT sync_ligne")
+                try:
+                    cur.execute(requete, (ctid,))
+                    ligne_inseree, ligne_mise_a_jour = cur.fetchone()
+                    inseres += ligne_inseree
+                    mis_a_jour += ligne_mise_a_jour
+                    cur.execute("RELEASE SAVEPOINT sync_ligne")
+                except psycopg2.IntegrityError:
+                    # Conflit sur une autre contrainte: ignoré comme en mode ligne
+                    cur.execute("ROLLBACK TO SAVEPOINT sync_ligne")
+                except psycopg2.Error as erreur:
+                    cur.execute("ROLLBACK TO SAVEPOINT sync_ligne")
+                    erreurs += 1
+                    logger.error(f"Erreur lors de l'insertion dans {table_name}: {erreur}")
+
+        cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(staging)))
+        ignores = len(lignes) - inseres - mis_a_jour - erreurs
+        return inseres, mis_a_jour, ignores, erreurs
+
+    def sync_table_flux(self, table_name: str):
+        """Synchronise une table par lots (connexions propres à la table: appelable en parallèle)"""
+        source = self.connecter_session(self.local_db_url)
+        cible = self.connecter_session(self.prod_db_url)
+        try:
+            if not self.table_exists(source, table_name):
+                logger.warning(f"Table {table_name} n'existe pas dans la base locale, ignorée")
+                return
+            if not self.table_exists(cible, table_name):
+                logger.warning(f"Table {table_name} n'existe pas dans la base de production, ignorée")
+                return
+
+            colonnes_cible = set(self.get_table_columns(cible, table_name))
+            colonnes = [c for c in self.get_table_columns(source, table_name) if c in colonnes_cible]
+            absentes = [c for c in self.get_table_columns(source, table_name) if c not in colonnes_cible]
+            if absentes:
+                logger.warning(f"{table_name}: colonnes absentes de la production ignorées: {', '.join(absentes)}")
+            if not colonnes:
+                logger.warning(f"Aucune colonne commune pour {table_name}, ignorée")
+                return
+
+            cle = self.get_primary_key_columns(cible, table_name)
+            # Reprise possible au sein de la table si la clé primaire est une seule colonne
+            cle_reprise = cle[0] if len(cle) == 1 and cle[0] in colonnes else None
+            derniere_cle = self.reprise.derniere_cle(table_name) if cle_reprise else None
+
+            filtre = sql.SQL("")
+            parametres: Tuple = ()
+            if cle_reprise:
+                if derniere_cle is not None:
+                    filtre = sql.SQL("WHERE {} > %s").format(sql.Identifier(cle_reprise))
+                    parametres = (derniere_cle,)
+                    logger.info(f"{table_name}: reprise après {cle_reprise} = {derniere_cle}")
+                filtre = sql.SQL("{} ORDER BY {}").format(filtre, sql.Identifier(cle_reprise))
+
+            if self.dry_run:
+                with source.cursor() as cur:
+                    cur.execute(sql.SQL("SELECT count(*) FROM (SELECT 1 FROM {} {}) AS lignes").format(
+                        sql.Identifier(table_name), filtre), parametres)
+                    total = cur.fetchone()[0]
+                logger.info(f"[DRY RUN] {table_name}: {total} enregistrements seraient synchronisés")
+                self._ajouter_stats(rows_inserted=total)
+                return
+
+            staging = f"sync_{table_name}"
+            with cible.cursor() as cur:
+                cur.execute(sql.SQL(
+                    "CREATE TEMP TABLE IF NOT EXISTS {} AS SELECT {} FROM {} WITH NO DATA").format(
+                    sql.Identifier(staging),
+                    sql.SQL(', ').join(sql.Identifier(c) for c in colonnes),
+                    sql.Identifier(table_name)))
+                cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(staging)))
+
+            # Représentation texte de chaque valeur: relue par la cible selon le type de sa colonne
+            requete = sql.SQL("SELECT {} FROM {} {}").format(
+                sql.SQL(', ').join(sql.SQL("{}::text").format(sql.Identifier(c)) for c in colonnes),
+                sql.Identifier(table_name), filtre)
+            index_cle = colonnes.index(cle_reprise) if cle_reprise else None
+
+            totaux = {'inseres': 0, 'mis_a_jour': 0, 'ignores': 0, 'erreurs': 0}
+            lues = 0
+            debut = time.monotonic()
+            with source.cursor(name=f"sync_{table_name}") as lecture, cible.cursor() as cur:
+                lecture.itersize = self.taille_lot
+                lecture.execute(requete, parametres)
+                while True:
+                    lignes = lecture.fetchmany(self.taille_lot)
+                    if not lignes:
+                        break
+                    inseres, mis_a_jour, ignores, erreurs = self._appliquer_lot(
+                        cur, table_name, staging, colonnes, cle, lignes)
+                    lues += len(lignes)
+                    for nom, valeur in zip(totaux, (inseres, mis_a_jour, ignores, erreurs)):
+                        totaux[nom] += valeur
+
+                    if self.reprise.actif:
+                        # Lot validé avant d'être noté: une reprise ne saute aucune ligne
+                        cible.commit()
+                        self.reprise.enregistrer(
+                            table_name, lignes[-1][index_cle] if index_cle is not None else None)
+                        self._ajouter_stats(rows_inserted=inseres, rows_updated=mis_a_jour,
+                                            rows_skipped=ignores, errors=erreurs)
+                    duree = max(time.monotonic() - debut, 1e-6)
+                    logger.info(f"{table_name}: {lues} lignes ({lues / duree:.0f} lignes/s)")
+
+            cible.commit()
+            self.reprise.enregistrer(table_name, terminee=True)
+            if not self.reprise.actif:
+                self._ajouter_stats(rows_inserted=totaux['inseres'], rows_updated=totaux['mis_a_jour'],
+                                    rows_skipped=totaux['ignores'], errors=totaux['erreurs'])
+            self._ajouter_stats(tables_processed=1)
+            logger.info(f"✓ Table {table_name} synchronisée: {totaux['inseres']} insérés, "
+                        f"{totaux['mis_a_jour']} mis à jour, {totaux['ignores']} ignorés "
+                        f"({lues / max(time.monotonic() - debut, 1e-6):.0f} lignes/s)")
+        except Exception:
+            cible.rollback()
+            raise
+        finally:
+            source.close()
+            cible.close()
+
+    def sync_all_flux(self):
+        """Synchronise les tables en mode flux, en parallèle dès que leurs dépendances sont synchronisées"""
+        tables = self.TABLE_ORDER + self.ASSOCIATION_TABLES
+        conn = self.connecter_session(self.prod_db_url)
+        try:
+            dependances = self.get_dependances(conn, tables)
+        finally:
+            conn.close()
+
+        terminees = {t for t in tables if self.reprise.table_terminee(t)}
+        for table in sorted(terminees, key=tables.index):
+            logger.info(f"Table {table} déjà synchronisée (reprise), ignorée")
+        restantes = [t for t in tables if t not in terminees]
+        en_cours = {}
+
+        with ThreadPoolExecutor(max_workers=self.paralleles) as executeur:
+            while restantes or en_cours:
+                places = self.paralleles - len(en_cours)
+                for table in tables_pretes(restantes, terminees, dependances, not en_cours)[:places]:
+                    restantes.remove(table)
+                    en_cours[executeur.submit(self.sync_table_flux, table)] = table
+
+                faites, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+                for future in faites:
+                    table = en_cours.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        # Les tables en cours se terminent; aucune nouvelle table n'est lancée
+                        restantes.clear()
+                        raise
+                    terminees.add(table)
+    
     def sync_all(self):
         """Synchronise toutes les tables dans l'ordre correct"""
         logger.info("Début de la synchronisation des données")
         logger.info(f"Mode: {'DRY RUN' if self.dry_run else 'EXECUTION'}")
         logger.info(f"Stratégie: {'UPDATE existing' if self.update_existing else 'SKIP existing'}")
+
+        if self.mode == 'flux':
+            logger.info(f"Moteur: flux (lots de {self.taille_lot} lignes, {self.paralleles} table(s) en parallèle)")
+            try:
+                # Une transaction par table (par lot avec --reprise), validée par sync_table_flux
+                self.sync_all_flux()
+            except Exception as e:
+                logger.error(f"Erreur lors de la synchronisation: {e}")
+                if self.reprise.actif:
+                    logger.error(f"Relancez avec --reprise {self.reprise.chemin} pour reprendre")
+                raise
+            finally:
+                self.print_stats()
+            return
         
         try:
             # Synchroniser les tables principales
@@ -390,6 +766,29 @@ def main():
         action='store_true',
         help='Met à jour les enregistrements existants au lieu de les ignorer'
     )
+    parser.add_argument(
+        '--mode',
+        choices=['flux', 'ligne'],
+        default='flux',
+        help='flux: lots COPY + INSERT ... ON CONFLICT (par défaut); ligne: une requête par enregistrement'
+    )
+    parser.add_argument(
+        '--taille-lot',
+        type=int,
+        default=TAILLE_LOT_DEFAUT,
+        help=f'Lignes par lot en mode flux (par défaut: {TAILLE_LOT_DEFAUT})'
+    )
+    parser.add_argument(
+        '--paralleles',
+        type=int,
+        default=2,
+        help='Tables indépendantes synchronisées en parallèle en mode flux (par défaut: 2)'
+    )
+    parser.add_argument(
+        '--reprise',
+        type=str,
+        help='Fichier de points de reprise (mode flux): reprend une synchronisation interrompue'
+    )
     parser.add_argument(
         '--local-db-url',
         type=str,
@@ -447,7 +846,11 @@ def main():
         local_db_url=local_db_url,
         prod_db_url=prod_db_url,
         dry_run=args.dry_run,
-        update_existing=args.update_existing
+        update_existing=args.update_existing,
+        mode=args.mode,
+        taille_lot=args.taille_lot,
+        paralleles=args.paralleles,
+        reprise=args.reprise
     )
     
     try:
@@ -4,7 +4,13 @@ Configuration pytest pour les tests
 import pytest
 import os
 import sys
+import json
+import time
 import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import MagicMock
 
 # Mock ML/PDF modules avant d'importer l'app
@@ -13,10 +19,13 @@ sys.modules['torch'] = MagicMock()
 sys.modules['PyPDF2'] = MagicMock()
 sys.modules['sentence_transformers'] = MagicMock()
 
+from sqlalchemy import event
+
 from app import create_app, db
 from app.models.user import User, UserRole
 from app.models.qcm import QCM
 from app.models.question import Question
+from app.services.referentiel_service import catalogue_referentiels
 import bcrypt
 
 
@@ -38,6 +47,7 @@ def app():
 
     app = create_app()
     app.config.update(test_config)
+    catalogue_referentiels.invalider()
 
     # Créer les tables
     with app.app_context():
@@ -171,3 +181,191 @@ def sample_question(app, db_session, sample_qcm):
         db_session.commit()
 
         return question
+
+
+@pytest.fixture
+def sqlite_app(monkeypatch, tmp_path):
+    """
+    Application sur une base SQLite fichier propre au test (le pool QueuePool refuse :memory:)
+
+    DATABASE_URL pointe vers la base du test le temps du test; les tables sont créées et le
+    contexte d'application reste actif jusqu'à la fin du test. Le catalogue des référentiels
+    en cache (global au processus) est vidé: il pourrait venir de la base d'un test précédent.
+    """
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    app = create_app()
+    app.config['TESTING'] = True
+    catalogue_referentiels.invalider()
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def compter_requetes():
+    """
+    Collecte les requêtes SQL exécutées dans un bloc
+
+        with compter_requetes() as requetes: ...
+    requetes: instructions SQL, ou (instruction, paramètres) avec parametres=True
+    """
+    @contextmanager
+    def _compter(parametres=False):
+        requetes = []
+
+        def enregistrer(conn, cursor, statement, parameters, context, executemany):
+            requetes.append((statement, parameters) if parametres else statement)
+
+        event.listen(db.engine, 'before_cursor_execute', enregistrer)
+        try:
+            yield requetes
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', enregistrer)
+
+    return _compter
+
+
+class FluxSSE:
+    """Réponse en streaming (Server-Sent Events Chat Completions) programmée sur ServeurHTTPStub"""
+
+    def __init__(self, fragments, delai_fragment=0.0):
+        self.fragments = list(fragments)
+        self.delai_fragment = delai_fragment
+        self.envoyes = 0  # Fragments écrits avant la fin du flux ou la déconnexion du client
+        self.interrompu = False  # Le client a fermé la connexion avant la fin du flux
+        self.termine = threading.Event()
+
+
+class ServeurHTTPStub:
+    """
+    Serveur HTTP local (keep-alive) qui rejoue des réponses programmées
+    Remplace l'API Hugging Face: aucun accès réseau pendant les tests.
+    latence_connexion simule le coût d'une poignée de main TCP + TLS par nouvelle connexion.
+    """
+
+    def __init__(self):
+        self.reponses = deque()  # (statut, corps, en-têtes, délai)
+        self.reponses_par_modele = {}  # modèle -> deque de réponses (prioritaires)
+        self.requetes = []  # (chemin, corps JSON)
+        self.connexions = 0
+        self.latence_connexion = 0.0
+        self.lock = threading.Lock()
+        serveur = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # En-têtes et corps sont écrits séparément: sans TCP_NODELAY, l'ACK retardé coûte ~40 ms
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                with serveur.lock:
+                    serveur.connexions += 1
+                if serveur.latence_connexion:
+                    time.sleep(serveur.latence_connexion)
+                super().setup()
+
+            def do_POST(self):
+                longueur = int(self.headers.get('Content-Length', 0))
+                corps = json.loads(self.rfile.read(longueur) or b'null')
+                with serveur.lock:
+                    serveur.requetes.append((self.path, corps))
+                    file = serveur.reponses_par_modele.get((corps or {}).get('model')) or serveur.reponses
+                    statut, reponse, en_tetes, delai = file.popleft() if file \
+                        else (200, serveur.completion('ok'), {}, 0)
+                if delai:
+                    time.sleep(delai)
+                if isinstance(reponse, FluxSSE):
+                    self.envoyer_flux(statut, reponse)
+                    return
+                contenu = json.dumps(reponse).encode('utf-8')
+                self.send_response(statut)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(contenu)))
+                for nom, valeur in en_tetes.items():
+                    self.send_header(nom, valeur)
+                self.end_headers()
+                self.wfile.write(contenu)
+
+            def envoyer_flux(self, statut, flux):
+                """Écrit les fragments en chunks HTTP, un événement SSE par fragment"""
+                self.send_response(statut)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                evenements = [json.dumps({'choices': [{'delta': {'content': f}}]}) for f in flux.fragments]
+                try:
+                    for evenement in evenements + ['[DONE]']:
+                        donnees = f'data: {evenement}\n\n'.encode('utf-8')
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(donnees), donnees))
+                        self.wfile.flush()
+                        if evenement != '[DONE]':
+                            flux.envoyes += 1
+                            if flux.delai_fragment:
+                                time.sleep(flux.delai_fragment)
+                    self.wfile.write(b'0\r\n\r\n')
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    flux.interrompu = True
+                    self.close_connection = True
+                finally:
+                    flux.termine.set()
+
+            def log_message(self, *args):
+                pass
+
+        self.serveur = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.serveur.daemon_threads = True
+        self.thread = threading.Thread(target=self.serveur.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.serveur.server_address[1]}/v1/chat/completions'
+
+    @staticmethod
+    def completion(contenu):
+        """Corps d'une réponse Chat Completions"""
+        return {'choices': [{'message': {'content': contenu}}]}
+
+    def programmer(self, statut=200, corps=None, en_tetes=None, modele=None, delai=0):
+        """
+        Ajoute une réponse à rejouer (dans l'ordre des requêtes)
+        modele: réservée aux requêtes de ce modèle; delai: secondes avant l'envoi de la réponse
+        """
+        reponse = (statut, corps if corps is not None else self.completion('ok'), en_tetes or {}, delai)
+        if modele:
+            self.reponses_par_modele.setdefault(modele, deque()).append(reponse)
+        else:
+            self.reponses.append(reponse)
+
+    def programmer_flux(self, fragments, modele=None, delai_fragment=0.0, statut=200, delai=0):
+        """
+        Ajoute une réponse en streaming (fragments de texte envoyés un par un). Retourne le FluxSSE
+        delai: secondes avant l'envoi des en-têtes
+        """
+        flux = FluxSSE(fragments, delai_fragment)
+        self.programmer(statut, flux, modele=modele, delai=delai)
+        return flux
+
+    def modeles_appeles(self):
+        return [corps.get('model') for _, corps in self.requetes]
+
+
+@pytest.fixture
+def serveur_ia():
+    """Serveur local compatible Chat Completions; session HTTP, disjoncteur et latences IA remis à zéro"""
+    from app.services.ai_http import fermer_session_http, disjoncteur_modeles, latences_modeles
+
+    serveur = ServeurHTTPStub()
+    serveur.thread.start()
+    fermer_session_http()
+    disjoncteur_modeles.reinitialiser()
+    latences_modeles.vider()
+    yield serveur
+    fermer_session_http()
+    disjoncteur_modeles.reinitialiser()
+    latences_modeles.vider()
+    serveur.serveur.shutdown()
+    serveur.serveur.server_close()
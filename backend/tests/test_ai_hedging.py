@@ -0,0 +1,149 @@
+"""
+Tests de la génération "hedged" (course entre modèles) et du choix du modèle par requête
+Les appels sont servis par le serveur local serveur_ia (conftest): aucun accès réseau.
+"""
+import json
+import time
+
+import pytest
+
+from app.services.ai_http import latences_modeles
+from app.services.ai_service import AIService
+
+
+def json_questions(nombre, prefixe='Question'):
+    """Réponse JSON contenant nombre questions valides"""
+    return json.dumps({'questions': [{
+        'enonce': f'{prefixe} {i}',
+        'type': 'qcm',
+        'options': [{'texte': 'A', 'estCorrecte': True}, {'texte': 'B', 'estCorrecte': False}],
+        'explication': '',
+        'points': 1
+    } for i in range(nombre)]})
+
+
+def completion_questions(serveur, nombre, prefixe='Question'):
+    """Réponse Chat Completions contenant nombre questions valides"""
+    return serveur.completion(json_questions(nombre, prefixe))
+
+
+def flux_questions(serveur, nombre, prefixe='Question', taille=20, **kwargs):
+    """Réponse en streaming (appels de la course entre modèles) de nombre questions valides"""
+    texte = json_questions(nombre, prefixe)
+    return serveur.programmer_flux([texte[i:i + taille] for i in range(0, len(texte), taille)], **kwargs)
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path, serveur_ia):
+    """AIService en mode hedged sur le serveur local (modèles: modele-a puis modele-b, modele-c)"""
+    monkeypatch.setenv('HF_API_TOKEN', 'hf_test_token')
+    monkeypatch.setenv('HF_MODEL', 'modele-a')
+    monkeypatch.setenv('AI_HEDGED_GENERATION', 'true')
+    monkeypatch.setenv('AI_HTTP_BACKOFF_BASE_SECONDS', '0')
+    monkeypatch.setenv('AI_QUESTIONS_CACHE_ENABLED', 'false')
+    monkeypatch.setenv('AI_QUESTIONS_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    service = AIService()
+    service.api_url = serveur_ia.url
+    service.fallback_models = ['modele-b', 'modele-c']
+    return service
+
+
+def generer(service, **kwargs):
+    return service.generate_questions('Texte source du cours.', num_questions=2, use_cache=False, **kwargs)
+
+
+def test_relance_apres_delai(service, serveur_ia):
+    """Modèle principal lent: le suivant est lancé après le délai de relance et sa réponse est retenue"""
+    service.hedge_delai_defaut = 0.1
+    flux_questions(serveur_ia, 2, 'Lente', modele='modele-a', delai=2)
+    flux_questions(serveur_ia, 2, 'Rapide', modele='modele-b')
+
+    debut = time.perf_counter()
+    questions = generer(service)
+
+    assert time.perf_counter() - debut < 1.5
+    assert [q['enonce'] for q in questions] == ['Rapide 0', 'Rapide 1']
+    assert serveur_ia.modeles_appeles() == ['modele-a', 'modele-b']
+
+
+def test_reponse_invalide_ecartee(service, serveur_ia):
+    """Une réponse sans question valide est écartée et le modèle suivant est lancé sans attendre"""
+    service.hedge_delai_defaut = 30
+    serveur_ia.programmer_flux(['Je ne peux pas répondre.'], modele='modele-a')
+    flux_questions(serveur_ia, 2, 'Valide', modele='modele-b')
+
+    debut = time.perf_counter()
+    questions = generer(service)
+
+    assert time.perf_counter() - debut < 5
+    assert questions[0]['enonce'] == 'Valide 0'
+
+
+def test_perdant_abandonne(service, serveur_ia):
+    """Une fois une réponse retenue, le modèle perdant ne fait plus de nouvelle tentative"""
+    service.hedge_delai_defaut = 0.05
+    serveur_ia.programmer(503, {'error': 'loading'}, {'Retry-After': '0'}, modele='modele-a', delai=0.5)
+    flux_questions(serveur_ia, 2, modele='modele-b')
+
+    generer(service)
+    time.sleep(0.8)
+
+    assert serveur_ia.modeles_appeles().count('modele-a') == 1
+
+
+def test_flux_perdant_ferme(service, serveur_ia):
+    """Le flux du modèle perdant, en cours de lecture, est fermé dès qu'une réponse est retenue"""
+    service.hedge_delai_defaut = 0.1
+    lent = flux_questions(serveur_ia, 20, 'Lente', taille=5, modele='modele-a', delai_fragment=0.05)
+    flux_questions(serveur_ia, 2, 'Rapide', modele='modele-b')
+
+    questions = generer(service)
+
+    assert questions[0]['enonce'] == 'Rapide 0'
+    assert lent.termine.wait(5)
+    assert lent.interrompu
+    assert lent.envoyes < len(lent.fragments)
+
+
+def test_latence_du_flux_complet_enregistree(service, serveur_ia):
+    """La durée de la réponse complète retenue alimente le délai de relance"""
+    flux_questions(serveur_ia, 2, modele='modele-a', delai_fragment=0.01)
+
+    generer(service)
+
+    duree, = latences_modeles._durees['modele-a']
+    assert duree > 0.01
+
+
+def test_echec_de_tous_les_modeles(service, serveur_ia):
+    """Tous les modèles échouent: erreur explicite"""
+    for modele in ('modele-a', 'modele-b', 'modele-c'):
+        serveur_ia.programmer(410, {'error': 'gone'}, modele=modele)
+
+    with pytest.raises(Exception, match='Tous les modèles ont échoué'):
+        generer(service)
+
+
+def test_delai_relance_percentile(service):
+    """Le délai de relance est le p95 des latences récentes du modèle principal"""
+    service.hedge_delai_defaut = 7
+    assert service._delai_relance('modele-a') == 7
+
+    for duree in range(1, 21):
+        latences_modeles.enregistrer('modele-a', duree / 10)
+    assert service._delai_relance('modele-a') == pytest.approx(1.9)
+
+
+def test_modele_par_requete_sans_effet_global(service, serveur_ia):
+    """Le modèle demandé vaut pour la requête; un fallback ne change pas le modèle du service"""
+    service.hedging = False
+    serveur_ia.programmer(corps=completion_questions(serveur_ia, 2), modele='modele-c')
+    generer(service, model='modele-c')
+    assert serveur_ia.modeles_appeles() == ['modele-c']
+
+    serveur_ia.programmer(410, {'error': 'gone'}, modele='modele-a')
+    serveur_ia.programmer(corps=completion_questions(serveur_ia, 2), modele='modele-b')
+    generer(service)
+
+    assert serveur_ia.modeles_appeles()[1:] == ['modele-a', 'modele-b']
+    assert service.model == 'modele-a'
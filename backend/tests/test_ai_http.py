@@ -0,0 +1,152 @@
+"""
+Tests de la couche HTTP des appels IA (session partagée, backoff, disjoncteur, métriques)
+Les appels sont servis par le serveur local serveur_ia (conftest): aucun accès réseau.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+from prometheus_client import REGISTRY
+
+from app.services import ai_http
+from app.services.ai_http import DisjoncteurModeles, delai_backoff, lire_retry_after
+from app.services.ai_service import AIService
+
+
+@pytest.fixture
+def attentes(monkeypatch):
+    """Délais demandés par le backoff (sans attendre réellement)"""
+    delais = []
+    monkeypatch.setattr(ai_http.time, 'sleep', delais.append)
+    return delais
+
+
+@pytest.fixture
+def service_factory(monkeypatch, tmp_path, serveur_ia):
+    """Crée des AIService pointant sur le serveur local, avec un seul modèle de secours"""
+    monkeypatch.setenv('HF_API_TOKEN', 'hf_test_token')
+    monkeypatch.setenv('HF_MODEL', 'modele-a')
+    monkeypatch.setenv('AI_QUESTIONS_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+
+    def creer():
+        service = AIService()
+        service.api_url = serveur_ia.url
+        service.fallback_models = ['modele-b']
+        return service
+    return creer
+
+
+def appeler(service):
+    return service._call_huggingface_api_with_messages([{'role': 'user', 'content': 'Bonjour'}], max_tokens=16)
+
+
+def test_connexion_reutilisee(service_factory, serveur_ia):
+    """Les appels successifs réutilisent la même connexion (une seule poignée de main)"""
+    serveur_ia.latence_connexion = 0.02
+    service = service_factory()
+    nombre = 10
+
+    debut = time.perf_counter()
+    for _ in range(nombre):
+        assert appeler(service) == 'ok'
+    duree_pool = time.perf_counter() - debut
+    assert serveur_ia.connexions == 1
+
+    # Référence: une connexion par appel (requests.post sans session)
+    debut = time.perf_counter()
+    for _ in range(nombre):
+        requests.post(serveur_ia.url, json={'model': 'modele-a'}, timeout=5)
+    duree_sans_pool = time.perf_counter() - debut
+
+    assert serveur_ia.connexions == 1 + nombre
+    assert duree_pool < duree_sans_pool
+
+
+def test_retry_after_respecte(service_factory, serveur_ia, attentes):
+    """429 avec Retry-After: le délai indiqué est attendu avant la nouvelle tentative"""
+    serveur_ia.programmer(429, {'error': 'rate limit'}, {'Retry-After': '2'})
+    serveur_ia.programmer(200, serveur_ia.completion('après attente'))
+
+    assert appeler(service_factory()) == 'après attente'
+    assert attentes == [2.0]
+    assert serveur_ia.modeles_appeles() == ['modele-a', 'modele-a']
+
+
+def test_backoff_exponentiel_avec_gigue(service_factory, serveur_ia, attentes):
+    """Sans Retry-After, les attentes sont bornées par base * 2^tentative"""
+    service = service_factory()
+    service.http.backoff_base = 1.0
+    for _ in range(2):
+        serveur_ia.programmer(500, {'error': 'interne'})
+
+    assert appeler(service) == 'ok'
+    assert len(attentes) == 2
+    assert 0 <= attentes[0] <= 1.0 and 0 <= attentes[1] <= 2.0
+
+
+def test_disjoncteur_410_partage(service_factory, serveur_ia, attentes):
+    """Un modèle retiré (410) n'est plus sollicité, y compris par une autre instance du service"""
+    serveur_ia.programmer(410, {'error': 'gone'})
+
+    assert appeler(service_factory()) == 'ok'
+    assert appeler(service_factory()) == 'ok'
+
+    assert serveur_ia.modeles_appeles() == ['modele-a', 'modele-b', 'modele-b']
+    assert attentes == []
+
+
+def test_disjoncteur_503_puis_reouverture(service_factory, serveur_ia, attentes, monkeypatch):
+    """503 sur toutes les tentatives: modèle écarté, puis de nouveau essayé à l'échéance"""
+    service = service_factory()
+    for _ in range(service.max_retries):
+        serveur_ia.programmer(503, {'error': 'loading'})
+
+    assert appeler(service) == 'ok'
+    assert serveur_ia.modeles_appeles() == ['modele-a'] * service.max_retries + ['modele-b']
+    assert ai_http.disjoncteur_modeles.est_ouvert('modele-a')
+
+    maintenant = time.monotonic()
+    monkeypatch.setattr(ai_http.time, 'monotonic', lambda: maintenant + 3600)
+    assert not ai_http.disjoncteur_modeles.est_ouvert('modele-a')
+
+
+def test_tous_modeles_ecartes():
+    """Si tous les modèles sont écartés, ils sont tous réessayés plutôt que d'échouer sans appel"""
+    disjoncteur = DisjoncteurModeles({410: 60})
+    disjoncteur.ouvrir('a', 410)
+
+    assert disjoncteur.filtrer(['a', 'b']) == ['b']
+    disjoncteur.ouvrir('b', 410)
+    assert disjoncteur.filtrer(['a', 'b']) == ['a', 'b']
+    disjoncteur.fermer('a')
+    assert disjoncteur.filtrer(['a', 'b']) == ['a']
+
+
+def test_histogramme_latence_par_modele(service_factory, serveur_ia):
+    """Chaque appel est mesuré dans l'histogramme Prometheus du modèle"""
+    etiquettes = {'modele': 'modele-a', 'statut': '200'}
+    avant = REGISTRY.get_sample_value('ai_http_request_duration_seconds_count', etiquettes) or 0
+
+    appeler(service_factory())
+
+    assert REGISTRY.get_sample_value('ai_http_request_duration_seconds_count', etiquettes) == avant + 1
+
+
+@pytest.mark.parametrize('valeur, attendu', [('3', 3.0), (' 1.5 ', 1.5), ('-4', 0.0), ('', None), ('demain', None)])
+def test_lire_retry_after(valeur, attendu):
+    assert lire_retry_after(valeur) == attendu
+
+
+def test_lire_retry_after_date_http():
+    date = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= lire_retry_after(format_datetime(date, usegmt=True)) <= 30
+
+
+def test_delai_backoff_bornes():
+    delais = [delai_backoff(5, base=1.0, plafond=8.0) for _ in range(200)]
+
+    assert all(0 <= d <= 8.0 for d in delais)
+    assert len(set(delais)) > 1
+    assert delai_backoff(0, base=1.0, plafond=8.0, retry_after=120) == 8.0
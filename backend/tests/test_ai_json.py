@@ -0,0 +1,125 @@
+"""
+Tests de la récupération du JSON des réponses IA (ai_json.reparer_json)
+
+Le corpus tests/donnees/reponses_ia_mal_formees.json rassemble des réponses mal formées
+relevées en pratique; les tests aléatoires (graine fixe) vérifient qu'aucune entrée ne
+provoque autre chose qu'une ErreurJSON et qu'une réponse tronquée rend ses questions complètes.
+"""
+import json
+import os
+import random
+import re
+import time
+
+import pytest
+
+from app.services.ai_json import ErreurJSON, reparer_json
+from app.services.ai_service import AIService
+
+CHEMIN_CORPUS = os.path.join(os.path.dirname(__file__), 'donnees', 'reponses_ia_mal_formees.json')
+
+with open(CHEMIN_CORPUS, encoding='utf-8') as fichier:
+    CORPUS = json.load(fichier)
+
+
+def questions_de(donnees):
+    return donnees if isinstance(donnees, list) else donnees.get('questions', [])
+
+
+def questions_aleatoires(generateur, nombre):
+    """Questions valides au contenu varié (accents, guillemets échappés, accolades, retours à la ligne)"""
+    fragments = ['TCP', 'l\'IP', '{clé}', '[liste]', 'a "b" c', 'é\nà', '\\', 'x: y, z', '1,5']
+    return [{
+        'enonce': f"Question {i} " + ' '.join(generateur.choice(fragments) for _ in range(generateur.randint(1, 6))),
+        'type': 'qcm',
+        'options': [{'texte': generateur.choice(fragments), 'estCorrecte': j == 0}
+                    for j in range(generateur.randint(2, 5))],
+        'explication': generateur.choice(fragments + ['']),
+        'points': generateur.randint(1, 3)
+    } for i in range(nombre)]
+
+
+@pytest.mark.parametrize('cas', CORPUS, ids=[cas['nom'] for cas in CORPUS])
+def test_corpus_reponses_mal_formees(cas):
+    questions = questions_de(reparer_json(cas['reponse']))
+
+    assert [question['enonce'] for question in questions] == cas['enonces']
+
+
+def test_questions_validees_depuis_le_corpus(monkeypatch):
+    """Les questions récupérées passent la validation d'AIService"""
+    monkeypatch.setenv('HF_API_TOKEN', 'hf_test_token')
+    service = AIService()
+    cas = {c['nom']: c for c in CORPUS}['tronquee_dans_une_option']
+
+    questions = service._validate_questions({'questions': service._parser_questions(cas['reponse'])})
+
+    assert [q['enonce'] for q in questions] == cas['enonces']
+    assert all(len(q['options']) >= 2 for q in questions)
+
+
+def test_json_valide_inchange():
+    generateur = random.Random(1)
+    for _ in range(50):
+        donnees = {'questions': questions_aleatoires(generateur, 3), 'meta': [1, 2.5, None, True]}
+        assert reparer_json(json.dumps(donnees, ensure_ascii=generateur.random() < 0.5)) == donnees
+
+
+def test_fuzz_troncature():
+    """Toute troncature rend un préfixe des questions, chacune complète"""
+    generateur = random.Random(2)
+    for _ in range(20):
+        questions = questions_aleatoires(generateur, 4)
+        texte = 'Voici le QCM :\n```json\n' + json.dumps({'questions': questions}, ensure_ascii=False,
+                                                       indent=generateur.choice([None, 2]))
+        for position in range(texte.index('{') + 1, len(texte), 3):
+            recuperees = questions_de(reparer_json(texte[:position]))
+            assert recuperees == questions[:len(recuperees)]
+
+
+def test_fuzz_mutations_de_format():
+    """Virgules finales, virgules manquantes et guillemets typographiques sont réparés sans perte"""
+    generateur = random.Random(3)
+    for _ in range(100):
+        questions = questions_aleatoires(generateur, 3)
+        texte = json.dumps({'questions': questions}, ensure_ascii=False)
+        mutation = generateur.choice(['virgule_finale', 'virgule_manquante', 'guillemets_cles'])
+        if mutation == 'virgule_finale':
+            texte = re.sub(r'("points": \d)\}', r'\1,}', texte).replace('}]', '},]')
+        elif mutation == 'virgule_manquante':
+            texte = texte.replace('}, {"enonce"', '}\n{"enonce"')
+        else:
+            for cle in ('questions', 'enonce', 'options', 'points'):
+                texte = texte.replace(f'"{cle}"', f'“{cle}”')
+
+        assert questions_de(reparer_json(texte)) == questions, mutation
+
+
+def test_fuzz_entrees_arbitraires():
+    """Sur une entrée quelconque, seule ErreurJSON peut être levée"""
+    generateur = random.Random(4)
+    alphabet = '{}[]",:\'“”\\ \nabc01-.eTNn/'
+    for _ in range(2000):
+        texte = ''.join(generateur.choice(alphabet) for _ in range(generateur.randint(0, 60)))
+        try:
+            reparer_json(texte)
+        except ErreurJSON:
+            pass
+
+
+def test_cout_lineaire_sur_reponse_pathologique():
+    """Entrées qui faisaient reculer les anciennes expressions régulières: coût linéaire"""
+    motifs = ['{"enonce": "a", "type": "qcm", "options": [', '{"enonce": "', '"\\']
+
+    for motif in motifs:
+        durees = []
+        for repetitions in (2000, 16000):
+            texte = '{"questions": [' + motif * repetitions
+            debut = time.perf_counter()
+            try:
+                reparer_json(texte)
+            except ErreurJSON:
+                pass
+            durees.append(time.perf_counter() - debut)
+        # 8 fois plus de texte: bien moins que 64 fois plus de temps (marge pour la gigue)
+        assert durees[1] < max(durees[0], 0.005) * 24, motif
@@ -0,0 +1,217 @@
+"""
+Tests du service IA (sans appel réseau)
+"""
+import json
+import time
+
+import pytest
+
+from app.services.ai_cache import QuestionsCache, CACHE_QUESTIONS_REQUETES
+from app.services.ai_service import AIService, _repartir_questions
+from app.services.commentaire_ia_pipeline import commentaire_par_defaut
+from app.services.document_parser import DocumentParser
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    """AIService avec un token factice et un cache de questions isolé"""
+    monkeypatch.setenv('HF_API_TOKEN', 'hf_test_token')
+    monkeypatch.setenv('AI_QUESTIONS_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    return AIService()
+
+
+def reponse_questions(nombre):
+    """Réponse du modèle contenant nombre questions valides"""
+    return json.dumps({'questions': [{
+        'enonce': f'Question {i}',
+        'type': 'qcm',
+        'options': [{'texte': 'A', 'estCorrecte': True}, {'texte': 'B', 'estCorrecte': False}],
+        'explication': '',
+        'points': 1
+    } for i in range(nombre)]})
+
+
+def resultat(pourcentage, est_reussi=None):
+    """Données de résultat au format attendu par generate_commentaires_resultats"""
+    return {
+        'note_sur_20': pourcentage / 5,
+        'pourcentage': pourcentage,
+        'questions_correctes': int(pourcentage / 10),
+        'questions_total': 10,
+        'est_reussi': pourcentage >= 50 if est_reussi is None else est_reussi
+    }
+
+
+class TestCommentairesGroupes:
+    """Tests de generate_commentaires_resultats"""
+
+    def test_une_requete_par_lot(self, service, monkeypatch):
+        """Les résultats sont découpés selon le budget de tokens, une requête par lot"""
+        appels = []
+
+        def _appel(messages, max_tokens=None, **kwargs):
+            nombre = messages[1]['content'].count('| Ton:')
+            appels.append(nombre)
+            return json.dumps([{'id': i + 1, 'commentaire': f'Commentaire {i + 1}'} for i in range(nombre)])
+
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages', _appel)
+        taille_lot = service._taille_lot_commentaires()
+
+        commentaires = service.generate_commentaires_resultats([resultat(60)] * (taille_lot + 3))
+
+        assert appels == [taille_lot, 3]
+        assert commentaires[0] == 'Commentaire 1'
+        assert commentaires[taille_lot] == 'Commentaire 1'
+        assert len(commentaires) == taille_lot + 3
+
+    def test_fallback_par_element(self, service, monkeypatch):
+        """Un élément manquant ou invalide reçoit le fallback, les autres sont conservés"""
+        reponse = 'Voici les commentaires:\n```json\n[{"id": 1, "commentaire": "\\"Bien joué.\\""}, ' \
+                  '{"id": 3, "commentaire": ""}, {"id": "x"}]\n```'
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages', lambda *a, **k: reponse)
+
+        commentaires = service.generate_commentaires_resultats([resultat(90), resultat(60), resultat(20)])
+
+        assert commentaires == [
+            'Bien joué.',
+            commentaire_par_defaut(60),
+            commentaire_par_defaut(20)
+        ]
+
+    def test_reponse_tronquee(self, service, monkeypatch):
+        """Un tableau tronqué ou mal formé garde ses éléments complets"""
+        reponse = '[{"id": 1, "commentaire": "Bien joué.",}, {id: 2, commentaire: \'Correct.\'}, ' \
+                  '{"id": 3, "commentaire": "Revois les not'
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages', lambda *a, **k: reponse)
+
+        commentaires = service.generate_commentaires_resultats([resultat(90), resultat(60), resultat(20)])
+
+        assert commentaires == ['Bien joué.', 'Correct.', commentaire_par_defaut(20)]
+
+    def test_reponse_invalide(self, service, monkeypatch):
+        """Une réponse non JSON ou une erreur API donne le fallback pour tout le lot"""
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages', lambda *a, **k: 'Pas de JSON')
+        assert service.generate_commentaires_resultats([resultat(20)]) == [
+            commentaire_par_defaut(20)]
+
+        def _erreur(*a, **k):
+            raise Exception('API indisponible')
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages', _erreur)
+        assert service.generate_commentaires_resultats([resultat(90)]) == [
+            commentaire_par_defaut(90)]
+
+    def test_commentaire_tronque(self, service, monkeypatch):
+        """Les commentaires sont limités à 200 caractères"""
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages',
+                            lambda *a, **k: json.dumps(['x' * 300]))
+        assert service.generate_commentaires_resultats([resultat(50)]) == ['x' * 200]
+
+
+class TestCacheQuestions:
+    """Tests du cache de génération de questions"""
+
+    def test_generation_identique_servie_par_le_cache(self, service, monkeypatch):
+        """Même texte et mêmes paramètres: un seul appel au modèle"""
+        appels = []
+
+        def _appel(messages, num_questions=10, **kwargs):
+            appels.append(num_questions)
+            return reponse_questions(num_questions)
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages', _appel)
+        hits_avant = CACHE_QUESTIONS_REQUETES.labels(resultat='hit')._value.get()
+
+        premieres = service.generate_questions('Cours de réseaux', num_questions=3, matiere='Info')
+        secondes = service.generate_questions('  Cours de réseaux\n', num_questions=3, matiere='Info')
+        service.generate_questions('Cours de réseaux', num_questions=4, matiere='Info')
+        service.generate_questions('Cours de réseaux', num_questions=3, matiere='Info', use_cache=False)
+
+        assert appels == [3, 4, 3]
+        assert secondes == premieres
+        assert CACHE_QUESTIONS_REQUETES.labels(resultat='hit')._value.get() == hits_avant + 1
+
+    def test_eviction_lru_et_ttl(self, tmp_path):
+        """Le cache est borné en nombre d'entrées (LRU) et les entrées expirent"""
+        cache = QuestionsCache(chemin=str(tmp_path / 'lru.sqlite3'), max_entrees=2, ttl_secondes=60, actif=True)
+        cache.set('a', [{'enonce': 'a'}])
+        cache.set('b', [{'enonce': 'b'}])
+        time.sleep(0.01)
+        assert cache.get('a') is not None  # 'a' devient la plus récemment utilisée
+        cache.set('c', [{'enonce': 'c'}])
+
+        assert cache.get('b') is None
+        assert cache.get('a') == [{'enonce': 'a'}]
+        assert cache.get('c') == [{'enonce': 'c'}]
+
+        cache.ttl_secondes = -1
+        assert cache.get('a') is None
+
+
+class TestGenerationParParties:
+    """Tests de la génération map-reduce pour les textes longs"""
+
+    def test_decoupage_aux_limites_de_paragraphes(self):
+        """Les parties respectent la taille maximale et ne coupent pas les paragraphes"""
+        paragraphes = [f"Paragraphe {i}. " + "mot " * 40 for i in range(30)]
+        chunks = DocumentParser.split_into_chunks("\n\n".join(paragraphes), max_chars=1000)
+
+        assert len(chunks) > 1
+        assert all(len(c) <= 1000 for c in chunks)
+        assert all(c.startswith("Paragraphe") for c in chunks)
+        assert " ".join(chunks) == " ".join(" ".join(p.split()) for p in paragraphes)
+
+    def test_decoupage_paragraphe_trop_long(self):
+        """Un paragraphe plus long que la limite est coupé aux phrases puis aux espaces"""
+        texte = "Une phrase courte. " * 50 + "x" * 2500
+        chunks = DocumentParser.split_into_chunks(texte, max_chars=1000)
+        assert all(len(c) <= 1000 for c in chunks)
+        assert "".join(chunks).replace(" ", "") == texte.replace(" ", "")
+
+    def test_repartition_des_questions(self):
+        """Le nombre de questions est réparti proportionnellement et au total exact"""
+        assert _repartir_questions([1000, 1000, 500], 10) == [4, 4, 2]
+        assert sum(_repartir_questions([800, 300, 900, 50], 17)) == 17
+        # Moins de questions que de parties: parties réparties dans tout le document
+        assert _repartir_questions([100] * 10, 2) == [0, 0, 1, 0, 0, 0, 0, 1, 0, 0]
+
+    def test_generation_parallele_fusion_et_dedoublonnage(self, service, monkeypatch):
+        """Chaque partie est générée séparément, les doublons sont supprimés avant validation"""
+        service.chunk_max_chars = 500
+        texte = "\n\n".join(f"Section {i}. " + "contenu " * 50 for i in range(4))
+        progression = []
+
+        def _appel(messages, num_questions=10, **kwargs):
+            section = messages[1]['content'].split('Texte source:\n')[1].split('.')[0]
+            questions = [{
+                'enonce': f'{section} question {j} ?',
+                'options': [{'texte': 'A', 'estCorrecte': True}, {'texte': 'B', 'estCorrecte': False}]
+            } for j in range(num_questions)]
+            questions.append({
+                'enonce': 'Question commune !',
+                'options': [{'texte': 'A', 'estCorrecte': True}, {'texte': 'B', 'estCorrecte': False}]
+            })
+            return json.dumps({'questions': questions})
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages', _appel)
+
+        questions = service.generate_questions(
+            texte, num_questions=8, use_cache=False,
+            progress_callback=lambda faites, total: progression.append((faites, total)))
+
+        enonces = [q['enonce'] for q in questions]
+        assert len(enonces) == 9  # 2 par section + 1 question commune conservée une seule fois
+        assert enonces.count('Question commune !') == 1
+        assert enonces[0].startswith('Section 0')
+        assert progression[-1] == (4, 4)
+
+    def test_partie_en_echec_ignoree(self, service, monkeypatch):
+        """Une partie en échec n'empêche pas la génération à partir des autres"""
+        service.chunk_max_chars = 500
+        texte = "\n\n".join(f"Section {i}. " + "contenu " * 50 for i in range(3))
+
+        def _appel(messages, num_questions=10, **kwargs):
+            if 'Section 1.' in messages[1]['content']:
+                raise Exception('Timeout')
+            return reponse_questions(num_questions)
+        monkeypatch.setattr(service, '_call_huggingface_api_with_messages', _appel)
+
+        # Parties 0 et 2: 2 questions chacune, mêmes énoncés dédoublonnés
+        assert len(service.generate_questions(texte, num_questions=6, use_cache=False)) == 2
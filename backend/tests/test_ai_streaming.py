@@ -0,0 +1,221 @@
+"""
+Tests de la génération en streaming (analyse incrémentale, transmission au fil de l'eau, annulation)
+Les appels sont servis par le serveur local serveur_ia (conftest): aucun accès réseau.
+"""
+import json
+import threading
+import time
+
+import pytest
+
+from app.services.ai_service import AIService, GenerationAnnulee
+from app.services.ai_stream import ExtracteurQuestions, lire_flux_sse
+from app.services.async_task_manager import AsyncTaskManager
+from app.services.task_store import MemoryTaskStore, SQLiteTaskStore
+
+
+def question(enonce):
+    return {
+        'enonce': enonce,
+        'type': 'qcm',
+        'options': [{'texte': 'A', 'estCorrecte': True}, {'texte': 'B', 'estCorrecte': False}],
+        'explication': '',
+        'points': 1
+    }
+
+
+def fragments_questions(nombre, taille=12, prefixe='Question'):
+    """Réponse JSON de nombre questions, découpée en fragments de taille caractères"""
+    texte = json.dumps({'questions': [question(f'{prefixe} {i}') for i in range(nombre)]})
+    return [texte[i:i + taille] for i in range(0, len(texte), taille)]
+
+
+def extraire(texte, taille=1):
+    extracteur = ExtracteurQuestions()
+    questions = []
+    for i in range(0, len(texte), taille):
+        questions.extend(extracteur.ajouter(texte[i:i + taille]))
+    return questions
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path, serveur_ia):
+    """AIService sur le serveur local (modèles: modele-a puis modele-b)"""
+    monkeypatch.setenv('HF_API_TOKEN', 'hf_test_token')
+    monkeypatch.setenv('HF_MODEL', 'modele-a')
+    monkeypatch.setenv('AI_HTTP_BACKOFF_BASE_SECONDS', '0')
+    monkeypatch.setenv('AI_QUESTIONS_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    service = AIService()
+    service.api_url = serveur_ia.url
+    service.fallback_models = ['modele-b']
+    return service
+
+
+def generer(service, nombre=3, **kwargs):
+    kwargs.setdefault('use_cache', False)
+    return service.generate_questions_stream('Texte source du cours.', num_questions=nombre, **kwargs)
+
+
+def test_extracteur_fragments_quelconques():
+    """Les questions sont extraites quel que soit le découpage, dès la fermeture de leur objet"""
+    texte = 'Voici le QCM:\n```json\n' + json.dumps({'questions': [question('Q1'), question('Q2')]}) + '\n```'
+
+    for taille in (1, 7, len(texte)):
+        assert [q['enonce'] for q in extraire(texte, taille)] == ['Q1', 'Q2']
+
+    extracteur = ExtracteurQuestions()
+    premiere = json.dumps({'questions': [question('Q1')]})[:-2]
+    assert [q['enonce'] for q in extracteur.ajouter(premiere)] == ['Q1']
+
+
+def test_extracteur_chaines_et_objets_imbriques():
+    """Accolades et crochets dans les chaînes, objets imbriqués et autres tableaux sont ignorés"""
+    piege = question('Que vaut {"a": [1, 2]} ? \\"}]')
+    texte = json.dumps({
+        'meta': {'questions': 'pas un tableau', 'liste': [{'x': 1}]},
+        'questions': [piege, question('Q2')]
+    })
+
+    questions = extraire(texte)
+
+    assert [q['enonce'] for q in questions] == [piege['enonce'], 'Q2']
+    assert questions[0]['options'][0] == {'texte': 'A', 'estCorrecte': True}
+
+
+def test_extracteur_liste_et_virgules_finales():
+    """Tableau de premier niveau, objets réparés (virgules finales, guillemets); un objet irréparable est ignoré"""
+    texte = '[{"enonce": "Q1", "options": [{"texte": "A",},],}, {"enonce": Q2}, {"enonce": "Q3", {}}]'
+
+    assert [q['enonce'] for q in extraire(texte)] == ['Q1', 'Q2']
+
+
+def test_lire_flux_sse():
+    lignes = [b': keep-alive', b'', b'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+              b'data: {"choices": [{"delta": {"content": "Bon"}}]}', 'data: pas du json',
+              b'data: {"choices": [{"delta": {"content": "jour"}}]}', b'data: [DONE]',
+              b'data: {"choices": [{"delta": {"content": "ignore"}}]}']
+
+    assert list(lire_flux_sse(lignes)) == ['Bon', 'jour']
+
+
+def test_premiere_question_avant_la_fin(service, serveur_ia):
+    """La première question est transmise bien avant la fin de la réponse"""
+    fragments = fragments_questions(3)
+    flux = serveur_ia.programmer_flux(fragments, delai_fragment=0.03)
+    instants = []
+    debut = time.perf_counter()
+
+    questions = generer(service, on_question=lambda q: instants.append(time.perf_counter() - debut))
+    duree = time.perf_counter() - debut
+
+    assert [q['enonce'] for q in questions] == ['Question 0', 'Question 1', 'Question 2']
+    assert len(instants) == 3
+    assert instants[0] < duree / 2
+    assert flux.envoyes == len(fragments)
+    assert serveur_ia.requetes[0][1]['stream'] is True
+
+
+def test_annulation_ferme_le_flux(service, serveur_ia):
+    """L'annulation interrompt la génération: la connexion est fermée, le serveur cesse d'envoyer"""
+    fragments = fragments_questions(10)
+    flux = serveur_ia.programmer_flux(fragments, delai_fragment=0.02)
+    annulation = threading.Event()
+
+    with pytest.raises(GenerationAnnulee):
+        generer(service, nombre=10, annulation=annulation, on_question=lambda q: annulation.set())
+
+    assert flux.termine.wait(5)
+    assert flux.interrompu
+    assert flux.envoyes < len(fragments)
+
+
+def test_annulation_pendant_le_backoff(service, serveur_ia):
+    """Une annulation levée pendant l'attente avant nouvelle tentative (503) l'interrompt"""
+    serveur_ia.programmer(503, {'error': 'loading'}, en_tetes={'Retry-After': '30'})
+    annulation = threading.Event()
+    threading.Timer(0.2, annulation.set).start()
+    debut = time.perf_counter()
+
+    with pytest.raises(GenerationAnnulee):
+        generer(service, annulation=annulation)
+
+    assert time.perf_counter() - debut < 5
+
+
+def test_flux_sans_echantillon_de_latence(service, serveur_ia):
+    """La durée jusqu'aux en-têtes d'un flux n'alimente pas les percentiles du hedging"""
+    from app.services.ai_http import latences_modeles
+    serveur_ia.programmer_flux(fragments_questions(3))
+
+    assert len(generer(service)) == 3
+    assert not latences_modeles._durees
+
+
+def test_arret_au_nombre_demande(service, serveur_ia):
+    """Le flux est fermé dès que le nombre de questions demandé est atteint"""
+    fragments = fragments_questions(8)
+    flux = serveur_ia.programmer_flux(fragments, delai_fragment=0.02)
+
+    questions = generer(service, nombre=2)
+
+    assert len(questions) == 2
+    assert flux.termine.wait(5)
+    assert flux.envoyes < len(fragments)
+
+
+def test_modele_suivant_et_doublons(service, serveur_ia):
+    """Modèle retiré: le suivant est essayé; les doublons et questions invalides sont écartés"""
+    serveur_ia.programmer(410, {'error': 'gone'}, modele='modele-a')
+    texte = json.dumps({'questions': [question('Q1'), question('q1 !'), {'enonce': 'sans options'},
+                                      question('Q2')]})
+    serveur_ia.programmer_flux([texte], modele='modele-b')
+    recues = []
+
+    questions = generer(service, on_question=recues.append)
+
+    assert [q['enonce'] for q in questions] == ['Q1', 'Q2']
+    assert recues == questions
+    assert serveur_ia.modeles_appeles() == ['modele-a', 'modele-b']
+
+
+def test_cache_retransmis(service, serveur_ia):
+    """Une génération identique est servie par le cache et ses questions transmises à nouveau"""
+    serveur_ia.programmer_flux(fragments_questions(2))
+    premieres = generer(service, nombre=2, use_cache=True)
+    recues = []
+
+    secondes = generer(service, nombre=2, use_cache=True, on_question=recues.append)
+
+    assert secondes == premieres == recues
+    assert len(serveur_ia.requetes) == 1
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_annulation_tache_en_attente_et_en_cours(backend, tmp_path):
+    """Une tâche annulée en attente n'est pas exécutée; en cours, elle reste REVOKED"""
+    store = MemoryTaskStore() if backend == 'memory' else SQLiteTaskStore(str(tmp_path / 'tasks.sqlite3'))
+    manager = AsyncTaskManager(max_workers=1, store=store)
+    demarree = threading.Event()
+    executions = []
+
+    def longue(task_id):
+        demarree.set()
+        annulation = manager.annulation(task_id)
+        while not annulation.is_set():
+            time.sleep(0.01)
+        manager.update_task_progress(task_id, 50, 'ignoré')
+        raise GenerationAnnulee('Génération annulée')
+
+    en_cours = manager.create_task_with_id(longue, owner_id='prof-1')
+    en_attente = manager.create_task_with_id(lambda task_id: executions.append(task_id))
+    assert demarree.wait(5)
+
+    assert manager.cancel_task(en_attente)
+    assert manager.cancel_task(en_cours)
+    manager.file.join()
+
+    assert executions == []
+    statut = manager.get_task_status(en_cours)
+    assert statut['status'] == 'REVOKED' and statut['message'] == 'Tâche annulée'
+    assert statut['owner_id'] == 'prof-1'
+    assert not manager.cancel_task(en_cours)
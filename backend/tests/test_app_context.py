@@ -0,0 +1,104 @@
+"""
+Tests de l'application partagée par les tâches hors requête (app.utils.app_context)
+"""
+import threading
+
+import pytest
+
+import app as app_module
+from app import db
+from app.models.user import User, UserRole
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.services.ai_service import ai_service
+from app.services import quiz_generation_service
+from app.utils import app_context as app_context_module
+from app.utils.app_context import app_context, get_app
+
+
+@pytest.fixture
+def compteur_create_app(monkeypatch):
+    """Compte les appels à create_app() après la création de l'application de test"""
+    appels = []
+    original = app_module.create_app
+
+    def _create_app(*args, **kwargs):
+        appels.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, 'create_app', _create_app)
+    return appels
+
+
+def hors_requete(fonction):
+    """Exécute une fonction dans un thread sans contexte d'application (comme un worker)"""
+    resultats = []
+    thread = threading.Thread(target=lambda: resultats.append(fonction()))
+    thread.start()
+    thread.join(10)
+    return resultats[0]
+
+
+def contextes_imbriques():
+    with app_context() as courante:
+        # Appel imbriqué: le contexte courant est réutilisé
+        with app_context() as imbriquee:
+            return courante, imbriquee
+
+
+def test_application_enregistree_par_create_app(sqlite_app, compteur_create_app):
+    assert get_app() is sqlite_app
+    courante, imbriquee = hors_requete(contextes_imbriques)
+    assert courante is sqlite_app
+    assert imbriquee is sqlite_app
+    assert compteur_create_app == []
+
+
+def test_creation_unique_par_processus(sqlite_app, monkeypatch, compteur_create_app):
+    monkeypatch.setattr(app_context_module, '_app', None)
+
+    premiere = get_app()
+    assert get_app() is premiere
+    courante, _ = hors_requete(contextes_imbriques)
+    assert courante is premiere
+    assert len(compteur_create_app) == 1
+
+
+def test_init_worker_app(sqlite_app, monkeypatch, compteur_create_app):
+    from celery_app import init_worker_app
+    monkeypatch.setattr(app_context_module, '_app', None)
+
+    init_worker_app()
+    application = get_app()
+    init_worker_app()
+
+    assert get_app() is application
+    assert len(compteur_create_app) == 1
+
+
+def test_generation_asynchrone_sans_create_app(sqlite_app, monkeypatch, compteur_create_app):
+    with sqlite_app.app_context():
+        enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+        db.session.add(enseignant)
+        db.session.flush()
+        qcm = QCM(titre='Photosynthèse', createur_id=enseignant.id)
+        db.session.add(qcm)
+        db.session.commit()
+        qcm_id = qcm.id
+
+    monkeypatch.setattr(ai_service, 'generate_questions_stream', lambda **kwargs: [{
+        'enonce': 'Quel gaz est absorbé ?',
+        'type_question': 'qcm',
+        'options': [{'texte': 'CO2', 'estCorrecte': True}, {'texte': 'O2', 'estCorrecte': False}]
+    }])
+    monkeypatch.setattr(quiz_generation_service.task_manager, 'update_task_progress', lambda *a, **k: None)
+
+    # Exécution hors requête, comme dans un thread du gestionnaire de tâches
+    resultat = hors_requete(lambda: quiz_generation_service.generate_quiz_from_text_async(
+        'tache-1', qcm_id, 'Texte source'))
+
+    assert resultat['titre'] == 'Photosynthèse'
+    assert resultat['num_questions'] == 1
+    assert compteur_create_app == []
+    with sqlite_app.app_context():
+        assert Question.query.filter_by(qcm_id=qcm_id).count() == 1
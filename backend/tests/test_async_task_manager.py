@@ -0,0 +1,241 @@
+"""
+Tests du gestionnaire de tâches asynchrones (pool borné, priorités, admission, éviction, store partagé)
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.async_task_manager import (
+    AsyncTaskManager,
+    TaskQueueFullError,
+    PRIORITE_HAUTE,
+    PRIORITE_BASSE,
+)
+from app.services.task_store import MemoryTaskStore, SQLiteTaskStore
+
+
+def attendre(condition, timeout=5.0):
+    """Attend qu'une condition soit vraie (échec du test après timeout)"""
+    fin = time.time() + timeout
+    while time.time() < fin:
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("Condition non atteinte dans le délai imparti")
+
+
+def manager(**kwargs):
+    kwargs.setdefault('store', MemoryTaskStore())
+    return AsyncTaskManager(**kwargs)
+
+
+def test_concurrence_bornee_par_le_pool():
+    gestionnaire = manager(max_workers=2, max_queue=20)
+    liberation = threading.Event()
+    en_cours = []
+    maximum = []
+    verrou = threading.Lock()
+
+    def tache():
+        with verrou:
+            en_cours.append(1)
+            maximum.append(len(en_cours))
+        liberation.wait(5)
+        with verrou:
+            en_cours.pop()
+        return 'ok'
+
+    ids = [gestionnaire.create_task(tache) for _ in range(6)]
+    attendre(lambda: len(maximum) >= 2)
+    time.sleep(0.05)
+    assert max(maximum) == 2
+    assert len(gestionnaire.workers) == 2
+
+    liberation.set()
+    attendre(lambda: all(gestionnaire.get_task_status(i)['status'] == 'SUCCESS' for i in ids))
+    assert max(maximum) == 2
+    assert gestionnaire.get_task_status(ids[0])['result'] == 'ok'
+
+
+def test_priorite_et_position_dans_la_file():
+    gestionnaire = manager(max_workers=1, max_queue=20)
+    liberation = threading.Event()
+    ordre = []
+
+    bloquante = gestionnaire.create_task(liberation.wait, 5)
+    attendre(lambda: gestionnaire.get_task_status(bloquante)['status'] == 'PROGRESS')
+
+    basse = gestionnaire.create_task(ordre.append, 'basse', priority=PRIORITE_BASSE)
+    normale = gestionnaire.create_task(ordre.append, 'normale')
+    haute = gestionnaire.create_task_with_id(lambda task_id: ordre.append('haute'), priority=PRIORITE_HAUTE)
+
+    assert gestionnaire.get_queue_position(haute) == 1
+    assert gestionnaire.get_queue_position(normale) == 2
+    assert gestionnaire.get_queue_position(basse) == 3
+    assert gestionnaire.get_task_status(basse)['queue_position'] == 3
+    assert gestionnaire.get_queue_position(bloquante) is None
+
+    liberation.set()
+    attendre(lambda: len(ordre) == 3)
+    assert ordre == ['haute', 'normale', 'basse']
+
+
+def test_admission_refusee_quand_la_file_est_pleine():
+    gestionnaire = manager(max_workers=1, max_queue=2)
+    liberation = threading.Event()
+
+    bloquante = gestionnaire.create_task(liberation.wait, 5)
+    attendre(lambda: gestionnaire.get_task_status(bloquante)['status'] == 'PROGRESS')
+    gestionnaire.create_task(lambda: None)
+    gestionnaire.create_task(lambda: None)
+
+    with pytest.raises(TaskQueueFullError):
+        gestionnaire.verifier_admission()
+    with pytest.raises(TaskQueueFullError):
+        gestionnaire.create_task(lambda: None)
+
+    liberation.set()
+    attendre(lambda: not gestionnaire.en_attente)
+    gestionnaire.verifier_admission()
+
+
+def test_echec_de_tache():
+    gestionnaire = manager(max_workers=1)
+
+    def tache():
+        raise ValueError("texte vide")
+
+    task_id = gestionnaire.create_task(tache)
+    attendre(lambda: gestionnaire.get_task_status(task_id)['status'] == 'FAILURE')
+    statut = gestionnaire.get_task_status(task_id)
+    assert statut['error'] == 'texte vide'
+    assert statut['finished_at'] is not None
+
+
+def test_eviction_des_taches_terminees():
+    gestionnaire = manager(max_workers=1, ttl_seconds=60)
+    liberation = threading.Event()
+
+    terminee = gestionnaire.create_task(lambda: 'ok')
+    en_cours = gestionnaire.create_task(liberation.wait, 5)
+    attendre(lambda: gestionnaire.get_task_status(en_cours)['status'] == 'PROGRESS')
+
+    # Vieillir artificiellement les deux tâches
+    ancien = datetime.now() - timedelta(hours=1)
+    gestionnaire.store.update(terminee, started_at=ancien, finished_at=ancien)
+    gestionnaire.store.update(en_cours, started_at=ancien)
+
+    assert gestionnaire.evict_finished_tasks() == 1
+    assert gestionnaire.get_task_status(terminee) is None
+    assert gestionnaire.get_task_status(en_cours) is not None
+
+    liberation.set()
+
+
+def test_eviction_store_sqlite(tmp_path):
+    """Éviction sur le store SQLite: tous les statuts terminaux, et création de tâche après l'intervalle"""
+    gestionnaire = manager(max_workers=1, ttl_seconds=60, store=SQLiteTaskStore(str(tmp_path / 'tasks.sqlite3')))
+    liberation = threading.Event()
+
+    reussie = gestionnaire.create_task(lambda: 'ok')
+    echouee = gestionnaire.create_task(lambda: 1 / 0)
+    en_cours = gestionnaire.create_task(liberation.wait, 5)
+    annulee = gestionnaire.create_task(lambda: 'jamais')
+    assert gestionnaire.cancel_task(annulee)
+    attendre(lambda: gestionnaire.get_task_status(en_cours)['status'] == 'PROGRESS')
+    assert gestionnaire.get_task_status(echouee)['status'] == 'FAILURE'
+
+    ancien = datetime.now() - timedelta(hours=1)
+    for task_id in (reussie, echouee, annulee):
+        gestionnaire.store.update(task_id, started_at=ancien, finished_at=ancien)
+    gestionnaire.store.update(en_cours, started_at=ancien)
+
+    # Intervalle d'éviction écoulé: create_task déclenche l'éviction
+    gestionnaire.derniere_eviction = ancien
+    nouvelle = gestionnaire.create_task(lambda: 'ok')
+
+    assert all(gestionnaire.get_task_status(t) is None for t in (reussie, echouee, annulee))
+    assert gestionnaire.get_task_status(en_cours) is not None
+    assert gestionnaire.get_task_status(nouvelle) is not None
+
+    liberation.set()
+
+
+def test_store_sqlite_partage_entre_processus(tmp_path):
+    chemin = str(tmp_path / 'tasks.sqlite3')
+    liberation = threading.Event()
+    producteur = manager(max_workers=1, store=SQLiteTaskStore(chemin))
+    # Un autre worker gunicorn: même fichier, aucune tâche locale
+    lecteur = manager(max_workers=1, store=SQLiteTaskStore(chemin))
+
+    bloquante = producteur.create_task(liberation.wait, 5)
+    attendre(lambda: lecteur.get_task_status(bloquante)['status'] == 'PROGRESS')
+
+    def generation(task_id):
+        producteur.update_task_progress(task_id, 40, 'Génération des questions...')
+        return {'qcm_id': 'qcm-1'}
+
+    task_id = producteur.create_task_with_id(generation)
+    producteur.set_estimated_duration(task_id, 30)
+
+    statut = lecteur.get_task_status(task_id)
+    assert statut['status'] == 'PENDING'
+    assert statut['queue_position'] == 1
+    assert statut['estimated_remaining_seconds'] <= 30
+    assert isinstance(statut['started_at'], datetime)
+
+    liberation.set()
+    attendre(lambda: lecteur.get_task_status(task_id)['status'] == 'SUCCESS')
+    statut = lecteur.get_task_status(task_id)
+    assert statut['result'] == {'qcm_id': 'qcm-1'}
+    assert statut['progress'] == 100
+    assert statut['queue_position'] is None
+
+
+def test_annulation_par_un_autre_processus(tmp_path):
+    """Une annulation écrite par un autre worker n'est pas écrasée par la progression ni le succès"""
+    chemin = str(tmp_path / 'tasks.sqlite3')
+    executant = manager(max_workers=1, store=SQLiteTaskStore(chemin))
+    autre = manager(max_workers=1, store=SQLiteTaskStore(chemin))
+    demarree = threading.Event()
+    vue = []
+
+    def longue(task_id):
+        annulation = executant.annulation(task_id)
+        demarree.set()
+        fin = time.monotonic() + 5
+        while not annulation.is_set() and time.monotonic() < fin:
+            executant.update_task_progress(task_id, 50, 'En cours...')
+            time.sleep(0.01)
+        vue.append(annulation.is_set())
+        return {'qcm_id': 'qcm-1'}
+
+    task_id = executant.create_task_with_id(longue)
+    assert demarree.wait(5)
+    assert autre.cancel_task(task_id)
+    executant.file.join()
+
+    assert vue == [True]
+    statut = autre.get_task_status(task_id)
+    assert statut['status'] == 'REVOKED' and statut['result'] is None
+    assert not autre.cancel_task(task_id)
+
+
+def test_nettoyage_meme_si_annulee_avant_execution():
+    """Le nettoyage d'une tâche est exécuté qu'elle ait tourné ou été annulée en attente"""
+    gestionnaire = manager(max_workers=1)
+    liberation = threading.Event()
+    nettoyees = []
+
+    executee = gestionnaire.create_task_with_id(lambda task_id: liberation.wait(5),
+                                                nettoyage=lambda: nettoyees.append('executee'))
+    annulee = gestionnaire.create_task_with_id(lambda task_id: None,
+                                               nettoyage=lambda: nettoyees.append('annulee'))
+    assert gestionnaire.cancel_task(annulee)
+    liberation.set()
+    gestionnaire.file.join()
+
+    assert sorted(nettoyees) == ['annulee', 'executee']
+    assert gestionnaire.get_task_status(executee)['status'] == 'SUCCESS'
@@ -0,0 +1,108 @@
+"""
+Tests de la résolution de l'audience des QCM et sessions (AudienceService)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.etablissement import Etablissement
+from app.models.etudiant import Etudiant
+from app.models.enseignant import Enseignant
+from app.models.matiere import Matiere
+from app.models.niveau import Niveau
+from app.models.classe import Classe
+from app.models.qcm import QCM
+from app.models.session_examen import SessionExamen
+from app.models.associations import etudiant_matieres_v2, etudiant_classes_v2
+from app.services.audience_service import AudienceService
+from app.services.enseignant_service import EnseignantService
+
+
+@pytest.fixture
+def donnees(sqlite_app):
+    """Trois étudiants en informatique (dont un inactif), deux en physique, une classe"""
+    etablissement = Etablissement(code='UDM', nom='Université', type_etablissement='université')
+    niveau = Niveau(code='L1', nom='Licence 1', ordre=1, cycle='licence')
+    info = Matiere(code='INFO101', nom='Informatique')
+    physique = Matiere(code='PHY101', nom='Physique')
+    prof = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+    db.session.add_all([etablissement, niveau, info, physique, prof])
+    db.session.flush()
+
+    classe = Classe(code='L1-A', nom='L1 A', niveau_id=niveau.id, annee_scolaire='2024-2025')
+    enseignant = Enseignant(user_id=prof.id, numero_enseignant='E1', etablissement_id=etablissement.id)
+    enseignant.matieres.append(info)
+    db.session.add_all([classe, enseignant])
+    db.session.flush()
+
+    etudiants = []
+    for i, (matieres, actif) in enumerate([([info], True), ([info, physique], True),
+                                           ([info], False), ([physique], True)]):
+        user = User(email=f'etudiant{i}@test.com', name=f'Etudiant {i}', role=UserRole.ETUDIANT)
+        db.session.add(user)
+        db.session.flush()
+        etudiant = Etudiant(user_id=user.id, numero_etudiant=f'N{i}', etablissement_id=etablissement.id,
+                            niveau_id=niveau.id, actif=actif)
+        db.session.add(etudiant)
+        db.session.flush()
+        for matiere in matieres:
+            db.session.execute(etudiant_matieres_v2.insert().values(
+                etudiant_id=etudiant.id, matiere_id=matiere.id, annee_scolaire='2024-2025'))
+        etudiants.append(etudiant)
+
+    for etudiant in etudiants[2:]:
+        db.session.execute(etudiant_classes_v2.insert().values(
+            etudiant_id=etudiant.id, classe_id=classe.id, annee_scolaire='2024-2025'))
+
+    qcm = QCM(titre='QCM Info', createur_id=prof.id, matiere_id=info.id, matiere=info.nom)
+    db.session.add(qcm)
+    db.session.flush()
+    now = datetime.utcnow()
+    session = SessionExamen(titre='Session', date_debut=now, date_fin=now + timedelta(hours=1),
+                            duree_minutes=60, qcm_id=qcm.id, classe_id=classe.id, createur_id=prof.id)
+    db.session.add(session)
+    db.session.commit()
+    return {'qcm': qcm, 'session': session, 'etudiants': etudiants, 'info': info,
+            'enseignant': enseignant}
+
+
+def test_audience_qcm_une_requete(donnees, compter_requetes):
+    service = AudienceService()
+    db.session.refresh(donnees['qcm'])
+
+    with compter_requetes() as requetes:
+        assert service.count_audience_qcm(donnees['qcm']) == 2
+    assert len(requetes) == 1
+
+    attendus = sorted(e.user_id for e in donnees['etudiants'][:2])
+    assert sorted(service.iter_audience_qcm(donnees['qcm'], batch_size=1)) == attendus
+
+
+def test_matiere_inactive_ou_absente(donnees):
+    service = AudienceService()
+    donnees['info'].actif = False
+    db.session.commit()
+    assert service.count_audience_qcm(donnees['qcm']) == 0
+
+    donnees['qcm'].matiere_id = None
+    assert service.count_audience_qcm(donnees['qcm']) == 0
+
+
+def test_audience_session_par_classe(donnees):
+    service = AudienceService()
+
+    # Étudiants 2 (inactif) et 3 dans la classe: seul l'actif est ciblé
+    assert list(service.iter_audience_session(donnees['session'])) == [donnees['etudiants'][3].user_id]
+
+    donnees['session'].classe_id = None
+    assert service.count_audience_session(donnees['session']) == 2
+
+
+def test_etudiants_lies_enseignant(donnees):
+    resultat = EnseignantService().get_etudiants_lies(donnees['enseignant'].id)
+
+    # L'étudiant inscrit en informatique et physique n'apparaît qu'une fois
+    assert resultat['total'] == 2
+    assert sorted(e['numeroEtudiant'] for e in resultat['items']) == ['N0', 'N1']
@@ -0,0 +1,160 @@
+"""
+Tests du pipeline de commentaires IA (hors du chemin critique de la soumission)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.niveau import Niveau
+from app.models.classe import Classe
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.models.session_examen import SessionExamen
+from app.models.resultat import Resultat
+from app.services.ai_service import ai_service
+from app.services.commentaire_ia_pipeline import CommentaireIAPipeline, commentaire_par_defaut
+from app.services.resultat_service import ResultatService
+
+
+@pytest.fixture
+def notifications(monkeypatch):
+    """Capture les notifications Socket.IO envoyées par le pipeline"""
+    envoyees = []
+    monkeypatch.setattr('app.events.notifications.notify_commentaire_resultat',
+                        lambda user_id, resultat_id, commentaire=None: envoyees.append(
+                            (user_id, resultat_id, commentaire)))
+    return envoyees
+
+
+def creer_resultat_en_cours():
+    """Crée une session en cours avec une question QCM et un résultat démarré"""
+    enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+    etudiant = User(email='etudiant@test.com', name='Etudiant', role=UserRole.ETUDIANT)
+    niveau = Niveau(code='L1', nom='Licence 1', ordre=1, cycle='licence')
+    db.session.add_all([enseignant, etudiant, niveau])
+    db.session.flush()
+
+    classe = Classe(code='L1-A', nom='L1 Info A', niveau_id=niveau.id, annee_scolaire='2024-2025')
+    qcm = QCM(titre='QCM', matiere='Informatique', status='published', createur_id=enseignant.id)
+    db.session.add_all([classe, qcm])
+    db.session.flush()
+
+    question = Question(enonce='2 + 2 ?', qcm_id=qcm.id, points=1, type_question='qcm')
+    question.set_options([{'texte': '4', 'estCorrecte': True}, {'texte': '5', 'estCorrecte': False}])
+    now = datetime.utcnow()
+    session = SessionExamen(
+        titre='Session',
+        date_debut=now - timedelta(hours=1),
+        date_fin=now + timedelta(hours=1),
+        duree_minutes=60,
+        status='en_cours',
+        qcm_id=qcm.id,
+        classe_id=classe.id,
+        createur_id=enseignant.id
+    )
+    db.session.add_all([question, session])
+    db.session.flush()
+
+    resultat = Resultat(
+        etudiant_id=etudiant.id,
+        session_id=session.id,
+        qcm_id=qcm.id,
+        date_debut=now - timedelta(minutes=5),
+        score_maximum=1,
+        questions_total=1,
+        status='en_cours'
+    )
+    db.session.add(resultat)
+    db.session.commit()
+    return resultat, question
+
+
+class TestCommentaireIAPipeline:
+    """Tests de la soumission et du traitement par lots"""
+
+    def test_soumission_sans_appel_ia(self, sqlite_app, monkeypatch):
+        """La soumission enregistre le fallback et planifie le commentaire IA"""
+        resultat, question = creer_resultat_en_cours()
+
+        def _interdit(*args, **kwargs):
+            raise AssertionError("L'IA ne doit pas être appelée pendant la soumission")
+        monkeypatch.setattr(ai_service, 'generate_commentaire_resultat', _interdit)
+        monkeypatch.setattr(ai_service, 'generate_commentaires_resultats', _interdit)
+
+        planifies = []
+        monkeypatch.setattr('app.services.resultat_service.commentaire_pipeline.planifier',
+                            lambda resultat_id, commentaire: planifies.append((resultat_id, commentaire)))
+
+        data = ResultatService().soumettre_reponses(resultat.id, {question.id: '4'})
+
+        assert data['status'] == 'termine'
+        assert data['commentaireProf'] == commentaire_par_defaut(100)
+        assert planifies == [(resultat.id, commentaire_par_defaut(100))]
+
+    def test_traiter_lot(self, sqlite_app, monkeypatch, notifications):
+        """Le lot met à jour commentaire_prof et notifie l'étudiant"""
+        resultat, question = creer_resultat_en_cours()
+        resultat.status = 'termine'
+        resultat.pourcentage = 100
+        resultat.note_sur_20 = 20
+        resultat.commentaire_prof = commentaire_par_defaut(100)
+        db.session.commit()
+        resultat_id, etudiant_id = resultat.id, resultat.etudiant_id
+
+        monkeypatch.setattr(ai_service, 'generate_commentaires_resultats',
+                            lambda resultats: ['Très bien.'] * len(resultats))
+
+        mis_a_jour = CommentaireIAPipeline().traiter_lot([(resultat_id, commentaire_par_defaut(100))])
+
+        assert mis_a_jour == 1
+        assert db.session.get(Resultat, resultat_id).commentaire_prof == 'Très bien.'
+        # Résultat non publié: l'étudiant est notifié sans le contenu du commentaire
+        assert notifications == [(etudiant_id, resultat_id, None)]
+
+    def test_commentaire_modifie_non_ecrase(self, sqlite_app, monkeypatch, notifications):
+        """Un commentaire saisi par l'enseignant entre-temps est conservé"""
+        resultat, question = creer_resultat_en_cours()
+        resultat.commentaire_prof = 'Commentaire du professeur'
+        db.session.commit()
+
+        monkeypatch.setattr(ai_service, 'generate_commentaires_resultats',
+                            lambda resultats: ['Très bien.'] * len(resultats))
+
+        mis_a_jour = CommentaireIAPipeline().traiter_lot([(resultat.id, commentaire_par_defaut(0))])
+
+        assert mis_a_jour == 0
+        assert db.session.get(Resultat, resultat.id).commentaire_prof == 'Commentaire du professeur'
+        assert notifications == []
+
+    def test_commentaire_modifie_pendant_l_appel_ia(self, sqlite_app, monkeypatch, notifications):
+        """Un commentaire enregistré pendant l'appel IA (autre requête) n'est pas écrasé"""
+        resultat, question = creer_resultat_en_cours()
+        resultat.commentaire_prof = commentaire_par_defaut(0)
+        db.session.commit()
+        resultat_id = resultat.id
+
+        def generation_lente(resultats):
+            with db.engine.begin() as connexion:
+                connexion.execute(update(Resultat).where(Resultat.id == resultat_id).values(
+                    commentaire_prof='Commentaire du professeur'))
+            return ['Très bien.'] * len(resultats)
+        monkeypatch.setattr(ai_service, 'generate_commentaires_resultats', generation_lente)
+
+        mis_a_jour = CommentaireIAPipeline().traiter_lot([(resultat_id, commentaire_par_defaut(0))])
+
+        assert mis_a_jour == 0
+        db.session.expire_all()
+        assert db.session.get(Resultat, resultat_id).commentaire_prof == 'Commentaire du professeur'
+        assert notifications == []
+
+    def test_collecte_par_lots(self):
+        """Les éléments en file sont regroupés jusqu'à la taille de lot"""
+        pipeline = CommentaireIAPipeline(taille_lot=3, delai_max_secondes=0.05)
+        for i in range(5):
+            pipeline.file.put((f'r{i}', ''))
+
+        assert [rid for rid, _ in pipeline._collecter_lot()] == ['r0', 'r1', 'r2']
+        assert [rid for rid, _ in pipeline._collecter_lot()] == ['r3', 'r4']
@@ -0,0 +1,164 @@
+"""
+Tests de la correction par lot des réponses ouvertes (app.tasks.correction)
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.api import correction as correction_api
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.models.resultat import Resultat
+from app.models.session_examen import SessionExamen
+from app.models.user import User, UserRole
+from app.repositories.resultat_repository import ResultatRepository
+from app.tasks import correction
+
+
+def question(question_id, type_question='texte_libre', reponse_correcte=None, points=2):
+    q = Question(
+        enonce=f'Question {question_id}',
+        type_question=type_question,
+        points=points,
+        reponse_correcte=reponse_correcte,
+        qcm_id='qcm-1'
+    )
+    q.id = question_id
+    return q
+
+
+@pytest.fixture
+def questions():
+    qcm = question('q1', type_question='qcm', points=1)
+    qcm.set_options([{'id': 'a', 'texte': 'Paris', 'estCorrecte': True},
+                     {'id': 'b', 'texte': 'Lyon', 'estCorrecte': False}])
+    return [
+        qcm,
+        question('q2', reponse_correcte='La photosynthèse produit du dioxygène'),
+        question('q3', reponse_correcte='Les mitochondries produisent énergie cellulaire'),
+    ]
+
+
+def test_lots_par_longueur():
+    textes = ['a' * 50, 'a', 'a' * 10, 'a' * 3, 'a' * 40]
+    lots = correction._lots_par_longueur(textes, 2)
+
+    assert lots == [[1, 3], [2, 4], [0]]
+
+
+def test_fallback_sans_modules_ia(monkeypatch):
+    monkeypatch.setattr(correction, 'TORCH_AVAILABLE', False)
+
+    scores = correction.calculate_semantic_similarities([
+        ('Paris', 'paris'),
+        ('Lyon', 'Paris'),
+    ])
+
+    assert scores == [0.5, 0.0]
+    assert correction.calculate_semantic_similarities([]) == []
+
+
+def test_un_seul_lot_pour_toute_la_session(monkeypatch, questions):
+    appels = []
+
+    def _similarites(paires):
+        appels.append(list(paires))
+        return [0.9 if 'dioxygène' in reponse else 0.1 for reponse, _ in paires]
+
+    monkeypatch.setattr(correction, 'calculate_semantic_similarities', _similarites)
+    copies = {
+        'etudiant-1': {'q1': 'a', 'q2': 'La photosynthèse produit du dioxygène', 'q3': 'Je ne sais pas'},
+        'etudiant-2': {'q1': 'b', 'q2': 'Elle produit du dioxygène'},
+        'etudiant-3': {},
+    }
+
+    scores = correction.compute_open_answer_scores(questions, copies)
+
+    # Un seul appel, uniquement pour les réponses ouvertes
+    assert len(appels) == 1
+    assert len(appels[0]) == 3
+    assert scores == {
+        'etudiant-1': {'q2': 0.9, 'q3': 0.1},
+        'etudiant-2': {'q2': 0.9},
+        'etudiant-3': {},
+    }
+
+
+def test_ponderation_avec_score_precalcule(monkeypatch, questions):
+    def _interdit(*args):
+        raise AssertionError("La similarité doit venir du lot")
+
+    monkeypatch.setattr(correction, 'calculate_semantic_similarity', _interdit)
+    copie = {'q1': 'a', 'q2': 'La photosynthèse produit du dioxygène'}
+
+    correction_copie = correction.grade_answer_sheet(questions, copie, {'q2': 1.0})
+
+    resultats = {r['question_id']: r for r in correction_copie['results']}
+    assert resultats['q1']['points_earned'] == 1
+    # 70% sémantique + 30% mots-clés (tous présents)
+    assert resultats['q2']['score'] == pytest.approx(1.0)
+    assert resultats['q2']['semantic_score'] == 1.0
+    assert resultats['q3']['feedback'] == 'Question non répondue'
+    assert correction_copie['total_points'] == 5
+    assert correction_copie['questions_answered'] == 2
+    assert correction_copie['score_percentage'] == pytest.approx(60.0)
+
+
+@pytest.fixture
+def session_corrigee(sqlite_app):
+    """Session avec un résultat terminé et une tentative en cours, enseignant et étudiant"""
+    enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+    etudiant = User(email='etudiant@test.com', name='Etudiant', role=UserRole.ETUDIANT)
+    db.session.add_all([enseignant, etudiant])
+    db.session.flush()
+    qcm = QCM(titre='QCM', status='published', createur_id=enseignant.id)
+    db.session.add(qcm)
+    db.session.flush()
+    maintenant = datetime.utcnow()
+    session = SessionExamen(titre='Session', date_debut=maintenant - timedelta(hours=1),
+                            date_fin=maintenant + timedelta(hours=1), duree_minutes=30,
+                            qcm_id=qcm.id, createur_id=enseignant.id)
+    db.session.add(session)
+    db.session.flush()
+
+    termine = Resultat(etudiant_id=etudiant.id, session_id=session.id, qcm_id=qcm.id, date_debut=maintenant,
+                       score_maximum=2, questions_total=2, status='termine')
+    termine.set_reponses_detail({'q1': {'answer': 'a', 'correct': True},
+                                 'q2': {'answer': 'Du dioxygène', 'correct': False}})
+    en_cours = Resultat(etudiant_id=etudiant.id, session_id=session.id, qcm_id=qcm.id, date_debut=maintenant,
+                        score_maximum=2, questions_total=2, status='en_cours')
+    db.session.add_all([termine, en_cours])
+    db.session.commit()
+    return SimpleNamespace(session_id=session.id, qcm_id=qcm.id, resultat_id=termine.id,
+                           enseignant=create_access_token(identity=enseignant.id),
+                           etudiant=create_access_token(identity=etudiant.id))
+
+
+def test_copies_lues_en_base(session_corrigee):
+    copies = ResultatRepository().get_copies_session(session_corrigee.session_id)
+
+    assert copies == {session_corrigee.resultat_id: {'q1': 'a', 'q2': 'Du dioxygène'}}
+
+
+def test_correction_des_copies_reservee_a_l_enseignant(sqlite_app, session_corrigee, monkeypatch):
+    lancees = []
+    monkeypatch.setattr(correction_api, 'CORRECTION_AVAILABLE', True)
+    monkeypatch.setattr(correction_api, 'batch_correct_copies', SimpleNamespace(
+        apply_async=lambda args: lancees.append(args) or SimpleNamespace(id='tache-1')))
+    client = sqlite_app.test_client()
+
+    def soumettre(token, session_id):
+        return client.post('/api/correction/batch/copies', json={'session_id': session_id},
+                           headers={'Authorization': f'Bearer {token}'})
+
+    assert soumettre(session_corrigee.etudiant, session_corrigee.session_id).status_code == 403
+    assert soumettre(session_corrigee.enseignant, 'inconnue').status_code == 404
+    assert lancees == []
+
+    reponse = soumettre(session_corrigee.enseignant, session_corrigee.session_id)
+    assert reponse.status_code == 202
+    assert reponse.get_json()['task_id'] == 'tache-1'
+    assert lancees == [[session_corrigee.session_id]]
@@ -0,0 +1,161 @@
+"""
+Tests de l'extraction de texte des documents (PDF, DOCX)
+"""
+import base64
+import importlib
+import io
+import os
+import sys
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.api import qcm as qcm_api
+from app.models.user import User, UserRole
+from app.services import document_parser
+from app.services.async_task_manager import AsyncTaskManager
+from app.services.document_parser import DocumentParser
+from app.services.task_store import MemoryTaskStore
+
+
+@pytest.fixture(autouse=True)
+def pypdf2_reel(monkeypatch):
+    """conftest remplace PyPDF2 par un MagicMock: ces tests utilisent le vrai module"""
+    monkeypatch.delitem(sys.modules, 'PyPDF2', raising=False)
+    monkeypatch.setitem(sys.modules, 'PyPDF2', importlib.import_module('PyPDF2'))
+
+
+def creer_pdf(nombre_pages, lignes_par_page=20):
+    """Génère un PDF dont chaque ligne indique son numéro de page"""
+    from reportlab.pdfgen import canvas
+
+    tampon = io.BytesIO()
+    pdf = canvas.Canvas(tampon)
+    for page in range(nombre_pages):
+        for ligne in range(lignes_par_page):
+            pdf.drawString(50, 800 - ligne * 18, f"Page {page} ligne {ligne} du support de cours")
+        pdf.showPage()
+    pdf.save()
+    return tampon.getvalue()
+
+
+def creer_docx(nombre_paragraphes):
+    """Génère un DOCX de nombre_paragraphes paragraphes"""
+    import docx
+
+    doc = docx.Document()
+    for i in range(nombre_paragraphes):
+        doc.add_paragraph(f"Paragraphe {i} du support de cours")
+        doc.add_paragraph("")
+    tampon = io.BytesIO()
+    doc.save(tampon)
+    return tampon.getvalue()
+
+
+class TestExtractionPDF:
+    """Tests de l'extraction PDF"""
+
+    def test_extraction_sequentielle(self):
+        """Un petit PDF est extrait en entier, dans l'ordre des pages"""
+        texte = DocumentParser.extract_text(creer_pdf(3), 'pdf')
+        assert texte.index("Page 0 ligne 0") < texte.index("Page 1 ligne 0") < texte.index("Page 2 ligne 19")
+
+    def test_extraction_parallele(self, monkeypatch):
+        """Un PDF volumineux est extrait par lots de pages dans le pool de processus, dans l'ordre"""
+        monkeypatch.setenv('DOCUMENT_PARSER_WORKERS', '2')
+        monkeypatch.setattr(document_parser, '_process_pool', None)
+        nombre_pages = document_parser.SEUIL_PAGES_PARALLELE + 5
+
+        pages = list(DocumentParser.iter_pdf_text(creer_pdf(nombre_pages, lignes_par_page=2)))
+
+        assert document_parser._process_pool is not None
+        assert len(pages) == nombre_pages
+        assert all(texte.startswith(f"Page {i} ") for i, texte in enumerate(pages))
+        document_parser._reset_process_pool()
+
+    def test_arret_anticipe(self):
+        """L'extraction s'arrête dès que max_chars est atteint"""
+        pdf = creer_pdf(10)
+        longueur_page = len(next(DocumentParser.iter_pdf_text(pdf)))
+
+        pages = list(DocumentParser.iter_pdf_text(pdf, max_chars=longueur_page * 2 + 1))
+
+        assert len(pages) == 3
+
+    def test_source_fichier(self):
+        """Un fichier ouvert est accepté comme source (copié sur disque par blocs)"""
+        texte = DocumentParser.extract_from_pdf(io.BytesIO(creer_pdf(2)))
+        assert "Page 1 ligne 0" in texte
+
+    def test_pdf_invalide(self):
+        """Un contenu qui n'est pas un PDF lève une ValueError"""
+        with pytest.raises(ValueError):
+            DocumentParser.extract_text(b"pas un pdf", 'pdf')
+
+
+class TestExtractionDOCX:
+    """Tests de l'extraction DOCX"""
+
+    def test_extraction_et_arret_anticipe(self):
+        """Les paragraphes vides sont ignorés et max_chars arrête l'extraction"""
+        contenu = creer_docx(5)
+        assert DocumentParser.extract_text(contenu, 'docx').count("Paragraphe") == 5
+
+        paragraphes = list(DocumentParser.iter_docx_text(contenu, max_chars=1))
+        assert paragraphes == ["Paragraphe 0 du support de cours"]
+
+
+class TestTeleversement:
+    """Tests de l'écriture des documents téléversés sur disque"""
+
+    def test_base64_decode_par_blocs(self, monkeypatch):
+        """Le base64 est décodé bloc par bloc (retours à la ligne ignorés) à l'identique"""
+        monkeypatch.setattr(document_parser, 'TAILLE_BLOC', 7)
+        contenu = os.urandom(1000)
+        encode = base64.encodebytes(contenu).decode('ascii')
+
+        chemin = DocumentParser.enregistrer_base64(encode, '.pdf')
+        try:
+            with open(chemin, 'rb') as fichier:
+                assert fichier.read() == contenu
+        finally:
+            DocumentParser.supprimer(chemin)
+
+        with pytest.raises(ValueError):
+            DocumentParser.enregistrer_base64(encode.strip()[:-1], '.pdf')
+
+    @pytest.mark.parametrize('format_envoi', ['multipart', 'json'])
+    def test_endpoint_transmet_un_chemin(self, sqlite_app, monkeypatch, format_envoi):
+        """L'endpoint transmet à la tâche le chemin d'un fichier temporaire, supprimé ensuite"""
+        recus = []
+
+        def generation(task_id, qcm_id, chemin, file_type, num_questions, *args, **kwargs):
+            with open(chemin, 'rb') as fichier:
+                recus.append((chemin, fichier.read(), file_type, num_questions))
+            return {}
+
+        gestionnaire = AsyncTaskManager(max_workers=1, store=MemoryTaskStore())
+        monkeypatch.setattr(qcm_api, 'generate_quiz_from_document_async', generation)
+        monkeypatch.setattr(qcm_api, 'task_manager', gestionnaire)
+        enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+        db.session.add(enseignant)
+        db.session.commit()
+        entetes = {'Authorization': f'Bearer {create_access_token(identity=enseignant.id)}'}
+        contenu = creer_pdf(2)
+
+        champs = {'titre': 'Cours', 'file_type': 'pdf', 'num_questions': 3}
+        if format_envoi == 'multipart':
+            reponse = sqlite_app.test_client().post(
+                '/api/qcm/generate/document', headers=entetes, content_type='multipart/form-data',
+                data={**champs, 'file': (io.BytesIO(contenu), 'cours.pdf')})
+        else:
+            reponse = sqlite_app.test_client().post(
+                '/api/qcm/generate/document', headers=entetes,
+                json={**champs, 'file_content': base64.b64encode(contenu).decode('ascii')})
+        gestionnaire.file.join()
+
+        assert reponse.status_code == 202
+        chemin, lu, file_type, num_questions = recus[0]
+        assert (lu, file_type, num_questions) == (contenu, 'pdf', 3)
+        assert not os.path.exists(chemin)
@@ -0,0 +1,184 @@
+"""
+Tests du compte à rebours des examens poussé par WebSocket (app.events.exam_timer)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from types import SimpleNamespace
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import db
+from app.events import exam_timer
+from app.models.user import User, UserRole
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.models.session_examen import SessionExamen
+from app.models.resultat import Resultat
+from app.services.resultat_service import ResultatService
+
+
+@pytest.fixture
+def ticks_manuels(monkeypatch):
+    """Ticks déclenchés explicitement par les tests, cache des échéances vide"""
+    monkeypatch.setattr(exam_timer, '_demarrer_ticks', lambda: None)
+    exam_timer.echeances.vider()
+    yield
+    exam_timer.echeances.vider()
+
+
+@pytest.fixture
+def app(ticks_manuels, sqlite_app):
+    return sqlite_app
+
+
+@pytest.fixture
+def examen(app):
+    """Session de 30 minutes avec une question, et un étudiant"""
+    enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+    etudiant = User(email='etudiant@test.com', name='Etudiant', role=UserRole.ETUDIANT)
+    db.session.add_all([enseignant, etudiant])
+    db.session.flush()
+
+    qcm = QCM(titre='QCM', status='published', createur_id=enseignant.id)
+    db.session.add(qcm)
+    db.session.flush()
+    question = Question(enonce='2 + 2 ?', qcm_id=qcm.id, points=1, type_question='qcm')
+    question.set_options([{'texte': '4', 'estCorrecte': True}, {'texte': '5', 'estCorrecte': False}])
+    now = datetime.utcnow()
+    session = SessionExamen(titre='Session', date_debut=now - timedelta(hours=1),
+                            date_fin=now + timedelta(hours=1), duree_minutes=30, status='en_cours',
+                            qcm_id=qcm.id, createur_id=enseignant.id)
+    db.session.add_all([question, session])
+    db.session.commit()
+    return {'etudiant_id': etudiant.id, 'session_id': session.id, 'qcm_id': qcm.id,
+            'token': create_access_token(identity=etudiant.id)}
+
+
+def creer_resultat(examen, debut):
+    resultat = Resultat(etudiant_id=examen['etudiant_id'], session_id=examen['session_id'],
+                        qcm_id=examen['qcm_id'], date_debut=debut, score_maximum=1,
+                        questions_total=1, status='en_cours')
+    db.session.add(resultat)
+    db.session.commit()
+    return resultat.id
+
+
+class ClientSocket:
+    """Client Socket.IO simulé: rooms rejointes et événements reçus"""
+
+    def __init__(self, monkeypatch, sid='sid-1'):
+        self.sid = sid
+        self.rooms = set()
+        self.recus = []
+        monkeypatch.setattr(exam_timer, 'request', SimpleNamespace(sid=sid))
+        monkeypatch.setattr(exam_timer, 'join_room', lambda room, sid=None: self.rooms.add(room))
+        monkeypatch.setattr(exam_timer, 'emit', lambda nom, data: self.recus.append((nom, data)))
+        monkeypatch.setattr(exam_timer.socketio, 'emit', self._diffusion)
+
+    def _diffusion(self, nom, data, to=None, **kwargs):
+        if to in self.rooms:
+            self.recus.append((nom, data))
+
+    def emit(self, nom, data):
+        {'join_exam_timer': exam_timer.handle_join_exam_timer}[nom](data)
+
+    def evenements(self, nom):
+        return [data for recu, data in self.recus if recu == nom]
+
+
+def test_demarrage_et_soumission_alimentent_le_cache(examen):
+    service = ResultatService()
+    resultat = service.demarrer_examen(examen['session_id'], examen['etudiant_id'])
+
+    echeance = exam_timer.echeances.get(resultat['id'])
+    assert echeance['duree_totale_secondes'] == 1800
+    assert 1795 <= exam_timer.duree_restante(echeance) <= 1800
+
+    service.soumettre_reponses(resultat['id'], {})
+    assert exam_timer.echeances.get(resultat['id']) is None
+
+
+def test_join_recoit_echeance_puis_ticks_en_une_requete(app, examen, monkeypatch):
+    resultat_id = creer_resultat(examen, datetime.utcnow() - timedelta(minutes=10))
+    client = ClientSocket(monkeypatch)
+
+    # Échéance absente du cache (redémarrage): rechargée une fois depuis la base
+    client.emit('join_exam_timer', {'token': examen['token'], 'resultat_id': resultat_id})
+    deadline, = client.evenements('exam_deadline')
+    assert deadline['status'] == 'en_cours'
+    assert 1190 <= deadline['duree_restante_secondes'] <= 1200
+    assert exam_timer.echeances.get(resultat_id) is not None
+
+    requetes = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: requetes.append(args[2]))
+    exam_timer.emettre_ticks()
+    assert len(requetes) == 1  # Statut des tentatives en cache
+
+    tick, = client.evenements('exam_tick')
+    assert tick['resultat_id'] == resultat_id
+    assert 1190 <= tick['duree_restante_secondes'] <= 1200
+
+
+def test_auto_soumission_a_echeance(app, examen, monkeypatch):
+    debut = datetime.utcnow() - timedelta(minutes=10)
+    resultat_id = creer_resultat(examen, debut)
+    client = ClientSocket(monkeypatch)
+    client.emit('join_exam_timer', {'token': examen['token'], 'resultat_id': resultat_id})
+
+    echus = exam_timer.emettre_ticks(maintenant=debut + timedelta(minutes=30, seconds=1))
+
+    assert echus == [resultat_id]
+    auto, = client.evenements('exam_auto_submit')
+    assert auto['resultat_id'] == resultat_id
+    assert exam_timer.echeances.get(resultat_id) is None
+
+
+def test_autre_etudiant_refuse(app, examen, monkeypatch):
+    resultat_id = creer_resultat(examen, datetime.utcnow())
+    intrus = User(email='intrus@test.com', name='Intrus', role=UserRole.ETUDIANT)
+    db.session.add(intrus)
+    db.session.commit()
+    client = ClientSocket(monkeypatch)
+
+    client.emit('join_exam_timer', {'token': create_access_token(identity=intrus.id),
+                                    'resultat_id': resultat_id})
+
+    assert client.evenements('exam_deadline') == []
+    assert client.evenements('error')
+    exam_timer.emettre_ticks()
+    assert client.evenements('exam_tick') == []
+
+
+def test_tentative_soumise_par_un_autre_worker(app, examen, monkeypatch):
+    """Échéance restée en cache ici alors qu'un autre worker a traité la soumission"""
+    resultat_id = creer_resultat(examen, datetime.utcnow() - timedelta(minutes=10))
+    client = ClientSocket(monkeypatch)
+    client.emit('join_exam_timer', {'token': examen['token'], 'resultat_id': resultat_id})
+    db.session.get(Resultat, resultat_id).status = 'termine'
+    db.session.commit()
+
+    reponse = app.test_client().get(f'/api/resultats/{resultat_id}/temps-restant',
+                                    headers={'Authorization': f"Bearer {examen['token']}"})
+
+    assert reponse.status_code == 200
+    assert reponse.get_json()['status'] == 'termine'
+    assert reponse.get_json()['duree_restante_secondes'] == 0
+    assert exam_timer.echeances.get(resultat_id) is None
+
+
+def test_ticks_ignorent_les_tentatives_soumises_ailleurs(app, examen, monkeypatch):
+    debut = datetime.utcnow() - timedelta(minutes=10)
+    resultat_id = creer_resultat(examen, debut)
+    client = ClientSocket(monkeypatch)
+    client.emit('join_exam_timer', {'token': examen['token'], 'resultat_id': resultat_id})
+    db.session.get(Resultat, resultat_id).status = 'termine'
+    db.session.commit()
+
+    echus = exam_timer.emettre_ticks(maintenant=debut + timedelta(minutes=30, seconds=1))
+
+    assert echus == []
+    assert client.evenements('exam_auto_submit') == []
+    assert client.evenements('exam_tick') == []
+    assert exam_timer.echeances.get(resultat_id) is None
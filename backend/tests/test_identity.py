@@ -0,0 +1,135 @@
+"""
+Tests de l'identité partagée de l'utilisateur authentifié (app.utils.identity)
+"""
+import pytest
+from flask import current_app, jsonify
+from flask_jwt_extended import create_access_token, decode_token
+from sqlalchemy import event
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.enseignant import Enseignant
+from app.models.etablissement import Etablissement
+from app.repositories.user_repository import UserRepository
+from app.services.user_service import UserService
+from app.utils.decorators import require_complete_profile, require_role
+from app.utils.identity import cache_identites, utilisateur_courant
+
+
+@pytest.fixture
+def app(sqlite_app):
+    """Application de test avec deux routes protégées"""
+    @sqlite_app.route('/test/admin')
+    @require_role('admin')
+    def route_admin(current_user):
+        return jsonify({'id': current_user.id, 'email': current_user.email})
+
+    @sqlite_app.route('/test/profil')
+    @require_complete_profile
+    def route_profil():
+        user = utilisateur_courant()
+        # Même objet que celui des repositories: aucune requête supplémentaire
+        assert UserRepository().get_by_id(user.id) is user
+        return jsonify({'profil': user.enseignant_profil is not None})
+
+    cache_identites.vider()
+    yield sqlite_app
+    cache_identites.vider()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def utilisateurs(app):
+    etablissement = Etablissement(code='UDM', nom='Université', type_etablissement='université')
+    admin = User(email='admin@test.com', name='Admin', role=UserRole.ADMIN, is_active=True)
+    enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT, is_active=True)
+    sans_profil = User(email='nouveau@test.com', name='Nouveau', role=UserRole.ETUDIANT)
+    db.session.add_all([etablissement, admin, enseignant, sans_profil])
+    db.session.flush()
+    db.session.add(Enseignant(user_id=enseignant.id, numero_enseignant='EN001',
+                              etablissement_id=etablissement.id))
+    db.session.commit()
+    ids = {'admin': admin.id, 'enseignant': enseignant.id, 'sans_profil': sans_profil.id}
+    db.session.expunge_all()
+    return ids
+
+
+@pytest.fixture
+def requetes_users(app):
+    """Requêtes SQL lisant la table users"""
+    executees = []
+
+    def compter(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement:
+            executees.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', compter)
+    yield executees
+    event.remove(db.engine, 'before_cursor_execute', compter)
+
+
+def entetes(user_id):
+    """En-têtes d'un token créé dans sa propre requête (identités de la requête oubliées ensuite)"""
+    with current_app.test_request_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+
+def test_identite_chargee_une_fois(client, utilisateurs, requetes_users):
+    """Une requête pour l'utilisateur et ses profils, puis plus aucune tant que l'identité est en cache"""
+    en_tetes = entetes(utilisateurs['admin'])
+    cache_identites.vider()
+    requetes_users.clear()
+
+    for _ in range(5):
+        reponse = client.get('/test/admin', headers=en_tetes)
+        assert reponse.status_code == 200
+        assert reponse.get_json() == {'id': utilisateurs['admin'], 'email': 'admin@test.com'}
+
+    assert len(requetes_users) == 1
+    assert 'enseignants' in requetes_users[0] and 'etudiants' in requetes_users[0]
+
+
+def test_changement_de_role_invalide_le_cache(client, utilisateurs):
+    en_tetes = entetes(utilisateurs['admin'])
+    assert client.get('/test/admin', headers=en_tetes).status_code == 200
+
+    UserService().change_role(utilisateurs['admin'], 'enseignant')
+
+    assert client.get('/test/admin', headers=en_tetes).status_code == 403
+
+
+def test_changement_de_statut_invalide_le_cache(utilisateurs):
+    from app.utils.identity import charger_identite
+
+    assert charger_identite(utilisateurs['enseignant']).is_active is True
+    UserService().toggle_status(utilisateurs['enseignant'], utilisateurs['admin'])
+
+    assert cache_identites.get(utilisateurs['enseignant']) is None
+    assert charger_identite(utilisateurs['enseignant']).is_active is False
+
+
+def test_profil_complet(client, utilisateurs, requetes_users):
+    """Profils lus avec l'identité; l'objet User de la route est chargé une seule fois"""
+    en_tetes = entetes(utilisateurs['enseignant'])
+    cache_identites.vider()
+    requetes_users.clear()
+    reponse = client.get('/test/profil', headers=en_tetes)
+
+    assert reponse.status_code == 200 and reponse.get_json() == {'profil': True}
+    assert len(requetes_users) == 1
+
+    reponse = client.get('/test/profil', headers=entetes(utilisateurs['sans_profil']))
+    assert reponse.status_code == 403
+    assert reponse.get_json()['requiresOnboarding'] is True
+
+
+def test_claims_du_token(app, utilisateurs):
+    claims = decode_token(create_access_token(identity=utilisateurs['enseignant']))
+
+    assert (claims['role'], claims['email'], claims['name']) == ('enseignant', 'prof@test.com', 'Prof')
+    assert cache_identites.get(utilisateurs['enseignant']) is not None
+    assert 'role' not in decode_token(create_access_token(identity='inconnu'))
@@ -0,0 +1,179 @@
+"""
+Tests de la pagination par curseur (BaseRepository.get_all_keyset) et des endpoints de liste
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.qcm import QCM
+from app.models.resultat import Resultat
+from app.repositories.base_repository import encode_curseur, decode_curseur, cache_totaux
+from app.repositories.resultat_repository import ResultatRepository
+from app.repositories.qcm_repository import QCMRepository
+
+NOMBRE_RESULTATS = 23
+
+
+@pytest.fixture
+def app(sqlite_app):
+    cache_totaux.vider()
+    yield sqlite_app
+    cache_totaux.vider()
+
+
+@pytest.fixture
+def donnees(app):
+    """NOMBRE_RESULTATS résultats dont plusieurs partagent la même date de création"""
+    admin = User(email='admin@test.com', name='Admin', role=UserRole.ADMIN)
+    etudiant = User(email='etudiant@test.com', name='Etudiant', role=UserRole.ETUDIANT)
+    db.session.add_all([admin, etudiant])
+    db.session.flush()
+    qcm = QCM(titre='QCM', createur_id=admin.id)
+    db.session.add(qcm)
+    db.session.flush()
+
+    debut = datetime(2025, 1, 1, 8, 0, 0)
+    for i in range(NOMBRE_RESULTATS):
+        # Trois résultats par seconde: le départage se fait sur l'id
+        db.session.add(Resultat(etudiant_id=etudiant.id, qcm_id=qcm.id, date_debut=debut,
+                                score_maximum=20, questions_total=1,
+                                status='termine' if i % 2 else 'en_cours',
+                                created_at=debut + timedelta(seconds=i // 3)))
+    ids = {'admin_id': admin.id, 'qcm_id': qcm.id}
+    db.session.commit()
+    return ids
+
+
+def parcourir(repo, limit, filters=None):
+    """Parcourt toutes les pages d'un repository et retourne les entités dans l'ordre"""
+    entites, curseur = [], None
+    while True:
+        page, curseur, _ = repo.get_all_keyset(limit=limit, curseur=curseur, filters=filters)
+        entites.extend(page)
+        if not curseur:
+            return entites
+
+
+def test_curseur_aller_retour():
+    """Le jeton encode (created_at, id) de manière réversible et opaque"""
+    date = datetime(2025, 3, 4, 5, 6, 7, 890)
+    jeton = encode_curseur(date, 'abc-123')
+
+    assert 'abc' not in jeton and '=' not in jeton
+    assert decode_curseur(jeton) == (date, 'abc-123')
+
+
+@pytest.mark.parametrize('jeton', ['pas-un-curseur', '', 'W10', encode_curseur(datetime.utcnow(), 'x')[:-4]])
+def test_curseur_invalide(jeton):
+    with pytest.raises(ValueError):
+        decode_curseur(jeton)
+
+
+@pytest.mark.parametrize('limit', [1, 5, 7, NOMBRE_RESULTATS, 100])
+def test_parcours_complet_sans_doublon_ni_trou(app, donnees, limit):
+    """Toutes les pages réunies = la liste triée sur (created_at, id) décroissants"""
+    repo = ResultatRepository()
+    attendus = Resultat.query.order_by(Resultat.created_at.desc(), Resultat.id.desc()).all()
+
+    assert [r.id for r in parcourir(repo, limit)] == [r.id for r in attendus]
+
+
+def test_parcours_filtre(app, donnees):
+    """Les filtres du repository s'appliquent à chaque page"""
+    termines = parcourir(ResultatRepository(), 4, filters={'status': 'termine'})
+
+    assert len(termines) == NOMBRE_RESULTATS // 2
+    assert all(r.status == 'termine' for r in termines)
+
+
+def test_page_profonde_sans_offset(app, donnees, compter_requetes):
+    """Une page suivante filtre sur la clé du curseur au lieu de sauter des lignes"""
+    repo = ResultatRepository()
+    _, curseur, _ = repo.get_all_keyset(limit=10)
+
+    with compter_requetes(parametres=True) as requetes:
+        page, _, total = repo.get_all_keyset(limit=10, curseur=curseur)
+
+    assert len(page) == 10 and total is None
+    # Une requête pour la page, plus le préchargement groupé des réponses (selectinload)
+    assert len(requetes) == 2
+    assert 'FROM reponses_resultat' in requetes[1][0]
+    requete, parametres = requetes[0]
+    assert 'resultats.created_at <= ?' in requete and 'count(' not in requete.lower()
+    # SQLite rend toujours "LIMIT ? OFFSET ?": l'offset lié vaut 0
+    assert parametres[-2:] == (11, 0)
+
+
+def test_total_optionnel_mis_en_cache(app, donnees, compter_requetes):
+    """Le total n'est compté qu'une fois pour des pages successives d'une même liste"""
+    repo = ResultatRepository()
+    filtres = {'status': 'termine'}
+
+    _, curseur, total = repo.get_all_keyset(limit=5, filters=filtres, avec_total=True)
+    with compter_requetes() as requetes:
+        _, _, total_suivant = repo.get_all_keyset(limit=5, curseur=curseur, filters=filtres, avec_total=True)
+
+    assert total == total_suivant == NOMBRE_RESULTATS // 2
+    assert not any('count(' in requete.lower() for requete in requetes)
+
+    # Autres filtres: autre entrée de cache
+    _, _, total_en_cours = repo.get_all_keyset(limit=5, filters={'status': 'en_cours'}, avec_total=True)
+    assert total_en_cours == NOMBRE_RESULTATS - NOMBRE_RESULTATS // 2
+
+
+def test_estimation_sans_postgresql(app, donnees):
+    """Hors PostgreSQL, le total sans filtre est compté (pas d'estimation disponible)"""
+    repo = ResultatRepository()
+
+    assert repo.estimate_count() is None
+    assert repo.get_all_keyset(limit=2, avec_total=True)[2] == NOMBRE_RESULTATS
+
+
+def test_liste_qcm_keyset_charge_les_relations(app, donnees):
+    """Les options de chargement de liste s'appliquent aussi aux pages par curseur"""
+    qcms, curseur, _ = QCMRepository().get_all_keyset(limit=10)
+
+    assert len(qcms) == 1 and curseur is None
+    assert 'createur' in qcms[0].__dict__
+
+
+def test_endpoint_admin_resultats_par_curseur(app, client, donnees):
+    """GET /api/admin/resultats?cursor=: pages successives via pagination.next_cursor"""
+    entetes = {'Authorization': f"Bearer {create_access_token(identity=donnees['admin_id'])}"}
+
+    ids, curseur = [], ''
+    while curseur is not None:
+        reponse = client.get(f'/api/admin/resultats?per_page=10&include_total=true&cursor={curseur}',
+                             headers=entetes)
+        assert reponse.status_code == 200
+        contenu = reponse.get_json()
+        assert contenu['pagination']['total'] == NOMBRE_RESULTATS
+        ids.extend(r['id'] for r in contenu['resultats'])
+        curseur = contenu['pagination']['next_cursor']
+
+    assert len(ids) == len(set(ids)) == NOMBRE_RESULTATS
+
+
+def test_endpoints_curseur_invalide(app, client, donnees):
+    """Un curseur invalide est une erreur de requête (400)"""
+    entetes = {'Authorization': f"Bearer {create_access_token(identity=donnees['admin_id'])}"}
+
+    for url in ('/api/admin/resultats', '/api/admin/users', '/api/admin/qcm', '/api/admin/questions',
+                '/api/admin/sessions', '/api/qcm', '/api/resultats', '/api/sessions-examen'):
+        assert client.get(f'{url}?cursor=invalide', headers=entetes).status_code == 400, url
+
+
+def test_endpoint_resultats_par_curseur(app, client, donnees):
+    """GET /api/resultats?cursor=: réponse paginée avec next_cursor"""
+    entetes = {'Authorization': f"Bearer {create_access_token(identity=donnees['admin_id'])}"}
+
+    reponse = client.get('/api/resultats?limit=20&cursor=', headers=entetes)
+
+    assert reponse.status_code == 200
+    contenu = reponse.get_json()
+    assert len(contenu['data']) == 20 and contenu['total'] is None
+    suite = client.get(f"/api/resultats?limit=20&cursor={contenu['next_cursor']}", headers=entetes).get_json()
+    assert len(suite['data']) == NOMBRE_RESULTATS - 20 and suite['next_cursor'] is None
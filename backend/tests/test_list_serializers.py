@@ -0,0 +1,156 @@
+"""
+Tests des sérialiseurs de listes (QCM, sessions d'examen): budget de requêtes par page
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.etablissement import Etablissement
+from app.models.matiere import Matiere
+from app.models.niveau import Niveau
+from app.models.mention import Mention
+from app.models.parcours import Parcours
+from app.models.classe import Classe
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.models.session_examen import SessionExamen
+from app.models.resultat import Resultat
+from app.models.associations import qcm_niveaux
+from app.services.list_serializer import ListSerializer
+
+NOMBRE_LIGNES = 25
+
+# Requêtes SQL maximales par page, indépendamment du nombre de lignes
+BUDGET_LISTE_QCM = 6
+BUDGET_LISTE_SESSIONS = 5
+
+
+@pytest.fixture
+def client(sqlite_app):
+    return sqlite_app.test_client()
+
+
+@pytest.fixture
+def donnees(sqlite_app):
+    """NOMBRE_LIGNES QCM (3 questions, 2 niveaux ciblés) et autant de sessions (2 participants)"""
+    admin = User(email='admin@test.com', name='Admin', role=UserRole.ADMIN)
+    etudiant = User(email='etudiant@test.com', name='Etudiant', role=UserRole.ETUDIANT)
+    etablissement = Etablissement(code='UDM', nom='Université', type_etablissement='université')
+    matiere = Matiere(code='INFO101', nom='Informatique')
+    niveaux = [Niveau(code=f'L{i}', nom=f'Licence {i}', ordre=i, cycle='licence') for i in (1, 2)]
+    db.session.add_all([admin, etudiant, etablissement, matiere, *niveaux])
+    db.session.flush()
+
+    mention = Mention(code='INFO', nom='Informatique', etablissement_id=etablissement.id)
+    db.session.add(mention)
+    db.session.flush()
+    parcours = Parcours(code='IA', nom='Intelligence Artificielle', mention_id=mention.id)
+    classe = Classe(code='L1-A', nom='L1 A', niveau_id=niveaux[0].id, annee_scolaire='2024-2025')
+    db.session.add_all([parcours, classe])
+    db.session.flush()
+
+    debut = datetime.utcnow()
+    for i in range(NOMBRE_LIGNES):
+        qcm = QCM(titre=f'QCM {i}', createur_id=admin.id, matiere_id=matiere.id, status='published',
+                  niveau_id=niveaux[0].id, mention_id=mention.id, parcours_id=parcours.id,
+                  created_at=debut + timedelta(seconds=i))
+        db.session.add(qcm)
+        db.session.flush()
+        db.session.add_all([Question(enonce=f'Question {j}', qcm_id=qcm.id) for j in range(3)])
+        for niveau in niveaux:
+            db.session.execute(qcm_niveaux.insert().values(qcm_id=qcm.id, niveau_id=niveau.id))
+
+        session = SessionExamen(titre=f'Session {i}', date_debut=debut, date_fin=debut + timedelta(hours=2),
+                                duree_minutes=60, qcm_id=qcm.id, createur_id=admin.id, classe_id=classe.id,
+                                niveau_id=niveaux[0].id, mention_id=mention.id, parcours_id=parcours.id)
+        db.session.add(session)
+        db.session.flush()
+        db.session.add_all([
+            Resultat(etudiant_id=etudiant.id, qcm_id=qcm.id, session_id=session.id, date_debut=debut,
+                     score_maximum=20, questions_total=3)
+            for _ in range(2)
+        ])
+    admin_id = admin.id
+    db.session.commit()
+    db.session.expunge_all()
+
+    return {'admin_id': admin_id}
+
+
+def _entetes(admin_id):
+    return {'Authorization': f'Bearer {create_access_token(identity=admin_id)}'}
+
+
+def test_liste_qcm_api_budget_requetes(client, donnees, compter_requetes):
+    """GET /api/qcm: nombre de requêtes constant pour une page de 25 QCM"""
+    entetes = _entetes(donnees['admin_id'])
+
+    with compter_requetes() as requetes:
+        reponse = client.get('/api/qcm?limit=100', headers=entetes)
+
+    assert reponse.status_code == 200
+    qcms = reponse.get_json()['data']
+    assert len(qcms) == NOMBRE_LIGNES
+    assert all(q['nombreQuestions'] == 3 for q in qcms)
+    assert all([n['code'] for n in q['niveaux']] == ['L1', 'L2'] for q in qcms)
+    assert all(q['matiere'] == 'Informatique' and q['createur']['name'] == 'Admin' for q in qcms)
+    assert all(q['mention']['code'] == 'INFO' and q['parcours']['code'] == 'IA' for q in qcms)
+    assert len(requetes) <= BUDGET_LISTE_QCM, requetes
+
+
+def test_liste_qcm_admin_budget_requetes(client, donnees, compter_requetes):
+    """GET /api/admin/qcm: nombre de requêtes constant pour une page de 25 QCM"""
+    entetes = _entetes(donnees['admin_id'])
+
+    with compter_requetes() as requetes:
+        reponse = client.get(f'/api/admin/qcm?per_page={NOMBRE_LIGNES}', headers=entetes)
+
+    assert reponse.status_code == 200
+    assert len(reponse.get_json()['qcms']) == NOMBRE_LIGNES
+    assert len(requetes) <= BUDGET_LISTE_QCM, requetes
+
+
+def test_liste_sessions_admin_budget_requetes(client, donnees, compter_requetes):
+    """GET /api/admin/sessions: nombre de requêtes constant pour une page de 25 sessions"""
+    entetes = _entetes(donnees['admin_id'])
+
+    with compter_requetes() as requetes:
+        reponse = client.get(f'/api/admin/sessions?per_page={NOMBRE_LIGNES}', headers=entetes)
+
+    assert reponse.status_code == 200
+    sessions = reponse.get_json()['sessions']
+    assert len(sessions) == NOMBRE_LIGNES
+    assert all(s['nombreParticipants'] == 2 for s in sessions)
+    assert all(s['matiere'] == 'Informatique' and s['classe']['code'] == 'L1-A' for s in sessions)
+    assert all(s['niveau']['code'] == 'L1' and s['parcours']['code'] == 'IA' for s in sessions)
+    assert len(requetes) <= BUDGET_LISTE_SESSIONS, requetes
+
+
+def test_liste_sessions_examen_api_budget_requetes(client, donnees, compter_requetes):
+    """GET /api/sessions-examen: nombre de requêtes constant pour une page de 25 sessions"""
+    entetes = _entetes(donnees['admin_id'])
+
+    with compter_requetes() as requetes:
+        reponse = client.get('/api/sessions-examen?limit=100', headers=entetes)
+
+    assert reponse.status_code == 200
+    assert len(reponse.get_json()['data']) == NOMBRE_LIGNES
+    assert len(requetes) <= BUDGET_LISTE_SESSIONS + 1, requetes
+
+
+def test_dto_liste_identique_au_detail(sqlite_app, donnees):
+    """Les DTO de liste ont le même contenu que le to_dict de détail"""
+    serializer = ListSerializer()
+    qcms = QCM.query.order_by(QCM.created_at).limit(3).all()
+    sessions = SessionExamen.query.limit(3).all()
+
+    def trier_niveaux(donnees_qcm):
+        # L'ordre des niveaux n'est pas défini par la relation dynamique du détail
+        return {**donnees_qcm, 'niveaux': sorted(donnees_qcm['niveaux'], key=lambda n: n['ordre'])}
+
+    assert serializer.qcms(qcms) == [trier_niveaux(qcm.to_dict()) for qcm in qcms]
+    assert serializer.sessions(sessions) == [session.to_dict() for session in sessions]
+    assert serializer.qcms([]) == [] and serializer.sessions([]) == []
@@ -0,0 +1,114 @@
+"""
+Tests de l'écriture en masse des questions (QuestionRepository.insert_many / replace_for_qcm / upsert_many)
+"""
+import pytest
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.repositories.question_repository import QuestionRepository
+
+
+@pytest.fixture
+def qcms(sqlite_app):
+    enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+    db.session.add(enseignant)
+    db.session.flush()
+    qcms = [QCM(titre=f'QCM {i}', createur_id=enseignant.id) for i in range(2)]
+    db.session.add_all(qcms)
+    db.session.commit()
+    return qcms
+
+
+@pytest.fixture
+def instructions(sqlite_app, compter_requetes):
+    """Instructions SQL exécutées (executemany compté une fois)"""
+    with compter_requetes() as executees:
+        yield executees
+
+
+def question_generee(i):
+    return {
+        'enonce': f'Question {i} ?',
+        'type_question': 'qcm',
+        'options': [{'texte': 'Oui', 'estCorrecte': True}, {'texte': 'Non « é »', 'estCorrecte': False}],
+        'explication': f'Explication {i}',
+        'points': 2
+    }
+
+
+def test_insertion_en_une_instruction(qcms, instructions):
+    """Des milliers de questions sont insérées en un executemany, options encodées comme set_options"""
+    ids = QuestionRepository().insert_many(qcms[0].id, (question_generee(i) for i in range(2500)))
+    db.session.commit()
+
+    assert len([s for s in instructions if s.lstrip().upper().startswith('INSERT')]) == 1
+    assert len(set(ids)) == 2500
+    question = db.session.get(Question, ids[1234])
+    assert question.enonce == 'Question 1234 ?' and question.qcm_id == qcms[0].id
+    assert question.get_options() == question_generee(1234)['options']
+    assert question.points == 2 and question.created_at is not None
+
+
+def test_format_des_scripts_de_donnees(qcms):
+    """Format des scripts de données: clé type, réponse correcte des vrai/faux, pas d'options"""
+    ids = QuestionRepository().insert_many(qcms[0].id, [
+        {'enonce': 'Python est typé statiquement.', 'type': 'vrai_faux', 'points': 1,
+         'reponse_correcte': 'Faux', 'explication': 'Typage dynamique.'},
+    ])
+    db.session.commit()
+
+    question = db.session.get(Question, ids[0])
+    assert question.type_question == 'vrai_faux'
+    assert question.reponse_correcte == 'Faux' and question.options is None
+
+
+def test_ordre_et_valeurs_par_defaut(qcms):
+    """created_at suit l'ordre reçu; points 0 conservé, explication vide par défaut"""
+    ids = QuestionRepository().insert_many(qcms[0].id, [
+        {'enonce': f'Question {i} ?', 'type_question': 'qcm', 'points': 0} for i in range(3)
+    ] + [{'enonce': 'Sans barème ?', 'type_question': 'qcm'}])
+    db.session.commit()
+
+    ordonnees = Question.query.filter_by(qcm_id=qcms[0].id).order_by(Question.created_at).all()
+    assert [q.id for q in ordonnees] == ids
+    assert len({q.created_at for q in ordonnees}) == 4
+    assert [q.points for q in ordonnees] == [0, 0, 0, 1]
+    assert all(q.explication == '' for q in ordonnees)
+
+
+def test_remplacement_limite_au_qcm(qcms):
+    repo = QuestionRepository()
+    repo.insert_many(qcms[0].id, [question_generee(i) for i in range(3)])
+    repo.insert_many(qcms[1].id, [question_generee(i) for i in range(2)])
+    db.session.commit()
+
+    repo.replace_for_qcm(qcms[0].id, [question_generee(10)])
+    db.session.commit()
+
+    assert [q.enonce for q in repo.get_by_qcm(qcms[0].id)] == ['Question 10 ?']
+    assert repo.count_by_qcm(qcms[1].id) == 2
+
+
+def test_upsert(qcms, instructions):
+    """Mise à jour par id (date de création conservée), insertion des nouvelles, ids d'un autre QCM ignorés"""
+    repo = QuestionRepository()
+    existant, autre_qcm = repo.insert_many(qcms[0].id, [question_generee(1)])[0], \
+        repo.insert_many(qcms[1].id, [question_generee(2)])[0]
+    db.session.commit()
+    cree_le = db.session.get(Question, existant).created_at
+    qcm_id = qcms[0].id
+    instructions.clear()
+
+    modifiee = dict(question_generee(1), id=existant, enonce='Question 1 corrigée ?')
+    detournee = dict(question_generee(2), id=autre_qcm, enonce='Détournée ?')
+    ids = repo.upsert_many(qcm_id, [modifiee, question_generee(3), detournee])
+    assert len(instructions) == 1
+    db.session.commit()
+
+    assert ids[0] == existant
+    question = db.session.get(Question, existant)
+    assert question.enonce == 'Question 1 corrigée ?' and question.created_at == cree_le
+    assert sorted(q.enonce for q in repo.get_by_qcm(qcms[0].id)) == ['Question 1 corrigée ?', 'Question 3 ?']
+    assert db.session.get(Question, autre_qcm).enonce == 'Question 2 ?'
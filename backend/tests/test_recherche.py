@@ -0,0 +1,134 @@
+"""
+Tests de la recherche indexée (app.repositories.recherche) et de l'autocomplétion
+"""
+import pytest
+from sqlalchemy import text
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.niveau import Niveau
+from app.models.classe import Classe
+from app.models.matiere import Matiere
+from app.repositories.user_repository import UserRepository
+from app.repositories.matiere_repository import MatiereRepository
+from app.services.matiere_service import MatiereService
+from app.services.qcm_service import QCMService
+from app.services.recherche_service import index_matieres
+
+
+@pytest.fixture
+def app(sqlite_app):
+    niveau = Niveau(code='L1', nom='Licence 1', ordre=1, cycle='licence')
+    db.session.add(niveau)
+    db.session.flush()
+    db.session.add_all([
+        User(email='admin@test.com', name='Admin', role=UserRole.ADMIN),
+        User(email='jean.dupont@test.com', name='Jean Dupont', role=UserRole.ETUDIANT),
+        User(email='helene.durand@test.com', name='Hélène Durand', role=UserRole.ETUDIANT),
+        User(email='marc@test.com', name='Marc Leduc', role=UserRole.ENSEIGNANT),
+        *[User(email=f'etudiant{i}@test.com', name=f'Dupuis {i}', role=UserRole.ETUDIANT) for i in range(30)],
+        Classe(code='L1-INFO-A', nom='Licence 1 Informatique A', niveau_id=niveau.id, annee_scolaire='2024-2025'),
+        Classe(code='L1-INFO-B', nom='Licence 1 Informatique B', niveau_id=niveau.id,
+               annee_scolaire='2024-2025', actif=False),
+        Matiere(code='MATH101', nom='Mathématiques Générales', coefficient=2.0),
+        Matiere(code='INFO101', nom='Informatique', coefficient=1.0),
+        Matiere(code='HIST101', nom='Histoire', coefficient=1.0, actif=False),
+    ])
+    db.session.commit()
+    return sqlite_app
+
+
+def _entetes(email):
+    user = User.query.filter_by(email=email).first()
+    return {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+
+def test_recherche_utilisateurs_fts(app):
+    user_repo = UserRepository()
+
+    assert [u.email for u in user_repo.search_by_email_or_name('dupont')] == ['jean.dupont@test.com']
+    # Accents ignorés, préfixes de mots, plusieurs mots
+    assert [u.name for u in user_repo.search_by_email_or_name('helene')] == ['Hélène Durand']
+    assert [u.name for u in user_repo.search_by_email_or_name('jean dup')] == ['Jean Dupont']
+    # Résultats limités (défaut SEARCH_DEFAULT_LIMIT)
+    assert len(user_repo.search_by_email_or_name('dupuis', limit=5)) == 5
+    assert len(user_repo.search_by_email_or_name('dupuis')) == 20
+    assert user_repo.search_by_email_or_name('  ') == []
+
+    assert db.session.execute(
+        text("SELECT count(*) FROM sqlite_master WHERE name LIKE 'users_fts%'")
+    ).scalar() > 0
+
+
+def test_index_fts_survit_a_l_annulation(app):
+    """L'index créé pendant une lecture reste alimenté quand la transaction de la session est annulée"""
+    user_repo = UserRepository()
+
+    assert len(user_repo.search_by_email_or_name('dupont')) == 1
+    db.session.rollback()
+    db.session.remove()
+
+    assert len(user_repo.search_by_email_or_name('dupont')) == 1
+    assert [u.name for u in user_repo.search_by_email_or_name('helene')] == ['Hélène Durand']
+
+
+def test_index_fts_suit_les_ecritures(app):
+    user_repo = UserRepository()
+    assert user_repo.search_by_email_or_name('zoe') == []
+
+    db.session.add(User(email='zoe@test.com', name='Zoé Martin', role=UserRole.ETUDIANT))
+    jean = user_repo.get_by_email('jean.dupont@test.com')
+    jean.name = 'Jean Bernard'
+    db.session.delete(user_repo.get_by_email('marc@test.com'))
+    db.session.commit()
+
+    assert [u.email for u in user_repo.search_by_email_or_name('zoe')] == ['zoe@test.com']
+    assert [u.name for u in user_repo.search_by_email_or_name('bernard')] == ['Jean Bernard']
+    assert user_repo.search_by_email_or_name('leduc') == []
+
+
+def test_resolution_matiere_en_memoire(app):
+    assert index_matieres.resoudre('math101')['code'] == 'MATH101'
+    assert index_matieres.resoudre('  mathematiques generales ')['code'] == 'MATH101'
+    assert index_matieres.resoudre('mathématiques')['code'] == 'MATH101'
+    # Code exact d'une matière inactive retourné (l'appelant vérifie actif), nom partiel ignoré
+    assert index_matieres.resoudre('HIST101')['actif'] is False
+    assert index_matieres.resoudre('histo') is None
+    assert [m['code'] for m in index_matieres.completer('inf')] == ['INFO101']
+    assert [m['code'] for m in index_matieres.completer('gen')] == ['MATH101']
+    assert MatiereRepository().search('info')[0].code == 'INFO101'
+
+    # Nouvelle matière prise en compte (invalidation du catalogue des référentiels)
+    MatiereService().create_matiere({'code': 'PHYS101', 'nom': 'Physique', 'coefficient': 1.5})
+    assert index_matieres.resoudre('physique')['code'] == 'PHYS101'
+
+    admin = User.query.filter_by(email='admin@test.com').first()
+    qcm = QCMService().create_qcm({'titre': 'QCM', 'matiere': 'Mathematiques'}, admin.id)
+    assert qcm['matiere'] == 'Mathématiques Générales'
+
+
+def test_autocompletion(app):
+    client = app.test_client()
+
+    reponse = client.get('/api/recherche/autocomplete?q=l1&limit=5', headers=_entetes('admin@test.com'))
+    assert reponse.status_code == 200
+    suggestions = reponse.get_json()
+    assert set(suggestions) == {'utilisateurs', 'classes', 'matieres'}
+    assert [c['code'] for c in suggestions['classes']] == ['L1-INFO-A']
+
+    reponse = client.get('/api/recherche/autocomplete?q=dup&limit=3', headers=_entetes('admin@test.com'))
+    assert len(reponse.get_json()['utilisateurs']) == 3
+
+    # Un étudiant ne reçoit pas de suggestions d'utilisateurs
+    reponse = client.get('/api/recherche/autocomplete?q=jean', headers=_entetes('jean.dupont@test.com'))
+    assert 'utilisateurs' not in reponse.get_json()
+
+    assert client.get('/api/recherche/autocomplete?q=',
+                      headers=_entetes('admin@test.com')).status_code == 400
+    assert client.get('/api/recherche/autocomplete?q=inf&limit=-5',
+                      headers=_entetes('admin@test.com')).status_code == 400
+    # Limite négative ramenée à la valeur par défaut (pas de troncature par la fin)
+    assert [m['code'] for m in index_matieres.completer('i', limite=-5)] == ['INFO101']
+    assert client.get('/api/recherche/autocomplete?q=a&types=cours',
+                      headers=_entetes('admin@test.com')).status_code == 400
@@ -0,0 +1,90 @@
+"""
+Tests du catalogue des référentiels en cache (app.services.referentiel_service)
+"""
+import pytest
+
+from app import db
+from app.models.niveau import Niveau
+from app.models.matiere import Matiere
+from app.services.matiere_service import MatiereService
+from app.services.referentiel_service import catalogue_referentiels
+
+
+@pytest.fixture
+def app(sqlite_app):
+    db.session.add_all([
+        Niveau(code='L1', nom='Licence 1', ordre=1, cycle='licence'),
+        Matiere(code='MATH101', nom='Mathématiques', coefficient=2.0),
+        Matiere(code='HIST101', nom='Histoire', coefficient=1.0, actif=False),
+    ])
+    db.session.commit()
+    return sqlite_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def requetes(app, compter_requetes):
+    """Requêtes SQL exécutées"""
+    with compter_requetes() as executees:
+        yield executees
+
+
+def test_liste_en_cache_et_304(client, requetes):
+    reponse = client.get('/api/matieres')
+    etag = reponse.headers['ETag']
+    assert reponse.status_code == 200 and len(reponse.get_json()) == 2
+
+    requetes.clear()
+    reponse = client.get('/api/matieres')
+    assert reponse.status_code == 200 and reponse.headers['ETag'] == etag
+    assert requetes == []
+
+    reponse = client.get('/api/matieres', headers={'If-None-Match': etag})
+    assert reponse.status_code == 304
+    assert reponse.data == b''
+
+    reponse = client.get('/api/matieres?actives_seulement=true')
+    assert [m['code'] for m in reponse.get_json()] == ['MATH101']
+    assert reponse.headers['ETag'] != etag
+
+
+def test_ecriture_invalide_le_cache(client):
+    etag = client.get('/api/matieres').headers['ETag']
+
+    MatiereService().create_matiere({'code': 'PHYS101', 'nom': 'Physique', 'coefficient': 1.5})
+
+    reponse = client.get('/api/matieres', headers={'If-None-Match': etag})
+    assert reponse.status_code == 200
+    assert 'PHYS101' in [m['code'] for m in reponse.get_json()]
+    assert reponse.headers['ETag'] != etag
+
+
+def test_ecriture_annulee_sans_invalidation(app):
+    catalogue_referentiels.lister('niveaux')
+    version = catalogue_referentiels.version
+
+    db.session.add(Niveau(code='L2', nom='Licence 2', ordre=2, cycle='licence'))
+    db.session.flush()
+    db.session.rollback()
+
+    assert catalogue_referentiels.version == version
+    assert [n['code'] for n in catalogue_referentiels.lister('niveaux')[0]] == ['L1']
+
+
+def test_catalogue_combine(client, requetes):
+    reponse = client.get('/api/referentiels')
+    catalogue = reponse.get_json()
+
+    assert reponse.status_code == 200
+    assert set(catalogue) == {'niveaux', 'mentions', 'parcours', 'matieres', 'etablissements'}
+    assert [n['code'] for n in catalogue['niveaux']] == ['L1']
+    assert len(catalogue['matieres']) == 2
+
+    requetes.clear()
+    reponse = client.get('/api/referentiels', headers={'If-None-Match': reponse.headers['ETag']})
+    assert reponse.status_code == 304
+    assert requetes == []
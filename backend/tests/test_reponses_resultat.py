@@ -0,0 +1,231 @@
+"""
+Tests du stockage normalisé des réponses (ReponseResultat) et de la reprise des anciens détails JSON
+"""
+import importlib.util
+import json
+import os
+from datetime import datetime
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.models.resultat import Resultat
+from app.models.reponse_resultat import ReponseResultat
+from app.repositories.statistiques_qcm_repository import StatistiquesQCMRepository
+
+CHEMIN_MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions',
+                                '20260116_090000_add_reponses_resultat.py')
+
+
+@pytest.fixture
+def qcm(sqlite_app):
+    """QCM de deux questions (la seconde avec une explication)"""
+    enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+    etudiant = User(email='etudiant@test.com', name='Etudiant', role=UserRole.ETUDIANT)
+    db.session.add_all([enseignant, etudiant])
+    db.session.flush()
+    qcm = QCM(titre='QCM', createur_id=enseignant.id)
+    db.session.add(qcm)
+    db.session.flush()
+    db.session.add_all([
+        Question(id='q1', enonce='Capitale de la France ?', qcm_id=qcm.id, points=1),
+        Question(id='q2', enonce='Langages typés ?', qcm_id=qcm.id, points=2, explication='Voir le cours 3'),
+    ])
+    db.session.commit()
+    return qcm
+
+
+def detail_soumission(correct_q1=True):
+    """Détail des réponses tel que construit par ResultatService.soumettre"""
+    return {
+        'q1': {'question_id': 'q1', 'question_enonce': 'Capitale de la France ?', 'question_numero': 1,
+               'answer': 'Paris' if correct_q1 else 'Lyon', 'correct_answer': 'Paris', 'correct': correct_q1,
+               'score': 1.0 if correct_q1 else 0.0, 'max_score': 1.0, 'feedback': ''},
+        'q2': {'question_id': 'q2', 'question_enonce': 'Langages typés ?', 'question_numero': 2,
+               'answer': ['Rust', 'Java'], 'correct_answer': ['Java', 'Rust'], 'correct': True,
+               'score': 2.0, 'max_score': 2.0, 'feedback': 'Voir le cours 3'},
+    }
+
+
+def creer_resultat(qcm, status='termine'):
+    resultat = Resultat(etudiant_id=qcm.createur_id, qcm_id=qcm.id, date_debut=datetime.utcnow(),
+                        score_maximum=3, questions_total=2, status=status)
+    db.session.add(resultat)
+    return resultat
+
+
+def test_aller_retour_compatible(sqlite_app, qcm):
+    """get_reponses_detail restitue le format historique, énoncé et explication compris"""
+    resultat = creer_resultat(qcm)
+    resultat.set_reponses_detail(detail_soumission())
+    db.session.commit()
+    resultat_id = resultat.id
+    db.session.expunge_all()
+
+    resultat = db.session.get(Resultat, resultat_id)
+    assert resultat.reponses_detail is None
+    assert resultat.get_reponses_detail() == detail_soumission()
+    assert resultat.to_dict(include_details=True)['reponsesDetail'] == detail_soumission()
+    assert db.session.query(ReponseResultat).filter_by(resultat_id=resultat_id).count() == 2
+
+
+def test_remplacement_et_suppression(sqlite_app, qcm):
+    """Redéfinir le détail remplace les lignes; supprimer le résultat supprime ses réponses"""
+    resultat = creer_resultat(qcm)
+    resultat.set_reponses_detail(detail_soumission())
+    db.session.commit()
+
+    resultat.set_reponses_detail({'q1': detail_soumission(correct_q1=False)['q1']})
+    db.session.commit()
+    assert list(resultat.get_reponses_detail()) == ['q1']
+    assert resultat.get_reponses_detail()['q1']['answer'] == 'Lyon'
+
+    db.session.delete(resultat)
+    db.session.commit()
+    assert db.session.query(ReponseResultat).count() == 0
+
+
+def test_ancien_detail_json_toujours_lu(sqlite_app, qcm):
+    """Un résultat non migré est lu depuis l'ancien champ JSON"""
+    resultat = creer_resultat(qcm)
+    resultat.reponses_detail = json.dumps(detail_soumission())
+    db.session.commit()
+
+    assert resultat.get_reponses_detail() == detail_soumission()
+
+
+def test_question_supprimee(sqlite_app, qcm):
+    """Sans la question, le détail garde la réponse, l'énoncé et l'explication soumis"""
+    resultat = creer_resultat(qcm)
+    resultat.set_reponses_detail(detail_soumission())
+    db.session.commit()
+    db.session.delete(db.session.get(Question, 'q2'))
+    db.session.commit()
+    db.session.expire_all()
+
+    assert resultat.get_reponses_detail() == detail_soumission()
+
+
+def test_question_modifiee_sans_reecrire_l_historique(sqlite_app, qcm):
+    """Modifier l'énoncé ou l'explication d'une question ne change pas les résultats passés"""
+    resultat = creer_resultat(qcm)
+    resultat.set_reponses_detail(detail_soumission())
+    db.session.commit()
+    question = db.session.get(Question, 'q2')
+    question.enonce = 'Langages compilés ?'
+    question.explication = 'Voir le cours 4'
+    db.session.commit()
+    db.session.expire_all()
+
+    assert resultat.get_reponses_detail() == detail_soumission()
+
+
+def test_agregats_sql_par_question(sqlite_app, qcm):
+    """Réponses agrégées par (question, réponse) sur les seuls résultats terminés"""
+    for correct_q1 in (True, True, False):
+        creer_resultat(qcm).set_reponses_detail(detail_soumission(correct_q1))
+    creer_resultat(qcm, status='en_cours').set_reponses_detail(detail_soumission())
+    db.session.commit()
+
+    lignes = {(question_id, reponse): (nombre, correctes)
+              for question_id, reponse, nombre, correctes in StatistiquesQCMRepository().agreger_reponses(qcm.id)}
+
+    assert lignes == {
+        ('q1', '"Paris"'): (2, 2),
+        ('q1', '"Lyon"'): (1, 0),
+        ('q2', '["Rust", "Java"]'): (3, 3),
+    }
+
+
+def test_migration_reprend_les_anciens_details(sqlite_app, qcm):
+    """La migration convertit les anciens détails JSON par lots et garde les détails illisibles"""
+    spec = importlib.util.spec_from_file_location('migration_reponses_resultat', CHEMIN_MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    migration.TAILLE_LOT = 2
+
+    for _ in range(5):
+        creer_resultat(qcm).reponses_detail = json.dumps(detail_soumission())
+    illisible = creer_resultat(qcm)
+    illisible.reponses_detail = '{pas du json'
+    # Deux ids identiques sur 36 caractères: non tronqués, le détail reste en JSON
+    ids_longs = {f"{'x' * 36}-{i}": {'answer': 'A', 'correct': True} for i in range(2)}
+    id_long = creer_resultat(qcm)
+    id_long.reponses_detail = json.dumps(ids_longs)
+    db.session.commit()
+    ids = [r.id for r in Resultat.query.filter(Resultat.id.notin_([illisible.id, id_long.id])).all()]
+    illisible_id, id_long_id = illisible.id, id_long.id
+    db.session.remove()
+
+    with db.engine.begin() as connexion:
+        ReponseResultat.__table__.drop(connexion)
+        with Operations.context(MigrationContext.configure(connexion)):
+            migration.upgrade()
+    db.session.expire_all()
+
+    for resultat_id in ids:
+        resultat = db.session.get(Resultat, resultat_id)
+        assert resultat.reponses_detail is None
+        assert resultat.get_reponses_detail() == detail_soumission()
+    assert db.session.get(Resultat, illisible_id).reponses_detail == '{pas du json'
+    assert db.session.get(Resultat, id_long_id).get_reponses_detail() == ids_longs
+    assert db.session.query(ReponseResultat).count() == 2 * len(ids)
+
+
+def test_migration_garde_l_enonce_soumis(sqlite_app, qcm):
+    """L'énoncé recopié dans l'ancien JSON est conservé; absent, il est repris sur la question"""
+    spec = importlib.util.spec_from_file_location('migration_reponses_resultat', CHEMIN_MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    ancien = detail_soumission()
+    ancien['q1']['question_enonce'] = 'Capitale française ?'
+    del ancien['q2']['question_enonce'], ancien['q2']['feedback']
+    resultat = creer_resultat(qcm)
+    resultat.reponses_detail = json.dumps(ancien)
+    db.session.commit()
+    resultat_id = resultat.id
+    db.session.remove()
+
+    with db.engine.begin() as connexion:
+        ReponseResultat.__table__.drop(connexion)
+        with Operations.context(MigrationContext.configure(connexion)):
+            migration.upgrade()
+    db.session.expire_all()
+
+    attendu = detail_soumission()
+    attendu['q1']['question_enonce'] = 'Capitale française ?'
+    assert db.session.get(Resultat, resultat_id).get_reponses_detail() == attendu
+
+
+def test_liste_admin_sans_requete_par_resultat(sqlite_app, qcm):
+    """Page admin des résultats avec détails: nombre de requêtes indépendant du nombre de lignes"""
+    from sqlalchemy import event
+    from app.services.admin_complete_service import AdminCompleteService
+
+    qcm_id = qcm.id
+
+    def requetes_page(nombre):
+        qcm_courant = db.session.get(QCM, qcm_id)
+        for _ in range(nombre):
+            creer_resultat(qcm_courant).set_reponses_detail(detail_soumission())
+        db.session.commit()
+        db.session.expunge_all()
+        executees = []
+        compter = lambda *args: executees.append(1)
+        event.listen(db.engine, 'before_cursor_execute', compter)
+        try:
+            page, _ = AdminCompleteService().get_all_resultats_admin(limit=100)
+            AdminCompleteService().get_resultats_admin_curseur(limit=100)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', compter)
+        assert all(r['reponsesDetail'] for r in page)
+        db.session.expunge_all()
+        return len(executees)
+
+    assert requetes_page(2) == requetes_page(8)
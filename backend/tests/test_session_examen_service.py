@@ -0,0 +1,110 @@
+"""
+Tests du service des sessions d'examen (liste des examens de l'étudiant)
+"""
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.niveau import Niveau
+from app.models.classe import Classe
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.models.session_examen import SessionExamen
+from app.models.resultat import Resultat
+from app.services.session_examen_service import SessionExamenService
+
+
+def creer_donnees(nombre_sessions):
+    """Crée un étudiant et nombre_sessions sessions avec QCM, questions et tentatives"""
+    enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+    etudiant = User(email='etudiant@test.com', name='Etudiant', role=UserRole.ETUDIANT)
+    niveau = Niveau(code='L1', nom='Licence 1', ordre=1, cycle='licence')
+    db.session.add_all([enseignant, etudiant, niveau])
+    db.session.flush()
+
+    classe = Classe(code='L1-A', nom='L1 Info A', niveau_id=niveau.id, annee_scolaire='2024-2025')
+    db.session.add(classe)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for i in range(nombre_sessions):
+        qcm = QCM(titre=f'QCM {i}', matiere='Informatique', status='published', createur_id=enseignant.id)
+        db.session.add(qcm)
+        db.session.flush()
+        for points in (1, 2, 3):
+            db.session.add(Question(enonce=f'Question {points}', qcm_id=qcm.id, points=points))
+
+        session = SessionExamen(
+            titre=f'Session {i}',
+            date_debut=now - timedelta(hours=1),
+            date_fin=now + timedelta(days=1),
+            duree_minutes=60,
+            status='en_cours',
+            qcm_id=qcm.id,
+            classe_id=classe.id,
+            createur_id=enseignant.id
+        )
+        db.session.add(session)
+        db.session.flush()
+
+        # Une session sur deux a déjà une tentative terminée
+        if i % 2 == 0:
+            db.session.add(Resultat(
+                etudiant_id=etudiant.id,
+                session_id=session.id,
+                qcm_id=qcm.id,
+                date_debut=now,
+                score_maximum=6,
+                questions_total=3,
+                status='termine'
+            ))
+
+    db.session.commit()
+    return etudiant.id
+
+
+class TestSessionsDisponiblesFormat:
+    """Tests de get_sessions_disponibles_format"""
+
+    def test_contenu_formate(self, sqlite_app):
+        """Les agrégats et le statut sont calculés par session"""
+        etudiant_id = creer_donnees(2)
+        db.session.expire_all()
+
+        examens = SessionExamenService().get_sessions_disponibles_format(etudiant_id)
+
+        assert len(examens) == 2
+        par_titre = {e['titre']: e for e in examens}
+        assert par_titre['Session 0']['statut'] == 'termine'
+        assert par_titre['Session 1']['statut'] == 'disponible'
+        for examen in examens:
+            assert examen['nombreQuestions'] == 3
+            assert examen['totalPoints'] == 6
+            assert examen['niveau'] == 'Licence 1'
+            assert examen['classe']['niveau']['nom'] == 'Licence 1'
+
+    def test_nombre_requetes_constant(self, sqlite_app, compter_requetes):
+        """Le nombre de requêtes ne dépend pas du nombre de sessions"""
+        service = SessionExamenService()
+
+        etudiant_id = creer_donnees(2)
+        db.session.expire_all()
+        with compter_requetes() as requetes_petit:
+            service.get_sessions_disponibles_format(etudiant_id)
+
+        db.session.query(Resultat).delete()
+        db.session.query(SessionExamen).delete()
+        db.session.query(Question).delete()
+        db.session.query(QCM).delete()
+        db.session.query(Classe).delete()
+        db.session.query(Niveau).delete()
+        db.session.query(User).delete()
+        db.session.commit()
+
+        etudiant_id = creer_donnees(10)
+        db.session.expire_all()
+        with compter_requetes() as requetes_grand:
+            examens = service.get_sessions_disponibles_format(etudiant_id)
+
+        assert len(examens) == 10
+        assert len(requetes_grand) == len(requetes_petit)
@@ -0,0 +1,151 @@
+"""
+Tests de la diffusion Socket.IO entre workers (app.events.diffusion)
+
+Deux serveurs Socket.IO dans le même processus, reliés par le broker en mémoire (memory://):
+l'application principale et un second « worker » qui sert les clients WebSocket.
+"""
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_socketio import SocketIO
+from socketio.packet import Packet
+
+from app.events import diffusion, exam_timer, notifications
+from app.extensions import socketio
+
+
+@pytest.fixture
+def file_en_memoire(monkeypatch):
+    """File de messages Socket.IO en mémoire (memory://), broker et présence vidés"""
+    monkeypatch.setenv('SOCKETIO_MESSAGE_QUEUE', 'memory://')
+    diffusion.broker_local.vider()
+    diffusion.get_presence().vider()
+    yield
+    socketio.server.manager.fermer()
+    diffusion.broker_local.vider()
+    diffusion.get_presence().vider()
+
+
+@pytest.fixture
+def app(file_en_memoire, sqlite_app):
+    return sqlite_app
+
+
+@pytest.fixture
+def worker(app):
+    """
+    Second serveur Socket.IO (autre worker) avec les gestionnaires de notifications
+
+    Les paquets envoyés aux clients de test sont relevés au niveau Engine.IO: le client de
+    test de Flask-SocketIO n'intercepte pas les emits vers les rooms de python-socketio 5.
+    """
+    app_worker = Flask('worker')
+    app_worker.config['JWT_SECRET_KEY'] = app.config['JWT_SECRET_KEY']
+    JWTManager(app_worker)
+    gestionnaire = diffusion.GestionnaireFileLocale(channel=app.config['SOCKETIO_CHANNEL'])
+    serveur = SocketIO(app_worker, client_manager=gestionnaire, async_mode='threading')
+    serveur.on('connect')(notifications.handle_connect)
+    serveur.on('disconnect')(notifications.handle_disconnect)
+    serveur.on('join_user_room')(notifications.handle_join_user_room)
+
+    paquets = []
+    serveur.server._send_eio_packet = lambda eio_sid, paquet: paquets.append((eio_sid, paquet.data))
+    yield SimpleNamespace(serveur=serveur, app=app_worker, paquets=paquets)
+    gestionnaire.fermer()
+
+
+def connecter(worker, user_id):
+    """Client WebSocket du second worker, dans la room personnelle de user_id"""
+    client = worker.serveur.test_client(worker.app)
+    client.emit('join_user_room', {'token': create_access_token(identity=user_id)})
+    return client
+
+
+def attendre(worker, client, evenement, nombre=1, delai=2.0):
+    """Payloads reçus par un client pour un événement (remise asynchrone par le thread du gestionnaire)"""
+    fin = time.monotonic() + delai
+    while True:
+        recus = []
+        for eio_sid, donnees in list(worker.paquets):
+            paquet = Packet(encoded_packet=donnees)
+            if eio_sid == client.eio_sid and paquet.data and paquet.data[0] == evenement:
+                recus.append(paquet.data[1])
+        if len(recus) >= nombre or time.monotonic() >= fin:
+            return recus
+        time.sleep(0.01)
+
+
+def test_notification_remise_par_un_autre_worker(app, worker):
+    client = connecter(worker, 'user-1')
+
+    notifications.notify_user_activated('user-1')
+
+    recus = attendre(worker, client, 'account_activated')
+    assert [r['type'] for r in recus] == ['account_activated']
+
+
+def test_presence_partagee(app, worker):
+    client = connecter(worker, 'user-1')
+
+    assert notifications.est_connecte('user-1')
+    assert diffusion.get_presence().utilisateurs_connectes() == {'user-1'}
+
+    client.disconnect()
+    assert not notifications.est_connecte('user-1')
+
+
+def test_emissions_groupees_une_seule_publication(app, worker):
+    clients = {user_id: connecter(worker, user_id) for user_id in ('user-1', 'user-2', 'user-3')}
+    publications = diffusion.broker_local.publications
+
+    with diffusion.emissions_groupees():
+        for numero, user_id in enumerate(clients):
+            notifications.notify_commentaire_resultat(user_id, f'resultat-{numero}', 'Bien')
+        notifications.notify_commentaire_resultat('user-1', 'resultat-0', 'Bien')  # Doublon
+        notifications.notify_admins_stats_update()
+        notifications.notify_admins_stats_update()
+
+    assert diffusion.broker_local.publications == publications + 1
+    for numero, (user_id, client) in enumerate(clients.items()):
+        recus = attendre(worker, client, 'commentaire_resultat')
+        assert [r['resultat_id'] for r in recus] == [f'resultat-{numero}']
+
+
+def test_oubli_echeance_propage_aux_autres_workers(app, worker):
+    """Le signal publié par un serveur est exécuté par l'autre, sans atteindre les clients"""
+    client = connecter(worker, 'user-1')
+    exam_timer.echeances.enregistrer('resultat-1', 'user-1', datetime.utcnow(), 30)
+    try:
+        socketio.server.manager.publier_signal(exam_timer.SIGNAL_OUBLI, 'resultat-1')
+
+        fin = time.monotonic() + 2.0
+        while exam_timer.echeances.get('resultat-1') is not None and time.monotonic() < fin:
+            time.sleep(0.01)
+        assert exam_timer.echeances.get('resultat-1') is None
+        assert attendre(worker, client, exam_timer.SIGNAL_OUBLI, delai=0.1) == []
+    finally:
+        exam_timer.echeances.vider()
+
+
+def test_regroupement_des_emissions():
+    emissions = [
+        ('qcm_disponible', {'id': 1}, 'user_a', '/'),
+        ('stats_update', {'timestamp': None}, 'admins', '/'),
+        ('qcm_disponible', {'id': 1}, 'user_b', '/'),
+        ('qcm_disponible', {'id': 1}, 'user_a', '/'),
+        ('stats_update', {'timestamp': None}, 'admins', '/'),
+        ('qcm_disponible', {'id': 2}, 'user_c', '/'),
+    ]
+
+    messages = diffusion.regrouper_emissions(emissions, taille_lot=500)
+
+    assert [(m['event'], m['data'], m['room']) for m in messages] == [
+        ('qcm_disponible', {'id': 1}, ['user_a', 'user_b']),
+        ('stats_update', {'timestamp': None}, 'admins'),
+        ('qcm_disponible', {'id': 2}, 'user_c'),
+    ]
+    assert len(diffusion.regrouper_emissions(emissions[:3], taille_lot=1)) == 3
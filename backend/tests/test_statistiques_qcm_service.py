@@ -0,0 +1,188 @@
+"""
+Tests des agrégats de statistiques des QCM (mise à jour incrémentale et reconstruction)
+"""
+from datetime import datetime
+
+from app import db
+from app.models.user import User, UserRole
+from app.models.qcm import QCM
+from app.models.question import Question
+from app.models.resultat import Resultat
+from app.models.statistiques_qcm import StatistiquesQCM
+from app.services.statistiques_qcm_service import StatistiquesQCMService
+
+
+def creer_qcm():
+    """Crée un QCM de deux questions et retourne (qcm, [questions])"""
+    enseignant = User(email='prof@test.com', name='Prof', role=UserRole.ENSEIGNANT)
+    db.session.add(enseignant)
+    db.session.flush()
+
+    qcm = QCM(titre='QCM', matiere='Informatique', status='published', createur_id=enseignant.id)
+    db.session.add(qcm)
+    db.session.flush()
+    questions = [Question(enonce=f'Question {i}', qcm_id=qcm.id, points=1) for i in range(2)]
+    db.session.add_all(questions)
+    db.session.commit()
+    return qcm, questions
+
+
+def soumettre(qcm, questions, numero, note, correctes):
+    """Crée un résultat terminé et l'ajoute aux agrégats comme le fait ResultatService"""
+    etudiant = User(email=f'etudiant{numero}@test.com', name=f'Etudiant {numero}', role=UserRole.ETUDIANT)
+    db.session.add(etudiant)
+    db.session.flush()
+
+    reponses_detail = {
+        q.id: {'answer': 'A' if i < correctes else 'B', 'correct': i < correctes}
+        for i, q in enumerate(questions)
+    }
+    resultat = Resultat(
+        etudiant_id=etudiant.id,
+        qcm_id=qcm.id,
+        date_debut=datetime.utcnow(),
+        date_fin=datetime.utcnow(),
+        duree_reelle_secondes=60 * numero,
+        score_maximum=2,
+        questions_total=2,
+        note_sur_20=note,
+        pourcentage=note * 5,
+        status='termine'
+    )
+    resultat.set_reponses_detail(reponses_detail)
+    db.session.add(resultat)
+    db.session.flush()
+
+    StatistiquesQCMService().enregistrer_resultat(resultat, reponses_detail)
+    db.session.commit()
+    return resultat
+
+
+def resultat_anterieur(qcm):
+    """Résultat terminé enregistré sans passer par les agrégats (antérieur à leur création)"""
+    db.session.add(Resultat(etudiant_id=qcm.createur_id, qcm_id=qcm.id, date_debut=datetime.utcnow(),
+                            note_sur_20=15, pourcentage=75, score_maximum=2, questions_total=2,
+                            status='termine'))
+    db.session.commit()
+
+
+def cles_comparables(stats):
+    """Retire la liste des résultats (ordre instable à created_at égal)"""
+    return {k: v for k, v in stats.items() if k != 'resultats'}
+
+
+class TestStatistiquesQCM:
+    """Tests de StatistiquesQCMService"""
+
+    def test_incremental_egal_reconstruction(self, sqlite_app):
+        """Les agrégats incrémentaux donnent le même résultat qu'une reconstruction"""
+        service = StatistiquesQCMService()
+        qcm, questions = creer_qcm()
+
+        # Lecture avant toute soumission: statistiques vides, aucun agrégat écrit
+        assert service.get_statistiques_qcm(qcm.id)['nombre_soumissions'] == 0
+        assert db.session.get(StatistiquesQCM, qcm.id) is None
+
+        for numero, (note, correctes) in enumerate([(20, 2), (10, 1), (5.5, 1), (0, 0)], start=1):
+            soumettre(qcm, questions, numero, note, correctes)
+
+        incremental = service.get_statistiques_qcm(qcm.id)
+        assert incremental['nombre_soumissions'] == 4
+        assert incremental['nombre_etudiants_uniques'] == 4
+        assert incremental['moyenne_note_sur_20'] == 8.88
+        assert incremental['taux_reussite'] == 50.0
+        assert incremental['note_min'] == 0
+        assert incremental['note_max'] == 20
+        assert incremental['note_mediane'] == 7.75
+        assert incremental['statistiques_par_question'][0]['nombre_correctes'] == 3
+        assert incremental['statistiques_par_question'][1]['nombre_correctes'] == 1
+
+        service.reconstruire_qcm(qcm.id)
+        assert cles_comparables(service.get_statistiques_qcm(qcm.id)) == cles_comparables(incremental)
+
+    def test_correction_et_suppression(self, sqlite_app):
+        """Une correction ou une suppression met à jour les agrégats et les bornes"""
+        service = StatistiquesQCMService()
+        qcm, questions = creer_qcm()
+        service.reconstruire_qcm(qcm.id)
+
+        soumettre(qcm, questions, 1, 12, 1)
+        resultat_max = soumettre(qcm, questions, 2, 18, 2)
+
+        resultat_max.note_sur_20 = 8
+        resultat_max.pourcentage = 40
+        service.corriger_resultat(resultat_max, 18, 90)
+        db.session.commit()
+
+        stats = service.get_statistiques_qcm(qcm.id)
+        assert stats['note_max'] == 12
+        assert stats['note_min'] == 8
+        assert stats['taux_reussite'] == 50.0
+
+        db.session.delete(resultat_max)
+        service.retirer_resultat(resultat_max)
+        db.session.commit()
+
+        stats = service.get_statistiques_qcm(qcm.id)
+        assert stats['nombre_soumissions'] == 1
+        assert stats['note_min'] == 12
+        assert stats['note_max'] == 12
+        assert stats['statistiques_par_question'][1]['nombre_reponses'] == 1
+
+    def test_nombre_requetes_independant_des_soumissions(self, sqlite_app, compter_requetes):
+        """La lecture des statistiques ne dépend pas du nombre de soumissions"""
+        service = StatistiquesQCMService()
+        qcm, questions = creer_qcm()
+        service.reconstruire_qcm(qcm.id)
+
+        soumettre(qcm, questions, 1, 10, 1)
+        db.session.expire_all()
+        with compter_requetes() as requetes_petit:
+            service.get_statistiques_qcm(qcm.id)
+
+        for numero in range(2, 30):
+            soumettre(qcm, questions, numero, numero % 20, numero % 3)
+        db.session.expire_all()
+        with compter_requetes() as requetes_grand:
+            stats = service.get_statistiques_qcm(qcm.id)
+
+        assert stats['nombre_soumissions'] == 29
+        assert db.session.get(StatistiquesQCM, qcm.id).nombre_soumissions == 29
+        assert len(requetes_grand) == len(requetes_petit)
+
+    def test_lecture_sans_ecriture(self, sqlite_app, compter_requetes):
+        """La lecture d'un QCM sans agrégats n'écrit rien et ne les reconstruit pas"""
+        service = StatistiquesQCMService()
+        qcm, questions = creer_qcm()
+        resultat_anterieur(qcm)
+
+        with compter_requetes() as requetes:
+            stats = service.get_statistiques_qcm(qcm.id)
+
+        assert stats['nombre_soumissions'] == 0
+        assert all(r.lstrip().upper().startswith('SELECT') for r in requetes)
+        assert db.session.get(StatistiquesQCM, qcm.id) is None
+
+    def test_resultats_anterieurs_sans_agregats(self, sqlite_app):
+        """Des résultats antérieurs sans agrégats ne sont pas comptés à partir de zéro"""
+        service = StatistiquesQCMService()
+        qcm, questions = creer_qcm()
+        resultat_anterieur(qcm)
+
+        soumettre(qcm, questions, 1, 10, 1)
+        assert db.session.get(StatistiquesQCM, qcm.id) is None
+
+        service.reconstruire_qcm(qcm.id)
+        soumettre(qcm, questions, 2, 5, 0)
+        assert service.get_statistiques_qcm(qcm.id)['nombre_soumissions'] == 3
+
+    def test_premieres_soumissions_sans_conflit(self, sqlite_app):
+        """La création des agrégats ne heurte pas des agrégats créés entre-temps"""
+        service = StatistiquesQCMService()
+        qcm, questions = creer_qcm()
+        service.stats_repo.creer_si_absent(qcm.id)
+        service.stats_repo.creer_si_absent(qcm.id)
+        db.session.commit()
+
+        soumettre(qcm, questions, 1, 10, 1)
+        assert service.get_statistiques_qcm(qcm.id)['nombre_soumissions'] == 1
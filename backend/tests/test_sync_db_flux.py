@@ -0,0 +1,63 @@
+"""
+Tests des fonctions du mode flux de scripts/sync_db_to_prod.py (sans base PostgreSQL)
+"""
+import importlib.util
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def sync_db():
+    chemin = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'sync_db_to_prod.py')
+    spec = importlib.util.spec_from_file_location('sync_db_to_prod', chemin)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_format_copy(sync_db):
+    tampon = sync_db.lignes_copy([
+        ('id-1', 'Commentaire\tavec\ntabulation', None),
+        ('id-2', 'C:\\chemin\r', 't'),
+    ])
+
+    assert tampon.getvalue() == (
+        'id-1\tCommentaire\\tavec\\ntabulation\t\\N\n'
+        'id-2\tC:\\\\chemin\\r\tt\n'
+    )
+
+
+def test_ordonnancement_des_tables(sync_db):
+    tables = ['niveaux', 'matieres', 'users', 'classes', 'questions', 'qcms', 'qcm_niveaux']
+    dependances = {
+        'classes': {'niveaux'},
+        'questions': {'qcms'},
+        'qcms': {'users', 'matieres'},
+        'qcm_niveaux': {'qcms', 'niveaux'},
+    }
+
+    assert sync_db.tables_pretes(tables, set(), dependances, True) == ['niveaux', 'matieres', 'users']
+    restantes = ['classes', 'questions', 'qcms', 'qcm_niveaux']
+    terminees = {'niveaux', 'matieres', 'users'}
+    assert sync_db.tables_pretes(restantes, terminees, dependances, False) == ['classes', 'qcms']
+    assert sync_db.tables_pretes(['questions', 'qcm_niveaux'], terminees | {'qcms'}, dependances, False) \
+        == ['questions', 'qcm_niveaux']
+
+    # Cycle de clés étrangères: la première table restante est débloquée
+    cycle = {'a': {'b'}, 'b': {'a'}}
+    assert sync_db.tables_pretes(['a', 'b'], set(), cycle, True) == ['a']
+    assert sync_db.tables_pretes(['a', 'b'], set(), cycle, False) == []
+
+
+def test_points_de_reprise(sync_db, tmp_path):
+    chemin = str(tmp_path / 'reprise.json')
+    reprise = sync_db.PointsDeReprise(chemin)
+    reprise.enregistrer('users', terminee=True)
+    reprise.enregistrer('resultats', 'cle-42')
+
+    relue = sync_db.PointsDeReprise(chemin)
+    assert relue.table_terminee('users') and not relue.table_terminee('resultats')
+    assert relue.derniere_cle('resultats') == 'cle-42'
+    assert relue.derniere_cle('qcms') is None
+    assert not sync_db.PointsDeReprise(None).actif
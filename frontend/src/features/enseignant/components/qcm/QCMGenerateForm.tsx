@@ -324,11 +324,10 @@ export function QCMGenerateForm({
         // Génération depuis un document
         const file = data.file[0] as File;
         const fileType = file.name.endsWith(".pdf") ? "pdf" : "docx";
-        const base64Content = await qcmService.fileToBase64(file);
 
         response = await qcmService.generateFromDocument({
           titre: data.titre,
-          file_content: base64Content,
+          file,
           file_type: fileType,
           num_questions: data.num_questions || 10,
           matiere: data.matiere,
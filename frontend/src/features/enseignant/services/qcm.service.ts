@@ -197,11 +197,22 @@ export const qcmService = {
 
   /**
    * Génère un QCM à partir d'un document PDF/DOCX (asynchrone)
+   * Le fichier est envoyé tel quel en multipart/form-data (pas d'encodage base64)
    */
   async generateFromDocument(
     params: GenerateFromDocumentParams,
   ): Promise<TaskStatus> {
-    const response = await qcmApi.post("/qcm/generate/document", params);
+    const formData = new FormData();
+
+    Object.entries(params).forEach(([cle, valeur]) => {
+      if (valeur !== undefined && valeur !== null && valeur !== "") {
+        formData.append(cle, valeur instanceof File ? valeur : String(valeur));
+      }
+    });
+
+    const response = await qcmApi.post("/qcm/generate/document", formData, {
+      headers: { "Content-Type": "multipart/form-data" },
+    });
 
     return response.data;
   },
@@ -215,25 +226,6 @@ export const qcmService = {
     return response.data;
   },
 
-  /**
-   * Convertit un fichier en base64
-   */
-  async fileToBase64(file: File): Promise<string> {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-
-      reader.readAsDataURL(file);
-      reader.onload = () => {
-        const base64 = reader.result as string;
-        // Retirer le préfixe "data:*/*;base64,"
-        const base64Content = base64.split(",")[1];
-
-        resolve(base64Content);
-      };
-      reader.onerror = (error) => reject(error);
-    });
-  },
-
   /**
    * Génère le lien partageable pour un QCM
    */
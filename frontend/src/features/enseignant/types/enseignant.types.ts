@@ -160,7 +160,7 @@ export interface GenerateFromTextParams {
  */
 export interface GenerateFromDocumentParams {
   titre: string;
-  file_content: string; // base64
+  file: File;
   file_type: "pdf" | "docx";
   num_questions?: number;
   matiere?: string;